@@ -6,93 +6,128 @@ TO DO: Talvez essas funções devessem estar em basometro_alicativo
 '''
 
 from basometro import basometro_aplicativo
-import pandas as pd
-import os, shutil
+from basometro.core import armazenamento, geracoes, requisicoes
+import os
 
-def atualizar_basometro():
+def atualizar_basometro(df_path = "./database/basometro", manter_geracoes = geracoes.GERACOES_MANTIDAS):
+  '''
+  Atualiza o banco de dados e os arquivos da visualização.
 
-  def fazer_backup_database(df_path, df_backup_path):
-    backup = pd.read_csv(df_path, dtype = str)
-    backup.to_csv(df_backup_path, index = False)
+  O diretório output e o banco de dados, se estiver no formato colunar, são
+  versionados em gerações (ver geracoes.Geracoes): a atualização é montada em
+  uma geração nova, feita de hard links para os arquivos da atual, e só é
+  publicada – com a troca atômica de um link simbólico – quando termina. Se
+  ela falhar, a geração nova é apagada e a atual continua intacta. Bancos de
+  dados em CSV ou SQLite continuam sendo restaurados com marcar e restaurar.
 
-  def atualizar_database(df_path, df_backup_path):
+  Parâmetros:
+  df_path -> O caminho do banco de dados, em qualquer dos formatos de armazenamento.abrir_banco.
+  Se ele ainda não existir, é criado a partir de database/basometro.csv.
+  manter_geracoes -> O número de gerações guardadas do banco de dados e do
+  output, contando a atual. O padrão é geracoes.GERACOES_MANTIDAS.
+  '''
 
-    try:
-      basometro_aplicativo.atualizar_banco_de_dados(df_path = df_path,
-                                                    keep_all = False)
-    except Exception as e:
-      print("Um erro inesperado aconteceu ao atualizar o banco de dados. Vamos encerrar a operação e restaurar os arquivos ao estado anterior.")
-      shutil.copy(df_backup_path, df_path)
-      raise
+  def migrar_database(df_path, csv_path):
+    # Bancos de dados criados antes do formato colunar existem apenas em CSV
+    banco = armazenamento.abrir_banco(df_path)
+
+    if not banco.existe() and os.path.isfile(csv_path):
+      print(f"Convertendo {csv_path} para o formato colunar em {df_path}")
+      banco.importar(armazenamento.abrir_banco(csv_path))
+
+  def atualizar_database(df_path, csv_path, diario_path):
+
+    def atualizar(caminho):
+      basometro_aplicativo.atualizar_banco_de_dados(df_path = caminho,
+                                                    keep_all = False,
+                                                    diario_path = diario_path)
+
+    ########################################
+    ### EXECUÇÃO DE atualizar_database() ###
+    ########################################
+
+    erro = "Um erro inesperado aconteceu ao atualizar o banco de dados. Vamos encerrar a operação e restaurar os arquivos ao estado anterior."
+
+    if isinstance(armazenamento.abrir_banco(df_path), armazenamento.BancoColunar):
+
+      # Os votos novos são gravados em uma geração nova do banco de dados, com o índice, a matriz e as tabelas agregadas ao lado
+      try:
+        geracao = geracoes.Geracoes(df_path, sufixos = [ ".indice", ".matriz", ".agregados" ]).atualizar(atualizar, manter = manter_geracoes)
+      except Exception as e:
+        print(erro)
+        raise
+
+      print("Geração publicada:", geracao)
 
-  def fazer_backup_viz(output_path, backup_path):
-    if os.path.exists(backup_path):
-      shutil.rmtree(backup_path)
-    shutil.move(output_path, backup_path)
+    else:
+      # Em vez de copiar o banco de dados, registra o tamanho dele antes da atualização
+      marca = armazenamento.abrir_banco(df_path).marcar()
+      print("Estado registrado:", marca)
 
-  def atualizar_viz(df_path, temp_path, output_path, backup_path):
+      try:
+        atualizar(df_path)
+      except Exception as e:
+        print(erro)
+        armazenamento.abrir_banco(df_path).restaurar(marca)
+        raise
 
-    def substituir_diretorios(temp_path, output_path):
-      shutil.move(temp_path, output_path)
+    # O CSV é apenas uma exportação do banco de dados
+    armazenamento.abrir_banco(df_path).exportar_csv(csv_path)
+
+  def atualizar_viz(df_path, output_path):
+
+    def gerar(caminho):
+      basometro_aplicativo.gerar_arquivos_viz(freqs = [ "MS" ],
+                                              df_path = df_path,
+                                              output_path = caminho,
+                                              incremental = True)
 
     ###################################
     ### EXECUÇÃO DE atualizar_viz() ###
     ###################################
 
+    # A geração nova começa com hard links para os arquivos da atual, e apenas
+    # os arquivos dos deputados, partidos e governos com votos novos são
+    # apagados e escritos de novo (ver gerar_arquivos_viz). Se os arquivos
+    # precisarem ser gerados do zero, os que não mudaram voltam a ser hard
+    # links para os da geração atual.
     try:
-      # Gerar arquivos de visualização em um diretório temporário
-      basometro_aplicativo.gerar_arquivos_viz(freqs = [ "MS" ],
-                                              df_path = df_path,
-                                              output_path = temp_path)
+      geracao = geracoes.Geracoes(output_path).atualizar(gerar, copiar_atual = True, deduplicar = True, manter = manter_geracoes)
     except Exception as e:
-      print("Um erro inesperado aconteceu ao gerar os arquivos da visualização. Vamos encerrar a operação e restaurar os arquivos ao estado anterior.")
-
-      # Copia o backup para o output; deleta o diretório temporário
-      shutil.copytree(backup_path, output_path)
-      if os.path.exists(temp_path):
-        shutil.rmtree(temp_path)
-
+      print("Um erro inesperado aconteceu ao gerar os arquivos da visualização. Vamos encerrar a operação e manter os arquivos no estado anterior.")
       raise
 
-    substituir_diretorios(temp_path, output_path)
+    print("Geração publicada:", geracao)
 
   #########################################
   ### EXECUÇÃO de atualizar_basometro() ###
   #########################################
 
   # Database
-  df_path              = "./database/basometro.csv"
-  df_backup_path       = "./database/basometro-backup.csv"
+  csv_path         = "./database/basometro.csv"
+  diario_path      = os.path.join(os.path.dirname(df_path), "atualizacao.diario")
 
   # Viz
   output_path      = "./output"
-  backup_path      = "./backup-output"
-  temp_path        = "./temp-output"
 
-  assert os.path.isfile(df_path)
+  migrar_database(df_path, csv_path)
+
+  assert armazenamento.abrir_banco(df_path).existe()
   assert os.path.exists(output_path)
-  assert not os.path.exists(temp_path)
 
   print("Atualizando o Basômetro e as visualizações de dados.")
 
-  print("Iniciando backup")
-  fazer_backup_database(df_path, df_backup_path)
-  print("Backup pronto")
-
   print("Atualizando database")
-  atualizar_database(df_path, df_backup_path)
+  atualizar_database(df_path, csv_path, diario_path)
   print("Atualização do database pronta")
-
-  print("Fazendo backup de viz")
-  fazer_backup_viz(output_path, backup_path)
-  print("Backup de viz pronto")
+  requisicoes.relatorio_cache()
+  requisicoes.relatorio_agendador()
 
   print("Atualizando viz")
-  atualizar_viz(df_path, temp_path, output_path, backup_path)
+  atualizar_viz(df_path, output_path)
   print("Atualização de viz pronta")
 
   assert os.path.exists(output_path)
-  assert not os.path.exists(temp_path)
 
   print("Pronto!")
 
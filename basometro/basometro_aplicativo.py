@@ -4,19 +4,16 @@ As funções desse programa servem para cumprir tarefas necessárias
 e gerar arquivos CSV para a elaboração das visualizações de dados.
 '''
 
-from basometro import basometro_governos, basometro_partidos, basometro_deputados
-from basometro.core import core
-from camaraPy.api_original import proposicoes
+from basometro import basometro_coleta, basometro_governos, basometro_partidos, basometro_deputados
+from basometro.core import agregados, armazenamento, diario, esquema, geracoes, indice, matriz, memo, requisicoes
 from camaraPy.api_original.core import custom_exceptions
-import datetime, glob, json, os
+from concurrent.futures import ProcessPoolExecutor
+import datetime, glob, json, os, shutil
+import numpy as np
 import pandas as pd
 
 '''
 TO DO LIST:
-- Otimizar a atualização de forma que não seja necessário carregar
-o banco de dados inteiro na memória sempre que a função for executada.
-Pode ser feito mantendo um log de texto externo e appendando os valores
-usando a biblioteca csv do Python.
 - Fazer com que as funções operem diretamente em um DataFrame
 e não precisem mais ler o arquivo inteiro. Isso evita processamento
 duplicado e vai melhorar a performance.
@@ -26,32 +23,48 @@ duplicado e vai melhorar a performance.
 ### ATUALIZAR BANCO DE DADOS ###
 ################################
 
-def atualizar_banco_de_dados(df_path, keep_all = False):
+def atualizar_banco_de_dados(df_path, keep_all = False, max_workers = basometro_coleta.MAX_REQUISICOES_SIMULTANEAS, diario_path = None):
   '''
   Essa função atualiza a base de dados de votos do Basômetro com
   todas as votações realizadas entre a data do último registro e a
   data de execução.
 
   Parâmetros:
-  df_path -> O caminho para o arquivo CSV
+  df_path -> O caminho do banco de dados: o diretório do formato colunar ou um
+  arquivo CSV (ver armazenamento.abrir_banco)
   keep_all ->  Boleano que, se verdadeiro, determina a coleta TODOS os votos,
   incluindo abstenções e invogações do artigo 17. O padrão é False.
+  max_workers -> Número máximo de proposições coletadas em paralelo.
+  O padrão é o valor de basometro_coleta.MAX_REQUISICOES_SIMULTANEAS.
+  diario_path -> O caminho do diário da atualização. O padrão é o arquivo
+  atualizacao.diario no diretório do banco de dados.
+
+  As proposições coletadas são registradas em um diário salvo ao lado do
+  banco de dados. Se a atualização for interrompida antes de salvar os novos
+  votos, a próxima execução recomeça de onde ela parou.
+
+  As votações que já estão no banco de dados e a data da mais recente vêm do
+  índice mantido ao lado dele (ver indice.IndiceVotacoes), então os votos
+  antigos não são lidos. Eles também não são reescritos: os novos votos são
+  acrescentados ao banco de dados, e o custo da atualização depende apenas
+  do número de votos novos. Se ela falhar, o banco de dados volta ao tamanho
+  anterior. A matriz de votos (ver matriz.MatrizVotos), se já existir, tem
+  refeitas apenas as partições dos governos que receberam votos novos, e as
+  tabelas agregadas (ver agregados.AgregadosVotos), se já existirem, somam
+  apenas os votos novos, recebidos do gravador à medida que são gravados.
   '''
 
-  def selecionar_intervalo_de_datas(df):
+  def selecionar_intervalo_de_datas(indice_votacoes):
     '''
     Seleciona intervalo de datas entre o último
     registro e data de hoje. Retorna um par de valores.
 
     Parâmetros:
 
-    df -> O banco de dados de votos do basômetro.
+    indice_votacoes -> O objeto indice.IndiceVotacoes do banco de dados
     '''
 
-    df_ = df.copy()
-
-    df_ [ 'data' ] = pd.to_datetime(df_.data, format = "%Y-%m-%d %H:%M:%S")
-    latest_entry  = df_.data.max()
+    latest_entry = indice_votacoes.ultima_data
     # Adicione data manualmente para testar
     #latest_entry   = pd.to_datetime("2019-04-20", format = "%Y-%m-%d %H:%M:%S")
 
@@ -59,89 +72,31 @@ def atualizar_banco_de_dados(df_path, keep_all = False):
 
     return latest_entry, today
 
-  def extrair_novos_votos(latest_entry, today):
+  def extrair_novos_votos(latest_entry, today, max_workers, diario_coleta, gravador):
     '''
     Obtém as proposições votadas entre a data da última entrada
-    do banco de dados e o dia de hoje.
+    do banco de dados e o dia de hoje e entrega os votos de cada
+    uma delas ao gravador.
 
     Parâmetros:
     latest_entry -> Data da última votação do banco de dados atual,
     obtida em selecionar_intervalo_de_datas(). Objeto datetime.
     today -> Data atual, gerada em selecionar_intervalo_de_datas(). Objeto datetime.
-    df -> O banco de dados do basômetro, gerado na função principal
+    max_workers -> Número máximo de proposições coletadas em paralelo.
+    diario_coleta -> O objeto diario.DiarioColeta da atualização.
+    gravador -> O objeto armazenamento.GravadorVotos do banco de dados.
     '''
 
-    def extrair_dados_proposicao(new_prop, latest_entry):
+    def manter_votacao(votacao):
       '''
-      Faz solicitações para a API e obtém os votos de uma proposição específica.
-
-      Parâmetros:
-      new_prop-> Uma das proposições na lista obtida por listar_novas_proposicoes().
+      Essa checagem é necessária para não pegar todas as votações
+      de uma proposição que apareceu no plenário em mais de um ano.
+      As votações do mesmo dia da última entrada também são mantidas,
+      já que pode haver outras depois dela; as que já estão no banco
+      de dados são descartadas pelo gravador.
       '''
-
-      # Cria objetos a partir das votações
-      votos_arr = [ ] # Esse array será populado
-
-      id_proposicao = new_prop['codProposicao']
-
-      new_prop = proposicoes.ObterProposicaoPorID( { "IdProp" : id_proposicao } )
-      new_prop = new_prop['proposicao']
-
-      params = {
-          "Tipo"   : new_prop['@tipo'].strip(),
-          "Numero" : new_prop['@numero'].strip(),
-          "Ano"    : new_prop['@ano'].strip()
-      }
-
-      # Acessa as votações da proposta
-      try:
-        votacoes = proposicoes.ObterVotacaoProposicao(params)
-
-        dados_proposicao = {
-          "tipoProposicao"   : votacoes['proposicao']['Sigla'].strip(),
-          "numeroProposicao" : votacoes['proposicao']['Numero'].strip(),
-          "anoProposicao"    : votacoes['proposicao']['Ano'].strip()
-        }
-
-        votacoes = votacoes['proposicao']['Votacoes']['Votacao']
-
-        # Se os dados vêm na forma de lista, a proposição em questão
-        # tem ao menos duas votações associadas à ela.
-        if isinstance(votacoes, list):
-
-          for votacao in votacoes:
-
-            # Essachecagem é necessária para não pegar todas as votações
-            # de uma proposição que apareceu no plenário em mais de um ano
-            data_votacao = pd.to_datetime(votacao["@Data"], format = "%d/%m/%Y")
-            if data_votacao > latest_entry:
-
-              # Cria um novo elemento que vai ser passado para o objeto Votacao
-              votacao["dadosProposicao"] = dados_proposicao
-
-              votacao = core.Votacao(votacao)
-              votos_arr.extend(votacao.votos)
-
-
-        # Se houve apenas uma votação, porém, os dados vêm como um dicionário
-        # solto e só precsisamos transformar ela em um objeto votação do basômetro.
-        elif isinstance(votacoes, dict):
-
-          # Essa checagem é necessária para não pegar todas as votações
-          # de uma proposição que apareceu no plenário em mais de um ano
-          data_votacao = pd.to_datetime(votacoes["@Data"], format = "%d/%m/%Y")
-          if data_votacao > latest_entry:
-
-            # Cria um novo elemento que vai ser passado para o objeto Votacao
-            votacoes["dadosProposicao"] = dados_proposicao
-
-            votacao = core.Votacao(votacoes)
-            votos_arr.extend(votacao.votos)
-
-      except custom_exceptions.ProposicaoAcessoria as e:
-        votos_arr = [ ]
-
-      return votos_arr
+      data_votacao = pd.to_datetime(votacao["@Data"], format = "%d/%m/%Y")
+      return data_votacao >= latest_entry
 
     # Caso aconteça uma virada de ano entre a data do último voto
     # e a data de requisição, vamos precisar fazer uma solicitação
@@ -156,10 +111,11 @@ def atualizar_banco_de_dados(df_path, keep_all = False):
     else:
       years = [ today.year ]
 
-    votes_arr = [ ]
-
     print("Extraindo votos dos anos:", years)
 
+    # Uma proposição votada nos dois anos é buscada uma única vez
+    memoria = memo.MemoProposicoes(years)
+
     for year in years:
 
       print("Olhando para o ano:", year)
@@ -171,7 +127,7 @@ def atualizar_banco_de_dados(df_path, keep_all = False):
       try:
 
         # Faz requisição para a API, recuperando as votações do ano atual
-        props = proposicoes.ListarProposicoesVotadasEmPlenario( { "Ano" : year } )
+        props = requisicoes.listar_proposicoes_votadas(year)
         props = props['proposicoes']['proposicao']
 
       except custom_exceptions.SemDados as e:
@@ -179,60 +135,108 @@ def atualizar_banco_de_dados(df_path, keep_all = False):
         print("O ano", year, "está zoado")
         continue
 
+      ids_proposicao = [ ]
+
       for prop in props:
 
         print("Looking at prop", prop)
 
-        if pd.to_datetime( prop [ "dataVotacao" ], format = "%d/%m/%Y") > latest_entry:
+        if pd.to_datetime( prop [ "dataVotacao" ], format = "%d/%m/%Y") >= latest_entry:
           print("Fetching vote on", prop["dataVotacao"])
-          new_votes = extrair_dados_proposicao(prop, latest_entry)
-          votes_arr.extend(new_votes)
+          ids_proposicao.append(prop['codProposicao'])
+
+      # A lista traz uma entrada por votação, então a mesma proposição pode
+      # aparecer várias vezes. dict.fromkeys remove as repetições mantendo a ordem.
+      ids_proposicao = list(dict.fromkeys(ids_proposicao))
 
-    return votes_arr
+      # Proposições registradas no diário de uma execução anterior não são coletadas de novo
+      retomadas = set( id_proposicao for id_proposicao in ids_proposicao if diario_coleta.concluida(year, id_proposicao) )
+      pendentes = [ id_proposicao for id_proposicao in ids_proposicao if id_proposicao not in retomadas ]
+
+      # Usa o mesmo motor de coleta concorrente do módulo basometro_coleta
+      resultados = basometro_coleta.coletar_proposicoes(pendentes, manter_votacao,
+                                                        max_workers = max_workers,
+                                                        year = year,
+                                                        memoria = memoria)
+
+      for id_proposicao in ids_proposicao:
+
+        if id_proposicao in retomadas:
+          new_votes = diario_coleta.votos(year, id_proposicao)
+
+        else:
+          # Os resultados vêm na mesma ordem de pendentes
+          _, new_votes = next(resultados)
+          diario_coleta.registrar(year, id_proposicao, new_votes)
+
+        gravador.adicionar(new_votes)
+
+    memoria.relatorio()
 
   ##########################
   ### EXECUÇÃO PRINCIPAL ###
   ##########################
 
-  # Lê a base de dados
-  df = pd.read_csv(df_path, dtype = str)
-
   # Pega os intervalos de data
-  latest_entry, today = selecionar_intervalo_de_datas(df)
+  indice_votacoes     = indice.IndiceVotacoes.abrir(df_path)
+  latest_entry, today = selecionar_intervalo_de_datas(indice_votacoes)
   print("Latest entry:", latest_entry, "Today:", today)
 
+  # O diário só é reaproveitado se a última data do banco de dados não mudou
+  if diario_path is None:
+    diario_path = os.path.join(os.path.dirname(df_path), "atualizacao.diario")
+
+  diario_coleta = diario.DiarioColeta(diario_path, { "tipo" : "atualizacao", "latest_entry" : str(latest_entry) })
+
+  # A matriz de votos, se estiver em dia com o banco de dados, é atualizada junto com ele
+  matriz_votos  = matriz.MatrizVotos(df_path)
+  matriz_em_dia = matriz_votos.carregar()
+
+  # O mesmo vale para as tabelas agregadas
+  agregados_votos  = agregados.AgregadosVotos(df_path)
+  agregados_em_dia = agregados_votos.carregar()
+
+  # Os novos votos são filtrados (duplicatas, senadores e, se assim determinado,
+  # ausências e art. 17) e gravados em lotes depois dos que já estão no banco
+  banco    = armazenamento.abrir_banco(df_path)
+  gravador = banco.gravador(keep_all = keep_all, anexar = True)
+
+  # Votações que já estão no banco de dados são descartadas pela identidade
+  gravador.votacoes.update(indice_votacoes.votacoes)
+
+  if agregados_em_dia:
+    gravador.observadores.append(agregados_votos.registrar)
+
   # Obtém as votações que transcorreram desde a última data adicionada
   print("Fetching new votes")
-  new_votes = extrair_novos_votos(latest_entry, today)
 
-  # Transforma em dataframe
-  new_votes = pd.DataFrame( [ item.__dict__ for item in new_votes ] )
+  try:
+    extrair_novos_votos(latest_entry, today, max_workers, diario_coleta, gravador)
 
-  if new_votes.shape[0] > 0:
+  except BaseException:
+    gravador.descartar()
+    raise
 
-    # Converte a coluna de data para um objeto ISO
-    new_votes [ 'data' ] = pd.to_datetime(new_votes.data, format = "%d/%m/%Y")
+  gravador.concluir()
 
-    # Faz checagens de duplicatas para derrubar um bug observado
-    # em algumas das votações registradas na api_original
-    new_votes = new_votes.drop_duplicates()
+  indice_votacoes.registrar(gravador)
+  indice_votacoes.salvar()
 
-    # Remove votos de parlamentares sem id – geralmente, senadores
-    new_votes = new_votes [ new_votes.ideCadastro != "" ]
+  # Apenas as partições dos governos que receberam votos novos são refeitas
+  if matriz_em_dia:
+    matriz_votos.atualizar(gravador.governos)
 
-    # Remove ausências e art. 17, se assim determinado
-    if keep_all is False:
-      new_votes = new_votes [ (new_votes.voto != "-") & (new_votes.voto != "Art. 17") ]
+  if agregados_em_dia:
+    agregados_votos.atualizar()
 
-  # Adiciona os novos votos ao df original e salva
-  df = df.append(new_votes, ignore_index = True)
-  df.to_csv(df_path, index = False)
+  # Com os votos salvos, o diário não é mais necessário
+  diario_coleta.apagar()
 
 ######################################
 ### GERAR ARQUIVOS DA VISUALIZAÇÃO ###
 ######################################
 
-def gerar_arquivos_viz(freqs, df_path, output_path):
+def gerar_arquivos_viz(freqs, df_path, output_path, incremental = False, processos = None):
   '''
   Acessa o banco de dados do Basômetro para gerar os
   arquivos de texto necessários para as visualizações.
@@ -240,112 +244,100 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
   Parâmetros:
   freqs -> Os intervalos de tempo pelos quais os dados de votação
   devem ser agrupados. São necessariamente múltiplos de "MS" (month-start).
-  df_path -> O caminho até a base de dados com todos os votos do Basômetro.
+  df_path -> O caminho até a base de dados com todos os votos do Basômetro, em
+  qualquer dos formatos de armazenamento.abrir_banco. Os votos são lidos com
+  os tipos de esquema.ESQUEMA, e os arquivos de governos, partidos e deputados
+  são calculados a partir da matriz de votos (ver matriz.MatrizVotos), que é
+  construída se ainda não existir.
   output_path -> O caminho até o diretório raiz onde os dados devem ser salvos.
+  incremental -> Booleano. Se verdadeiro e output_path já tiver os arquivos
+  gerados, com as mesmas freqs, a partir de uma revisão anterior das tabelas
+  agregadas do banco de dados (ver agregados.AgregadosVotos), apenas os
+  arquivos dos deputados, partidos e governos que receberam votos desde então
+  são gerados de novo, a partir das tabelas agregadas, junto com os arquivos
+  gerais que dependem deles. Caso contrário, o conteúdo de output_path é
+  apagado e todos os arquivos são gerados do zero. Em ambos os casos, os
+  arquivos existentes nunca são alterados no lugar, porque podem ser hard
+  links para os de outra geração (ver geracoes.Geracoes). O padrão é False.
+  processos -> Se for maior que 1, a geração do zero divide os governos, os
+  partidos e os deputados em fatias, calculadas e escritas por esse número de
+  processos (ver gerar_fatia_viz), enquanto o processo principal gera os JSONs
+  que dependem do DataFrame. Os processos não recebem os votos: cada um abre a
+  matriz de votos do disco, e os arrays mapeados na memória são compartilhados
+  entre eles. Os arquivos são os mesmos da geração em série. A geração
+  incremental é sempre em série. O padrão é None, em série.
   '''
 
-  def gerar_arquivos_deputados(freqs, df, output_path):
+  def gerar_arquivos_deputados(freqs, matriz_votos, output_path):
     '''
     Gera arquivos para a visualização que mostra todas as
-    votações de um deputado ao longo do tempo.
+    votações de um deputado ao longo do tempo. Retorna o valor
+    máximo de cada arquivo, por caminho, para as escalas.
 
     Parâmetros:
     freqs -> Herdado da função principal
-    df -> O banco de dados com votos do basômetro. Ele é definido pela função principal.
+    matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos). Ela é definida pela função principal.
     output_path -> Herdado da função principal.
     '''
 
+    maximos = { }
+
     subdir = f"{output_path}/deputados"
     if not os.path.exists(subdir):
       os.makedirs(subdir)
 
+    # As séries de todos os deputados são calculadas de uma vez, em cada partição da matriz
     for freq in freqs:
 
-      ids_cadastro = list( df.ideCadastro.unique() )
-
-      for ideCadastro in ids_cadastro:
-
-        temp = df [ df.ideCadastro == ideCadastro ]
-
-        csv_files = [ ]
-        for governo in temp.governo.unique():
-
-          try:
-            file = basometro_deputados.calcular_governismo(df = temp,
-                                                           ideCadastro = ideCadastro,
-                                                           governo = governo,
-                                                           freq = freq,
-                                                           ajustar_bins_bool = True)
-
-          except basometro_deputados.NoVotes:
-            continue
+      series = basometro_deputados.calcular_governismo_deputados(matriz_votos = matriz_votos,
+                                                                 freq = freq,
+                                                                 ajustar_bins_bool = True)
 
-          csv_files.append(file)
+      for ideCadastro, file in series:
+        file.to_csv(f"{subdir}/{ideCadastro}-{freq}.csv", index = False)
+        maximos[f"{subdir}/{ideCadastro}-{freq}.csv"] = max( file.antiGovCtg.tolist() + file.proGovCtg.tolist() )
 
-        if len(csv_files) > 0:
-            file = pd.concat(csv_files)
-            file.to_csv(f"{subdir}/{ideCadastro}-{freq}.csv", index = False)
+    return maximos
 
-    return
-
-  def gerar_arquivos_partidos(freqs, df, output_path):
+  def gerar_arquivos_partidos(freqs, matriz_votos, output_path):
     '''
     Gera arquivos para a visualização que mostra todas as
-    votações de um deputado ao longo do tempo.
+    votações de um deputado ao longo do tempo. Retorna o valor
+    máximo de cada arquivo, por caminho, para as escalas.
 
     Parâmetros:
     freqs -> Herdado da função principal
-    df -> O banco de dados com votos do basômetro. Ele é definido pela função principal.
+    matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos). Ela é definida pela função principal.
     output_path -> Herdado da função principal.
     '''
 
+    maximos = { }
+
     subdir = f"{output_path}/partidos"
     if not os.path.exists(subdir):
       os.makedirs(subdir)
 
+    # As séries de todos os partidos e a de toda a Câmara, indicada pela
+    # palavra-chave 'todos', são calculadas de uma vez, em cada partição da matriz
     for freq in freqs:
 
-      partidos = list( df.partido.unique() )
-      partidos.append("todos") # A palavra-chave 'todos' indica para as funções
-                              # do módulo invocado que todos os partidos
-                              # devem ser considerados
-
-      for partido in partidos:
-
-        if partido == "todos":
-          temp = df.copy()
+      series = basometro_partidos.calcular_governismo_partidos(matriz_votos = matriz_votos,
+                                                               freq = freq,
+                                                               ajustar_bins_bool = True)
 
-        else:
-          temp = df [ df.partido == partido ]
-
-        csv_files = [ ]
-        for governo in temp.governo.unique():
-
-          try:
-            file = basometro_partidos.calcular_governismo(df = temp,
-                                                           partido = partido,
-                                                           governo = governo,
-                                                           freq = freq,
-                                                           ajustar_bins_bool = True)
+      for partido, file in series:
+        file.to_csv(f"{subdir}/{partido}-{freq}.csv", index = False)
+        maximos[f"{subdir}/{partido}-{freq}.csv"] = max( file.antiGovCtg.tolist() + file.proGovCtg.tolist() )
 
-          except basometro_partidos.NoVotes:
-            continue
+    return maximos
 
-          csv_files.append(file)
-
-        if len(csv_files) > 0:
-            file = pd.concat(csv_files)
-            file.to_csv(f"{subdir}/{partido}-{freq}.csv", index = False)
-
-    return
-
-  def gerar_arquivos_governos(df, output_path):
+  def gerar_arquivos_governos(matriz_votos, output_path):
     '''
     Gera arquivos para a primeira visualização do aplicativo: um histograma
     que agrega o resultado de todas as votações de um determinado governo.
 
     Parâmetros:
-    df -> O banco de dados com votos do basômetro. Ele é definido pela função principal.
+    matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos). Ela é definida pela função principal.
     output_path -> Herdado da função principal.
     '''
 
@@ -353,18 +345,12 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
     if not os.path.exists(subdir):
       os.makedirs(subdir)
 
-    for governo in df.governo.unique():
-
-      temp = df [ df.governo == governo ]
-
-      partidos = list( temp.partido.unique() )
-      partidos.append("todos")
+    # Os arquivos de todos os partidos e de 'todos' saem de uma só tabela por governo
+    for governo in matriz_votos.governos():
 
-      for partido in partidos:
-        file = basometro_governos.calcular_governismo(df = temp,
-                                                      governo = governo,
-                                                      partido = partido)
+      arquivos = basometro_governos.calcular_governismo_governo(df = matriz_votos, governo = governo)
 
+      for partido, file in arquivos.items():
         file.to_csv(f"{subdir}/{governo}-{partido}.csv", index = False)
 
     return
@@ -382,8 +368,8 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
 
     def pegar_historico_df(data):
       # Calcular a média histórica de apoio
-      pro_votes   = data [ (data.voto) == (data.orientacaoGoverno) ].shape[0]
-      opp_votes   = data [ (data.voto) != (data.orientacaoGoverno) ].shape[0]
+      pro_votes   = int( (data.voto == data.orientacaoGoverno).sum() )
+      opp_votes   = int( (data.voto != data.orientacaoGoverno).sum() )
       total_votes = data.shape[0]
 
       value = pro_votes / total_votes
@@ -508,7 +494,7 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
     with open(f"{output_path}/entity-corresp.json", "w+") as outfile:
       json.dump(json_obj, outfile)
 
-  def definir_valores_escalas(output_path):
+  def definir_valores_escalas(output_path, maximos = None):
     '''
     Esse script é usado para alterar um arquivo json que contém o valor
     máximo de votos nos conjuntos de arquivos de deputados e partidos.
@@ -517,8 +503,14 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
 
     Parâmetros:
     output_path -> O caminho até o diretório raiz onde os dados devem ser salvos.
+    maximos -> O valor máximo, já conhecido, de alguns arquivos, por caminho
+    (ver gerar_fatia_viz). Esses arquivos não são lidos de novo. O padrão é
+    None: todos os arquivos são lidos.
     '''
 
+    if maximos is None:
+      maximos = { }
+
     def get_max_value(df):
 
         anti_gov = df.antiGovCtg.tolist()
@@ -535,17 +527,25 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
     for subdir in subdirs:
 
         files = glob.glob(f"{output_path}/{subdir}/*.csv")
+        files = [ file for file in files if "todos" not in file ]
 
-        df = pd.concat ([ pd.read_csv(file) for file in files if "todos" not in file ])
+        # O maior valor de todos os arquivos é o maior entre os de cada um
+        valores = [ maximos[file] for file in files if file in maximos ]
+        lidos   = [ file for file in files if file not in maximos ]
 
-        max_value = get_max_value(df)
+        if len(lidos) > 0:
+          valores.append( get_max_value(pd.concat([ pd.read_csv(file) for file in lidos ])) )
 
-        json_obj[subdir] = max_value
+        json_obj[subdir] = max(valores)
 
     # Pega o maior valor para a escala de todos os partidos
-    df = pd.read_csv(f"{output_path}/partidos/todos-MS.csv")
+    if f"{output_path}/partidos/todos-MS.csv" in maximos:
+      max_value = maximos[f"{output_path}/partidos/todos-MS.csv"]
 
-    max_value = get_max_value(df)
+    else:
+      df = pd.read_csv(f"{output_path}/partidos/todos-MS.csv")
+
+      max_value = get_max_value(df)
 
     json_obj["todos"] = max_value
 
@@ -565,27 +565,293 @@ def gerar_arquivos_viz(freqs, df_path, output_path):
     with open(f"{output_path}/last-update.json", "w+") as outfile:
       json.dump(json_obj, outfile)
 
+  def gerar_arquivos_alterados(freqs, agregados_votos, alteracoes, output_path):
+    '''
+    Gera de novo, a partir das tabelas agregadas, apenas os arquivos dos
+    governos, partidos e deputados alterados, o histórico e os nomes, se eles
+    mudaram, e atualiza as escalas. Cada arquivo é apagado antes de ser
+    escrito (ver geracoes.desvincular). Retorna o número de arquivos escritos.
+
+    Parâmetros:
+    freqs -> Herdado da função principal
+    agregados_votos -> As tabelas agregadas do banco de dados (agregados.AgregadosVotos)
+    alteracoes -> As alterações desde a geração dos arquivos (ver agregados.AgregadosVotos.alteracoes_desde)
+    output_path -> Herdado da função principal.
+    '''
+
+    escritos = [ ]
+
+    # Os valores máximos dos arquivos escritos, para as escalas
+    maximos = { }
+
+    def escrever(file, caminho, escala = None):
+      geracoes.desvincular(caminho)
+      file.to_csv(caminho, index = False)
+      escritos.append(caminho)
+
+      if escala is not None:
+        maximos[escala] = max( [ maximos.get(escala, 0) ] + file.antiGovCtg.tolist() + file.proGovCtg.tolist() )
+
+    for governo, partidos in alteracoes["governos"].items():
+      for partido, file in basometro_governos.calcular_governismo_agregados(agregados_votos, governo, partidos).items():
+        escrever(file, f"{output_path}/governos/{governo}-{partido}.csv")
+
+    for freq in freqs:
+
+      for partido, file in basometro_partidos.calcular_governismo_agregados(agregados_votos, alteracoes["partidos"], freq):
+        escrever(file, f"{output_path}/partidos/{partido}-{freq}.csv", "partidos" if partido != "todos" else None)
+
+      for ideCadastro, file in basometro_deputados.calcular_governismo_agregados(agregados_votos, alteracoes["deputados"], freq):
+        escrever(file, f"{output_path}/deputados/{ideCadastro}-{freq}.csv", "deputados")
+
+    if alteracoes["historico"]:
+      geracoes.desvincular(f"{output_path}/historicos.json")
+      calcular_apoio_historico_agregados(agregados_votos, output_path)
+      escritos.append(f"{output_path}/historicos.json")
+
+    if alteracoes["nomes"]:
+      # Os nomes dependem de todos os votos, mas apenas de algumas colunas
+      df = armazenamento.abrir_banco(df_path).ler(colunas = [ 'parlamentar', 'ideCadastro', 'UF', 'partido', 'descricaoPartido', 'data' ], tipado = True)
+
+      for arquivo in [ "partidos.json", "deputados.json", "entity-corresp.json" ]:
+        geracoes.desvincular(f"{output_path}/{arquivo}")
+        escritos.append(f"{output_path}/{arquivo}")
+
+      gerar_nomes_partidos(df, output_path)
+      gerar_nomes_deputados(df, output_path)
+      gerar_correspondencias(df, output_path)
+
+    # As contagens de cada arquivo só crescem, então cada escala é a maior entre
+    # a anterior e a dos arquivos escritos. A de todos os partidos é a do arquivo mensal.
+    todos_mensal = "MS" in freqs and "todos" in alteracoes["partidos"]
+
+    if len(maximos) > 0 or todos_mensal:
+
+      with open(f"{output_path}/escalas.json") as file:
+        json_obj = json.load(file)
+
+      for escala, max_value in maximos.items():
+        json_obj[escala] = max(json_obj[escala], max_value)
+
+      if todos_mensal:
+        df = pd.read_csv(f"{output_path}/partidos/todos-MS.csv")
+        json_obj["todos"] = max( df.antiGovCtg.tolist() + df.proGovCtg.tolist() )
+
+      geracoes.desvincular(f"{output_path}/escalas.json")
+
+      with open(f"{output_path}/escalas.json", "w+") as outfile:
+        json.dump(json_obj, outfile)
+
+      escritos.append(f"{output_path}/escalas.json")
+
+    return len(escritos)
+
+  def calcular_apoio_historico_agregados(agregados_votos, output_path):
+    '''
+    Versão de calcular_apoio_historico que parte das tabelas agregadas do banco
+    de dados: os governos ficam na ordem do seu primeiro voto, como lá.
+
+    Parâmetros:
+    agregados_votos -> As tabelas agregadas do banco de dados (agregados.AgregadosVotos)
+    output_path -> O caminho até o diretório raiz onde os dados devem ser salvos.
+    '''
+
+    historico = agregados_votos.tabelas["historico"].sort_values('primeiro', kind = "mergesort")
+
+    json_obj = { }
+    json_obj['historico'] = round( int(historico.governistas.sum()) / int(historico.votos.sum()), 2 )
+
+    for governo, pro_votes, total_votes in zip(historico.governo, historico.governistas.tolist(), historico.votos.tolist()):
+      json_obj[governo] = round(pro_votes / total_votes, 2)
+
+    with open(f"{output_path}/historicos.json", "w+") as outfile:
+      json.dump(json_obj, outfile)
+
+  def gerar_arquivos_paralelo(freqs, matriz_votos, output_path, processos):
+    '''
+    Gera os arquivos de governos, partidos e deputados em um pool de processos,
+    uma fatia por tarefa, e, ao mesmo tempo, no processo principal, os JSONs
+    que dependem do DataFrame com os votos. As escalas são definidas no final,
+    a partir dos valores máximos retornados pelas tarefas.
+
+    Parâmetros:
+    freqs -> Herdado da função principal
+    matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos). Ela é definida pela função principal.
+    output_path -> Herdado da função principal.
+    processos -> Herdado da função principal.
+    '''
+
+    for subdir in [ "governos", "partidos", "deputados" ]:
+      os.makedirs(f"{output_path}/{subdir}", exist_ok = True)
+
+    # Cada governo é uma tarefa, e os partidos e deputados de cada freq são
+    # divididos em uma fatia por processo
+    tarefas  = [ ("governos", None, [ governo ]) for governo in matriz_votos.governos() ]
+    partidos = matriz_votos.partidos() + [ "todos" ]
+
+    for freq in freqs:
+      tarefas += [ ("partidos", freq, fatia.tolist()) for fatia in np.array_split(np.array(partidos, dtype = object), min(processos, len(partidos))) ]
+      tarefas += [ ("deputados", freq, fatia.tolist()) for fatia in np.array_split(matriz_votos.deputados(), processos) if fatia.shape[0] > 0 ]
+
+    with ProcessPoolExecutor(max_workers = processos, initializer = iniciar_processo_viz, initargs = (df_path,)) as executor:
+
+      futuros = [ executor.submit(gerar_fatia_viz, etapa, freq, fatia, output_path) for etapa, freq, fatia in tarefas ]
+
+      # Enquanto isso, o processo principal lê os votos e gera os JSONs
+      df = armazenamento.abrir_banco(df_path).ler(tipado = True)
+
+      print("Memória ocupada pelos votos, por coluna (bytes):")
+      print(esquema.memoria(df).to_string())
+
+      calcular_apoio_historico(df, output_path)
+      gerar_nomes_partidos(df, output_path)
+      gerar_nomes_deputados(df, output_path)
+      gerar_correspondencias(df, output_path)
+
+      maximos = { }
+      for futuro in futuros:
+        maximos.update(futuro.result())
+
+    definir_valores_escalas(output_path, maximos)
+
+  def gravar_marcador(agregados_votos, output_path):
+    '''
+    Guarda, junto com os arquivos, a revisão das tabelas agregadas e as freqs
+    a partir das quais eles foram gerados, para a próxima geração incremental
+    '''
+    geracoes.desvincular(caminho_marcador)
+
+    with open(caminho_marcador, "w") as outfile:
+      json.dump(dict(agregados_votos.marcador(), freqs = list(freqs)), outfile)
+
+  def ler_marcador():
+    try:
+      with open(caminho_marcador) as file:
+        marcador = json.load(file)
+
+    except (OSError, ValueError):
+      return None
+
+    return marcador if marcador.get("freqs") == list(freqs) else None
+
   ############################
   ### Execução da função   ###
   ### gerar_arquivos_viz() ###
   ############################
 
-  df = pd.read_csv(df_path, dtype = str)
+  caminho_marcador = f"{output_path}/.agregados.json"
 
-  if not os.path.exists(output_path):
-    os.makedirs(output_path)
+  # As tabelas agregadas identificam a versão do banco de dados da qual os arquivos saíram
+  agregados_votos = agregados.AgregadosVotos.abrir(df_path)
+  alteracoes      = agregados_votos.alteracoes_desde(ler_marcador()) if incremental else None
 
-  gerar_arquivos_governos(df, output_path)
+  if alteracoes is not None:
+    print(f"{gerar_arquivos_alterados(freqs, agregados_votos, alteracoes, output_path)} arquivos gerados de novo a partir das tabelas agregadas")
 
-  calcular_apoio_historico(df, output_path)
-  gerar_nomes_partidos(df, output_path)
-  gerar_nomes_deputados(df, output_path)
-  gerar_correspondencias(df, output_path)
+  else:
 
-  gerar_arquivos_partidos(freqs, df, output_path)
-  gerar_arquivos_deputados(freqs, df, output_path)
+    if incremental and os.path.exists(output_path):
+      # Os arquivos herdados são apagados, e não sobrescritos
+      for nome in os.listdir(output_path):
+        caminho = os.path.join(output_path, nome)
 
-  definir_valores_escalas(output_path)
+        if os.path.isdir(caminho) and not os.path.islink(caminho):
+          shutil.rmtree(caminho)
+        else:
+          os.remove(caminho)
+
+    if not os.path.exists(output_path):
+      os.makedirs(output_path)
+
+    # Os arquivos de governos, partidos e deputados são calculados a partir da matriz de votos
+    matriz_votos = matriz.MatrizVotos.abrir(df_path)
+
+    if processos is not None and processos > 1:
+      gerar_arquivos_paralelo(freqs, matriz_votos, output_path, processos)
+
+    else:
+      df = armazenamento.abrir_banco(df_path).ler(tipado = True)
+
+      print("Memória ocupada pelos votos, por coluna (bytes):")
+      print(esquema.memoria(df).to_string())
+
+      gerar_arquivos_governos(matriz_votos, output_path)
+
+      calcular_apoio_historico(df, output_path)
+      gerar_nomes_partidos(df, output_path)
+      gerar_nomes_deputados(df, output_path)
+      gerar_correspondencias(df, output_path)
+
+      maximos = gerar_arquivos_partidos(freqs, matriz_votos, output_path)
+      maximos.update(gerar_arquivos_deputados(freqs, matriz_votos, output_path))
+
+      definir_valores_escalas(output_path, maximos)
+
+  geracoes.desvincular(f"{output_path}/last-update.json")
   definir_hora_atualizacao(output_path)
 
+  gravar_marcador(agregados_votos, output_path)
+
   return
+
+###########################
+### GERAÇÃO EM PARALELO ###
+###########################
+
+# A matriz de votos aberta em cada processo do pool de gerar_arquivos_viz
+MATRIZ_PROCESSO = None
+
+def iniciar_processo_viz(df_path):
+  '''
+  Abre a matriz de votos do banco de dados em um processo do pool de
+  gerar_arquivos_viz. Os arrays de cada partição são mapeados do disco (ver
+  matriz.MatrizVotos), então todos os processos leem as mesmas páginas de
+  memória, sem que os votos sejam copiados ou serializados para cada um.
+
+  Parâmetros:
+  df_path -> O caminho do banco de dados, já com a matriz de votos em dia
+  '''
+  global MATRIZ_PROCESSO
+
+  MATRIZ_PROCESSO = matriz.MatrizVotos(df_path)
+
+  if not MATRIZ_PROCESSO.carregar():
+    raise RuntimeError(f"A matriz de votos de {df_path} não está em dia com o banco de dados")
+
+def gerar_fatia_viz(etapa, freq, entidades, output_path):
+  '''
+  Calcula e escreve, em um processo do pool de gerar_arquivos_viz, os arquivos
+  de uma fatia de uma etapa, com as mesmas funções da geração em série.
+  Retorna um dicionário com o valor máximo de votos pró e contra o governo de
+  cada arquivo de partidos e deputados escrito, por caminho, para as escalas.
+
+  Parâmetros:
+  etapa -> "governos", "partidos" ou "deputados"
+  freq -> O intervalo de tempo dos arquivos de partidos e deputados. Ignorado para os governos.
+  entidades -> Os governos, os partidos (incluindo "todos") ou os ideCadastro da fatia
+  output_path -> O caminho até o diretório raiz onde os dados devem ser salvos.
+  '''
+
+  maximos = { }
+
+  if etapa == "governos":
+
+    for governo in entidades:
+      for partido, file in basometro_governos.calcular_governismo_governo(df = MATRIZ_PROCESSO, governo = governo).items():
+        file.to_csv(f"{output_path}/governos/{governo}-{partido}.csv", index = False)
+
+    return maximos
+
+  if etapa == "partidos":
+    series = basometro_partidos.calcular_governismo_partidos(matriz_votos = MATRIZ_PROCESSO, freq = freq, partidos = entidades)
+
+  else:
+    series = basometro_deputados.calcular_governismo_deputados(matriz_votos = MATRIZ_PROCESSO, freq = freq, deputados = entidades)
+
+  for nome, file in series:
+    caminho = f"{output_path}/{etapa}/{nome}-{freq}.csv"
+    file.to_csv(caminho, index = False)
+
+    maximos[caminho] = max( file.antiGovCtg.tolist() + file.proGovCtg.tolist() )
+
+  return maximos
@@ -5,17 +5,273 @@ de todas as proposições que tiveram votação nominal e estão registradas nos
 sistemas do Congresso.
 '''
 
-from basometro.core import core
+from basometro.core import armazenamento, core, memo, requisicoes
 from camaraPy.api_original.core import custom_exceptions
-from camaraPy.api_original import proposicoes
-import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import asyncio, collections, datetime, os
 import pandas as pd
 
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Número máximo de requisições simultâneas que os coletores
+# podem fazer à API da Câmara no modo de coleta concorrente.
+MAX_REQUISICOES_SIMULTANEAS = 8
+
 ###################
 # COLETA DE DADOS #
 ###################
 
-def coletar_votos(start_year, end_year, warn_proposicao_acessoria = False, keep_all = False):
+def obter_parametros_proposicao(id_proposicao):
+
+  '''
+  Acessa os detalhes de uma proposição e retorna os parâmetros
+  (tipo, número e ano) necessários para obter suas votações.
+
+  Parâmetros:
+  id_proposicao -> O codProposicao da proposição na API da Câmara
+  '''
+
+  prop = requisicoes.obter_proposicao(id_proposicao)
+  prop = prop['proposicao']
+
+  params = {
+      "Tipo"   : prop['@tipo'].strip(),
+      "Numero" : prop['@numero'].strip(),
+      "Ano"    : prop['@ano'].strip()
+  }
+
+  return params
+
+def extrair_votos_votacoes(id_proposicao, params, manter_votacao, warn_proposicao_acessoria = False, year = None, memoria = None):
+
+  '''
+  Acessa as votações de uma proposição a partir dos parâmetros obtidos
+  em obter_parametros_proposicao. Retorna um core.LoteVotos.
+
+  Parâmetros:
+  id_proposicao -> O codProposicao da proposição na API da Câmara
+  params -> Dicionário com tipo, número e ano da proposição
+  manter_votacao -> Função que recebe o dicionário de uma votação e
+  retorna verdadeiro caso ela deva ser coletada. É usada, por exemplo,
+  para descartar votações de outros anos.
+  warn_proposicao_acessoria -> Booleano que determina se deve ser
+  printado no console um aviso sempre que o coletor encontrar
+  uma proposição acessória, que não tem votos associados.
+  year -> O ano cujas votações estão sendo coletadas. É usado para decidir
+  por quanto tempo a resposta da API pode ser reaproveitada do cache.
+  memoria -> Um objeto memo.MemoProposicoes opcional, compartilhado pela coleta
+  inteira. Com ele, as votações da proposição são buscadas uma única vez e cada
+  ano recebe apenas as suas – nesse caso, year é obrigatório.
+  '''
+
+  votos_arr = core.LoteVotos()
+
+  # Acessa as votações da proposta
+  try:
+    if memoria is not None:
+      dados_proposicao, votacoes = memoria.votacoes(id_proposicao, params, year)
+
+    else:
+      votacoes = requisicoes.obter_votacao_proposicao(params, year)
+
+      dados_proposicao = {
+        "tipoProposicao"   : votacoes['proposicao']['Sigla'].strip(),
+        "numeroProposicao" : votacoes['proposicao']['Numero'].strip(),
+        "anoProposicao"    : votacoes['proposicao']['Ano'].strip()
+      }
+
+      votacoes = votacoes['proposicao']['Votacoes']['Votacao']
+
+  except custom_exceptions.ProposicaoAcessoria as e:
+    if warn_proposicao_acessoria:
+      print(f"Exceção ProposicaoAcessoria aconteceu no id {id_proposicao}")
+    return votos_arr
+
+  # Se houve apenas uma votação, os dados vêm como um dicionário
+  # solto. Caso contrário, a proposição em questão tem ao menos
+  # duas votações associadas à ela e os dados vêm em uma lista.
+  if isinstance(votacoes, dict):
+    votacoes = [ votacoes ]
+
+  for votacao in votacoes:
+
+    if manter_votacao(votacao):
+
+      # Cria um novo elemento que vai ser passado para o objeto Votacao
+      votacao["dadosProposicao"] = dados_proposicao
+
+      votacao = core.Votacao(votacao)
+      votos_arr.estender(votacao.votos)
+
+  requisicoes.contar_votos(len(votos_arr))
+
+  return votos_arr
+
+def extrair_votos_proposicao(id_proposicao, manter_votacao, warn_proposicao_acessoria = False, year = None, memoria = None):
+
+  '''
+  Faz as solicitações para a API e obtém os votos de uma proposição
+  específica. Retorna um core.LoteVotos.
+
+  Parâmetros:
+  id_proposicao -> O codProposicao da proposição na API da Câmara
+  manter_votacao -> Herdado de extrair_votos_votacoes
+  warn_proposicao_acessoria -> Herdado de extrair_votos_votacoes
+  year -> Herdado de extrair_votos_votacoes
+  memoria -> Herdado de extrair_votos_votacoes
+  '''
+
+  if memoria is not None:
+    params = memoria.parametros(id_proposicao, obter_parametros_proposicao)
+  else:
+    params = obter_parametros_proposicao(id_proposicao)
+
+  return extrair_votos_votacoes(id_proposicao, params, manter_votacao, warn_proposicao_acessoria, year, memoria)
+
+def coletar_proposicoes(ids_proposicao, manter_votacao, warn_proposicao_acessoria = False, max_workers = 1, year = None, memoria = None):
+
+  '''
+  Executa extrair_votos_proposicao para uma lista de proposições. Quando
+  max_workers é maior que 1, as requisições são feitas em paralelo por um
+  pool de threads. Em todo caso, os resultados são gerados (yield) na mesma
+  ordem de ids_proposicao, como pares (id_proposicao, votos).
+
+  Parâmetros:
+  ids_proposicao -> Lista com os codProposicao que devem ser coletados
+  manter_votacao -> Herdado de extrair_votos_proposicao
+  warn_proposicao_acessoria -> Herdado de extrair_votos_proposicao
+  max_workers -> Número máximo de proposições processadas ao mesmo tempo.
+  Como cada proposição exige duas requisições em sequência, esse também é
+  o número máximo de requisições simultâneas feitas para a API.
+  year -> Herdado de extrair_votos_votacoes
+  memoria -> Herdado de extrair_votos_votacoes
+  '''
+
+  def extrair(id_proposicao):
+    return extrair_votos_proposicao(id_proposicao, manter_votacao, warn_proposicao_acessoria, year, memoria)
+
+  if max_workers <= 1:
+    for id_proposicao in ids_proposicao:
+      yield id_proposicao, extrair(id_proposicao)
+    return
+
+  # O método map do executor devolve os resultados na ordem em que
+  # as tarefas foram submetidas, o que mantém a coleta determinística
+  with ThreadPoolExecutor(max_workers = max_workers) as executor:
+    for id_proposicao, votos in zip(ids_proposicao, executor.map(extrair, ids_proposicao)):
+      yield id_proposicao, votos
+
+def gerar_votos_ano(year, warn_proposicao_acessoria = False, max_workers = 1, diario = None, memoria = None):
+
+  '''
+  Coleta os votos das votações que aconteceram em um ano e gera (yield),
+  proposição por proposição, objetos core.LoteVotos, sem nenhum filtro.
+  Apenas os votos da proposição atual ficam na memória.
+
+  Parâmetros:
+  year -> O ano em que os votos devem ser coletados
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_votos
+  diario -> Herdado de coletar_votos
+  memoria -> Herdado de extrair_votos_votacoes
+  '''
+
+  print(f"Coletando o ano {year}")
+
+  # Faz solicitação para a API
+  data = requisicoes.listar_proposicoes_votadas(year)
+
+  # Pega os ids únicos de cada votação
+  data = data['proposicoes']['proposicao']
+
+  # O método retorna um id para cada vez que a proposição foi votada.
+  # Queremos os ids únicos – ordenados, para que a coleta seja determinística.
+  ids_proposicao = sorted( set( [ item['codProposicao'] for item in data ] ) )
+
+  # Essa checagem é necessária para não pegar todas as votações
+  # de uma proposição que apareceu no plenário em mais de um ano
+  def manter_votacao(votacao):
+    return votacao["@Data"][-4:] == str(year)
+
+  # Proposições registradas no diário de uma execução anterior não são coletadas de novo
+  retomadas = set( id_proposicao for id_proposicao in ids_proposicao
+                   if diario is not None and diario.concluida(year, id_proposicao) )
+  pendentes = [ id_proposicao for id_proposicao in ids_proposicao if id_proposicao not in retomadas ]
+
+  # Para cada id, faz nova solicitação e pega os parâmetros necessários pata obter as votações
+  resultados = coletar_proposicoes(pendentes, manter_votacao,
+                                   warn_proposicao_acessoria = warn_proposicao_acessoria,
+                                   max_workers = max_workers,
+                                   year = year,
+                                   memoria = memoria)
+
+  for index, id_proposicao in enumerate(ids_proposicao):
+
+    print(f"Estamos na proposição {id_proposicao}, que é a número {index + 1} de {len(ids_proposicao)} deste ano ({requisicoes.resumo_vazao()})".ljust(120), end='\r')
+
+    if id_proposicao in retomadas:
+      votos = diario.votos(year, id_proposicao)
+
+    else:
+      # Os resultados vêm na mesma ordem de pendentes
+      _, votos = next(resultados)
+      if diario is not None:
+        diario.registrar(year, id_proposicao, votos)
+
+    yield votos
+
+  print("\n")
+
+def coletar_votos_ano(year, warn_proposicao_acessoria = False, max_workers = 1, diario = None):
+
+  '''
+  Coleta todos os votos das votações que aconteceram em um ano
+  e retorna um core.LoteVotos, sem nenhum filtro.
+
+  Parâmetros:
+  year -> O ano em que os votos devem ser coletados
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_votos
+  diario -> Herdado de coletar_votos
+  '''
+
+  votos_arr = core.LoteVotos()
+
+  for votos in gerar_votos_ano(year, warn_proposicao_acessoria, max_workers, diario):
+    votos_arr.estender(votos)
+
+  return votos_arr
+
+def gerar_votos(start_year, end_year, warn_proposicao_acessoria = False, max_workers = 1, diario = None):
+
+  '''
+  Gera (yield) os votos de um intervalo de anos como objetos
+  core.LoteVotos, um para cada proposição, na mesma ordem de coletar_votos.
+  Os votos não são filtrados: isso fica a cargo de quem os consome, como
+  um armazenamento.GravadorVotos. Cada proposição é buscada uma única vez,
+  mesmo que tenha votações em vários anos (ver memo.MemoProposicoes).
+
+  Parâmetros:
+  start_year -> Herdado de coletar_votos
+  end_year -> Herdado de coletar_votos
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_votos
+  diario -> Herdado de coletar_votos
+  '''
+
+  years   = range(int(start_year), int(end_year) + 1)
+  memoria = memo.MemoProposicoes(years)
+
+  for year in years:
+    yield from gerar_votos_ano(year, warn_proposicao_acessoria, max_workers, diario, memoria)
+
+  memoria.relatorio()
+
+def coletar_votos(start_year, end_year, warn_proposicao_acessoria = False, keep_all = False, max_workers = 1, diario = None):
 
   '''
   Função que coleta todos os votos que aconteceram
@@ -30,120 +286,458 @@ def coletar_votos(start_year, end_year, warn_proposicao_acessoria = False, keep_
   uma proposição acessória, que não tem votos associados.
   keep_all -> Booleano que, se verdadeiro, coleta TODOS os votos,
   incluindo abstenções e invocações do artigo 17.
+  max_workers -> Número máximo de proposições coletadas em paralelo.
+  O padrão, 1, faz a coleta de forma sequencial.
+  diario -> Um objeto diario.DiarioColeta opcional. Cada proposição concluída
+  é registrada nele, e as que já constam no diário não são coletadas de novo.
   '''
 
-  votos_arr = [ ]
+  votos_arr = core.LoteVotos()
 
-  start_year = int(start_year)
-  end_year   = int(end_year)
+  for votos in gerar_votos(start_year, end_year, warn_proposicao_acessoria, max_workers, diario):
+    votos_arr.estender(votos)
 
-  for year in range(start_year, end_year + 1):
+  return montar_dataframe(votos_arr, keep_all)
 
-    print(f"Coletando o ano {year}")
+def coletar_votos_pipeline(start_year, end_year, warn_proposicao_acessoria = False, keep_all = False, max_workers = MAX_REQUISICOES_SIMULTANEAS, diario = None):
 
-    # Faz solicitação para a API
-    data = proposicoes.ListarProposicoesVotadasEmPlenario( { "Ano" : year } )
+  '''
+  Alternativa a coletar_votos que organiza a coleta como um pipeline
+  assíncrono de três estágios ligados por filas: a listagem das proposições
+  votadas em cada ano, a busca dos detalhes de cada proposição e a busca
+  (e processamento) das suas votações. Como os estágios rodam ao mesmo
+  tempo, os detalhes das proposições de um ano começam a ser buscados
+  enquanto as votações do ano anterior ainda estão sendo processadas.
 
-    # Pega os ids únicos de cada votação
-    data = data['proposicoes']['proposicao']
+  O resultado é idêntico ao de coletar_votos, inclusive na ordem dos votos.
 
-    # O método retorna um id para cada vez que a proposição foi votada.
-    # Queremos os ids únicos.
-    ids_proposicao = list( set( [ item['codProposicao'] for item in data ] ) )
+  Parâmetros:
+  start_year -> Primeiro ano em que os votos devem ser coletados
+  end_year -> Segundo ano em que os votos devem ser coletados
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  keep_all -> Herdado de coletar_votos
+  max_workers -> Número de requisições simultâneas em cada um dos
+  estágios de detalhes e de votações.
+  diario -> Herdado de coletar_votos
+  '''
 
-    # Para cada id, faz nova solicitação e pega os parâmetros necessários pata obter as votações
-    for index, id_proposicao in enumerate(ids_proposicao):
+  votos_arr = core.LoteVotos()
 
-      print(f"Estamos na proposição {id_proposicao}, que é a número {index + 1} de {len(ids_proposicao)} deste ano".ljust(80), end='\r')
+  emitir_votos_pipeline(start_year, end_year, votos_arr.estender, warn_proposicao_acessoria, max_workers, diario)
 
-      prop = proposicoes.ObterProposicaoPorID( { "IdProp" : id_proposicao } )
-      prop = prop['proposicao']
+  return montar_dataframe(votos_arr, keep_all)
 
-      params = {
-          "Tipo"   : prop['@tipo'].strip(),
-          "Numero" : prop['@numero'].strip(),
-          "Ano"    : prop['@ano'].strip()
-      }
+def emitir_votos_pipeline(start_year, end_year, emitir, warn_proposicao_acessoria = False, max_workers = MAX_REQUISICOES_SIMULTANEAS, diario = None):
+
+  '''
+  Executa o pipeline descrito em coletar_votos_pipeline e entrega os votos de
+  cada proposição, sem filtros, à função emitir, na mesma ordem de gerar_votos.
+  Os votos de uma proposição são entregues assim que ela e todas as anteriores
+  ficam prontas, então apenas as proposições que ainda esperam por uma anterior
+  ficam na memória – no máximo algumas dezenas, por causa das filas limitadas.
+
+  Parâmetros:
+  start_year -> Herdado de coletar_votos_pipeline
+  end_year -> Herdado de coletar_votos_pipeline
+  emitir -> Função chamada com o core.LoteVotos de cada proposição
+  warn_proposicao_acessoria -> Herdado de coletar_votos_pipeline
+  max_workers -> Herdado de coletar_votos_pipeline
+  diario -> Herdado de coletar_votos_pipeline
+  '''
+
+  def emitir_prontas(ordem, resultados):
+    '''
+    Entrega, em ordem, as proposições cujos votos já estão disponíveis
+    '''
+    while len(ordem) > 0 and ordem[0] in resultados:
+      emitir(resultados.pop(ordem.popleft()))
+
+  async def listar_proposicoes(loop, executor, fila_detalhes, ordem, resultados):
+    '''
+    Primeiro estágio: lista as proposições votadas em cada ano
+    e as envia, uma a uma, para a fila de detalhes.
+    '''
+
+    for year in range(start_year, end_year + 1):
+
+      print(f"Listando as proposições do ano {year}")
+
+      data = await loop.run_in_executor(executor, requisicoes.listar_proposicoes_votadas, year)
+      data = data['proposicoes']['proposicao']
+
+      for id_proposicao in sorted( set( [ item['codProposicao'] for item in data ] ) ):
+        ordem.append( (year, id_proposicao) )
+
+        # Proposições que constam no diário pulam os próximos estágios
+        if diario is not None and diario.concluida(year, id_proposicao):
+          resultados[ (year, id_proposicao) ] = diario.votos(year, id_proposicao)
+          emitir_prontas(ordem, resultados)
+          continue
+
+        await fila_detalhes.put( (year, id_proposicao) )
+
+    # Avisa os trabalhadores do próximo estágio que não há mais tarefas
+    for _ in range(max_workers):
+      await fila_detalhes.put(None)
+
+  async def buscar_detalhes(loop, executor, fila_detalhes, fila_votacoes):
+    '''
+    Segundo estágio: obtém os parâmetros de cada proposição.
+    '''
+
+    while True:
+
+      tarefa = await fila_detalhes.get()
+      if tarefa is None:
+        break
+
+      year, id_proposicao = tarefa
+      params = await loop.run_in_executor(executor, memoria.parametros, id_proposicao, obter_parametros_proposicao)
+      await fila_votacoes.put( (year, id_proposicao, params) )
+
+  async def buscar_votacoes(loop, executor, fila_votacoes, ordem, resultados, processadas):
+    '''
+    Terceiro estágio: obtém e processa as votações de cada proposição.
+    '''
+
+    while True:
+
+      tarefa = await fila_votacoes.get()
+      if tarefa is None:
+        break
+
+      year, id_proposicao, params = tarefa
+
+      # Essa checagem é necessária para não pegar todas as votações
+      # de uma proposição que apareceu no plenário em mais de um ano
+      def manter_votacao(votacao, year = year):
+        return votacao["@Data"][-4:] == str(year)
+
+      votos = await loop.run_in_executor(executor, extrair_votos_votacoes, id_proposicao, params,
+                                         manter_votacao, warn_proposicao_acessoria, year, memoria)
+      resultados[ (year, id_proposicao) ] = votos
+      if diario is not None:
+        diario.registrar(year, id_proposicao, votos)
+
+      emitir_prontas(ordem, resultados)
+
+      processadas.append(id_proposicao)
+      print(f"Proposições processadas: {len(processadas)} ({requisicoes.resumo_vazao()})".ljust(120), end='\r')
+
+  async def executar_pipeline(loop, executor):
+    '''
+    Cria as filas e os trabalhadores de cada estágio. As tarefas
+    criadas são guardadas em tarefas, para que possam ser canceladas.
+    '''
+
+    # Filas limitadas fazem com que um estágio rápido espere pelos
+    # mais lentos em vez de acumular tarefas na memória
+    fila_detalhes = asyncio.Queue(maxsize = max_workers * 4)
+    fila_votacoes = asyncio.Queue(maxsize = max_workers * 4)
+
+    # ordem guarda as proposições que ainda não foram entregues e
+    # resultados, os votos das que estão prontas mas esperam sua vez
+    ordem       = collections.deque()
+    resultados  = { }
+    processadas = [ ]
+
+    trabalhadores_detalhes = [ buscar_detalhes(loop, executor, fila_detalhes, fila_votacoes) for _ in range(max_workers) ]
+    trabalhadores_votacoes = [ buscar_votacoes(loop, executor, fila_votacoes, ordem, resultados, processadas) for _ in range(max_workers) ]
+
+    async def encerrar_votacoes():
+      await asyncio.gather(*trabalhadores_detalhes)
+      for _ in range(max_workers):
+        await fila_votacoes.put(None)
+
+    tarefas.extend([ loop.create_task(tarefa) for tarefa in [ listar_proposicoes(loop, executor, fila_detalhes, ordem, resultados),
+                                                              encerrar_votacoes(),
+                                                              *trabalhadores_votacoes ] ])
+
+    await asyncio.gather(*tarefas)
+
+    # Todas as proposições devem ter sido entregues
+    assert len(ordem) == 0 and len(resultados) == 0
+
+  ############################################
+  ### EXECUÇÃO DE emitir_votos_pipeline() ###
+  ############################################
+
+  start_year  = int(start_year)
+  end_year    = int(end_year)
+  max_workers = max(int(max_workers), 1)
+
+  # Cada proposição é buscada uma única vez, mesmo que apareça em vários anos
+  memoria = memo.MemoProposicoes(range(start_year, end_year + 1))
+
+  loop    = asyncio.new_event_loop()
+  tarefas = [ ]
+
+  try:
+    # As chamadas do camaraPy são bloqueantes, então cada uma delas roda
+    # em uma thread. São max_workers threads para cada um dos estágios.
+    with ThreadPoolExecutor(max_workers = max_workers * 2 + 1) as executor:
 
-      # Acessa as votações da proposta
       try:
-        votacoes = proposicoes.ObterVotacaoProposicao(params)
+        loop.run_until_complete(executar_pipeline(loop, executor))
+
+      # Se um estágio falhar (ou a coleta for interrompida), os demais são
+      # cancelados em vez de ficarem esperando nas filas para sempre
+      except BaseException:
+        for tarefa in tarefas:
+          tarefa.cancel()
+        loop.run_until_complete(asyncio.gather(*tarefas, return_exceptions = True))
+        raise
+
+  finally:
+    loop.close()
+
+  print("\n")
+  memoria.relatorio()
+
+def gravar_votos(start_year, end_year, gravador, warn_proposicao_acessoria = False, max_workers = 1, pipeline = False, diario = None):
+
+  '''
+  Coleta os votos de um intervalo de anos e os entrega, proposição por
+  proposição, a um armazenamento.GravadorVotos, que os filtra e escreve
+  em disco em lotes. Ao contrário de coletar_votos, nenhum DataFrame com
+  o período inteiro é montado, então o consumo de memória não depende do
+  número de anos coletados. O gravador não é concluído aqui.
+
+  Parâmetros:
+  start_year -> Herdado de coletar_votos
+  end_year -> Herdado de coletar_votos
+  gravador -> O objeto armazenamento.GravadorVotos que recebe os votos
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_votos
+  pipeline -> Booleano. Se verdadeiro, a coleta é feita pelo pipeline assíncrono.
+  diario -> Herdado de coletar_votos
+  '''
+
+  if pipeline:
+    emitir_votos_pipeline(start_year, end_year, gravador.adicionar, warn_proposicao_acessoria, max_workers, diario)
+    return
+
+  for votos in gerar_votos(start_year, end_year, warn_proposicao_acessoria, max_workers, diario):
+    gravador.adicionar(votos)
+
+def caminho_particao(diretorio, year):
+  '''
+  Retorna o caminho do arquivo com os votos brutos de um ano
+  '''
+  return os.path.join(diretorio, f"{year}.csv")
+
+def coletar_particao_ano(year, diretorio, warn_proposicao_acessoria = False, max_workers = 1, taxa = None):
+
+  '''
+  Coleta os votos de um ano e os salva, sem nenhum filtro, em uma partição
+  dentro do diretório informado. O arquivo é escrito com outro nome e só é
+  renomeado no final, então a existência da partição indica que ela está
+  completa. Roda em um processo separado, chamado por coletar_votos_particionado.
+
+  Retorna o caminho da partição e os contadores do cache e do agendador do
+  processo durante a coleta do ano (ver requisicoes.estatisticas), que não
+  chegariam de outra forma ao processo principal.
+
+  Parâmetros:
+  year -> O ano em que os votos devem ser coletados
+  diretorio -> O diretório onde as partições são salvas
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_votos
+  taxa -> Se for informada, o processo passa a usar um agendador próprio com
+  esse limite de requisições por segundo – a parte que lhe cabe do limite global.
+  '''
+
+  if taxa is not None:
+    requisicoes.configurar_agendador(requisicoes.criar_agendador(taxa = taxa))
+
+  # O processo pode ter herdado os contadores do principal ou já ter coletado
+  # outro ano, então eles são zerados para contar apenas este
+  requisicoes.zerar_estatisticas()
+
+  caminho = caminho_particao(diretorio, year)
+
+  votos_arr = coletar_votos_ano(year, warn_proposicao_acessoria, max_workers)
+  df = votos_arr.para_dataframe()
+
+  temp = f"{caminho}.tmp"
+  df.to_csv(temp, index = False, encoding = 'utf-8')
+  os.replace(temp, caminho)
+
+  return caminho, requisicoes.estatisticas()
+
+def coletar_votos_particionado(start_year, end_year, diretorio, warn_proposicao_acessoria = False, keep_all = False,
+                               max_workers = 1, processos = None, tentativas = 3):
+
+  '''
+  Alternativa a coletar_votos que divide o intervalo de anos entre vários
+  processos. Cada processo coleta um ano por vez e salva uma partição com
+  os votos brutos daquele ano; no final, as partições são reunidas por
+  juntar_particoes, que aplica os filtros globais. Anos que já têm partição
+  salva não são coletados de novo, então, se algum deles falhar, basta
+  executar a função outra vez para refazer apenas os que faltam.
+
+  Parâmetros:
+  start_year -> Primeiro ano em que os votos devem ser coletados
+  end_year -> Segundo ano em que os votos devem ser coletados
+  diretorio -> O diretório onde as partições são salvas
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  keep_all -> Herdado de coletar_votos
+  max_workers -> Herdado de coletar_particoes
+  processos -> Herdado de coletar_particoes
+  tentativas -> Herdado de coletar_particoes
+  '''
 
-        dados_proposicao = {
-          "tipoProposicao"   : votacoes['proposicao']['Sigla'].strip(),
-          "numeroProposicao" : votacoes['proposicao']['Numero'].strip(),
-          "anoProposicao"    : votacoes['proposicao']['Ano'].strip()
-        }
+  years = coletar_particoes(start_year, end_year, diretorio, warn_proposicao_acessoria, max_workers, processos, tentativas)
 
-        votacoes = votacoes['proposicao']['Votacoes']['Votacao']
+  return juntar_particoes(years, diretorio, keep_all)
 
-      except custom_exceptions.ProposicaoAcessoria as e:
-        if warn_proposicao_acessoria:
-          print(f"Exceção ProposicaoAcessoria aconteceu no id {id_proposicao}")
-        continue
+def coletar_particoes(start_year, end_year, diretorio, warn_proposicao_acessoria = False,
+                      max_workers = 1, processos = None, tentativas = 3):
+
+  '''
+  Coleta em vários processos as partições que ainda faltam no diretório e
+  retorna a lista de anos do intervalo. Levanta RuntimeError se algum ano
+  continuar sem partição depois de todas as tentativas. Os contadores do cache
+  e do agendador de cada ano coletado são somados aos deste processo, para os
+  relatórios do final da coleta.
+
+  Parâmetros:
+  start_year -> Herdado de coletar_votos_particionado
+  end_year -> Herdado de coletar_votos_particionado
+  diretorio -> Herdado de coletar_votos_particionado
+  warn_proposicao_acessoria -> Herdado de coletar_votos
+  max_workers -> Número máximo de proposições coletadas em paralelo por cada processo
+  processos -> Número de processos. O padrão é o número de núcleos da máquina.
+  tentativas -> Quantas vezes os anos que falharem são tentados de novo antes de desistir
+  '''
 
-      # Se os dados vêm na forma de lista, a proposição em questão
-      # tem ao menos duas votações associadas à ela.
-      if isinstance(votacoes, list):
+  def listar_pendentes(years):
+    return [ year for year in years if not os.path.exists(caminho_particao(diretorio, year)) ]
 
-        for votacao in votacoes:
+  years = list( range(int(start_year), int(end_year) + 1) )
+  os.makedirs(diretorio, exist_ok = True)
 
-          # Essa checagem é necessária para não pegar todas as votações
-          # de uma proposição que apareceu no plenário em mais de um ano
-          if votacao["@Data"][-4:] == str(year):
+  # O limite de requisições por segundo vale para a coleta inteira,
+  # então é dividido igualmente entre os processos
+  taxa = None
+  if requisicoes.AGENDADOR is not None and requisicoes.AGENDADOR.balde is not None:
+    taxa = requisicoes.AGENDADOR.balde.taxa / (processos or os.cpu_count())
 
-            # Cria um novo elemento que vai ser passado para o objeto Votacao
-            votacao["dadosProposicao"] = dados_proposicao
+  for tentativa in range(tentativas):
 
-            votacao = core.Votacao(votacao)
-            votos_arr.extend(votacao.votos)
+    pendentes = listar_pendentes(years)
+    if len(pendentes) == 0:
+      break
 
+    print(f"Coletando {len(pendentes)} anos em paralelo (tentativa {tentativa + 1} de {tentativas})")
 
-      # Se houve apenas uma votação, porém, os dados vêm como um dicionário
-      # solto e só precsisamos transformar ela em um objeto votação do basômetro.
-      elif isinstance(votacoes, dict):
+    with ProcessPoolExecutor(max_workers = processos) as executor:
 
-        # Essa checagem é necessária para não pegar todas as votações
-        # de uma proposição que apareceu no plenário em mais de um ano
-        if votacoes["@Data"][-4:] == str(year):
+      futures = { executor.submit(coletar_particao_ano, year, diretorio, warn_proposicao_acessoria, max_workers, taxa) : year
+                  for year in pendentes }
 
-          # Cria um novo elemento que vai ser passado para o objeto Votacao
-          votacoes["dadosProposicao"] = dados_proposicao
+      for future in as_completed(futures):
+        year = futures[future]
+        try:
+          _, contadores = future.result()
+          requisicoes.somar_estatisticas(contadores)
+          print(f"Partição do ano {year} pronta")
 
-          votacao = core.Votacao(votacoes)
-          votos_arr.extend(votacao.votos)
-      # print()
+        except Exception as e:
+          print(f"A coleta do ano {year} falhou: {e!r}")
 
-    print("\n")
+  pendentes = listar_pendentes(years)
+  if len(pendentes) > 0:
+    raise RuntimeError(f"Não foi possível coletar os anos {pendentes}. As partições dos demais anos foram mantidas em {diretorio}; execute a coleta de novo para tentar apenas os que faltam.")
 
-  # Transforma a lista de objetos 'voto' em um DataFrame
-  df = pd.DataFrame( [ item.__dict__ for item in votos_arr ] )
+  return years
+
+def ler_particao(diretorio, year):
+
+  '''
+  Lê a partição de um ano, com a coluna de data já convertida.
+  Retorna None se o ano não teve nenhum voto.
+
+  Parâmetros:
+  diretorio -> O diretório onde as partições estão salvas
+  year -> O ano da partição
+  '''
+
+  try:
+    # keep_default_na evita que ideCadastro vazios virem NaN
+    df = pd.read_csv(caminho_particao(diretorio, year), dtype = str, keep_default_na = False)
+
+  except pd.errors.EmptyDataError:
+    # Partições vazias, de anos sem nenhum voto, gravadas por versões anteriores
+    return None
+
+  # Anos sem nenhum voto geram partições só com o cabeçalho
+  if df.shape[0] == 0:
+    return None
 
   # Converte a coluna de data para um objeto ISO
   df['data'] = pd.to_datetime(df.data, format = "%d/%m/%Y")
 
+  return df
+
+def juntar_particoes(years, diretorio, keep_all = False):
+
   '''
-  AVISO
+  Lê as partições salvas por coletar_particao_ano, na ordem dos anos,
+  e aplica os filtros globais do Basômetro ao resultado. Se nenhum dos
+  anos teve votos, retorna um DataFrame vazio, como o de montar_dataframe.
+
+  Parâmetros:
+  years -> Lista com os anos que devem ser lidos
+  diretorio -> O diretório onde as partições estão salvas
+  keep_all -> Herdado de coletar_votos
+  '''
+
+  dfs = [ df for df in ( ler_particao(diretorio, year) for year in years ) if df is not None ]
+
+  # Se nenhum ano teve votos, o resultado é um DataFrame vazio, com as mesmas colunas e tipos
+  if len(dfs) == 0:
+    dfs = [ pd.DataFrame(columns = core.COLUNAS_VOTO).astype({ "data" : "datetime64[ns]" }) ]
+
+  df = pd.concat(dfs, ignore_index = True)
+
+  return core.categorizar_partidos( armazenamento.filtrar_votos(df, keep_all) )
 
-  A solução abaixo é terrível e podemos estar perdendo
-  dados relevantes. Entretanto, no estado atual da API,
-  é a saída possível.
+def gravar_particoes(years, diretorio, gravador):
 
-  Como a API retorna entradas duplicadas, seja porque há
-  votações inteiras ou votos individuais repetidos, precisamos
-  nos livrar deles. A maneira mais óbvia é um simples df.drop_duplicates().
-  Se o voto é rigorosamente igual, feito na mesma hora e na mesma votação
-  específica, as chances são altas de que seja uma duplicata.
-  Assim, vamos derrubar todas.
   '''
+  Versão de juntar_particoes que entrega as partições, uma de cada
+  vez, a um armazenamento.GravadorVotos, em vez de reuni-las na memória.
 
-  df = df.drop_duplicates()
+  Parâmetros:
+  years -> Lista com os anos que devem ser lidos
+  diretorio -> O diretório onde as partições estão salvas
+  gravador -> O objeto armazenamento.GravadorVotos que recebe os votos
+  '''
 
-  # Remove votos de parlamentares sem id – geralmente, senadores
-  df = df[ df.ideCadastro != "" ]
+  for year in years:
+    df = ler_particao(diretorio, year)
+    if df is not None:
+      gravador.adicionar_dataframe(df)
 
-  if keep_all is False:
-    # Remove ausências e art. 17
-    df = df [ (df.voto != "-") & (df.voto != "Art. 17")]
+def montar_dataframe(votos_arr, keep_all = False):
 
-  return df
+  '''
+  Transforma um core.LoteVotos no DataFrame do Basômetro,
+  removendo duplicatas, votos sem ideCadastro e, caso keep_all seja
+  falso, ausências e invocações do artigo 17. As colunas partido e
+  descricaoPartido são categóricas (ver core.categorizar_partidos).
+
+  Parâmetros:
+  votos_arr -> O core.LoteVotos (ou a lista de objetos core.Voto) gerado pelos coletores
+  keep_all -> Herdado da função que chamou esta
+  '''
+
+  # Monta o DataFrame diretamente a partir das colunas do lote
+  df = core.LoteVotos.de_votos(votos_arr).para_dataframe()
+
+  # Converte a coluna de data para um objeto ISO
+  df['data'] = pd.to_datetime(df.data, format = "%d/%m/%Y")
+
+  # As colunas de partido, já categóricas, ficam só com os partidos que restaram
+  return core.categorizar_partidos( armazenamento.filtrar_votos(df, keep_all) )
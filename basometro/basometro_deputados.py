@@ -2,9 +2,16 @@
 Calcula os dados necessários para traçar a evolução
 do governismo de cada um dos deputados ao longo do tempo.
 Gera os dados necessários para os gráficos de linha.
+
+As séries de todos os deputados são calculadas de uma vez, em uma passada
+por partição da matriz de votos (ver calcular_governismo_deputados), em vez
+de um cálculo por deputado e governo. Na geração incremental, as séries dos
+deputados com votos novos saem das tabelas agregadas (ver
+calcular_governismo_agregados).
 '''
-from basometro.core import core
-import datetime
+from basometro import basometro_governos
+from basometro.core import agregados, armazenamento, core, esquema, matriz
+import numpy as np
 import pandas as pd
 
 class NoVotes(ValueError):
@@ -15,6 +22,103 @@ class NoVotes(ValueError):
   '''
   pass
 
+def ajustar_bins(arr):
+  '''
+  Essa função só é executada caso o parâmetro "ajustar_bins_bool" de calcular_governismo
+  ou de calcular_governismo_deputados seja verdadeiro. Ela opera sobre intervalos de tempo onde
+  não houve nenhum voto, fazendo com que estes datapoints registrem o percentual de
+  governismo do datapoints imediatamente anterior (ou, caso seja o primeiro da série,
+  remove da lista). Isso
+  é útil para evitar que gráficos gerados a partir dos dados mostrem oscilanções
+  que, na prática, nunca ocorreram.
+  '''
+
+  def trim(arr):
+    '''
+    Recursivamente, remove pontos temporais sem votos das bordas da lista
+    '''
+
+    if len(arr) == 0:
+      return arr
+
+    if (arr[0]["proGovPct"] != "NO_VOTES") and (arr[-1]["proGovPct"] != "NO_VOTES"):
+      return arr
+
+    else:
+
+      for index, item in enumerate(arr):
+
+        if item["proGovPct"] == "NO_VOTES":
+
+          if index == 0 or index == len(arr) - 1:
+            arr.pop(index)
+
+      return trim(arr)
+
+  def replace(arr):
+    '''
+    Substitui os itens sem votos (já que restaram apenas os do meio da array) pelo
+    pelo valor de governismo do item imediatamente anterior
+    '''
+    for index, item in enumerate(arr):
+      if item["proGovPct"] == "NO_VOTES":
+        arr[index]["proGovPct"] = arr[index - 1]["proGovPct"]
+        arr[index]["antiGovPct"] = arr[index - 1]["antiGovPct"]
+        arr[index]["partido"]   = arr[index - 1]["partido"]
+
+    return arr
+
+  arr = trim(arr)
+  arr = replace(arr)
+  return arr
+
+def montar_serie(ideCadastro, parlamentar, governo, date_pairs, totais, sessoes, pro, partidos, ufs, ajustar_bins_bool = True):
+  '''
+  Monta a lista de datapoints de um deputado em um governo, como a de
+  calcular_governismo, a partir das contagens de cada bin. Usada pelas
+  versões em lote, que contam os votos de todos os deputados de uma vez.
+
+  Parâmetros:
+  ideCadastro -> O id do deputado, como texto
+  parlamentar -> O nome mais recente do deputado no governo
+  governo -> O governo
+  date_pairs -> As bins do governo (ver core.calcular_intervalos)
+  totais, sessoes, pro -> Listas com o total de votos, o de sessões e o de votos pró-governo em cada bin
+  partidos, ufs -> Listas com o partido e a UF do primeiro voto de cada bin, ou "NO_VOTES" nas bins sem votos
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  '''
+  new_df = [ ]
+
+  for (start, end), total_votes, total_sessions, pro_gov_count, partido, uf in zip(date_pairs, totais, sessoes, pro, partidos, ufs):
+
+    if total_votes != 0:
+      pro_gov_percentage  = round(pro_gov_count / total_votes, 2)
+      anti_gov_percentage = round(1 - pro_gov_percentage, 2)
+    else:
+      pro_gov_percentage  = "NO_VOTES"
+      anti_gov_percentage = "NO_VOTES"
+
+    new_df.append({
+      "ideCadastro"   : ideCadastro,
+      "parlamentar"   : parlamentar,
+      "partido"       : partido,
+      "uf"            : uf,
+      "governo"       : governo,
+      "proGovPct"     : pro_gov_percentage,
+      "antiGovPct"    : anti_gov_percentage,
+      "proGovCtg"     : pro_gov_count,
+      "antiGovCtg"    : total_votes - pro_gov_count,
+      "totalVotos"    : total_votes,
+      "totalVotacoes" : total_sessions,
+      "dataInicio"    : start,
+      "dataFim"       : end,
+    })
+
+  if ajustar_bins_bool is True:
+    new_df = ajustar_bins(new_df)
+
+  return new_df
+
 def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True):
 
   '''
@@ -22,7 +126,10 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
   os dados no intervalo de tempo determinado no parâmetro janela.
 
   Parâmetros:
-  df -> A base de dados de votos do Basômetro, criada no módulo basometro_coleta
+  df -> A base de dados de votos do Basômetro, criada no módulo basometro_coleta, um banco de
+  dados (armazenamento.BancoVotos), do qual só os votos do deputado no governo são lidos – no
+  armazenamento.BancoSQLite, por uma consulta que usa os índices –, ou uma matriz.MatrizVotos,
+  na qual eles são uma linha da matriz do governo
   ideCadastro -> O id do deputado na base de dados da Câmara
   governo -> Uma string que determina o período do governo para analisar. ("Lula 1", por exemplo.)
   freq -> O intervalo de tempo em que os dados de votação devem ser agrupados para cálculo da média de governismo
@@ -52,44 +159,9 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
     governo -> O governo, herado da função principal
     '''
 
-    # Constante que representa um segundo.
-    # Vai ser usada para evitar que as bins temporais se sobreponham.
-    one_second = datetime.timedelta(seconds = 1)
-
     new_df = [ ]
 
-    # Seleciona as datas de início e fim do governo
-    date_extent = core.GOVERNOS_SUPORTADOS[governo]
-    assert len(date_extent) == 2
-
-    # A partir delas, cria um intervalo de datas
-    date_range = [ pd.to_datetime(item, format = "%d/%m/%Y") for item in date_extent ]
-    date_range = list( pd.date_range( start = date_range[0], end = date_range[1], freq = freq ) )   # Referência: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.date_range.html
-
-    # É preciso adicionar o último dia de governo de cada um dos presidentes.
-    # Ele acaba cortado pela função pd.date_range, que só pega os inícios de mês
-    end_of_term = pd.to_datetime(date_extent[1], format = "%d/%m/%Y").replace(hour = 23, minute = 59, second = 59)
-    date_range.append(end_of_term)
-
-    # Cria pares com datas iniciais e finais para selecionar os dados
-    date_pairs = [ ]
-    for start, end in zip( date_range[:-1], date_range[1:] ):
-      if end != end_of_term:
-        end = end - one_second
-
-      date_pair = (start, end)
-      date_pairs.append(date_pair)
-
-    # O governo Temer é o único que não se inicia em um começo de mês.
-    # Assim, precisamos adicionar um par de datas inicial manualmente.
-    if governo == "Temer 1":
-
-      date_pair = ( pd.to_datetime("2016-05-13"), date_pairs[0][0] - one_second )
-      date_pairs.insert(0, date_pair)
-
-    # Checa se o primeiro e último dia dos intervalos correspondem às datas do governo
-    assert date_pairs[0][0].date()   == pd.to_datetime(core.GOVERNOS_SUPORTADOS[governo][0], format = "%d/%m/%Y").date()
-    assert date_pairs[-1][-1].date() == pd.to_datetime(core.GOVERNOS_SUPORTADOS[governo][1], format = "%d/%m/%Y").date()
+    date_pairs = core.calcular_intervalos(governo, freq)
 
     # Obtém o nome mais recente usado pelo parlamentar
     parlamentar = df.sort_index(ascending = False).reset_index().loc[0, 'parlamentar']
@@ -112,15 +184,15 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
       # resolvido na coleta, mas uma checagem a mais nunca machucou ninguém.
       assert(total_votes == total_sessions)
 
-      pro_gov_count  = temp [ temp.voto == temp.orientacaoGoverno ].shape[0]
+      pro_gov_count  = int( temp.governista.sum() )
       anti_gov_count = total_votes - pro_gov_count
 
 
       # Obtém o partido e uf do parlamentar no INÍCIO do período compreendido pelo bin
       # TO DO: não é o caso de selecionar o partido pelo qual ele mais votou no período?
       if temp.shape[0] > 0:
-        partido = temp.reset_index().loc[0, 'partido']
-        uf      = temp.reset_index().loc[0, 'UF']
+        partido = temp.partido.iloc[0]
+        uf      = temp.UF.iloc[0]
       else:
         partido = "NO_VOTES"
         uf      = "NO_VOTES"
@@ -152,59 +224,11 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
 
     return new_df
 
-  def ajustar_bins(arr):
-    '''
-    Essa função só é executada caso o parâmetro "ajustar_bins" da função principal
-    seja verdadeiro. Ela opera sobre intervalos de tempo onde não houve nenhum voto,
-    fazendo com que estes datapoints registrem o percentual de governismo do datapoints
-    imediatamente anterior (ou, caso seja o primeiro da série, remove da lista). Isso
-    é útil para evitar que gráficos gerados a partir dos dados mostrem oscilanções
-    que, na prática, nunca ocorreram.
-    '''
-
-    def trim(arr):
-      '''
-      Recursivamente, remove pontos temporais sem votos das bordas da lista
-      '''
-
-      if (arr[0]["proGovPct"] != "NO_VOTES") and (arr[-1]["proGovPct"] != "NO_VOTES"):
-        return arr
-
-      else:
-
-        for index, item in enumerate(arr):
-
-          if item["proGovPct"] == "NO_VOTES":
-
-            if index == 0 or index == len(arr) - 1:
-              arr.pop(index)
-
-        return trim(arr)
-
-    def replace(arr):
-      '''
-      Substitui os itens sem votos (já que restaram apenas os do meio da array) pelo
-      pelo valor de governismo do item imediatamente anterior
-      '''
-      for index, item in enumerate(arr):
-        if item["proGovPct"] == "NO_VOTES":
-          arr[index]["proGovPct"] = arr[index - 1]["proGovPct"]
-          arr[index]["antiGovPct"] = arr[index - 1]["antiGovPct"]
-          arr[index]["partido"]   = arr[index - 1]["partido"]
-
-      return arr
-
-    arr = trim(arr)
-    arr = replace(arr)
-    return arr
-
   ##########################
   ### EXECUÇÃO PRINCIPAL ###
   ##########################
 
-  if freq not in ['MS', '2MS', '3MS', '4MS',
-                  '5MS', '6MS', '7MS', '8MS',
-                  '9MS', '10MS', '11MS', '12MS']:
+  if freq not in core.FREQUENCIAS:
     raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
 
   # Converte número para string
@@ -217,17 +241,30 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
   if governo not in core.GOVERNOS_SUPORTADOS.keys():
       raise TypeError(f"Os governos suportados são os seguintes: {core.GOVERNOS_SUPORTADOS.keys()}")
 
-  # Copia para evitar mudanças indesejadas no objeto original
-  df_ = df.copy()
+  if isinstance(df, matriz.MatrizVotos):
+    # Na matriz, os votos do deputado no governo, sem os liberados, já vêm com a coluna governista
+    df_ = df.dataframe(governo, ideCadastro = ideCadastro)
 
-  # Remove votos liberados
-  df_ = df_[ df_.orientacaoGoverno != 'Liberado' ]
+  else:
 
-  # Para calcular o panorama geral da Câmara, o usuário deve usar o módulo
-  # basometro_partidos. Isso permite adicionar um assert útil, já que os dados
-  # da Câmara são problemáticos – o número de votos de um deputado precisa ser igual
-  # ao número de sessões de que ele partiicpou.
-  df_ = df_ [ (df_.ideCadastro == ideCadastro) & (df_.governo == governo) ]
+    if isinstance(df, armazenamento.BancoVotos):
+      df_ = df.ler(governos = [ governo ], deputados = [ ideCadastro ], tipado = True)
+
+    else:
+      # Copia para evitar mudanças indesejadas no objeto original
+      df_ = df.copy()
+
+    # Remove votos liberados
+    df_ = df_[ df_.orientacaoGoverno != 'Liberado' ]
+
+    # Para calcular o panorama geral da Câmara, o usuário deve usar o módulo
+    # basometro_partidos. Isso permite adicionar um assert útil, já que os dados
+    # da Câmara são problemáticos – o número de votos de um deputado precisa ser igual
+    # ao número de sessões de que ele partiicpou.
+    df_ = df_ [ (df_.ideCadastro == esquema.como_coluna(df_.ideCadastro, ideCadastro)) & (df_.governo == governo) ]
+
+    # Marca os votos que seguiram a orientação do governo
+    df_ = df_.assign(governista = df_.voto == df_.orientacaoGoverno)
 
 
   # Se não há votos, retornar nada
@@ -249,3 +286,248 @@ def calcular_governismo(df, ideCadastro, governo, freq, ajustar_bins_bool = True
 
   new_df = pd.DataFrame(new_df)
   return new_df
+
+def calcular_governismo_deputados(matriz_votos, freq, ajustar_bins_bool = True, deputados = None):
+
+  '''
+  Versão em lote de calcular_governismo, para todos os deputados de uma vez.
+  Em vez de filtrar os votos de cada deputado em cada governo e selecionar
+  cada bin separadamente, conta de uma só passada, em cada partição da matriz
+  de votos, os votos pró e contra o governo, o total de votos e o de sessões
+  de cada deputado em cada bin. Depois, separa o resultado em uma série por
+  deputado, igual à concatenação, na ordem dos governos, das retornadas por
+  calcular_governismo.
+
+  A exceção, deliberada, são os empates no mesmo dia. Se um deputado votou
+  mais de uma vez em um dia, o partido e a UF de cada bin vêm do primeiro voto,
+  na ordem do banco de dados, do primeiro dia da bin, e o nome mais recente
+  vem do primeiro voto do último dia. calcular_governismo ordena os votos com
+  a ordenação padrão, que não é estável, e pode escolher qualquer voto do
+  dia. As séries só diferem quando o deputado muda de nome, partido ou UF
+  entre votos do mesmo dia.
+
+  Retorna um gerador de pares (ideCadastro, DataFrame), em ordem crescente de
+  ideCadastro. Deputados sem nenhum voto fora das votações liberadas ficam de fora.
+
+  Parâmetros:
+  matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos)
+  freq -> Ver calcular_governismo
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  deputados -> Se for informado, apenas os votos desses ideCadastro são
+  contados, e apenas as suas séries são retornadas – uma fatia dos deputados,
+  para dividir o cálculo entre processos. O padrão é None, todos os deputados.
+  '''
+
+  ##########################
+  ### FUNÇÕES AUXILIARES ###
+  ##########################
+
+  def agregar_particao(particao, governo):
+    '''
+    Retorna um dicionário com a lista de datapoints de cada deputado que
+    votou no governo, como os de calcular_governismo_por_intervalos.
+
+    Parâmetros:
+    particao -> A partição do governo na matriz de votos (matriz.ParticaoGoverno)
+    governo -> O governo
+    '''
+
+    date_pairs = core.calcular_intervalos(governo, freq)
+    n_bins     = len(date_pairs)
+
+    datas = np.asarray(particao.datas)
+    bins  = core.calcular_bins(datas, date_pairs)
+
+    # Os votos válidos, fora das votações liberadas, ordenados por deputado e,
+    # para cada deputado, pela data e pela ordem da votação no banco de dados
+    votos   = np.asarray(particao.votos)
+    validos = (votos == matriz.VOTO_GOVERNISTA) | (votos == matriz.VOTO_CONTRARIO)
+    ordem   = np.lexsort( (np.arange(datas.shape[0]), datas) )
+
+    if escolhidos is not None:
+      validos &= np.isin(particao.deputados, escolhidos)[:, None]
+
+    linhas, posicoes = np.nonzero(validos[:, ordem])
+    colunas          = ordem[posicoes]
+
+    if linhas.shape[0] == 0:
+      return { }
+
+    # O nome mais recente de cada deputado é o do primeiro voto, na ordem do
+    # banco de dados, do último dia em que ele votou (ver os empates acima)
+    deputados, primeiros = np.unique(linhas, return_index = True)
+    ultimos              = np.append(primeiros[1:], linhas.shape[0]) - 1
+    dias                 = np.flatnonzero( np.r_[ True, (linhas[1:] != linhas[:-1]) | (datas[colunas][1:] != datas[colunas][:-1]) ] )
+    nomes                = particao.nomes[ deputados, colunas[ dias[ np.searchsorted(dias, ultimos, side = "right") - 1 ] ] ]
+
+    # Uma só passada pelos votos dentro das bins: como estão ordenados, os
+    # votos de cada par (deputado, bin) são contíguos, e o primeiro é o do
+    # início da bin
+    dentro = bins[colunas] >= 0
+    linhas, colunas = linhas[dentro], colunas[dentro]
+
+    grupos                   = linhas.astype(np.int64) * n_bins + bins[colunas]
+    chaves, inicio, contagem = np.unique(grupos, return_index = True, return_counts = True)
+
+    governistas = (votos[linhas, colunas] == matriz.VOTO_GOVERNISTA).astype(np.int64)
+
+    # Sessões distintas de cada par, que devem ser tantas quanto os votos
+    n_sessoes = len(particao.dicionarios["sessoes"])
+    sessoes   = np.unique( grupos * n_sessoes + particao.sessoes[colunas] ) // n_sessoes
+
+    celulas = particao.deputados.shape[0] * n_bins
+
+    def espalhar(valores, vazio):
+      tabela = np.full(celulas, vazio, dtype = np.int64)
+      tabela[chaves] = valores
+      return tabela.reshape(-1, n_bins)
+
+    totais    = espalhar(contagem, 0)
+    pro       = espalhar(np.add.reduceat(governistas, inicio) if inicio.shape[0] > 0 else inicio, 0)
+    sessoes   = espalhar(np.bincount(np.searchsorted(chaves, sessoes), minlength = chaves.shape[0]), 0)
+    partidos  = espalhar(particao.partidos[ linhas[inicio], colunas[inicio] ], -2)
+    ufs       = espalhar(particao.ufs[ linhas[inicio], colunas[inicio] ], -2)
+
+    # Um deputado não pode votar duas vezes na mesma sessão (ver calcular_governismo)
+    basometro_governos.validar_sessoes(pd.DataFrame({
+      "ideCadastro"   : particao.deputados,
+      "totalVotos"    : totais.sum(axis = 1),
+      "totalVotacoes" : sessoes.sum(axis = 1),
+    }), governo)
+
+    # O código -1 é o de um voto sem partido ou UF, e -2, o de uma bin sem votos
+    dicionario_partidos = particao.dicionarios["partidos"] + [ "NO_VOTES", np.nan ]
+    dicionario_ufs      = particao.dicionarios["ufs"] + [ "NO_VOTES", np.nan ]
+
+    series = { }
+
+    for deputado, nome in zip(deputados.tolist(), nomes.tolist()):
+      series[int(particao.deputados[deputado])] = montar_serie(
+        ideCadastro       = str( int(particao.deputados[deputado]) ),
+        parlamentar       = particao.dicionarios["nomes"][nome],
+        governo           = governo,
+        date_pairs        = date_pairs,
+        totais            = totais[deputado].tolist(),
+        sessoes           = sessoes[deputado].tolist(),
+        pro               = pro[deputado].tolist(),
+        partidos          = [ dicionario_partidos[partido] for partido in partidos[deputado].tolist() ],
+        ufs               = [ dicionario_ufs[uf] for uf in ufs[deputado].tolist() ],
+        ajustar_bins_bool = ajustar_bins_bool,
+      )
+
+    return series
+
+  ##########################
+  ### EXECUÇÃO PRINCIPAL ###
+  ##########################
+
+  if freq not in core.FREQUENCIAS:
+    raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
+
+  escolhidos = None if deputados is None else np.asarray(deputados, dtype = np.int64)
+
+  # Datapoints de cada deputado, na ordem cronológica dos governos
+  series = { }
+
+  for governo in matriz_votos.governos():
+
+    if governo not in core.GOVERNOS_SUPORTADOS.keys():
+      raise TypeError(f"Os governos suportados são os seguintes: {core.GOVERNOS_SUPORTADOS.keys()}")
+
+    for ideCadastro, new_df in agregar_particao(matriz_votos.particoes[governo], governo).items():
+      series.setdefault(ideCadastro, [ ]).extend(new_df)
+
+  for ideCadastro in sorted(series):
+    if len(series[ideCadastro]) > 0:
+      yield ideCadastro, pd.DataFrame(series[ideCadastro])
+
+def calcular_governismo_agregados(agregados_votos, deputados, freq, ajustar_bins_bool = True):
+
+  '''
+  Versão de calcular_governismo_deputados que parte das tabelas agregadas do
+  banco de dados, nas quais os votos de cada deputado já estão contados por
+  mês (ver agregados.AgregadosVotos), e calcula apenas as séries de alguns
+  deputados – em geral, os que votaram desde a última geração dos arquivos.
+  As bins de cada frequência são somas de meses inteiros.
+
+  Retorna um gerador de pares (ideCadastro, DataFrame), em ordem crescente de
+  ideCadastro, iguais aos de calcular_governismo_deputados.
+
+  Parâmetros:
+  agregados_votos -> As tabelas agregadas do banco de dados (agregados.AgregadosVotos)
+  deputados -> O ideCadastro de cada deputado
+  freq -> Ver calcular_governismo
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  '''
+
+  if freq not in core.FREQUENCIAS:
+    raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
+
+  tabela = agregados_votos.tabelas["deputados"]
+  tabela = tabela[ tabela.ideCadastro.isin([ int(ideCadastro) for ideCadastro in deputados ]) ]
+
+  # Datapoints de cada deputado, na ordem cronológica dos governos
+  series = { }
+
+  for governo in core.NOMES_GOVERNOS:
+
+    meses = tabela[ tabela.governo == governo ]
+    if meses.shape[0] == 0:
+      continue
+
+    date_pairs, bins_meses = agregados.bins_dos_meses(governo, freq)
+    n_bins                 = len(date_pairs)
+
+    ids, linhas = np.unique(meses.ideCadastro.values, return_inverse = True)
+    bins        = bins_meses[ meses.mes.values ]
+
+    # O nome mais recente é o do mês com o último dia de votos e, nele, o do voto que vem primeiro no banco de dados
+    ordem = np.lexsort(( meses.ultimo.values, -meses.fim.values, linhas ))
+    nomes = meses.parlamentar.values[ ordem[ np.unique(linhas[ordem], return_index = True)[1] ] ]
+
+    # As contagens de cada par (deputado, bin) são as somas das dos seus meses
+    dentro  = bins >= 0
+    grupos  = linhas[dentro] * n_bins + bins[dentro]
+    celulas = ids.shape[0] * n_bins
+
+    def somar(coluna):
+      return np.bincount(grupos, weights = meses[coluna].values[dentro], minlength = celulas).astype(np.int64).reshape(-1, n_bins)
+
+    totais, pro, sessoes = somar("votos"), somar("governistas"), somar("sessoes")
+
+    # Um deputado não pode votar duas vezes na mesma sessão (ver calcular_governismo)
+    basometro_governos.validar_sessoes(pd.DataFrame({
+      "ideCadastro"   : ids,
+      "totalVotos"    : totais.sum(axis = 1),
+      "totalVotacoes" : sessoes.sum(axis = 1),
+    }), governo)
+
+    # O partido e a UF de cada bin são os do mês com o primeiro voto
+    ordem             = np.lexsort(( meses.primeiro.values[dentro], meses.inicio.values[dentro], grupos ))
+    chaves, primeiros = np.unique(grupos[ordem], return_index = True)
+
+    partidos = np.full(celulas, "NO_VOTES", dtype = object)
+    ufs      = np.full(celulas, "NO_VOTES", dtype = object)
+
+    partidos[chaves] = meses.partido.values[dentro][ ordem[primeiros] ]
+    ufs[chaves]      = meses.UF.values[dentro][ ordem[primeiros] ]
+
+    partidos, ufs = partidos.reshape(-1, n_bins), ufs.reshape(-1, n_bins)
+
+    for linha, ideCadastro in enumerate(ids.tolist()):
+      series.setdefault(ideCadastro, [ ]).extend(montar_serie(
+        ideCadastro       = str(ideCadastro),
+        parlamentar       = nomes[linha],
+        governo           = governo,
+        date_pairs        = date_pairs,
+        totais            = totais[linha].tolist(),
+        sessoes           = sessoes[linha].tolist(),
+        pro               = pro[linha].tolist(),
+        partidos          = partidos[linha].tolist(),
+        ufs               = ufs[linha].tolist(),
+        ajustar_bins_bool = ajustar_bins_bool,
+      ))
+
+  for ideCadastro in sorted(series):
+    if len(series[ideCadastro]) > 0:
+      yield ideCadastro, pd.DataFrame(series[ideCadastro])
@@ -2,99 +2,335 @@
 Calcula os dados necessários para traçar um
 panorama geral da base aliada de cada governo.
 Gera os dados necessários para os histogramas.
+
+Os histogramas de todos os partidos de um governo, e o de toda a Câmara,
+saem de um só agrupamento dos votos por deputado e partido (ver
+calcular_governismo_governo). Os deputados que votaram mais de uma vez na
+mesma sessão, sinal de dados duplicados, são listados em um aviso (ver
+validar_sessoes).
 '''
 
-from basometro.core import core
+from basometro.core import armazenamento, core, matriz
+import warnings
+import numpy as np
 import pandas as pd
 
-def calcular_governismo(df, governo, partido):
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Colunas lidas do banco de dados para o cálculo
+COLUNAS = [ 'parlamentar', 'ideCadastro', 'UF', 'voto', 'partido', 'orientacaoGoverno', 'governo', 'idVotacao' ]
+
+# Atributos de cada voto codificados como inteiros por votos_governo, na ordem das colunas do resultado
+ATRIBUTOS = [ 'parlamentar', 'partido', 'UF' ]
+
+###########
+# FUNÇÕES #
+###########
+
+def votos_governo(df, governo):
+
+  '''
+  Retorna os votos de um governo, fora das votações liberadas e na ordem do
+  banco de dados, como um DataFrame com as colunas ideCadastro, parlamentar,
+  partido, UF, sessao e governista. O nome, o partido, a UF e a sessão
+  (idVotacao) são códigos inteiros, com -1 nos campos vazios. Retorna também
+  um dicionário com os valores dos códigos de cada atributo de ATRIBUTOS e a
+  lista dos partidos do governo, incluindo os que só votaram em votações liberadas.
+
+  Parâmetros:
+  df -> Ver calcular_governismo
+  governo -> O governo
+  '''
+
+  if isinstance(df, matriz.MatrizVotos):
+    particao = df.particoes.get(governo)
+
+    if particao is None:
+      votos = pd.DataFrame({ coluna : np.zeros(0, dtype = np.int64) for coluna in [ 'ideCadastro' ] + ATRIBUTOS + [ 'sessao' ] })
+      return votos.assign(governista = np.zeros(0, dtype = bool)), { atributo : [ ] for atributo in ATRIBUTOS }, [ ]
+
+    # A ordem do banco de dados: a da votação e, nela, a posição do voto
+    _, mascara      = particao.mascara()
+    colunas, linhas = np.nonzero(mascara.T)
+    ordem           = np.lexsort(( particao.posicoes[linhas, colunas], colunas ))
+    linhas, colunas = linhas[ordem], colunas[ordem]
+
+    votos = pd.DataFrame({
+      "ideCadastro" : particao.deputados[linhas],
+      "parlamentar" : particao.nomes[linhas, colunas],
+      "partido"     : particao.partidos[linhas, colunas],
+      "UF"          : particao.ufs[linhas, colunas],
+      "sessao"      : particao.sessoes[colunas],
+      "governista"  : particao.votos[linhas, colunas] == matriz.VOTO_GOVERNISTA,
+    })
+
+    dicionarios = { atributo : particao.dicionarios[nome] for atributo, nome in zip(ATRIBUTOS, [ "nomes", "partidos", "ufs" ]) }
+
+    return votos, dicionarios, list(particao.dicionarios["partidos"])
+
+  if isinstance(df, armazenamento.BancoVotos):
+    df_ = df.ler(colunas = COLUNAS, governos = [ governo ], tipado = True)
+  else:
+    df_ = df
+
+  df_      = df_ [ df_.governo == governo ]
+  partidos = list( df_.partido.dropna().unique() )
+
+  # Remove da base dados em que a organização do governo seja 'Liberado'
+  df_ = df_ [ (df_.orientacaoGoverno != 'Liberado') & df_.ideCadastro.notna() ]
+
+  votos       = { "ideCadastro" : df_.ideCadastro.values }
+  dicionarios = { }
+
+  for atributo in ATRIBUTOS:
+    votos[atributo], dicionarios[atributo] = pd.factorize(df_[atributo])
+
+  votos["sessao"]     = pd.factorize(df_.idVotacao)[0]
+  votos["governista"] = (df_.voto == df_.orientacaoGoverno).values
+
+  return pd.DataFrame(votos), { atributo : list(valores) for atributo, valores in dicionarios.items() }, partidos
+
+def validar_sessoes(tabela, governo, duplicados = None):
+
+  '''
+  Um deputado não pode votar duas vezes na mesma sessão, mas há dados
+  problemáticos da Câmara em que isso ocorre. O problema deve ter sido
+  resolvido na coleta, mas uma checagem a mais nunca machucou ninguém.
+  Retorna as linhas da tabela em que o total de votos é diferente do de
+  sessões e, se houver alguma ou algum voto duplicado, emite um aviso com
+  todos esses deputados.
+
+  Parâmetros:
+  tabela -> Um DataFrame com as colunas ideCadastro, totalVotos e totalVotacoes
+  governo -> O governo, para o aviso
+  duplicados -> Os votos repetidos que ficaram fora da tabela, como os de
+  matriz.ParticaoGoverno.votos_duplicados. A matriz de votos guarda um só voto
+  de cada deputado em cada votação, então os demais são avisados à parte.
+  '''
+
+  invalidos = tabela if tabela.shape[0] == 0 else tabela [ tabela.totalVotos != tabela.totalVotacoes ]
+
+  deputados = [ f"{linha.ideCadastro} ({linha.totalVotos} votos em {linha.totalVotacoes} sessões)" for linha in invalidos.itertuples() ]
+
+  if duplicados is not None:
+    deputados += [ f"{linha.ideCadastro} ({linha.votos} votos na votação {linha.idVotacao})" for linha in duplicados.itertuples() ]
+
+  if len(deputados) > 0:
+    warnings.warn(f"Há deputados que votaram mais de uma vez na mesma sessão no governo {governo}: {', '.join(deputados)}", stacklevel = 2)
+
+  return invalidos
+
+def montar_histograma(tabela, governo, total_sessoes_governo):
+
+  '''
+  Transforma as linhas agregadas de uma tabela, uma por deputado, no DataFrame
+  do arquivo de um partido ou de toda a Câmara. Usada pelas versões em lote.
+
+  Parâmetros:
+  tabela -> As linhas, com as colunas ideCadastro, parlamentar, partido, UF,
+  totalVotos, proGovCtg e totalVotacoes
+  governo -> O governo
+  total_sessoes_governo -> As sessões COM ORIENTAÇÃO DA BANCADA, no partido ou em toda a Câmara
+  '''
+
+  if tabela.shape[0] == 0:
+    return pd.DataFrame([ ])
+
+  total_votes    = tabela.totalVotos.tolist()
+  pro_gov_count  = tabela.proGovCtg.tolist()
+
+  # O arredondamento é o do Python, e não o do numpy, para que os valores sejam exatamente os mesmos
+  pro_gov_percentage = [ round(pro / total, 2) for pro, total in zip(pro_gov_count, total_votes) ]
+
+  return pd.DataFrame({
+    "ideCadastro"              : tabela.ideCadastro.values,
+    "parlamentar"              : tabela.parlamentar.values,
+    "partido"                  : tabela.partido.values,
+    "uf"                       : tabela.UF.values,
+    "governo"                  : governo,
+    "proGovPct"                : pro_gov_percentage,
+    "antiGovPct"               : [ round(1 - pro, 2) for pro in pro_gov_percentage ],
+    "proGovCtg"                : pro_gov_count,
+    "antiGovCtg"               : [ total - pro for pro, total in zip(pro_gov_count, total_votes) ],
+    "totalVotos"               : total_votes,
+    "totalVotacoes"            : tabela.totalVotacoes.tolist(),
+    "totalSessoesGoverno"      : total_sessoes_governo,
+    "assiduidadeParlamentar"   : [ round(total / total_sessoes_governo, 2) for total in total_votes ],
+  })
+
+def calcular_governismo_governo(df, governo):
 
   '''
   Calcula o percentual de governismo de todos os deputados que votaram em
-  determinada gestão do executivo. Retorna os valores como dataframe.
+  determinada gestão do executivo, para cada partido e para toda a Câmara
+  ("todos"). Retorna um dicionário com um DataFrame para cada partido do
+  governo e para "todos" – vazio para os partidos que só votaram em
+  votações liberadas.
+
+  Os votos são agregados em um só groupby, por deputado e partido, do qual
+  saem todas as tabelas: a de um partido é uma fatia dele, e a de "todos"
+  soma as linhas de cada deputado. Os deputados ficam na ordem do seu
+  primeiro voto no banco de dados, e o nome, o partido e a UF são os do seu
+  último voto. Os deputados com mais votos que sessões – ou, na matriz de
+  votos, com votos duplicados – são avisados por validar_sessoes.
 
   Parâmetros:
-  df -> Um dataframe do pandas, gerado pela função coletar_votos
+  df -> Ver calcular_governismo
   governo -> Uma string que identifica qual o governo cujas votações devem ser consideradas.
-  O valor "todos" pode ser passado para que o cálculo considere todos os governos.
-  partido -> Uma string que identifica o partido para o qual o cáluclo deve ser feito.
   '''
 
+  ##########################
+  ### FUNÇÕES AUXILIARES ###
+  ##########################
+
+  def montar(tabela, total_sessoes_governo):
+    '''
+    Decodifica os atributos das linhas agregadas de uma tabela e monta o DataFrame do arquivo
+
+    Parâmetros:
+    tabela -> As linhas, com os atributos codificados e as contagens
+    total_sessoes_governo -> Ver montar_histograma
+    '''
+
+    def decodificar(atributo):
+      valores = np.array(dicionarios[atributo] + [ np.nan ], dtype = object)
+      return valores[ tabela[atributo].values ]
+
+    decodificada = tabela.assign(parlamentar = decodificar("parlamentar"), partido = decodificar("partido"), UF = decodificar("UF"))
+
+    return montar_histograma(decodificada, governo, total_sessoes_governo)
+
+  ##########################
+  ### EXECUÇÃO PRINCIPAL ###
+  ##########################
+
   # Checa se o cálculo foi para um dos governos suportados
   if governo not in core.GOVERNOS_SUPORTADOS.keys():
     raise ValueError(f"Atualmente são suportados apenas os seguintes governos: {core.GOVERNOS_SUPORTADOS.keys()}")
 
-  df_ = df.copy()
+  votos, dicionarios, partidos = votos_governo(df, governo)
 
-  df_ = df_ [ df_.governo == governo ]
+  if votos.shape[0] == 0:
+    return { partido : pd.DataFrame([ ]) for partido in partidos + [ "todos" ] }
 
-  if partido != "todos":
-    df_ = df_ [df_.partido == partido ]
+  votos["posicao"] = np.arange(votos.shape[0])
 
-  # Remove da base dados em que a organização do governo seja 'Liberado'
-  df_ = df_[ df_.orientacaoGoverno != 'Liberado' ]
-
-  # Calcula quantas sessões ocorreram neste governo COM ORIENTAÇÃO DA BANCADA
-  total_sessoes_governo = df_.idVotacao.unique().shape[0]
-
-  # Para cada deputado na base já filtrada, calcula uma taxa de governismo
-  # e outras informações úteis (número total de votos, número de votos pro governo)
-  new_df = [ ]
-  id_deputados = df_.ideCadastro.unique()
-
-  for id_deputado in id_deputados:
-
-    # Filtra e recupera índices padrão
-    temp = df_ [ df_.ideCadastro == id_deputado ]
-    temp = temp.reset_index()
-
-    # Pega os últimos nome, uf e partidos usados pelo parlamentar no período
-    parlamentar         = temp.loc[ (temp.shape[0] - 1), 'parlamentar' ]
-    partido_parlamentar = temp.loc[ (temp.shape[0] - 1), 'partido' ]
-    uf_parlamentar      = temp.loc[ (temp.shape[0] - 1), 'UF' ]
-
-    # Contabiliza votos e votações
-    total_votes       = temp.shape[0]
-    total_sessions    = temp.idVotacao.unique().shape[0]
-
-    # Um deputado não pode votar duas vezes na mesma sessão, mas há dados
-    # problemáticos da Câmara em que isso ocorre. O problema deve ter sido
-    # resolvido na coleta, mas uma checagem a mais nunca machucou ninguém.
-    assert(total_votes == total_sessions)
-
-    # Calcula também o percentual de comparecimento do deputado – ou seja,
-    # o percentual de sessões da legislatura em que ele esteve presente.
-    assiduidade_parlamentar = round(total_votes / total_sessoes_governo, 2)
-
-    # Calcula a contagem de votos pró e contra governo
-    pro_gov_count   = temp [ temp.orientacaoGoverno == temp.voto ].shape[0]
-    anti_gov_count  = total_votes - pro_gov_count
-
-    # Calcula o percentual de votos pró e contra governo
-    pro_gov_percentage  = round(pro_gov_count / total_votes, 2)
-    anti_gov_percentage = round(1 - pro_gov_percentage, 2)
-
-    datapoint = {
-      "ideCadastro"              : id_deputado,
-      "parlamentar"              : parlamentar,
-      "partido"                  : partido_parlamentar,
-      "uf"                       : uf_parlamentar,
-      "governo"                  : governo,
-      "proGovPct"                : pro_gov_percentage,
-      "antiGovPct"               : anti_gov_percentage,
-      "proGovCtg"                : pro_gov_count,
-      "antiGovCtg"               : anti_gov_count,
-      "totalVotos"               : total_votes,
-      "totalVotacoes"            : total_sessions,
-      "totalSessoesGoverno"      : total_sessoes_governo,
-      "assiduidadeParlamentar"   : assiduidade_parlamentar,
-    }
-
-    new_df.append( datapoint )
-
-  # print()
-
-  # Transforma dataframe e renomeia colunas
-  new_df = pd.DataFrame(new_df)
-
-  return new_df
+  # Um só groupby, na ordem do banco de dados: cada deputado em cada partido
+  # pelo qual votou, com os atributos do último voto e as contagens
+  tabela = votos.groupby([ 'ideCadastro', 'partido' ], sort = False).agg(
+    parlamentar   = ( 'parlamentar', 'last' ),
+    UF            = ( 'UF', 'last' ),
+    ultimo        = ( 'posicao', 'last' ),
+    totalVotos    = ( 'governista', 'size' ),
+    proGovCtg     = ( 'governista', 'sum' ),
+    totalVotacoes = ( 'sessao', 'nunique' ),
+  ).reset_index()
+
+  # Toda a Câmara: as contagens somadas por deputado e os atributos do grupo com o último voto.
+  # As sessões de cada deputado são contadas de novo, porque as de partidos diferentes podem se repetir.
+  deputados = tabela.groupby('ideCadastro', sort = False)
+  ultimos   = tabela.loc[ deputados.ultimo.idxmax().values ]
+
+  todos = pd.DataFrame({
+    "ideCadastro"   : ultimos.ideCadastro.values,
+    "parlamentar"   : ultimos.parlamentar.values,
+    "partido"       : ultimos.partido.values,
+    "UF"            : ultimos.UF.values,
+    "totalVotos"    : deputados.totalVotos.sum().values,
+    "proGovCtg"     : deputados.proGovCtg.sum().values,
+    "totalVotacoes" : votos.drop_duplicates([ 'ideCadastro', 'sessao' ]).groupby('ideCadastro', sort = False).size().values,
+  })
+
+  # A matriz de votos guarda à parte os votos duplicados (ver matriz.ParticaoGoverno.construir)
+  if isinstance(df, matriz.MatrizVotos):
+    validar_sessoes(todos, governo, duplicados = df.particoes[governo].votos_duplicados())
+  else:
+    validar_sessoes(todos, governo)
+
+  # Sessões COM ORIENTAÇÃO DA BANCADA de cada partido e de todo o governo
+  sessoes_partidos = votos.groupby('partido').sessao.nunique()
+
+  arquivos = { }
+
+  for partido in partidos:
+    codigo = dicionarios["partido"].index(partido) if partido in dicionarios["partido"] else None
+
+    # Partidos que só votaram em votações liberadas ficam com um arquivo vazio
+    if codigo is None or codigo not in sessoes_partidos.index:
+      arquivos[partido] = pd.DataFrame([ ])
+    else:
+      arquivos[partido] = montar(tabela [ tabela.partido == codigo ], int(sessoes_partidos[codigo]))
+
+  arquivos["todos"] = montar(todos, votos.sessao.nunique())
+
+  return arquivos
+
+def calcular_governismo_agregados(agregados_votos, governo, partidos):
+
+  '''
+  Versão de calcular_governismo_governo que parte das tabelas agregadas do
+  banco de dados, nas quais os votos de cada deputado em cada partido e em
+  toda a Câmara já estão contados por governo (ver agregados.AgregadosVotos),
+  e monta apenas os arquivos de alguns partidos – em geral, os que receberam
+  votos desde a última geração dos arquivos. Retorna um dicionário com um
+  DataFrame para cada partido, igual ao de calcular_governismo_governo.
+
+  Parâmetros:
+  agregados_votos -> As tabelas agregadas do banco de dados (agregados.AgregadosVotos)
+  governo -> O governo
+  partidos -> Os partidos, incluindo "todos" para toda a Câmara
+  '''
+
+  if governo not in core.GOVERNOS_SUPORTADOS.keys():
+    raise ValueError(f"Atualmente são suportados apenas os seguintes governos: {core.GOVERNOS_SUPORTADOS.keys()}")
+
+  tabela  = agregados_votos.tabelas["governos"]
+  tabela  = tabela[ (tabela.governo == governo) & tabela.partido.isin(partidos) ]
+  sessoes = agregados_votos.tabelas["sessoes"]
+  sessoes = sessoes[ sessoes.governo == governo ].set_index('partido').sessoes
+
+  # Os deputados ficam na ordem do seu primeiro voto no banco de dados, e o partido de "todos" é o do último voto
+  tabela = tabela.sort_values('primeiro', kind = "mergesort").rename(columns = {
+    "votos"       : "totalVotos",
+    "governistas" : "proGovCtg",
+    "sessoes"     : "totalVotacoes",
+  })
+
+  arquivos = { }
+
+  for partido in partidos:
+    linhas = tabela[ tabela.partido == partido ]
+
+    if partido == "todos":
+      validar_sessoes(linhas, governo)
+
+    # Partidos que só votaram em votações liberadas ficam com um arquivo vazio
+    if sessoes.get(partido, 0) == 0:
+      arquivos[partido] = pd.DataFrame([ ])
+    else:
+      arquivos[partido] = montar_histograma(linhas.assign(partido = linhas.partidoVoto), governo, int(sessoes[partido]))
+
+  return arquivos
+
+def calcular_governismo(df, governo, partido):
+
+  '''
+  Calcula o percentual de governismo de todos os deputados que votaram em
+  determinada gestão do executivo. Retorna os valores como dataframe.
+
+  Parâmetros:
+  df -> Um dataframe do pandas, gerado pela função coletar_votos, um banco de
+  dados (armazenamento.BancoVotos) ou uma matriz.MatrizVotos. No banco colunar,
+  apenas as colunas usadas e as partições do governo são lidas; na matriz, os
+  votos do governo são os da sua partição.
+  governo -> Uma string que identifica qual o governo cujas votações devem ser consideradas.
+  partido -> Uma string que identifica o partido para o qual o cáluclo deve ser feito. O
+  valor "todos" pode ser passado para que o cálculo considere toda a Câmara.
+  '''
+
+  # Os arquivos de todos os partidos saem do mesmo cálculo (ver calcular_governismo_governo)
+  return calcular_governismo_governo(df, governo).get(partido, pd.DataFrame([ ]))
@@ -2,9 +2,14 @@
 Calcula os dados necessários para traçar a evolução
 do governismo de cada um dos partidos ao longo do tempo.
 Gera os dados necessários para os gráficos de linha.
+
+As séries de todos os partidos são calculadas de uma vez, em uma passada por
+partição da matriz de votos (ver calcular_governismo_partidos), e a de toda a
+Câmara é a soma das deles. Na geração incremental, as séries saem das tabelas
+agregadas (ver calcular_governismo_agregados).
 '''
-from basometro.core import core
-import datetime
+from basometro.core import agregados, core, matriz
+import numpy as np
 import pandas as pd
 
 
@@ -16,6 +21,99 @@ class NoVotes(ValueError):
   '''
   pass
 
+def ajustar_bins(arr):
+  '''
+  Essa função só é executada caso o parâmetro "ajustar_bins_bool" de calcular_governismo
+  ou de calcular_governismo_partidos seja verdadeiro. Ela opera sobre intervalos de tempo onde
+  não houve nenhum voto, fazendo com que estes datapoints registrem o percentual de
+  governismo do datapoints imediatamente anterior (ou, caso seja o primeiro da série,
+  remove da lista). Isso
+  é útil para evitar que gráficos gerados a partir dos dados mostrem oscilanções
+  que, na prática, nunca ocorreram.
+  '''
+
+  def trim(arr):
+    '''
+    Recursivamente, remove pontos temporais sem votos das bordas da lista
+    '''
+
+    if len(arr) == 0:
+      return arr
+
+    if (arr[0]["proGovPct"] != "NO_VOTES") and (arr[-1]["proGovPct"] != "NO_VOTES"):
+      return arr
+
+    else:
+
+      for index, item in enumerate(arr):
+
+        if item["proGovPct"] == "NO_VOTES":
+
+          if index == 0 or index == len(arr) - 1:
+            arr.pop(index)
+
+      return trim(arr)
+
+  def replace(arr):
+    '''
+    Substitui os itens sem votos (já que restaram apenas os do meio da array) pelo
+    pelo valor de governismo do item imediatamente anterior
+    '''
+    for index, item in enumerate(arr):
+      if item["proGovPct"] == "NO_VOTES":
+
+        arr[index]["proGovPct"]  = arr[index - 1]["proGovPct"]
+        arr[index]["antiGovPct"] = arr[index - 1]["antiGovPct"]
+
+    return arr
+
+  arr = trim(arr)
+  arr = replace(arr)
+  return arr
+
+def montar_serie(partido, governo, date_pairs, totais, pro, sessoes, ajustar_bins_bool = True):
+  '''
+  Monta a lista de datapoints de um partido em um governo, como a de
+  calcular_governismo, a partir das contagens de cada bin. Usada pelas
+  versões em lote, que contam os votos de todos os partidos de uma vez.
+
+  Parâmetros:
+  partido -> O partido, ou "todos"
+  governo -> O governo
+  date_pairs -> As bins do governo (ver core.calcular_intervalos)
+  totais, pro, sessoes -> Listas com o total de votos, o de votos pró-governo e o de sessões em cada bin
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  '''
+  new_df = [ ]
+
+  for (start, end), total_votes, pro_gov_count, total_sessions in zip(date_pairs, totais, pro, sessoes):
+
+    if total_votes != 0:
+      pro_gov_percentage  = round(pro_gov_count / total_votes, 2)
+      anti_gov_percentage = round(1 - pro_gov_percentage, 2)
+
+    else:
+      pro_gov_percentage  = "NO_VOTES"
+      anti_gov_percentage = "NO_VOTES"
+
+    new_df.append({
+      "partido"       : partido,
+      "governo"       : governo,
+      "proGovPct"     : pro_gov_percentage,
+      "antiGovPct"    : anti_gov_percentage,
+      "proGovCtg"     : pro_gov_count,
+      "antiGovCtg"    : total_votes - pro_gov_count,
+      "totalVotos"    : total_votes,
+      "totalVotacoes" : total_sessions,
+      "dataInicio"    : start,
+      "dataFim"       : end,
+    })
+
+  if ajustar_bins_bool is True:
+    new_df = ajustar_bins(new_df)
+
+  return new_df
+
 def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool = True):
 
   '''
@@ -23,7 +121,8 @@ def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool =
   os dados no intervalo de tempo determinado no parâmetro janela.
 
   Parâmetros:
-  df -> A base de dados de votos do Basômetro, criada no módulo basometro_coleta
+  df -> A base de dados de votos do Basômetro, criada no módulo basometro_coleta, ou uma
+  matriz.MatrizVotos, na qual os votos do partido são uma máscara da matriz do governo
   partido -> Uma string com o nome do partido desejado. ("PT", por exemplo). É possível, também, passar
   o parâmetro "TODOS" para calcular o governismo de toda a Câmara dos Deputados no período.
   governo -> Uma string que determina o período do governo para analisar. ("Lula 1", por exemplo.)
@@ -54,44 +153,9 @@ def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool =
     freq -> O intervalo de tempo para agrupar os dados, herdado da função principal
     '''
 
-    # Constante que representa um segundo.
-    # Vai ser usada para evitar que as bins temporais se sobreponham.
-    one_second = datetime.timedelta(seconds = 1)
-
     new_df = [ ]
 
-    # Seleciona as datas de início e fim do governo
-    date_extent = core.GOVERNOS_SUPORTADOS[governo]
-    assert len(date_extent) == 2
-
-    # A partir delas, cria um intervalo de datas
-    date_range = [ pd.to_datetime(item, format = "%d/%m/%Y") for item in date_extent ]
-    date_range = list( pd.date_range( start = date_range[0], end = date_range[1], freq = freq ) )    # Referência: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.date_range.html
-
-    # É preciso adicionar o último dia de governo de cada um dos presidentes.
-    # Ele acaba cortado pela função pd.date_range, que só pega os inícios de mês
-    end_of_term = pd.to_datetime(date_extent[1], format = "%d/%m/%Y").replace(hour = 23, minute = 59, second = 59)
-    date_range.append(end_of_term)
-
-    # Cria pares com datas iniciais e finais para selecionar os dados
-    date_pairs = [ ]
-    for start, end in zip( date_range[:-1], date_range[1:] ):
-      if end != end_of_term:
-        end = end - one_second
-
-      date_pair = (start, end)
-      date_pairs.append(date_pair)
-
-    # O governo Temer é o único que não se inicia em um começo de mês.
-    # Assim, precisamos adicionar um par de datas inicial manualmente.
-    if governo == "Temer 1":
-
-      date_pair = ( pd.to_datetime("2016-05-13"), date_pairs[0][0] - one_second )
-      date_pairs.insert(0, date_pair)
-
-    # Checa se o primeiro e último dia dos intervalos correspondem às datas do governo
-    assert date_pairs[0][0].date()   == pd.to_datetime(core.GOVERNOS_SUPORTADOS[governo][0], format = "%d/%m/%Y").date()
-    assert date_pairs[-1][-1].date() == pd.to_datetime(core.GOVERNOS_SUPORTADOS[governo][1], format = "%d/%m/%Y").date()
+    date_pairs = core.calcular_intervalos(governo, freq)
 
     # Seleciona os votos que ocorream dentro do período e calcula o governismo nesse intervalo
     for date_pair in date_pairs:
@@ -105,7 +169,7 @@ def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool =
       total_sessions = temp.idVotacao.unique().shape[0]
 
       total_votes    = temp.shape[0]
-      pro_gov_count  = temp [ temp.voto == temp.orientacaoGoverno ].shape[0]
+      pro_gov_count  = int( temp.governista.sum() )
       anti_gov_count = total_votes - pro_gov_count
 
       if total_votes != 0:
@@ -134,78 +198,38 @@ def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool =
 
     return new_df
 
-  def ajustar_bins(arr):
-    '''
-    Essa função só é executada caso o parâmetro "ajustar_bins" da função principal
-    seja verdadeiro. Ela opera sobre intervalos de tempo onde não houve nenhum voto,
-    fazendo com que estes datapoints registrem o percentual de governismo do datapoints
-    imediatamente anterior (ou, caso seja o primeiro da série, remove da lista). Isso
-    é útil para evitar que gráficos gerados a partir dos dados mostrem oscilanções
-    que, na prática, nunca ocorreram.
-    '''
-
-    def trim(arr):
-      '''
-      Recursivamente, remove pontos temporais sem votos das bordas da lista
-      '''
-
-      if (arr[0]["proGovPct"] != "NO_VOTES") and (arr[-1]["proGovPct"] != "NO_VOTES"):
-        return arr
-
-      else:
-
-        for index, item in enumerate(arr):
-
-          if item["proGovPct"] == "NO_VOTES":
-
-            if index == 0 or index == len(arr) - 1:
-              arr.pop(index)
-
-        return trim(arr)
-
-    def replace(arr):
-      '''
-      Substitui os itens sem votos (já que restaram apenas os do meio da array) pelo
-      pelo valor de governismo do item imediatamente anterior
-      '''
-      for index, item in enumerate(arr):
-        if item["proGovPct"] == "NO_VOTES":
-
-          arr[index]["proGovPct"]  = arr[index - 1]["proGovPct"]
-          arr[index]["antiGovPct"] = arr[index - 1]["antiGovPct"]
-
-      return arr
-
-    arr = trim(arr)
-    arr = replace(arr)
-    return arr
-
-##########################
-### EXECUÇÃO PRINCIPAL ###
-##########################
+  ##########################
+  ### EXECUÇÃO PRINCIPAL ###
+  ##########################
 
-  if freq not in ['MS', '2MS', '3MS', '4MS',
-                  '5MS', '6MS', '7MS', '8MS',
-                  '9MS', '10MS', '11MS', '12MS']:
+  if freq not in core.FREQUENCIAS:
     raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
 
   # Checa se o governo é suportado pelo Basômetro
   if governo not in core.GOVERNOS_SUPORTADOS.keys():
     raise TypeError(f"Os governos suportados são os seguintes: {core.GOVERNOS_SUPORTADOS.keys()}")
 
-  # Copia para evitar mudanças indesejadas no objeto original
-  df_ = df.copy()
+  if isinstance(df, matriz.MatrizVotos):
+    # Na matriz, os votos do governo, sem os liberados, já vêm com a coluna governista
+    df_ = df.dataframe(governo, partido = None if partido.lower() == "todos" else partido)
+
+  else:
+    # Copia para evitar mudanças indesejadas no objeto original
+    df_ = df.copy()
 
-  # Remove da base dados em que a organização do governo seja 'Liberado'
-  df_ = df_[ df_.orientacaoGoverno != 'Liberado' ]
+    # Remove da base dados em que a organização do governo seja 'Liberado'
+    df_ = df_[ df_.orientacaoGoverno != 'Liberado' ]
 
-  if partido.lower() == "todos":
-    # Caso positivo, os dados levam em conta os votos registrados por toda a Câmara dos Deputados
-    df_ = df_ [ df_.governo == governo ]
+    if partido.lower() == "todos":
+      # Caso positivo, os dados levam em conta os votos registrados por toda a Câmara dos Deputados
+      df_ = df_ [ df_.governo == governo ]
 
-  else:
-    # Filtra para manter apenas os partidos e o governo relevantes no banco de dados
-    df_ = df_ [ (df_.partido == partido) & (df_.governo == governo) ]
+    else:
+      # Filtra para manter apenas os partidos e o governo relevantes no banco de dados
+      df_ = df_ [ (df_.partido == partido) & (df_.governo == governo) ]
+
+    # Marca os votos que seguiram a orientação do governo
+    df_ = df_.assign(governista = df_.voto == df_.orientacaoGoverno)
 
   # Se não há votos, retornar nada
   if df_.shape[0] == 0:
@@ -226,3 +250,173 @@ def calcular_governismo(df, partido, governo , freq = "MS", ajustar_bins_bool =
 
   new_df = pd.DataFrame(new_df)
   return new_df
+
+def calcular_governismo_partidos(matriz_votos, freq = "MS", ajustar_bins_bool = True, partidos = None):
+
+  '''
+  Versão em lote de calcular_governismo, para todos os partidos e para toda a
+  Câmara de uma vez. Em cada partição da matriz de votos, conta de uma só
+  passada os votos pró e contra o governo, o total de votos e as sessões de
+  cada partido em cada bin. A série de "todos" é a soma das dos partidos – as
+  sessões, a união das sessões de cada partido –, sem uma nova passada pelos votos.
+
+  Retorna um gerador de pares (partido, DataFrame), na ordem de
+  MatrizVotos.partidos() e com "todos" por último. Cada DataFrame é igual à
+  concatenação, na ordem dos governos, dos retornados por calcular_governismo.
+
+  Parâmetros:
+  matriz_votos -> A matriz de votos do banco de dados (matriz.MatrizVotos)
+  freq -> Ver calcular_governismo
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  partidos -> Se for informado, apenas as séries desses partidos, incluindo
+  "todos" se estiver entre eles, são montadas e retornadas – uma fatia dos
+  partidos, para dividir o cálculo entre processos. Os votos contados são
+  sempre os de todos os partidos. O padrão é None, todos os partidos.
+  '''
+
+  ##########################
+  ### FUNÇÕES AUXILIARES ###
+  ##########################
+
+  def agregar_particao(particao, governo):
+    '''
+    Retorna um dicionário com a lista de datapoints de cada partido que votou
+    no governo, e de "todos", como os de calcular_governismo_por_intervalos.
+
+    Parâmetros:
+    particao -> A partição do governo na matriz de votos (matriz.ParticaoGoverno)
+    governo -> O governo
+    '''
+
+    date_pairs = core.calcular_intervalos(governo, freq)
+    n_bins     = len(date_pairs)
+    n_partidos = len(particao.dicionarios["partidos"])
+    n_sessoes  = len(particao.dicionarios["sessoes"])
+
+    bins = core.calcular_bins(np.asarray(particao.datas), date_pairs)
+
+    # Os votos válidos, fora das votações liberadas
+    votos            = np.asarray(particao.votos)
+    linhas, colunas  = np.nonzero( (votos == matriz.VOTO_GOVERNISTA) | (votos == matriz.VOTO_CONTRARIO) )
+    partidos         = particao.partidos[linhas, colunas].astype(np.int64)
+    governistas      = votos[linhas, colunas] == matriz.VOTO_GOVERNISTA
+
+    # Partidos com algum voto válido no governo, mesmo que fora das bins
+    presentes = np.unique(partidos[ partidos >= 0 ])
+    algum     = partidos.shape[0] > 0
+
+    dentro                          = bins[colunas] >= 0
+    partidos, colunas, governistas  = partidos[dentro], colunas[dentro], governistas[dentro]
+
+    # Uma só passada: cada voto é contado no par (partido, bin). A primeira
+    # linha é a dos votos sem partido, que só entram na série de "todos".
+    grupos = (partidos + 1) * n_bins + bins[colunas]
+    celulas = (n_partidos + 1) * n_bins
+
+    totais = np.bincount(grupos, minlength = celulas).reshape(n_partidos + 1, n_bins)
+    pro    = np.bincount(grupos[governistas], minlength = celulas).reshape(n_partidos + 1, n_bins)
+
+    # As sessões distintas de cada partido em cada bin e, pela união delas, as de toda a Câmara
+    sessoes_partidos = np.unique( grupos * n_sessoes + particao.sessoes[colunas] )
+    sessoes_todos    = np.unique( sessoes_partidos % (n_bins * n_sessoes) )
+
+    sessoes = np.bincount(sessoes_partidos // n_sessoes, minlength = celulas).reshape(n_partidos + 1, n_bins)
+
+    series = { }
+
+    for codigo in presentes.tolist():
+      partido = particao.dicionarios["partidos"][codigo]
+
+      if partido not in escolhidos:
+        continue
+
+      series[partido] = montar_serie(partido, governo, date_pairs, totais[codigo + 1].tolist(), pro[codigo + 1].tolist(),
+                                     sessoes[codigo + 1].tolist(), ajustar_bins_bool)
+
+    if algum and "todos" in escolhidos:
+      series["todos"] = montar_serie("todos", governo, date_pairs, totais.sum(axis = 0).tolist(), pro.sum(axis = 0).tolist(),
+                                     np.bincount(sessoes_todos // n_sessoes, minlength = n_bins).tolist(), ajustar_bins_bool)
+
+    return series
+
+  ##########################
+  ### EXECUÇÃO PRINCIPAL ###
+  ##########################
+
+  if freq not in core.FREQUENCIAS:
+    raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
+
+  escolhidos = set(matriz_votos.partidos() + [ "todos" ] if partidos is None else partidos)
+
+  # Datapoints de cada partido, na ordem cronológica dos governos
+  series = { partido : [ ] for partido in matriz_votos.partidos() + [ "todos" ] if partido in escolhidos }
+
+  for governo in matriz_votos.governos():
+
+    if governo not in core.GOVERNOS_SUPORTADOS.keys():
+      raise TypeError(f"Os governos suportados são os seguintes: {core.GOVERNOS_SUPORTADOS.keys()}")
+
+    for partido, new_df in agregar_particao(matriz_votos.particoes[governo], governo).items():
+      series[partido].extend(new_df)
+
+  for partido, new_df in series.items():
+    if len(new_df) > 0:
+      yield partido, pd.DataFrame(new_df)
+
+def calcular_governismo_agregados(agregados_votos, partidos, freq = "MS", ajustar_bins_bool = True):
+
+  '''
+  Versão de calcular_governismo_partidos que parte das tabelas agregadas do
+  banco de dados, nas quais os votos de cada partido e de toda a Câmara já
+  estão contados por mês (ver agregados.AgregadosVotos), e calcula apenas as
+  séries de alguns partidos – em geral, os que receberam votos desde a última
+  geração dos arquivos. As bins de cada frequência são somas de meses inteiros.
+
+  Retorna um gerador de pares (partido, DataFrame), na ordem de partidos,
+  iguais aos de calcular_governismo_partidos.
+
+  Parâmetros:
+  agregados_votos -> As tabelas agregadas do banco de dados (agregados.AgregadosVotos)
+  partidos -> Os partidos, incluindo "todos" para toda a Câmara
+  freq -> Ver calcular_governismo
+  ajustar_bins_bool -> Ver calcular_governismo. Default: True.
+  '''
+
+  if freq not in core.FREQUENCIAS:
+    raise TypeError("As frequências suportados são apenas MS ou múltiplos (2MS, 3MS, etc.)")
+
+  tabela = agregados_votos.tabelas["partidos"]
+  tabela = tabela[ tabela.partido.isin(partidos) ]
+
+  # Datapoints de cada partido, na ordem cronológica dos governos
+  series = { partido : [ ] for partido in partidos }
+
+  for governo in core.NOMES_GOVERNOS:
+
+    meses = tabela[ tabela.governo == governo ]
+    if meses.shape[0] == 0:
+      continue
+
+    date_pairs, bins_meses = agregados.bins_dos_meses(governo, freq)
+    n_bins                 = len(date_pairs)
+
+    codigos, presentes = pd.factorize(meses.partido)
+    bins               = bins_meses[ meses.mes.values ]
+
+    # As contagens de cada par (partido, bin) são as somas das dos seus meses
+    dentro  = bins >= 0
+    grupos  = codigos[dentro] * n_bins + bins[dentro]
+    celulas = len(presentes) * n_bins
+
+    def somar(coluna):
+      return np.bincount(grupos, weights = meses[coluna].values[dentro], minlength = celulas).astype(np.int64).reshape(-1, n_bins)
+
+    totais, pro, sessoes = somar("votos"), somar("governistas"), somar("sessoes")
+
+    for codigo, partido in enumerate(presentes):
+      series[partido].extend( montar_serie(partido, governo, date_pairs, totais[codigo].tolist(), pro[codigo].tolist(),
+                                           sessoes[codigo].tolist(), ajustar_bins_bool) )
+
+  for partido, new_df in series.items():
+    if len(new_df) > 0:
+      yield partido, pd.DataFrame(new_df)
@@ -0,0 +1,1517 @@
+'''
+Rotinas para medir o desempenho do Basômetro sem depender da API
+real da Câmara dos Deputados. As funções do camaraPy usadas pelos
+coletores são substituídas por uma API simulada, que gera respostas
+sintéticas (mas com a mesma estrutura das originais) e imita a
+latência da rede.
+
+Para rodar todos os benchmarks, execute na raiz do repositório:
+
+python -m basometro.benchmark
+'''
+
+from basometro import reproducao
+from basometro.core import core, requisicoes
+from camaraPy.api_original import proposicoes as campy_proposicoes
+from camaraPy.api_original.core import custom_exceptions
+from concurrent.futures import ProcessPoolExecutor
+import filecmp, gc, multiprocessing, os, random, requests, resource, shutil, sys, tempfile, time, tracemalloc
+
+################
+# API SIMULADA #
+################
+
+class ApiSimulada(reproducao.ApiSubstituta):
+  '''
+  Imita os métodos ListarProposicoesVotadasEmPlenario, ObterProposicaoPorID
+  e ObterVotacaoProposicao do camaraPy. As respostas são determinísticas:
+  dependem apenas da semente e do ano ou proposição solicitados. Enquanto a
+  API simulada está instalada, o cache de respostas fica desativado, para que
+  dados sintéticos nunca se misturem aos verdadeiros, e as requisições passam
+  por um agendador próprio, sem limite de ritmo, cujas estatísticas ficam em
+  self.agendador (ver reproducao.ApiSubstituta).
+
+  Também é possível simular uma API instável: parte das requisições falha com
+  um erro de conexão e, se houver mais requisições simultâneas do que a
+  capacidade do servidor, todas elas ficam mais lentas (ver reproducao.RedeSimulada).
+
+  Parâmetros:
+  latencia -> Tempo, em segundos, que cada requisição leva para ser respondida
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  deputados -> Número de deputados que votam em cada votação
+  semente -> Semente usada para gerar os dados aleatórios
+  variacao -> Variação aleatória da latência, como fração dela. Com 0.5, cada
+  requisição leva entre 50% e 150% da latência.
+  falhas -> Probabilidade de uma requisição falhar com requests.ConnectionError
+  capacidade -> Número de requisições simultâneas que o servidor atende sem
+  ficar mais lento. None significa capacidade ilimitada.
+  agendador -> O agendador.AgendadorRequisicoes usado enquanto a API simulada
+  está instalada. O padrão é um criado por requisicoes.criar_agendador(taxa = None).
+  '''
+
+  PARTIDOS = [ "PT", "PMDB", "PSDB", "PFL", "PP", "PR", "PSB", "PDT", "PTB", "PCdoB", "PSOL", "PPS", "PV", "S.Part." ]
+
+  UFS = [ "SP", "RJ", "MG", "BA", "RS", "PR", "PE", "CE", "PA", "MA", "GO", "SC", "DF" ]
+
+  def __init__(self, latencia = 0.05, proposicoes_por_ano = 40, deputados = 513, semente = 0,
+               variacao = 0, falhas = 0, capacidade = None, agendador = None):
+    super().__init__(agendador)
+    self.proposicoes_por_ano = proposicoes_por_ano
+    self.deputados           = deputados
+    self.semente             = semente
+    self.rede                = reproducao.RedeSimulada(latencia, variacao, falhas, capacidade, semente)
+    self.originais           = { }
+    self._proposicoes        = { }
+
+  @property
+  def requisicoes(self):
+    return self.rede.requisicoes
+
+  @property
+  def falhas_simuladas(self):
+    return self.rede.falhas_simuladas
+
+  def substituir(self):
+    '''
+    Substitui as funções do camaraPy pelas da API simulada
+    '''
+    for metodo in reproducao.METODOS:
+      self.originais[metodo] = getattr(campy_proposicoes, metodo)
+      setattr(campy_proposicoes, metodo, getattr(self, metodo))
+
+  def restaurar(self):
+    '''
+    Restaura as funções originais do camaraPy
+    '''
+    for metodo, funcao in self.originais.items():
+      setattr(campy_proposicoes, metodo, funcao)
+    self.originais = { }
+
+  #####################
+  # GERAÇÃO DOS DADOS #
+  #####################
+
+  def _esperar(self):
+    '''
+    Imita o tempo de resposta do servidor e, eventualmente, uma falha de conexão
+    '''
+    if self.rede.esperar():
+      raise requests.ConnectionError("Falha de conexão simulada")
+
+  def _deputados(self, year):
+    '''
+    Gera os deputados da legislatura que inclui o ano passado como parâmetro.
+    Parte dos deputados se repete de uma legislatura para a outra.
+    '''
+    legislatura = (int(year) - 2003) // 4
+    rnd = random.Random(f"{self.semente}-legislatura-{legislatura}")
+
+    ids = rnd.sample(range(10000, 10000 + self.deputados * 2), self.deputados)
+
+    deputados = [ ]
+    for ide in ids:
+      rnd_deputado = random.Random(f"{self.semente}-deputado-{ide}")
+      deputados.append({
+        "@Nome"        : f"Deputado {ide} ",
+        "@ideCadastro" : f"{ide}",
+        "@Partido"     : rnd.choice(self.PARTIDOS),
+        "@UF"          : rnd_deputado.choice(self.UFS),
+        "governismo"   : rnd_deputado.random(),
+      })
+
+    return deputados
+
+  def _proposicao(self, id_proposicao):
+    '''
+    Gera (e memoriza) uma proposição com suas votações. Algumas delas
+    voltam ao plenário no ano seguinte ao da apresentação. Só as proposições
+    dos anos mais recentes ficam memorizadas, para que a memória ocupada pela
+    API simulada não cresça com o número de anos coletados; as demais são
+    geradas de novo, de forma idêntica, se forem pedidas outra vez.
+    '''
+    if id_proposicao in self._proposicoes:
+      return self._proposicoes[id_proposicao]
+
+    rnd  = random.Random(f"{self.semente}-proposicao-{id_proposicao}")
+    year = int(id_proposicao[:4])
+
+    votacoes = [ ]
+    for index in range(rnd.randint(1, 3)):
+
+      year_votacao = year + 1 if (index > 0 and rnd.random() < 0.2) else year
+      deputados = self._deputados(year_votacao)
+
+      # Há sempre pelo menos duas bancadas: em XML, uma lista com um único
+      # elemento seria lida como um dicionário solto
+      orientacao_pt = rnd.choice([ "Sim", "Não" ])
+      bancadas = [
+        { "@Sigla" : "PT",   "@orientacao" : orientacao_pt },
+        { "@Sigla" : "PSDB", "@orientacao" : "Não" if orientacao_pt == "Sim" else "Sim" },
+      ]
+      if rnd.random() < 0.9:
+        orientacao = rnd.choice([ "Sim", "Não" ])
+        bancadas.append({ "@Sigla" : "GOV.", "@orientacao" : orientacao })
+      else:
+        orientacao = "Sim"
+
+      votos = [ ]
+      for deputado in deputados:
+
+        sorteio = rnd.random()
+        if sorteio < 0.1:
+          voto = "-"
+        elif sorteio < 0.11:
+          voto = "Art. 17"
+        elif sorteio < 0.13:
+          voto = "Obstrução"
+        elif rnd.random() < deputado["governismo"]:
+          voto = orientacao
+        else:
+          voto = "Não" if orientacao == "Sim" else "Sim"
+
+        votos.append({ key : value for key, value in deputado.items() if key != "governismo" })
+        votos[-1]["@Voto"] = voto
+
+      votacoes.append({
+        "@Resumo"           : f"Votação {index + 1} da proposição {id_proposicao}",
+        "@Data"             : f"{rnd.randint(1, 28)}/{rnd.randint(2, 12)}/{year_votacao}",
+        "@Hora"             : f"{rnd.randint(10, 23)}:{rnd.randint(10, 59)}",
+        "@ObjVotacao"       : "MÉRITO",
+        "@codSessao"        : f"{id_proposicao}{index}",
+        "orientacaoBancada" : { "bancada" : bancadas },
+        "votos"             : { "Deputado" : votos },
+      })
+
+    proposicao = {
+      "id"        : id_proposicao,
+      "tipo"      : "PL",
+      "numero"    : id_proposicao[4:],
+      "ano"       : f"{year}",
+      "acessoria" : rnd.random() < 0.05,
+      "votacoes"  : votacoes,
+    }
+
+    for antiga in [ key for key in self._proposicoes if int(key[:4]) < year - 2 ]:
+      del self._proposicoes[antiga]
+
+    self._proposicoes[id_proposicao] = proposicao
+    return proposicao
+
+  def _ids_do_ano(self, year):
+    return [ f"{year}{numero:04d}" for numero in range(1, self.proposicoes_por_ano + 1) ]
+
+  #######################
+  # MÉTODOS DO camaraPy #
+  #######################
+
+  def ListarProposicoesVotadasEmPlenario(self, parameters = { }):
+    self._esperar()
+
+    year = int(parameters["Ano"])
+
+    data = [ ]
+    for id_proposicao in self._ids_do_ano(year - 1) + self._ids_do_ano(year):
+      for votacao in self._proposicao(id_proposicao)["votacoes"]:
+        if votacao["@Data"][-4:] == str(year):
+          data.append({ "codProposicao" : id_proposicao, "dataVotacao" : votacao["@Data"] })
+
+    if len(data) == 0:
+      raise custom_exceptions.SemDados(custom_exceptions.SemDados.err_message)
+
+    return { "proposicoes" : { "proposicao" : data } }
+
+  def ObterProposicaoPorID(self, parameters = { }):
+    self._esperar()
+
+    proposicao = self._proposicao(parameters["IdProp"])
+
+    return { "proposicao" : { "@tipo" : f"{proposicao['tipo']} ", "@numero" : proposicao["numero"], "@ano" : proposicao["ano"] } }
+
+  def ObterVotacaoProposicao(self, parameters = { }):
+    self._esperar()
+
+    proposicao = self._proposicao(f"{parameters['Ano']}{parameters['Numero']}")
+
+    if proposicao["acessoria"]:
+      raise custom_exceptions.ProposicaoAcessoria(custom_exceptions.ProposicaoAcessoria.err_message)
+
+    votacoes = [ dict(votacao) for votacao in proposicao["votacoes"] ]
+    if len(votacoes) == 1:
+      votacoes = votacoes[0]
+
+    return {
+      "proposicao" : {
+        "Sigla"    : proposicao["tipo"],
+        "Numero"   : proposicao["numero"],
+        "Ano"      : proposicao["ano"],
+        "Votacoes" : { "Votacao" : votacoes }
+      }
+    }
+
+######################
+# FUNÇÕES AUXILIARES #
+######################
+
+def cronometrar(funcao, *args, **kwargs):
+  '''
+  Executa a função e retorna o par (resultado, segundos decorridos)
+  '''
+  inicio = time.perf_counter()
+  resultado = funcao(*args, **kwargs)
+  return resultado, time.perf_counter() - inicio
+
+def imprimir_tabela(titulo, linhas):
+  '''
+  Imprime no console uma lista de pares (descrição, segundos)
+  '''
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  referencia = linhas[0][1]
+  for descricao, segundos in linhas:
+    print(f"{descricao.ljust(50)} {segundos:8.2f}s {referencia / segundos:6.1f}x")
+
+class VotoComDicionario(object):
+  '''
+  Réplica do antigo core.Voto, com um objeto por deputado e os dados da
+  votação repetidos em cada um, usada como referência por benchmark_votos
+  '''
+
+  def __init__(self, dictionary):
+    self.parlamentar       = dictionary['@Nome'].strip()
+    self.ideCadastro       = dictionary['@ideCadastro'].strip()
+    self.UF                = dictionary['@UF'].strip()
+    self.voto              = dictionary['@Voto'].strip()
+    self.partido           = core.padronizar_partido(dictionary['@Partido'].strip())
+    self.descricaoPartido  = core.pegar_descricao_partido(f"{self.partido}")
+    self.orientacaoGoverno = 'NOT_INITIATED'
+    self.data              = 'NOT_INITIATED'
+    self.hora              = 'NOT_INITIATED'
+    self.governo           = 'NOT_INITIATED'
+    self.idVotacao         = 'NOT_INITIATED'
+    self.tipoProposicao    = 'NOT_INITIATED'
+    self.numeroProposicao  = 'NOT_INITIATED'
+    self.anoProposicao     = 'NOT_INITIATED'
+
+##############
+# BENCHMARKS #
+##############
+
+def benchmark_coleta(start_year = 2015, end_year = 2018, latencia = 0.05, max_workers = 8, processos = 4):
+  '''
+  Compara o tempo de coleta dos votos usando a API simulada em quatro modos:
+  coleta sequencial, coleta com pool de threads, pipeline assíncrono e coleta
+  dividida por ano entre vários processos. Também confere se todos os modos
+  produzem o mesmo DataFrame.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta
+  latencia -> A latência simulada de cada requisição, em segundos
+  max_workers -> Número de requisições simultâneas nos modos concorrentes
+  processos -> Número de processos no modo dividido por ano
+  '''
+
+  from basometro import basometro_coleta
+
+  def coletar_particionado(start_year, end_year, max_workers):
+    diretorio = tempfile.mkdtemp()
+    try:
+      return basometro_coleta.coletar_votos_particionado(start_year, end_year, diretorio,
+                                                         max_workers = max_workers,
+                                                         processos = processos)
+    finally:
+      shutil.rmtree(diretorio)
+
+  # As requisições feitas pelos processos filhos não são
+  # contabilizadas pela API simulada do processo principal
+  modos = [
+    ( "sequencial",                                     basometro_coleta.coletar_votos,          1,           True ),
+    ( f"threads ({max_workers})",                       basometro_coleta.coletar_votos,          max_workers, True ),
+    ( f"pipeline assíncrono ({max_workers})",           basometro_coleta.coletar_votos_pipeline, max_workers, True ),
+    ( f"processos ({processos}) x threads ({max_workers})", coletar_particionado,                max_workers, False ),
+  ]
+
+  linhas = [ ]
+  resultados = [ ]
+
+  for descricao, coletor, workers, contar_requisicoes in modos:
+
+    with ApiSimulada(latencia = latencia) as api:
+      df, segundos = cronometrar(coletor, start_year, end_year, max_workers = workers)
+
+    if contar_requisicoes:
+      descricao = f"{descricao}, {api.requisicoes} requisições"
+
+    resultados.append(df.reset_index(drop = True))
+    linhas.append( (descricao, segundos) )
+
+  assert all( df.equals(resultados[0]) for df in resultados )
+
+  imprimir_tabela(f"Coleta {start_year}-{end_year}, latência de {latencia}s", linhas)
+
+  return linhas
+
+def benchmark_instalacao(start_year = 2015, end_year = 2018, latencia = 0.02, max_workers = 8):
+  '''
+  Mede o tempo total de instalar_basometro() – da coleta à geração dos
+  arquivos da visualização – usando a API simulada, em três modos: coleta
+  sequencial, coleta com pool de threads e pipeline assíncrono. A instalação
+  é feita em um diretório temporário.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta
+  latencia -> A latência simulada de cada requisição, em segundos
+  max_workers -> Número de requisições simultâneas nos modos concorrentes
+  '''
+
+  from basometro import instalador
+
+  modos = [
+    ( "sequencial",                      { "max_workers" : 1 } ),
+    ( f"threads ({max_workers})",        { "max_workers" : max_workers } ),
+    ( f"pipeline assíncrono ({max_workers})", { "max_workers" : max_workers, "pipeline" : True } ),
+  ]
+
+  diretorio_original = os.getcwd()
+  linhas = [ ]
+
+  for descricao, kwargs in modos:
+
+    diretorio = tempfile.mkdtemp()
+    os.makedirs(f"{diretorio}/database")
+
+    try:
+      os.chdir(diretorio)
+      with ApiSimulada(latencia = latencia) as api:
+        _, segundos = cronometrar(instalador.instalar_basometro, start_year = start_year, end_year = end_year, **kwargs)
+
+    finally:
+      os.chdir(diretorio_original)
+      shutil.rmtree(diretorio)
+
+    linhas.append( (f"{descricao}, {api.requisicoes} requisições", segundos) )
+
+  imprimir_tabela(f"Instalação {start_year}-{end_year}, latência de {latencia}s", linhas)
+
+  return linhas
+
+def benchmark_agendador(start_year = 2015, end_year = 2016, latencia = 0.05, max_workers = 16):
+  '''
+  Testa o agendador de requisições contra a API simulada em dois cenários.
+  No primeiro, 5% das requisições falham: sem o agendador a coleta é
+  interrompida; com ele, as requisições são repetidas e o resultado tem
+  que ser idêntico ao de uma API sem falhas. No segundo, o servidor só
+  atende bem 4 requisições simultâneas: a concorrência fixa em max_workers
+  é comparada com a concorrência adaptativa.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta
+  latencia -> A latência simulada de cada requisição, em segundos
+  max_workers -> Número de threads usadas pelo coletor
+  '''
+
+  from basometro import basometro_coleta
+
+  def coletar(api):
+    with api:
+      return cronometrar(basometro_coleta.coletar_votos, start_year, end_year, max_workers = max_workers)
+
+  referencia, _ = coletar(ApiSimulada(latencia = latencia, variacao = 0.5))
+
+  ###########################
+  ### API COM FALHAS (5%) ###
+  ###########################
+
+  linhas = [ ]
+
+  api = ApiSimulada(latencia = latencia, variacao = 0.5, falhas = 0.05)
+  try:
+    with api:
+      requisicoes.configurar_agendador(None)
+      cronometrar(basometro_coleta.coletar_votos, start_year, end_year, max_workers = max_workers)
+    print("A coleta sem agendador terminou apesar das falhas.")
+
+  except requests.ConnectionError:
+    print("\nSem agendador, a coleta foi interrompida pela primeira falha simulada.")
+
+  api = ApiSimulada(latencia = latencia, variacao = 0.5, falhas = 0.05,
+                    agendador = requisicoes.criar_agendador(taxa = None, espera_base = 0.05))
+  df, segundos = coletar(api)
+
+  assert df.equals(referencia)
+  linhas.append( (f"com agendador, {api.falhas_simuladas} falhas simuladas", segundos) )
+
+  imprimir_tabela(f"Coleta {start_year}-{end_year} com 5% de falhas", linhas)
+
+  ################################
+  ### SERVIDOR SOBRECARREGADO ###
+  ################################
+
+  linhas = [ ]
+
+  fixo = requisicoes.criar_agendador(taxa = None, concorrencia_inicial = max_workers,
+                                     concorrencia_minima = max_workers, concorrencia_maxima = max_workers)
+  adaptativo = requisicoes.criar_agendador(taxa = None)
+
+  for descricao, agendador in [ (f"concorrência fixa ({max_workers})", fixo), ("concorrência adaptativa", adaptativo) ]:
+
+    api = ApiSimulada(latencia = latencia, variacao = 0.5, capacidade = 4, agendador = agendador)
+    df, segundos = coletar(api)
+
+    assert df.equals(referencia)
+    linhas.append( (f"{descricao}, {api.requisicoes} requisições, limite final {agendador.limite}", segundos) )
+
+  imprimir_tabela(f"Coleta {start_year}-{end_year} em um servidor com capacidade para 4 requisições simultâneas", linhas)
+
+def benchmark_reproducao(start_year = 2015, end_year = 2016, latencia = 0.02, max_workers = 8):
+  '''
+  Grava as respostas da API simulada durante uma coleta e uma atualização
+  do banco de dados e as reproduz de três formas: pelo transporte em memória,
+  pelo servidor HTTP local (em que o camaraPy faz as requisições e interpreta
+  o XML de verdade) e pelo servidor HTTP local com 5% de falhas. Cada
+  reprodução tem que chegar exatamente ao mesmo resultado da gravação.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta. A atualização vai do fim desse ano até hoje.
+  latencia -> A latência simulada de cada requisição, em segundos
+  max_workers -> Número de requisições simultâneas
+  '''
+
+  from basometro import basometro_aplicativo, basometro_coleta
+  from basometro.core import armazenamento
+
+  def coletar():
+    return basometro_coleta.coletar_votos(start_year, end_year, max_workers = max_workers)
+
+  def atualizar(caminho):
+    shutil.copyfile(base, caminho)
+    basometro_aplicativo.atualizar_banco_de_dados(caminho, max_workers = max_workers)
+
+  diretorio  = tempfile.mkdtemp()
+  base       = os.path.join(diretorio, "base.csv")
+  referencia = os.path.join(diretorio, "referencia.csv")
+  arquivo    = os.path.join(diretorio, "gravacao.jsonl.gz")
+
+  try:
+
+    ################
+    ### GRAVAÇÃO ###
+    ################
+
+    with ApiSimulada(latencia = 0), reproducao.GravadorApi() as gravador:
+      df = coletar()
+
+      banco = armazenamento.GravadorVotos(base)
+      basometro_coleta.gravar_votos(start_year, end_year, banco, max_workers = max_workers)
+      banco.concluir()
+
+      atualizar(referencia)
+
+    gravador.gravacao.salvar(arquivo)
+    gravacao = reproducao.Gravacao.carregar(arquivo)
+
+    ##################
+    ### REPRODUÇÃO ###
+    ##################
+
+    modos = [
+      ( "transporte em memória", reproducao.ApiReproduzida, { } ),
+      ( "servidor HTTP local",   reproducao.ServidorLocal,  { } ),
+      ( "servidor HTTP local, leitura direta do XML", reproducao.ServidorLocal, { "leitura_xml" : True } ),
+      ( "servidor HTTP local, 5% de falhas", reproducao.ServidorLocal,
+        { "falhas" : 0.05, "agendador" : requisicoes.criar_agendador(taxa = None, espera_base = 0.05) } ),
+    ]
+
+    linhas = [ ]
+
+    for descricao, classe, kwargs in modos:
+
+      agendador   = kwargs.pop("agendador", None)
+      leitura_xml = requisicoes.configurar_leitura_xml( kwargs.pop("leitura_xml", False) )
+      rede        = reproducao.RedeSimulada(latencia, variacao = 0.5, **kwargs)
+
+      try:
+        with classe(gravacao, rede = rede, agendador = agendador):
+          df_reproduzido, segundos_coleta = cronometrar(coletar)
+          _, segundos_atualizacao = cronometrar(atualizar, os.path.join(diretorio, "atualizado.csv"))
+
+      finally:
+        requisicoes.configurar_leitura_xml(leitura_xml)
+
+      assert df_reproduzido.equals(df)
+      assert filecmp.cmp(referencia, os.path.join(diretorio, "atualizado.csv"), shallow = False)
+
+      descricao = f"{descricao}, {rede.requisicoes} requisições"
+      if rede.falhas_simuladas:
+        descricao += f", {rede.falhas_simuladas} falhas"
+
+      linhas.append( (descricao, segundos_coleta + segundos_atualizacao) )
+
+  finally:
+    shutil.rmtree(diretorio)
+
+  imprimir_tabela(f"Reprodução de {len(gravacao)} respostas gravadas: coleta {start_year}-{end_year} "
+                  f"e atualização, latência de {latencia}s", linhas)
+
+  return linhas
+
+def benchmark_votos(votos = 1000000, deputados = 513):
+  '''
+  Micro-benchmark da montagem dos votos, sem nenhuma requisição: compara
+  um objeto por deputado (como o antigo core.Voto) com as colunas de um
+  core.LoteVotos. Mede o tempo de CPU para receber as votações e montar o
+  DataFrame, a memória ocupada pelos votos antes do DataFrame, medida com
+  tracemalloc em uma passada separada, e a memória do próprio DataFrame, em
+  que o lote guarda partido e descricaoPartido como categorias.
+
+  Parâmetros:
+  votos -> Número aproximado de votos montados
+  deputados -> Número de deputados em cada votação
+  '''
+
+  import pandas as pd
+
+  # Votações sintéticas, com nomes e partidos como os da API
+  api = ApiSimulada(latencia = 0, deputados = deputados)
+  modelos = [ ]
+  for id_proposicao in api._ids_do_ano(2015)[:10]:
+    for votacao in api._proposicao(id_proposicao)["votacoes"]:
+      votacao = dict(votacao, dadosProposicao = { "tipoProposicao" : "PL", "numeroProposicao" : id_proposicao[4:], "anoProposicao" : "2015" })
+      dados = core.Votacao(votacao)
+      modelos.append( ( [ getattr(dados, coluna) for coluna in core.COLUNAS_DADOS_VOTACAO ], votacao["votos"]["Deputado"] ) )
+
+  # Cada votação recebe um id próprio, como aconteceria em uma coleta de verdade
+  n_votacoes = votos // deputados
+  votacoes   = [ ]
+  for index in range(n_votacoes):
+    dados, lista = modelos[index % len(modelos)]
+    dados = list(dados)
+    dados[core.COLUNAS_DADOS_VOTACAO.index('idVotacao')] += f".{index}"
+    votacoes.append( (dados, lista) )
+
+  def montar_objetos():
+    votos_arr = [ ]
+    for dados, lista in votacoes:
+      for item in lista:
+        voto = VotoComDicionario(item)
+        for coluna, valor in zip(core.COLUNAS_DADOS_VOTACAO, dados):
+          setattr(voto, coluna, valor)
+        votos_arr.append(voto)
+    return votos_arr
+
+  def montar_lote():
+    lote = core.LoteVotos()
+    for dados, lista in votacoes:
+      lote.adicionar_votacao(dados, lista)
+    return lote
+
+  def dataframe_objetos(votos_arr):
+    return pd.DataFrame( [ item.__dict__ for item in votos_arr ] )
+
+  def dataframe_lote(lote):
+    return lote.para_dataframe()
+
+  linhas     = [ ]
+  resultados = [ ]
+
+  for descricao, montar, converter in [ ("um objeto por voto", montar_objetos, dataframe_objetos),
+                                        ("LoteVotos (colunas)", montar_lote, dataframe_lote) ]:
+
+    # Memória: só os votos montados, sem o DataFrame
+    gc.collect()
+    tracemalloc.start()
+    container = montar()
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    gc.collect()
+
+    # Tempo de CPU: montagem e DataFrame
+    inicio = time.process_time()
+    df = converter(montar())
+    segundos = time.process_time() - inicio
+
+    resultados.append(df)
+    linhas.append( (descricao, segundos, memoria / 1024 ** 2, df.memory_usage(deep = True).sum() / 1024 ** 2) )
+    del df
+    gc.collect()
+
+  # O lote entrega os partidos como categorias; os valores são os mesmos
+  assert resultados[0].equals( resultados[1].astype({ coluna : object for coluna in core.COLUNAS_PARTIDO }) )
+
+  titulo = f"Montagem de {n_votacoes * deputados} votos ({n_votacoes} votações de {deputados} deputados)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  referencia = linhas[0][1]
+  for descricao, segundos, memoria, memoria_df in linhas:
+    print(f"{descricao.ljust(40)} {segundos:8.2f}s de CPU {referencia / segundos:6.1f}x "
+          f"{memoria:10.1f} MB {memoria_df:10.1f} MB no DataFrame")
+
+  return linhas
+
+def benchmark_xml(caminho_gravacao = None, maiores = 20, start_year = 2015, end_year = 2018, repeticoes = 5):
+  '''
+  Compara as duas formas de ler as respostas de ObterVotacaoProposicao com
+  mais votos: o camaraPy, que converte o XML em dicionários (xmltodict) para
+  depois montar o core.LoteVotos, e a leitura direta do core.leitor_xml. Mede o
+  tempo de CPU para ler todas as respostas e o pico de memória, com tracemalloc,
+  ao ler a maior delas. O tempo é o menor entre várias repetições. Também
+  confere se os dois caminhos montam os mesmos votos.
+
+  Parâmetros:
+  caminho_gravacao -> Uma gravação salva por reproducao.Gravacao, por exemplo da
+  API real. Sem ela, as respostas são geradas pela API simulada.
+  maiores -> Quantas respostas, das com mais votos, são lidas
+  start_year -> Sem gravação, o ano de início das respostas geradas
+  end_year -> Sem gravação, o ano de término das respostas geradas
+  repeticoes -> Quantas vezes as respostas são lidas para medir o tempo
+  '''
+
+  import json
+  import xmltodict
+  from basometro.core import leitor_xml
+
+  # Respostas como a API as envia, em XML
+  if caminho_gravacao is not None:
+    gravacao = reproducao.Gravacao.carregar(caminho_gravacao)
+    payloads = [ json.loads(resposta["payload"]) for chave, resposta in gravacao.respostas.items()
+                 if json.loads(chave)[0] == "ObterVotacaoProposicao" and "payload" in resposta ]
+    origem = f"gravação {os.path.basename(caminho_gravacao)}"
+
+  else:
+    api = ApiSimulada(latencia = 0)
+    payloads = [ ]
+    for year in range(start_year, end_year + 1):
+      for id_proposicao in api._ids_do_ano(year):
+        if not api._proposicao(id_proposicao)["acessoria"]:
+          payloads.append( api.ObterVotacaoProposicao({ "Ano" : id_proposicao[:4], "Numero" : id_proposicao[4:] }) )
+    origem = "API simulada"
+
+  def contar(payload):
+    votacoes = payload["proposicao"]["Votacoes"]["Votacao"]
+    votacoes = [ votacoes ] if isinstance(votacoes, dict) else votacoes
+    return sum( len(votacao["votos"]["Deputado"]) for votacao in votacoes )
+
+  payloads = sorted(payloads, key = contar, reverse = True)[:maiores]
+  xmls     = [ xmltodict.unparse(payload) for payload in payloads ]
+  votos    = sum( contar(payload) for payload in payloads )
+  del payloads
+
+  def montar(payload):
+    # Como em basometro_coleta.extrair_votos_votacoes
+    proposicao = payload["proposicao"]
+    dados_proposicao = {
+      "tipoProposicao"   : proposicao["Sigla"].strip(),
+      "numeroProposicao" : proposicao["Numero"].strip(),
+      "anoProposicao"    : proposicao["Ano"].strip()
+    }
+
+    votacoes = proposicao["Votacoes"]["Votacao"]
+    votacoes = [ votacoes ] if isinstance(votacoes, dict) else votacoes
+
+    lote = core.LoteVotos()
+    for votacao in votacoes:
+      votacao["dadosProposicao"] = dados_proposicao
+      lote.estender(core.Votacao(votacao).votos)
+
+    return lote
+
+  linhas     = [ ]
+  resultados = [ ]
+
+  for descricao, ler in [ ("camaraPy (xmltodict)", xmltodict.parse),
+                          ("leitura direta do XML", leitor_xml.ler_votacao_proposicao) ]:
+
+    # Memória: pico durante a leitura da maior resposta
+    gc.collect()
+    tracemalloc.start()
+    montar(ler(xmls[0]))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Tempo de CPU: todas as respostas
+    tempos = [ ]
+    for _ in range(repeticoes):
+      gc.collect()
+      inicio = time.process_time()
+      lotes = [ montar(ler(xml)) for xml in xmls ]
+      tempos.append(time.process_time() - inicio)
+    segundos = min(tempos)
+
+    resultados.append( [ list(lote.linhas()) for lote in lotes ] )
+    linhas.append( (descricao, segundos, pico / 1024 ** 2) )
+    del lotes
+
+  assert resultados[0] == resultados[1]
+
+  titulo = f"Leitura das {len(xmls)} respostas de ObterVotacaoProposicao com mais votos ({votos} votos, {origem})"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  referencia = linhas[0][1]
+  for descricao, segundos, pico in linhas:
+    print(f"{descricao.ljust(40)} {segundos:8.2f}s de CPU {referencia / segundos:6.1f}x {pico:10.1f} MB de pico na maior resposta")
+
+  return linhas
+
+def benchmark_banco(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, repeticoes = 3):
+  '''
+  Compara o banco de dados em um único CSV com o banco colunar
+  (armazenamento.BancoColunar) e o SQLite (armazenamento.BancoSQLite): o
+  tamanho em disco e o tempo para ler todos os votos, apenas as colunas do
+  índice de votações, apenas os votos de um governo e apenas os de um
+  deputado. O tempo é o menor entre várias repetições. Também confere se os
+  formatos devolvem os mesmos votos e se as exportações são idênticas ao CSV.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  repeticoes -> Quantas vezes cada leitura é feita para medir o tempo
+  '''
+
+  from basometro import basometro_coleta
+  from basometro.core import armazenamento
+
+  def tamanho(caminho):
+    if os.path.isfile(caminho):
+      return os.path.getsize(caminho)
+
+    return sum( os.path.getsize(os.path.join(raiz, nome)) for raiz, _, nomes in os.walk(caminho) for nome in nomes )
+
+  def medir(ler):
+    tempos = [ ]
+    for _ in range(repeticoes):
+      gc.collect()
+      inicio = time.perf_counter()
+      df = ler()
+      tempos.append(time.perf_counter() - inicio)
+
+    return min(tempos), df
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro.csv")
+  exportado = os.path.join(diretorio, "exportado.csv")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.GravadorVotos(caminho)
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    bancos = [
+      ( "CSV",     armazenamento.BancoCSV(caminho) ),
+      ( "colunar", armazenamento.BancoColunar(os.path.join(diretorio, "basometro")) ),
+      ( "SQLite",  armazenamento.BancoSQLite(os.path.join(diretorio, "basometro.sqlite")) ),
+    ]
+    banco_csv = bancos[0][1]
+
+    for _, banco in bancos[1:]:
+      banco.importar(banco_csv)
+      banco.exportar_csv(exportado)
+      assert filecmp.cmp(caminho, exportado, shallow = False)
+
+    tamanhos = [ (formato, tamanho(banco.caminho)) for formato, banco in bancos ]
+
+    # O último governo do intervalo e um deputado qualquer
+    governo  = banco_csv.ler(colunas = [ 'governo' ]).governo.iloc[-1]
+    deputado = banco_csv.ler(colunas = [ 'ideCadastro' ]).ideCadastro.iloc[0]
+    colunas  = armazenamento.COLUNAS_VOTACAO + [ 'data' ]
+
+    leituras = [
+      ( "todos os votos",       { } ),
+      ( "colunas do índice",    { "colunas" : colunas } ),
+      ( f"governo {governo}",   { "governos" : [ governo ] } ),
+      ( f"deputado {deputado}", { "deputados" : [ deputado ] } ),
+    ]
+
+    linhas = [ ]
+
+    for descricao, filtros in leituras:
+      resultados = [ ]
+
+      for formato, banco in bancos:
+        segundos, df = medir(lambda: banco.ler(**filtros))
+        resultados.append(df)
+        linhas.append( (f"{descricao}, {formato}", segundos) )
+
+      assert all( resultado.equals(resultados[0]) for resultado in resultados[1:] )
+
+    votos = banco_csv.ler(colunas = [ 'idVotacao' ]).shape[0]
+
+  finally:
+    shutil.rmtree(diretorio)
+
+  titulo = f"Leitura do banco de dados de {start_year} a {end_year} ({votos} votos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  # Cada leitura é comparada à do CSV
+  for index, (descricao, segundos) in enumerate(linhas):
+    referencia = linhas[index - index % len(bancos)][1]
+    print(f"{descricao.ljust(40)} {segundos:8.3f}s {referencia / segundos:6.1f}x")
+
+  for formato, bytes_disco in tamanhos:
+    print(f"{f'Tamanho em disco, {formato}'.ljust(40)} {bytes_disco / 1024 ** 2:8.1f} MB")
+
+  return linhas
+
+def benchmark_esquema(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, repeticoes = 5):
+  '''
+  Compara os votos lidos como texto com os lidos com os tipos de
+  esquema.ESQUEMA (armazenamento.BancoVotos.ler, com tipado = True), no
+  banco colunar e no CSV: o tempo de leitura, o pico de memória da leitura,
+  medido com tracemalloc em uma passada separada, a memória ocupada pelo
+  DataFrame e o tempo da comparação entre voto e orientacaoGoverno, feita em
+  todos os cálculos de governismo. Também confere se os valores são os mesmos.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  repeticoes -> Quantas vezes cada operação é feita para medir o tempo
+  '''
+
+  from basometro import basometro_coleta
+  from basometro.core import armazenamento, esquema
+
+  def medir(funcao):
+    tempos = [ ]
+    for _ in range(repeticoes):
+      gc.collect()
+      inicio = time.perf_counter()
+      resultado = funcao()
+      tempos.append(time.perf_counter() - inicio)
+
+    return min(tempos), resultado
+
+  def pico(funcao):
+    gc.collect()
+    tracemalloc.start()
+    funcao()
+    _, maximo = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return maximo
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro.csv")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.GravadorVotos(caminho)
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    banco_csv     = armazenamento.BancoCSV(caminho)
+    banco_colunar = armazenamento.BancoColunar(os.path.join(diretorio, "basometro"))
+    banco_colunar.importar(banco_csv)
+
+    linhas     = [ ]
+    resultados = [ ]
+
+    for descricao, banco, tipado in [ ("CSV, texto",     banco_csv,     False),
+                                      ("CSV, tipado",    banco_csv,     True),
+                                      ("colunar, texto", banco_colunar, False),
+                                      ("colunar, tipado", banco_colunar, True) ]:
+
+      leitura, df = medir(lambda: banco.ler(tipado = tipado))
+      mascara, _  = medir(lambda: df.voto == df.orientacaoGoverno)
+
+      resultados.append( (df, tipado) )
+      linhas.append( (descricao, leitura, pico(lambda: banco.ler(tipado = tipado)), esquema.memoria(df).loc["total", "bytes"], mascara) )
+
+    # Os valores são os mesmos; só muda a representação
+    texto = resultados[0][0]
+    for df, tipado in resultados[1:]:
+      assert df.equals( esquema.aplicar(texto) if tipado else texto )
+
+  finally:
+    shutil.rmtree(diretorio)
+
+  titulo = f"Votos com e sem esquema, de {start_year} a {end_year} ({texto.shape[0]} votos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  for descricao, leitura, pico_leitura, memoria, mascara in linhas:
+    print(f"{descricao.ljust(20)} leitura {leitura:7.3f}s, pico {pico_leitura / 1024 ** 2:7.1f} MB, "
+          f"DataFrame {memoria / 1024 ** 2:7.1f} MB, voto == orientacaoGoverno {mascara * 1000:7.2f} ms")
+
+  print()
+  print(esquema.memoria(resultados[-1][0]).to_string())
+
+  return linhas
+
+def benchmark_matriz(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, amostra = 50):
+  '''
+  Compara os cálculos de governismo feitos a partir do DataFrame de votos,
+  como em gerar_arquivos_viz antes da matriz de votos, com os feitos a partir
+  da matriz (matriz.MatrizVotos): para uma amostra de deputados, para todos
+  os partidos e para todos os governos. Mede também o tempo para construir e
+  para abrir a matriz e confere se os arquivos gerados seriam idênticos.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  amostra -> Quantos deputados são calculados
+  '''
+
+  from basometro import basometro_coleta, basometro_deputados, basometro_governos, basometro_partidos
+  from basometro.core import armazenamento, matriz
+
+  def deputados_dataframe(df, ids):
+    arquivos = [ ]
+    for ideCadastro in ids:
+      temp = df [ df.ideCadastro == ideCadastro ]
+      for governo in temp.governo.unique():
+        arquivos.append( basometro_deputados.calcular_governismo(df = temp, ideCadastro = ideCadastro, governo = governo, freq = "MS") )
+
+    return arquivos
+
+  def deputados_matriz(matriz_votos, ids):
+    arquivos = [ ]
+    for ideCadastro in ids:
+      for governo in matriz_votos.governos(ideCadastro = ideCadastro):
+        arquivos.append( basometro_deputados.calcular_governismo(df = matriz_votos, ideCadastro = ideCadastro, governo = governo, freq = "MS") )
+
+    return arquivos
+
+  def partidos_dataframe(df):
+    arquivos = [ ]
+    for partido in list( df.partido.unique() ) + [ "todos" ]:
+      temp = df.copy() if partido == "todos" else df [ df.partido == partido ]
+      for governo in temp.governo.unique():
+        arquivos.append( basometro_partidos.calcular_governismo(df = temp, partido = partido, governo = governo) )
+
+    return arquivos
+
+  def partidos_matriz(matriz_votos):
+    arquivos = [ ]
+    for partido in matriz_votos.partidos() + [ "todos" ]:
+      governos = matriz_votos.governos() if partido == "todos" else matriz_votos.governos(partido = partido)
+      for governo in governos:
+        arquivos.append( basometro_partidos.calcular_governismo(df = matriz_votos, partido = partido, governo = governo) )
+
+    return arquivos
+
+  def governos_dataframe(df):
+    arquivos = [ ]
+    for governo in df.governo.unique():
+      temp = df [ df.governo == governo ]
+      arquivos.extend( basometro_governos.calcular_governismo_governo(df = temp, governo = governo).values() )
+
+    return arquivos
+
+  def governos_matriz(matriz_votos):
+    arquivos = [ ]
+    for governo in matriz_votos.governos():
+      arquivos.extend( basometro_governos.calcular_governismo_governo(df = matriz_votos, governo = governo).values() )
+
+    return arquivos
+
+  def medir(funcao, *args):
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.BancoColunar(caminho).gravador()
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    banco = armazenamento.abrir_banco(caminho)
+    df    = banco.ler(tipado = True)
+
+    construcao, _          = medir(matriz.MatrizVotos(caminho).reconstruir)
+    abertura, matriz_votos = medir(matriz.MatrizVotos.abrir, caminho)
+
+    ids = [ ideCadastro for ideCadastro in df.ideCadastro.unique()[ : amostra ] ]
+
+    etapas = [
+      ( f"deputados ({len(ids)})", (deputados_dataframe, df, ids), (deputados_matriz, matriz_votos, ids) ),
+      ( "partidos",                (partidos_dataframe, df),       (partidos_matriz, matriz_votos) ),
+      ( "governos",                (governos_dataframe, df),       (governos_matriz, matriz_votos) ),
+    ]
+
+    linhas = [ ]
+
+    for descricao, pelo_dataframe, pela_matriz in etapas:
+      segundos_dataframe, arquivos_dataframe = medir(*pelo_dataframe)
+      segundos_matriz, arquivos_matriz       = medir(*pela_matriz)
+
+      # Os arquivos são os mesmos, na mesma ordem
+      assert [ arquivo.to_csv(index = False) for arquivo in arquivos_dataframe ] == [ arquivo.to_csv(index = False) for arquivo in arquivos_matriz ]
+
+      linhas.append( (descricao, segundos_dataframe, segundos_matriz) )
+
+  finally:
+    shutil.rmtree(diretorio, ignore_errors = True)
+    shutil.rmtree(f"{caminho}.matriz", ignore_errors = True)
+
+  titulo = f"Governismo pelo DataFrame e pela matriz de votos, de {start_year} a {end_year} ({df.shape[0]} votos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+  print(f"{'Construção da matriz'.ljust(20)} {construcao:8.3f}s")
+  print(f"{'Abertura da matriz'.ljust(20)} {abertura:8.3f}s")
+
+  for descricao, segundos_dataframe, segundos_matriz in linhas:
+    print(f"{descricao.ljust(20)} DataFrame {segundos_dataframe:8.3f}s, matriz {segundos_matriz:8.3f}s, {segundos_dataframe / segundos_matriz:6.1f}x")
+
+  return linhas
+
+def benchmark_deputados(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, freqs = ("MS", "3MS")):
+  '''
+  Compara as três formas de calcular as séries de todos os deputados,
+  como em gerar_arquivos_deputados: filtrando o DataFrame de votos para cada
+  deputado, com uma chamada de basometro_deputados.calcular_governismo por
+  governo; com as mesmas chamadas sobre a matriz de votos; e de uma só vez,
+  com basometro_deputados.calcular_governismo_deputados. Confere se os CSVs
+  dos arquivos de cada deputado são idênticos, byte a byte.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  freqs -> Os intervalos de tempo calculados
+  '''
+
+  from basometro import basometro_coleta, basometro_deputados
+  from basometro.core import armazenamento, matriz
+  import pandas as pd
+
+  def por_deputado(df, matriz_votos, freq):
+    arquivos = { }
+    for ideCadastro in matriz_votos.deputados():
+      temp     = df [ df.ideCadastro == ideCadastro ] if df is not None else matriz_votos
+      governos = temp.governo.unique() if df is not None else matriz_votos.governos(ideCadastro = ideCadastro)
+
+      csv_files = [ ]
+      for governo in governos:
+        try:
+          csv_files.append( basometro_deputados.calcular_governismo(df = temp, ideCadastro = ideCadastro, governo = governo, freq = freq) )
+        except basometro_deputados.NoVotes:
+          continue
+
+      if len(csv_files) > 0:
+        arquivos[f"{ideCadastro}-{freq}"] = pd.concat(csv_files).to_csv(index = False)
+
+    return arquivos
+
+  def em_lote(matriz_votos, freq):
+    series = basometro_deputados.calcular_governismo_deputados(matriz_votos, freq = freq)
+    return { f"{ideCadastro}-{freq}" : arquivo.to_csv(index = False) for ideCadastro, arquivo in series }
+
+  def medir(funcao, *args):
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.BancoColunar(caminho).gravador()
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    df           = armazenamento.abrir_banco(caminho).ler(tipado = True)
+    matriz_votos = matriz.MatrizVotos.abrir(caminho)
+
+    linhas = [ ]
+
+    for freq in freqs:
+      segundos_dataframe, arquivos_dataframe = medir(por_deputado, df, matriz_votos, freq)
+      segundos_matriz, arquivos_matriz       = medir(por_deputado, None, matriz_votos, freq)
+      segundos_lote, arquivos_lote           = medir(em_lote, matriz_votos, freq)
+
+      # Os mesmos arquivos, com o mesmo conteúdo
+      assert arquivos_dataframe == arquivos_matriz == arquivos_lote
+
+      linhas.append( (freq, len(arquivos_lote), segundos_dataframe, segundos_matriz, segundos_lote) )
+
+  finally:
+    shutil.rmtree(diretorio, ignore_errors = True)
+
+  titulo = f"Séries dos deputados, de {start_year} a {end_year} ({df.shape[0]} votos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  for freq, arquivos, segundos_dataframe, segundos_matriz, segundos_lote in linhas:
+    print(f"{freq.ljust(5)} {arquivos:5d} arquivos: DataFrame {segundos_dataframe:8.3f}s, matriz {segundos_matriz:8.3f}s, "
+          f"em lote {segundos_lote:8.3f}s, {segundos_dataframe / segundos_lote:6.1f}x")
+
+  return linhas
+
+def benchmark_partidos(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, freqs = ("MS", "3MS")):
+  '''
+  Compara as três formas de calcular as séries dos partidos e de toda a
+  Câmara ("todos"), como em gerar_arquivos_partidos: filtrando o DataFrame de
+  votos para cada partido – e copiando-o inteiro para "todos" –, com uma
+  chamada de basometro_partidos.calcular_governismo por governo; com as mesmas
+  chamadas sobre a matriz de votos; e de uma só vez, com
+  basometro_partidos.calcular_governismo_partidos. Confere se os CSVs de cada
+  partido são idênticos, byte a byte.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  freqs -> Os intervalos de tempo calculados
+  '''
+
+  from basometro import basometro_coleta, basometro_partidos
+  from basometro.core import armazenamento, matriz
+  import pandas as pd
+
+  def por_partido(df, matriz_votos, freq):
+    arquivos = { }
+    for partido in matriz_votos.partidos() + [ "todos" ]:
+      if df is not None:
+        temp     = df.copy() if partido == "todos" else df [ df.partido == partido ]
+        governos = temp.governo.unique()
+      else:
+        temp     = matriz_votos
+        governos = matriz_votos.governos() if partido == "todos" else matriz_votos.governos(partido = partido)
+
+      csv_files = [ ]
+      for governo in governos:
+        try:
+          csv_files.append( basometro_partidos.calcular_governismo(df = temp, partido = partido, governo = governo, freq = freq) )
+        except basometro_partidos.NoVotes:
+          continue
+
+      if len(csv_files) > 0:
+        arquivos[f"{partido}-{freq}"] = pd.concat(csv_files).to_csv(index = False)
+
+    return arquivos
+
+  def em_lote(matriz_votos, freq):
+    series = basometro_partidos.calcular_governismo_partidos(matriz_votos, freq = freq)
+    return { f"{partido}-{freq}" : arquivo.to_csv(index = False) for partido, arquivo in series }
+
+  def medir(funcao, *args):
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.BancoColunar(caminho).gravador()
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    df           = armazenamento.abrir_banco(caminho).ler(tipado = True)
+    matriz_votos = matriz.MatrizVotos.abrir(caminho)
+
+    linhas = [ ]
+
+    for freq in freqs:
+      segundos_dataframe, arquivos_dataframe = medir(por_partido, df, matriz_votos, freq)
+      segundos_matriz, arquivos_matriz       = medir(por_partido, None, matriz_votos, freq)
+      segundos_lote, arquivos_lote           = medir(em_lote, matriz_votos, freq)
+
+      # Os mesmos arquivos, com o mesmo conteúdo
+      assert arquivos_dataframe == arquivos_matriz == arquivos_lote
+
+      linhas.append( (freq, len(arquivos_lote), segundos_dataframe, segundos_matriz, segundos_lote) )
+
+  finally:
+    shutil.rmtree(diretorio, ignore_errors = True)
+
+  titulo = f"Séries dos partidos, de {start_year} a {end_year} ({df.shape[0]} votos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  for freq, arquivos, segundos_dataframe, segundos_matriz, segundos_lote in linhas:
+    print(f"{freq.ljust(5)} {arquivos:5d} arquivos: DataFrame {segundos_dataframe:8.3f}s, matriz {segundos_matriz:8.3f}s, "
+          f"em lote {segundos_lote:8.3f}s, {segundos_dataframe / segundos_lote:6.1f}x")
+
+  return linhas
+
+def benchmark_incremental(start_year = 2011, end_year = 2018, proposicoes_por_ano = 40, sessoes = 1, freqs = ("MS", "3MS")):
+  '''
+  Simula a atualização diária: monta o banco de dados sem as últimas
+  votações, gera os arquivos da visualização e depois grava as votações
+  que faltavam, como o atualizador, com a matriz e as tabelas agregadas
+  atualizadas junto. Compara a geração incremental, sobre hard links para os
+  arquivos anteriores, com a geração de todos os arquivos do zero: confere se
+  os arquivos são idênticos, byte a byte, e se os anteriores continuam intactos.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  sessoes -> Quantas votações são gravadas na atualização
+  freqs -> Os intervalos de tempo dos arquivos de partidos e deputados
+  '''
+
+  from basometro import basometro_aplicativo, basometro_coleta
+  from basometro.core import agregados, armazenamento, matriz
+
+  def ler_arquivos(diretorio):
+    # O conteúdo de cada arquivo, menos o da hora da atualização
+    arquivos = { }
+    for raiz, _, nomes in os.walk(diretorio):
+      for nome in nomes:
+        caminho = os.path.join(raiz, nome)
+        if nome != "last-update.json":
+          with open(caminho, "rb") as file:
+            arquivos[os.path.relpath(caminho, diretorio)] = file.read()
+    return arquivos
+
+  def medir(funcao, *args, **kwargs):
+    gc.collect()
+    inicio = time.perf_counter()
+    funcao(*args, **kwargs)
+    return time.perf_counter() - inicio
+
+  diretorio   = tempfile.mkdtemp()
+  completo    = os.path.join(diretorio, "completo")
+  caminho     = os.path.join(diretorio, "basometro")
+  anterior    = os.path.join(diretorio, "anterior")
+  incremental = os.path.join(diretorio, "incremental")
+  do_zero     = os.path.join(diretorio, "do_zero")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.BancoColunar(completo).gravador()
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    # O banco de dados sem as últimas votações e os arquivos gerados a partir dele
+    df     = armazenamento.abrir_banco(completo).ler(tipado = True)
+    inicio = df.idVotacao.values.tolist().index( df.idVotacao.unique()[-sessoes] )
+
+    gravador = armazenamento.BancoColunar(caminho).gravador()
+    gravador.adicionar_dataframe(df.iloc[ : inicio ], filtrar = False)
+    gravador.concluir()
+
+    basometro_aplicativo.gerar_arquivos_viz(list(freqs), caminho, anterior)
+    conteudo_anterior = ler_arquivos(anterior)
+
+    # A atualização, como em atualizar_banco_de_dados
+    matriz_votos    = matriz.MatrizVotos.abrir(caminho)
+    agregados_votos = agregados.AgregadosVotos.abrir(caminho)
+
+    gravador = armazenamento.abrir_banco(caminho).gravador(anexar = True)
+    gravador.observadores.append(agregados_votos.registrar)
+    gravador.adicionar_dataframe(df.iloc[ inicio : ], filtrar = False)
+    gravador.concluir()
+
+    matriz_votos.atualizar(gravador.governos)
+    agregados_votos.atualizar()
+
+    # A geração nova começa com hard links para os arquivos anteriores, como em geracoes.Geracoes
+    shutil.copytree(anterior, incremental, copy_function = os.link)
+
+    segundos_incremental = medir(basometro_aplicativo.gerar_arquivos_viz, list(freqs), caminho, incremental, incremental = True)
+    segundos_do_zero     = medir(basometro_aplicativo.gerar_arquivos_viz, list(freqs), caminho, do_zero)
+
+    # Os mesmos arquivos, e os anteriores intactos
+    assert ler_arquivos(incremental) == ler_arquivos(do_zero)
+    assert ler_arquivos(anterior) == conteudo_anterior
+
+    total    = len(conteudo_anterior)
+    refeitos = sum( not os.path.samefile(os.path.join(anterior, arquivo), os.path.join(incremental, arquivo)) for arquivo in conteudo_anterior )
+
+  finally:
+    shutil.rmtree(diretorio, ignore_errors = True)
+
+  titulo = f"Arquivos da visualização depois de {sessoes} votações novas ({df.shape[0] - inicio} votos), de {start_year} a {end_year}"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+  print(f"Do zero:     {segundos_do_zero:8.3f}s, {total} arquivos")
+  print(f"Incremental: {segundos_incremental:8.3f}s, {refeitos} arquivos escritos de novo, {segundos_do_zero / segundos_incremental:6.1f}x")
+
+  return segundos_do_zero, segundos_incremental, total, refeitos
+
+def benchmark_paralelo(start_year = 2003, end_year = 2018, proposicoes_por_ano = 40, freqs = ("MS", "3MS"), processos = (2, 4, 8)):
+  '''
+  Compara a geração de todos os arquivos da visualização em série com a
+  geração em paralelo (ver gerar_arquivos_viz), com cada número de processos,
+  e confere se os arquivos são idênticos, byte a byte. O ganho depende dos
+  núcleos disponíveis, que são mostrados junto com os tempos: com menos
+  núcleos que processos, eles apenas se revezam.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta simulada
+  end_year -> O ano de término da coleta simulada
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  freqs -> Os intervalos de tempo dos arquivos de partidos e deputados
+  processos -> Os números de processos comparados com a geração em série
+  '''
+
+  from basometro import basometro_aplicativo, basometro_coleta
+  from basometro.core import armazenamento, matriz
+
+  def ler_arquivos(diretorio):
+    # O conteúdo de cada arquivo, menos o da hora da atualização
+    arquivos = { }
+    for raiz, _, nomes in os.walk(diretorio):
+      for nome in nomes:
+        caminho = os.path.join(raiz, nome)
+        if nome != "last-update.json":
+          with open(caminho, "rb") as file:
+            arquivos[os.path.relpath(caminho, diretorio)] = file.read()
+    return arquivos
+
+  def medir(funcao, *args, **kwargs):
+    gc.collect()
+    inicio = time.perf_counter()
+    funcao(*args, **kwargs)
+    return time.perf_counter() - inicio
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro")
+  tempos    = { }
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+      gravador = armazenamento.BancoColunar(caminho).gravador()
+      basometro_coleta.gravar_votos(start_year, end_year, gravador)
+      gravador.concluir()
+
+    # A matriz é construída antes, e uma primeira geração, descartada, aquece
+    # os caches, para que todas as gerações medidas partam do mesmo ponto
+    matriz.MatrizVotos.abrir(caminho)
+    basometro_aplicativo.gerar_arquivos_viz(list(freqs), caminho, os.path.join(diretorio, "aquecimento"))
+
+    serie     = os.path.join(diretorio, "serie")
+    tempos[1] = medir(basometro_aplicativo.gerar_arquivos_viz, list(freqs), caminho, serie)
+    conteudo  = ler_arquivos(serie)
+
+    for numero in processos:
+      paralelo       = os.path.join(diretorio, f"paralelo-{numero}")
+      tempos[numero] = medir(basometro_aplicativo.gerar_arquivos_viz, list(freqs), caminho, paralelo, processos = numero)
+
+      assert ler_arquivos(paralelo) == conteudo
+
+  finally:
+    shutil.rmtree(diretorio, ignore_errors = True)
+
+  titulo = f"Arquivos da visualização em paralelo, de {start_year} a {end_year} ({len(conteudo)} arquivos, {os.cpu_count()} núcleos)"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  for numero, segundos in tempos.items():
+    print(f"{numero:2d} processo(s): {segundos:8.3f}s, {tempos[1] / segundos:6.1f}x")
+
+  return tempos
+
+def medir_memoria(modo, start_year, end_year, proposicoes_por_ano):
+  '''
+  Coleta os votos do intervalo com a API simulada, sem latência, e retorna o
+  pico de memória (RSS) do processo em MB. Deve rodar em um processo novo,
+  já que o pico de memória de um processo nunca diminui.
+
+  Parâmetros:
+  modo -> "dataframe", para coletar_votos, ou "streaming", para gravar_votos
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  '''
+
+  from basometro import basometro_coleta
+  from basometro.core import armazenamento
+
+  diretorio = tempfile.mkdtemp()
+  caminho   = os.path.join(diretorio, "basometro.csv")
+
+  try:
+    with ApiSimulada(latencia = 0, proposicoes_por_ano = proposicoes_por_ano):
+
+      if modo == "dataframe":
+        df = basometro_coleta.coletar_votos(start_year, end_year)
+        df.to_csv(caminho, index = False)
+
+      else:
+        gravador = armazenamento.GravadorVotos(caminho)
+        basometro_coleta.gravar_votos(start_year, end_year, gravador)
+        gravador.concluir()
+
+  finally:
+    shutil.rmtree(diretorio)
+
+  # No Linux, ru_maxrss é dado em KB
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark_memoria(start_year = 2011, anos = (2, 4, 8), proposicoes_por_ano = 40):
+  '''
+  Compara o pico de memória da coleta que monta um único DataFrame no final
+  (coletar_votos) com o da coleta que grava os votos em lotes (gravar_votos),
+  para intervalos com diferentes números de anos. Cada medição roda em um
+  processo novo.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  anos -> Os tamanhos dos intervalos de anos medidos
+  proposicoes_por_ano -> Quantas proposições são votadas em cada ano
+  '''
+
+  contexto = multiprocessing.get_context("spawn")
+  linhas   = [ ]
+
+  for modo in [ "dataframe", "streaming" ]:
+    for n in anos:
+
+      with ProcessPoolExecutor(max_workers = 1, mp_context = contexto) as executor:
+        pico = executor.submit(medir_memoria, modo, start_year, start_year + n - 1, proposicoes_por_ano).result()
+
+      linhas.append( (f"{modo}, {n} anos", pico) )
+
+  titulo = f"Pico de memória da coleta a partir de {start_year}, {proposicoes_por_ano} proposições por ano"
+  print(f"\n{titulo}")
+  print("-" * len(titulo))
+
+  for descricao, pico in linhas:
+    print(f"{descricao.ljust(50)} {pico:8.1f} MB")
+
+  return linhas
+
+##############
+### main() ###
+##############
+
+BENCHMARKS = {
+  "coleta"      : benchmark_coleta,
+  "instalacao"  : benchmark_instalacao,
+  "memoria"     : benchmark_memoria,
+  "agendador"   : benchmark_agendador,
+  "reproducao"  : benchmark_reproducao,
+  "votos"       : benchmark_votos,
+  "xml"         : benchmark_xml,
+  "banco"       : benchmark_banco,
+  "esquema"     : benchmark_esquema,
+  "matriz"      : benchmark_matriz,
+  "deputados"   : benchmark_deputados,
+  "partidos"    : benchmark_partidos,
+  "incremental" : benchmark_incremental,
+  "paralelo"    : benchmark_paralelo,
+}
+
+def main(nomes = None):
+  if not nomes:
+    nomes = list(BENCHMARKS.keys())
+
+  for nome in nomes:
+    BENCHMARKS[nome]()
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,309 @@
+'''
+Agendador das requisições feitas à API da Câmara dos Deputados. Ele limita
+o ritmo das chamadas com um balde de fichas, repete as que falham por erros
+transitórios (com espera exponencial e aleatória entre as tentativas) e ajusta
+sozinho o número de requisições simultâneas: diminui quando a API responde com
+erros ou fica lenta e volta a aumentar enquanto as respostas chegam rápido.
+Também mede a vazão da coleta, em requisições e votos por segundo.
+'''
+
+import collections, random, threading, time
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Intervalo, em segundos, usado para calcular a vazão
+JANELA_VAZAO = 10
+
+###########
+# CLASSES #
+###########
+
+class BaldeDeFichas(object):
+  '''
+  Limitador de ritmo. O balde recebe taxa fichas por segundo, até o máximo
+  de capacidade, e cada requisição consome uma ficha. Quando o balde está
+  vazio, a requisição espera a próxima ficha.
+
+  Parâmetros:
+  taxa -> Número médio máximo de requisições por segundo
+  capacidade -> Número de requisições que podem ser feitas de uma só vez
+  depois de um período ocioso. O padrão é o equivalente a um segundo.
+  '''
+
+  def __init__(self, taxa, capacidade = None):
+    self.taxa        = taxa
+    self.capacidade  = capacidade if capacidade is not None else max(taxa, 1)
+    self.fichas      = self.capacidade
+    self._atualizado = time.monotonic()
+    self._lock       = threading.Lock()
+
+  def retirar(self):
+    '''
+    Consome uma ficha, esperando o tempo necessário caso o balde esteja vazio
+    '''
+    while True:
+
+      with self._lock:
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+        if self.fichas >= 1:
+          self.fichas -= 1
+          return
+
+        espera = (1 - self.fichas) / self.taxa
+
+      time.sleep(espera)
+
+class AgendadorRequisicoes(object):
+  '''
+  Executa as requisições à API respeitando o ritmo do balde de fichas e um
+  limite de requisições simultâneas que se adapta às respostas. O limite cresce
+  de um em um a cada limite respostas rápidas seguidas e cai pela metade quando
+  acontece um erro transitório – ou para três quartos quando uma resposta é lenta.
+  Uma resposta é lenta se demora mais do que tolerancia vezes a latência de
+  referência daquele método, que acompanha as respostas mais rápidas recentes,
+  somada a uma folga fixa que evita falsos alarmes em respostas muito rápidas.
+  Cada redução só vale uma vez para as requisições que já estavam em andamento,
+  para que uma rajada de respostas lentas não derrube o limite de uma vez.
+
+  Parâmetros:
+  taxa -> Número máximo de requisições por segundo. None desativa o limite de ritmo.
+  concorrencia_inicial -> Limite de requisições simultâneas no início
+  concorrencia_minima -> Menor valor que o limite pode assumir
+  concorrencia_maxima -> Maior valor que o limite pode assumir. Na prática, o
+  limite também não passa do número de threads usadas pelo coletor.
+  tentativas -> Número máximo de tentativas de cada requisição
+  espera_base -> Espera, em segundos, antes da segunda tentativa. Ela dobra a cada
+  nova tentativa, até espera_maxima, e o valor usado é sorteado entre zero e ela.
+  espera_maxima -> Maior espera possível entre duas tentativas, em segundos
+  tolerancia -> Quantas vezes a latência de referência uma resposta pode levar
+  antes de ser considerada lenta
+  folga -> Tempo, em segundos, somado ao limite de uma resposta lenta
+  permanentes -> Tupla de exceções que fazem parte do funcionamento normal da API
+  e, por isso, não são repetidas nem contam como erro
+  transitorias -> Tupla de exceções que indicam um erro transitório – de rede,
+  HTTP ou de tempo esgotado –, que é repetido e reduz a concorrência. Qualquer
+  outra exceção, como um KeyError causado por um bug ou por uma resposta
+  malformada, é levantada de imediato. O padrão é (OSError,), que inclui as
+  exceções do requests.
+  '''
+
+  def __init__(self, taxa = None, concorrencia_inicial = 4, concorrencia_minima = 1, concorrencia_maxima = 32,
+               tentativas = 5, espera_base = 0.5, espera_maxima = 30, tolerancia = 3, folga = 0.1, permanentes = ( ),
+               transitorias = (OSError,)):
+    self.balde               = BaldeDeFichas(taxa) if taxa else None
+    self.limite              = concorrencia_inicial
+    self.concorrencia_minima = concorrencia_minima
+    self.concorrencia_maxima = concorrencia_maxima
+    self.tentativas          = tentativas
+    self.espera_base         = espera_base
+    self.espera_maxima       = espera_maxima
+    self.tolerancia          = tolerancia
+    self.folga               = folga
+    self.permanentes         = permanentes
+    self.transitorias        = transitorias
+
+    self.requisicoes         = 0
+    self.erros               = 0
+    self.retentativas        = 0
+    self.votos               = 0
+
+    self._ativas             = 0
+    self._rapidas            = 0
+    self._ultima_reducao     = 0
+    self._referencias        = { }
+    self._inicio             = time.monotonic()
+    self._historico          = collections.deque()
+    self._condicao           = threading.Condition()
+    self._random             = random.Random()
+
+  ###############
+  # REQUISIÇÕES #
+  ###############
+
+  def executar(self, metodo, funcao, *args):
+    '''
+    Chama funcao(*args) respeitando os limites do agendador e repete a chamada
+    se ela levantar um erro transitório (ver transitorias). Retorna o resultado
+    da função ou, se todas as tentativas falharem, levanta o último erro. As
+    demais exceções são levantadas de imediato.
+
+    Parâmetros:
+    metodo -> O nome do método da API, usado para separar as latências de referência
+    funcao -> A função que faz a requisição
+    args -> Os argumentos passados para a função
+    '''
+    for tentativa in range(self.tentativas):
+
+      if self.balde is not None:
+        self.balde.retirar()
+
+      self.entrar()
+      inicio = time.monotonic()
+
+      try:
+        resultado = funcao(*args)
+
+      except self.permanentes:
+        self.sair()
+        self.registrar_sucesso(metodo, inicio)
+        raise
+
+      except self.transitorias:
+        self.sair()
+        self.registrar_erro(inicio)
+
+        if tentativa == self.tentativas - 1:
+          raise
+
+        with self._condicao:
+          self.retentativas += 1
+
+        # Espera exponencial com sorteio ("full jitter"): evita que
+        # todas as threads tentem de novo ao mesmo tempo
+        espera = min(self.espera_maxima, self.espera_base * 2 ** tentativa)
+        time.sleep(self._random.uniform(0, espera))
+        continue
+
+      except BaseException:
+        self.sair()
+        raise
+
+      self.sair()
+      self.registrar_sucesso(metodo, inicio)
+
+      return resultado
+
+  def entrar(self):
+    '''
+    Espera até que o número de requisições em andamento fique abaixo do limite
+    '''
+    with self._condicao:
+      while self._ativas >= self.limite:
+        self._condicao.wait()
+      self._ativas += 1
+
+  def sair(self):
+    with self._condicao:
+      self._ativas -= 1
+      self._condicao.notify_all()
+
+  ###########################
+  # CONCORRÊNCIA ADAPTATIVA #
+  ###########################
+
+  def registrar_sucesso(self, metodo, inicio):
+    '''
+    Contabiliza uma resposta e ajusta o limite de acordo com a sua latência
+    '''
+    agora    = time.monotonic()
+    latencia = agora - inicio
+
+    with self._condicao:
+
+      self.requisicoes += 1
+      self.registrar_historico(agora, 1, 0)
+
+      # A referência acompanha as respostas mais rápidas, mas sobe devagar
+      # para que uma API que ficou mais lenta de vez não seja punida para sempre
+      referencia = self._referencias.get(metodo)
+      referencia = latencia if referencia is None else min(latencia, referencia * 1.01)
+      self._referencias[metodo] = referencia
+
+      if latencia > self.tolerancia * referencia + self.folga:
+        self.reduzir(inicio, 0.75)
+        return
+
+      self._rapidas += 1
+      if self._rapidas >= self.limite and self.limite < self.concorrencia_maxima:
+        self.limite  += 1
+        self._rapidas = 0
+        self._condicao.notify_all()
+
+  def registrar_erro(self, inicio):
+    with self._condicao:
+      self.erros += 1
+      self.reduzir(inicio, 0.5)
+
+  def reduzir(self, inicio, fator):
+    '''
+    Reduz o limite, a não ser que a requisição tenha começado antes
+    da última redução. Deve ser chamada com a condição adquirida.
+    '''
+    self._rapidas = 0
+
+    if inicio < self._ultima_reducao:
+      return
+
+    self.limite = max(self.concorrencia_minima, int(self.limite * fator))
+    self._ultima_reducao = time.monotonic()
+
+  #########
+  # VAZÃO #
+  #########
+
+  def contar_votos(self, n):
+    '''
+    Registra que n votos foram processados, para o cálculo da vazão
+    '''
+    with self._condicao:
+      self.votos += n
+      self.registrar_historico(time.monotonic(), 0, n)
+
+  def registrar_historico(self, agora, requisicoes, votos):
+    '''
+    Acrescenta um evento ao histórico da vazão e descarta os que já saíram
+    da janela. Deve ser chamada com a condição adquirida.
+    '''
+    self._historico.append( (agora, requisicoes, votos) )
+
+    while self._historico[0][0] < agora - JANELA_VAZAO:
+      self._historico.popleft()
+
+  def vazao(self):
+    '''
+    Retorna um par (requisições por segundo, votos por segundo) calculado
+    sobre os últimos JANELA_VAZAO segundos
+    '''
+    agora = time.monotonic()
+
+    with self._condicao:
+      recentes    = [ item for item in self._historico if item[0] >= agora - JANELA_VAZAO ]
+      requisicoes = sum( item[1] for item in recentes )
+      votos       = sum( item[2] for item in recentes )
+
+    intervalo = max(min(JANELA_VAZAO, agora - self._inicio), 1e-3)
+
+    return requisicoes / intervalo, votos / intervalo
+
+  def resumo(self):
+    '''
+    Retorna uma linha com a vazão atual e o limite de concorrência, para os avisos de progresso
+    '''
+    requisicoes, votos = self.vazao()
+    return f"{requisicoes:.1f} req/s, {votos:.0f} votos/s, até {self.limite} simultâneas"
+
+  def zerar_estatisticas(self):
+    with self._condicao:
+      self.requisicoes  = 0
+      self.erros        = 0
+      self.retentativas = 0
+      self.votos        = 0
+      self._inicio      = time.monotonic()
+      self._historico.clear()
+
+  def somar_estatisticas(self, requisicoes, erros, retentativas, votos):
+    '''
+    Soma aos contadores os de outro processo, que teve o seu próprio agendador
+    '''
+    with self._condicao:
+      self.requisicoes  += requisicoes
+      self.erros        += erros
+      self.retentativas += retentativas
+      self.votos        += votos
@@ -0,0 +1,472 @@
+'''
+Tabelas agregadas dos votos do Basômetro. Em vez de um voto por linha, elas
+guardam as contagens de que os arquivos da visualização precisam: os votos,
+os votos pró-governo e as sessões de cada deputado e de cada partido em cada
+mês de cada governo, de cada deputado em cada partido em cada governo e de
+cada governo inteiro, com o nome, o partido e a UF do primeiro e do último
+voto onde os arquivos os usam (ver TABELAS).
+
+As contagens são somas, então votos novos são incorporados agregando apenas
+eles e somando o resultado às tabelas, sem reler o banco de dados (ver
+atualizar). Cada atualização é uma revisão, que registra os deputados, os
+partidos e os governos que receberam votos, para que apenas os arquivos
+deles sejam gerados de novo (ver alteracoes_desde e
+basometro_aplicativo.gerar_arquivos_viz).
+
+As tabelas ficam ao lado do banco de dados, com a extensão .agregados
+acrescentada ao nome, e registram a assinatura do banco de dados que
+descrevem, como a matriz (ver matriz.MatrizVotos). Os arquivos nunca são
+alterados no lugar: cada revisão vai para um diretório novo, e o manifesto
+que aponta para ele é substituído de uma vez.
+'''
+
+from basometro.core import armazenamento, core
+import json, os, shutil, uuid
+import numpy as np
+import pandas as pd
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Colunas lidas do banco de dados para montar as tabelas
+COLUNAS = [ 'parlamentar', 'ideCadastro', 'UF', 'voto', 'partido', 'orientacaoGoverno', 'data', 'governo' ] + armazenamento.COLUNAS_VOTACAO
+
+# Colunas de texto das tabelas, lidas do disco como texto mesmo quando parecem números
+TEXTOS = [ 'parlamentar', 'UF', 'partido', 'partidoVoto', 'governo', 'idVotacao' ]
+
+# Cada tabela: as chaves, as colunas somadas e as escolhas – colunas de
+# ordenação, ascendente e atributos tomados da primeira linha de cada grupo.
+# As datas (inicio e fim) são inteiros em nanossegundos, e a ordem (primeiro
+# e ultimo) é a posição do voto no banco de dados. O partido "todos" é o de
+# toda a Câmara.
+TABELAS = {
+  # Cada deputado em cada mês de cada governo, com o partido e a UF do
+  # primeiro voto do mês e o nome do primeiro voto do seu último dia
+  "deputados" : ( [ 'ideCadastro', 'governo', 'mes' ], [ 'votos', 'governistas', 'sessoes' ],
+                  [ ( [ 'inicio', 'primeiro' ], True, [ 'inicio', 'primeiro', 'partido', 'UF' ] ),
+                    ( [ 'fim', 'ultimo' ], [ False, True ], [ 'fim', 'ultimo', 'parlamentar' ] ) ] ),
+
+  # Cada partido, e "todos", em cada mês de cada governo
+  "partidos"  : ( [ 'partido', 'governo', 'mes' ], [ 'votos', 'governistas', 'sessoes' ], [ ] ),
+
+  # Cada deputado em cada partido, e em "todos", em cada governo, com o nome,
+  # o partido e a UF do último voto
+  "governos"  : ( [ 'governo', 'partido', 'ideCadastro' ], [ 'votos', 'governistas', 'sessoes' ],
+                  [ ( [ 'primeiro' ], True, [ 'primeiro' ] ),
+                    ( [ 'ultimo' ], False, [ 'ultimo', 'parlamentar', 'partidoVoto', 'UF' ] ) ] ),
+
+  # As sessões com orientação do governo de cada partido, e de "todos", em
+  # cada governo, incluindo os partidos que só votaram em votações liberadas
+  "sessoes"   : ( [ 'governo', 'partido' ], [ 'sessoes' ], [ ] ),
+
+  # Os votos com orientação do governo de cada governo, na ordem do primeiro deles
+  "historico" : ( [ 'governo' ], [ 'votos', 'governistas' ], [ ( [ 'primeiro' ], True, [ 'primeiro' ] ) ] ),
+
+  # As votações de cada governo, para que uma atualização com votos de uma
+  # votação já contada, que somaria a mesma sessão duas vezes, seja percebida
+  "votacoes"  : ( [ 'governo', 'idVotacao' ], [ ], [ ] ),
+}
+
+# Número de revisões cujas alterações ficam registradas no manifesto
+ALTERACOES_MANTIDAS = 30
+
+# Arquivo, dentro do diretório das tabelas agregadas, que aponta para a revisão atual
+MANIFESTO = "agregados.json"
+
+###########
+# FUNÇÕES #
+###########
+
+def reduzir(tabela, nome):
+  '''
+  Agrupa as linhas de uma tabela pelas chaves de TABELAS, somando as colunas
+  somadas e tomando os atributos de cada escolha. Serve tanto para agregar os
+  votos, uma linha por voto, quanto para juntar duas versões agregadas.
+  Retorna a tabela ordenada pelas chaves.
+
+  Parâmetros:
+  tabela -> Um DataFrame com as colunas da tabela
+  nome -> O nome da tabela em TABELAS
+  '''
+  chaves, somas, escolhas = TABELAS[nome]
+
+  if len(somas) == 0:
+    resultado = tabela[chaves].drop_duplicates()
+
+  else:
+    resultado = tabela.groupby(chaves, sort = False)[somas].sum().reset_index()
+
+  for ordenacao, ascendente, atributos in escolhas:
+    primeiras = tabela.sort_values(ordenacao, ascending = ascendente, kind = "mergesort").drop_duplicates(chaves)
+    resultado = resultado.merge(primeiras[ chaves + [ atributo for atributo in atributos if atributo not in chaves ] ], on = chaves, how = "left")
+
+  return resultado.sort_values(chaves, kind = "mergesort").reset_index(drop = True)
+
+def agregar(df, inicio = 0):
+  '''
+  Retorna um dicionário com as tabelas de TABELAS calculadas a partir de um
+  DataFrame de votos. Os votos sem governo ficam de fora de todas elas, e os
+  sem ideCadastro, de todas menos o histórico e as votações.
+
+  Parâmetros:
+  df -> DataFrame com as COLUNAS, tipado (ver esquema.aplicar) e na ordem do banco de dados
+  inicio -> A posição do primeiro voto de df no banco de dados. O padrão é 0.
+  '''
+
+  def contar_sessoes(votos, chaves):
+    # Cada sessão conta uma vez por grupo: no primeiro voto dela no grupo
+    return (~votos.duplicated(chaves + [ 'idVotacao' ])).astype(np.int64).values
+
+  ##########################
+  ### EXECUÇÃO PRINCIPAL ###
+  ##########################
+
+  datas = pd.to_datetime(df.data).values.astype("datetime64[ns]")
+
+  votos = pd.DataFrame({
+    "ordem"       : np.arange(inicio, inicio + df.shape[0], dtype = np.int64),
+    "ideCadastro" : df.ideCadastro.astype(object).values,
+    "parlamentar" : df.parlamentar.astype(object).values,
+    "partido"     : df.partido.astype(object).values,
+    "UF"          : df.UF.astype(object).values,
+    "governo"     : df.governo.astype(object).values,
+    "idVotacao"   : df.idVotacao.astype(object).values,
+    "data"        : datas.astype(np.int64),
+    "valido"      : (df.orientacaoGoverno != "Liberado").values,
+    "governistas" : (df.voto == df.orientacaoGoverno).values.astype(np.int64),
+    "repetido"    : df.duplicated([ 'ideCadastro', 'governo' ] + armazenamento.COLUNAS_VOTACAO).values,
+  })
+
+  votos = votos[ votos.governo.notna() ]
+
+  tabelas = { }
+
+  tabelas["votacoes"] = reduzir(votos, "votacoes")
+
+  validos = votos[ votos.valido ]
+  tabelas["historico"] = reduzir(validos.assign(votos = 1, primeiro = validos.ordem), "historico")
+
+  # Daqui em diante, apenas os votos de deputados e, como na matriz de votos,
+  # apenas o primeiro de cada deputado em cada votação (ver matriz.ParticaoGoverno.construir)
+  votos   = votos[ votos.ideCadastro.notna() & ~votos.repetido ]
+  votos   = votos.assign(ideCadastro = votos.ideCadastro.astype(np.int64))
+  validos = votos[ votos.valido ]
+
+  # O mês de cada voto válido: a sua bin na frequência MS (ver core.calcular_intervalos)
+  meses = np.full(validos.shape[0], -1, dtype = np.int64)
+
+  for governo, posicoes in validos.groupby('governo', sort = False).indices.items():
+    meses[posicoes] = core.calcular_bins(datas_ns(validos.data.values[posicoes]), core.calcular_intervalos(governo, "MS"))
+
+  validos = validos.assign(votos = 1, mes = meses, inicio = validos.data, fim = validos.data,
+                           primeiro = validos.ordem, ultimo = validos.ordem, partidoVoto = validos.partido)
+
+  # Os votos sem partido contam apenas para "todos"
+  com_partido = validos[ validos.partido.notna() ]
+  camara      = validos.assign(partido = "todos")
+
+  tabelas["deputados"] = reduzir(validos.assign(sessoes = contar_sessoes(validos, [ 'ideCadastro', 'governo', 'mes' ])), "deputados")
+
+  tabelas["partidos"] = reduzir(pd.concat([
+    com_partido.assign(sessoes = contar_sessoes(com_partido, [ 'partido', 'governo', 'mes' ])),
+    camara.assign(sessoes = contar_sessoes(camara, [ 'governo', 'mes' ])),
+  ]), "partidos")
+
+  tabelas["governos"] = reduzir(pd.concat([
+    com_partido.assign(sessoes = contar_sessoes(com_partido, [ 'governo', 'partido', 'ideCadastro' ])),
+    camara.assign(sessoes = contar_sessoes(camara, [ 'governo', 'ideCadastro' ])),
+  ]), "governos")
+
+  # Os partidos com votos apenas em votações liberadas entram com zero sessões
+  presentes = votos[ votos.partido.notna() ].assign(sessoes = 0)
+
+  tabelas["sessoes"] = reduzir(pd.concat([
+    presentes[[ 'governo', 'partido', 'sessoes' ]],
+    com_partido.assign(sessoes = contar_sessoes(com_partido, [ 'governo', 'partido' ])),
+    camara.assign(sessoes = contar_sessoes(camara, [ 'governo' ])),
+  ]), "sessoes")
+
+  return tabelas
+
+def datas_ns(valores):
+  '''
+  Converte um array de datas em nanossegundos, como as das tabelas, para datetime64
+  '''
+  return np.asarray(valores, dtype = np.int64).astype("datetime64[ns]")
+
+def combinar(antigas, novas):
+  '''
+  Retorna as tabelas que resultam de somar às antigas as tabelas agregadas de
+  votos novos. As sessões só podem ser somadas se nenhuma das votações novas
+  já estiver nas antigas (ver AgregadosVotos.atualizar).
+
+  Parâmetros:
+  antigas, novas -> Dicionários de tabelas, como os retornados por agregar
+  '''
+  return { nome : reduzir(pd.concat([ antigas[nome], novas[nome] ]), nome) for nome in TABELAS }
+
+def resumir(novas):
+  '''
+  Retorna as alterações que as tabelas agregadas de votos novos causam nos
+  arquivos da visualização: os deputados e os partidos com votos válidos, os
+  partidos de cada governo com votos (sempre com "todos") e se o histórico mudou.
+
+  Parâmetros:
+  novas -> As tabelas dos votos novos, como retornadas por agregar
+  '''
+  governos = { }
+
+  for governo, partidos in novas["sessoes"].groupby('governo', sort = False).partido:
+    governos[governo] = sorted( set(partidos) | { "todos" } )
+
+  return {
+    "deputados" : sorted( int(ideCadastro) for ideCadastro in novas["deputados"].ideCadastro.unique() ),
+    "partidos"  : sorted( novas["partidos"].partido.unique().tolist() ),
+    "governos"  : governos,
+    "historico" : bool( novas["historico"].shape[0] > 0 ),
+  }
+
+def bins_dos_meses(governo, freq):
+  '''
+  Retorna as bins de um governo em uma frequência (ver core.calcular_intervalos)
+  e um array com a bin de cada mês das tabelas – a posição na frequência MS –,
+  seguido de -1, a bin dos votos que caem fora de todos os meses
+
+  Parâmetros:
+  governo -> O governo
+  freq -> A frequência, MS ou um múltiplo
+  '''
+  date_pairs = core.calcular_intervalos(governo, freq)
+  inicios    = pd.DatetimeIndex([ start for start, _ in core.calcular_intervalos(governo, "MS") ]).values
+
+  return date_pairs, np.append(core.calcular_bins(inicios, date_pairs), -1)
+
+class AgregadosVotos(object):
+  '''
+  As tabelas agregadas de um banco de dados (ver TABELAS) e as alterações
+  das revisões mais recentes.
+
+  Parâmetros:
+  caminho_banco -> O caminho do banco de dados, em qualquer dos formatos de
+  armazenamento.abrir_banco. As tabelas são salvas ao lado dele, com a
+  extensão .agregados acrescentada ao nome; se o caminho for um link
+  simbólico, ao lado do destino do link, como a matriz.
+
+  Atributos:
+  tabelas -> Um dicionário com um DataFrame para cada tabela de TABELAS
+  id -> Identifica a sequência de revisões desde a última reconstrução
+  revisao -> O número da revisão atual. Cada atualização com votos novos cria uma.
+  proximo -> A posição, no banco de dados, do próximo voto gravado
+  alteracoes -> As alterações (ver resumir) das últimas revisões, com o número de cada uma
+  '''
+
+  VERSAO = 2
+
+  def __init__(self, caminho_banco):
+    self.banco             = armazenamento.abrir_banco(caminho_banco)
+    self.caminho           = f"{os.path.realpath(self.banco.caminho)}.agregados"
+    self.caminho_manifesto = os.path.join(self.caminho, MANIFESTO)
+    self.tabelas           = { }
+    self.id                = None
+    self.revisao           = 0
+    self.proximo           = 0
+    self.alteracoes        = [ ]
+    self._diretorio        = None
+    self._novos            = [ ]
+
+  @classmethod
+  def abrir(cls, caminho_banco):
+    '''
+    Carrega as tabelas agregadas do banco de dados ou, se elas não
+    existirem ou estiverem desatualizadas, calcula e salva novas.
+    '''
+    agregados = cls(caminho_banco)
+
+    if not agregados.carregar():
+      print("Calculando as tabelas agregadas do banco de dados.")
+      agregados.reconstruir()
+
+    return agregados
+
+  def carregar(self):
+    '''
+    Abre as tabelas salvas. Retorna False se elas não existirem, forem de
+    outra versão ou não corresponderem mais ao banco de dados.
+    '''
+    try:
+      with open(self.caminho_manifesto, encoding = "utf-8") as file:
+        dados = json.load(file)
+
+    except (OSError, ValueError):
+      return False
+
+    if dados.get("versao") != self.VERSAO or dados.get("assinatura") != self.banco.assinatura():
+      return False
+
+    self.id          = dados["id"]
+    self.revisao     = dados["revisao"]
+    self.proximo     = dados["proximo"]
+    self.alteracoes  = dados["alteracoes"]
+    self._diretorio  = dados["tabelas"]
+
+    diretorio = os.path.join(self.caminho, self._diretorio)
+
+    for nome in TABELAS:
+      self.tabelas[nome] = pd.read_csv(os.path.join(diretorio, f"{nome}.csv.gz"), keep_default_na = False, na_values = [ "" ],
+                                       dtype = { coluna : str for coluna in TEXTOS })
+
+    return True
+
+  def reconstruir(self):
+    '''
+    Calcula todas as tabelas a partir do banco de dados inteiro. As revisões
+    recomeçam, com um id novo, e as alterações anteriores são esquecidas.
+    '''
+    df = self.banco.ler(colunas = COLUNAS, tipado = True)
+
+    self.tabelas    = agregar(df)
+    self.id         = uuid.uuid4().hex
+    self.revisao    = 0
+    self.proximo    = df.shape[0]
+    self.alteracoes = [ ]
+    self._novos     = [ ]
+
+    self.salvar()
+
+  def registrar(self, df):
+    '''
+    Guarda um lote de votos gravado no banco de dados, para ser incorporado
+    por atualizar. Deve ser registrada como observador do gravador (ver
+    armazenamento.GravadorVotos), para receber todos os lotes, na ordem.
+
+    Parâmetros:
+    df -> DataFrame de votos, tipado
+    '''
+    self._novos.append( df[COLUNAS] )
+
+  def atualizar(self):
+    '''
+    Incorpora às tabelas os votos registrados desde a última atualização,
+    agregando apenas eles, e salva uma nova revisão. Se alguma votação dos
+    votos novos já estiver nas tabelas – o que só acontece se o banco de
+    dados for alterado por fora do gravador –, as sessões dela seriam
+    contadas duas vezes, e as tabelas são reconstruídas. Sem votos novos,
+    apenas o manifesto é salvo, com a assinatura atual do banco de dados.
+    '''
+    novos       = [ df for df in self._novos if df.shape[0] > 0 ]
+    self._novos = [ ]
+
+    if len(novos) == 0:
+      self.salvar_manifesto()
+      return
+
+    novos  = pd.concat(novos, ignore_index = True)
+    novas  = agregar(novos, self.proximo)
+
+    repetidas = novas["votacoes"].merge(self.tabelas["votacoes"], on = TABELAS["votacoes"][0])
+
+    if repetidas.shape[0] > 0:
+      print(f"{repetidas.shape[0]} votações novas já estavam nas tabelas agregadas. Recalculando as tabelas.")
+      self.reconstruir()
+      return
+
+    self.tabelas  = combinar(self.tabelas, novas)
+    self.proximo += novos.shape[0]
+    self.revisao += 1
+
+    self.alteracoes.append( dict(revisao = self.revisao, **resumir(novas)) )
+    self.alteracoes = self.alteracoes[ -ALTERACOES_MANTIDAS : ]
+
+    self.salvar()
+
+  def alteracoes_desde(self, marcador):
+    '''
+    Retorna a união das alterações das revisões posteriores a um marcador
+    (ver marcador), com a chave "nomes" verdadeira se houver alguma, ou None
+    se elas não puderem ser conhecidas: o marcador é de outra sequência de
+    revisões, posterior à atual, ou anterior às alterações guardadas.
+
+    Parâmetros:
+    marcador -> Um dicionário retornado por marcador, ou None
+    '''
+    if marcador is None or marcador.get("id") != self.id or not 0 <= marcador.get("revisao", -1) <= self.revisao:
+      return None
+
+    posteriores = [ alteracao for alteracao in self.alteracoes if alteracao["revisao"] > marcador["revisao"] ]
+
+    if len(posteriores) != self.revisao - marcador["revisao"]:
+      return None
+
+    deputados, partidos, governos = set(), set(), { }
+
+    for alteracao in posteriores:
+      deputados.update(alteracao["deputados"])
+      partidos.update(alteracao["partidos"])
+
+      for governo, partidos_governo in alteracao["governos"].items():
+        governos.setdefault(governo, set()).update(partidos_governo)
+
+    return {
+      "deputados" : sorted(deputados),
+      "partidos"  : sorted(partidos),
+      "governos"  : { governo : sorted(partidos_governo) for governo, partidos_governo in governos.items() },
+      "historico" : any( alteracao["historico"] for alteracao in posteriores ),
+      "nomes"     : len(posteriores) > 0,
+    }
+
+  def marcador(self):
+    '''
+    Retorna o id e o número da revisão atual, para ser guardado junto com os
+    arquivos gerados a partir dela (ver alteracoes_desde)
+    '''
+    return { "id" : self.id, "revisao" : self.revisao }
+
+  def salvar(self):
+    '''
+    Salva as tabelas em um diretório novo e depois o manifesto que aponta para ele
+    '''
+    self._diretorio = f"tabelas-{uuid.uuid4().hex}"
+    diretorio       = os.path.join(self.caminho, self._diretorio)
+
+    os.makedirs(diretorio)
+
+    for nome, tabela in self.tabelas.items():
+      tabela.to_csv(os.path.join(diretorio, f"{nome}.csv.gz"), index = False)
+
+    self.salvar_manifesto()
+    self.limpar()
+
+  def salvar_manifesto(self):
+    '''
+    Salva o manifesto, associado à versão atual do banco de dados. O arquivo
+    é escrito primeiro em um temporário, para nunca ficar pela metade.
+    '''
+    os.makedirs(self.caminho, exist_ok = True)
+
+    dados = {
+      "versao"     : self.VERSAO,
+      "assinatura" : self.banco.assinatura(),
+      "id"         : self.id,
+      "revisao"    : self.revisao,
+      "proximo"    : self.proximo,
+      "tabelas"    : self._diretorio,
+      "alteracoes" : self.alteracoes,
+    }
+
+    temporario = f"{self.caminho_manifesto}.tmp"
+    with open(temporario, "w", encoding = "utf-8") as file:
+      json.dump(dados, file, ensure_ascii = False, indent = 1)
+
+    os.replace(temporario, self.caminho_manifesto)
+    armazenamento.sincronizar_diretorio(self.caminho)
+
+  def limpar(self):
+    '''
+    Apaga os diretórios de tabelas que não são o do manifesto
+    '''
+    for nome in os.listdir(self.caminho):
+      if nome.startswith("tabelas-") and nome != self._diretorio:
+        shutil.rmtree(os.path.join(self.caminho, nome))
@@ -0,0 +1,1293 @@
+'''
+Gravação e leitura do banco de dados de votos do Basômetro. Em vez de
+acumular todos os votos de um período na memória e montar um único DataFrame
+no final, os coletores entregam os votos de cada proposição a um
+GravadorVotos, que os filtra na hora e os escreve em disco em lotes de
+tamanho limitado. Assim, o consumo de memória não depende do número de anos
+coletados.
+
+O banco de dados pode estar em três formatos, com a mesma interface
+(BancoVotos, ver abrir_banco): um único arquivo CSV, um diretório com os
+votos em colunas comprimidas, particionados por governo e ano (BancoColunar),
+ou um arquivo SQLite com índices, para consultas (BancoSQLite).
+No formato colunar, a leitura pode se limitar a algumas colunas e a alguns
+governos e anos, e uma atualização apenas acrescenta arquivos novos. O CSV
+continua disponível como formato de exportação.
+
+Os votos são gravados e, se pedido, lidos com os tipos de esquema.ESQUEMA.
+'''
+
+from basometro.core import core, esquema
+from urllib.parse import quote
+import csv, json, os, shutil, sqlite3, uuid
+import numpy as np
+import pandas as pd
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Número de votos acumulados na memória antes de cada escrita em disco
+TAMANHO_LOTE = 50000
+
+# Formato das datas no banco de dados. É o formato que o atualizador espera encontrar.
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+
+# Colunas que identificam uma votação de uma proposição
+COLUNAS_VOTACAO = [ 'idVotacao', 'tipoProposicao', 'numeroProposicao', 'anoProposicao' ]
+
+# Arquivo, dentro do diretório do banco colunar, que lista os fragmentos que fazem parte dele
+MANIFESTO = "manifesto.json"
+
+# Número de fragmentos de uma partição do banco colunar a partir do qual eles são reunidos em um só
+MAX_FRAGMENTOS = 16
+
+# Colunas com índices no banco SQLite
+COLUNAS_INDEXADAS = [ 'ideCadastro', 'partido', 'governo', 'idVotacao', 'data' ]
+
+# Extensões de arquivo que abrir_banco reconhece como bancos SQLite
+EXTENSOES_SQLITE = ( ".sqlite", ".sqlite3", ".db" )
+
+###########
+# FILTROS #
+###########
+
+def filtrar_votos(df, keep_all = False):
+
+  '''
+  Aplica ao DataFrame de votos os filtros globais do Basômetro: remove
+  duplicatas, votos sem ideCadastro e, caso keep_all seja falso, ausências
+  e invocações do artigo 17.
+
+  Parâmetros:
+  df -> DataFrame de votos, com a coluna de data já convertida
+  keep_all -> Herdado da função que chamou esta
+  '''
+
+  '''
+  AVISO
+
+  A solução abaixo é terrível e podemos estar perdendo
+  dados relevantes. Entretanto, no estado atual da API,
+  é a saída possível.
+
+  Como a API retorna entradas duplicadas, seja porque há
+  votações inteiras ou votos individuais repetidos, precisamos
+  nos livrar deles. A maneira mais óbvia é um simples df.drop_duplicates().
+  Se o voto é rigorosamente igual, feito na mesma hora e na mesma votação
+  específica, as chances são altas de que seja uma duplicata.
+  Assim, vamos derrubar todas.
+  '''
+
+  df = df.drop_duplicates()
+
+  # Remove votos de parlamentares sem id – geralmente, senadores
+  df = df[ df.ideCadastro != "" ]
+
+  if keep_all is False:
+    # Remove ausências e art. 17
+    df = df [ (df.voto != "-") & (df.voto != "Art. 17")]
+
+  return df
+
+###############
+# ARQUIVO CSV #
+###############
+
+def conferir_csv(caminho):
+  '''
+  Confere se um banco de dados em CSV pode receber votos no final: o
+  cabeçalho tem que ter exatamente as colunas de core.COLUNAS_VOTO, em
+  qualquer ordem, e o arquivo tem que terminar com uma quebra de linha – do
+  contrário, uma gravação anterior foi interrompida no meio de um voto.
+  Retorna as colunas, na ordem do arquivo. Levanta ValueError se o arquivo
+  não passar na conferência.
+
+  Parâmetros:
+  caminho -> O caminho do arquivo CSV
+  '''
+  with open(caminho, encoding = "utf-8", newline = "") as file:
+    colunas = next(csv.reader(file), [ ])
+
+  if sorted(colunas) != sorted(core.COLUNAS_VOTO):
+    raise ValueError(f"O cabeçalho de {caminho} não corresponde às colunas do banco de dados: {colunas}")
+
+  with open(caminho, "rb") as file:
+    file.seek(-1, os.SEEK_END)
+
+    if file.read(1) != b"\n":
+      raise ValueError(f"{caminho} termina no meio de uma linha")
+
+  return colunas
+
+def truncar_csv(caminho, tamanho):
+  '''
+  Corta o arquivo no tamanho indicado, descartando o que foi escrito depois
+
+  Parâmetros:
+  caminho -> O caminho do arquivo
+  tamanho -> O tamanho, em bytes, registrado antes da gravação
+  '''
+  with open(caminho, "r+b") as file:
+    file.truncate(tamanho)
+    file.flush()
+    os.fsync(file.fileno())
+
+def sincronizar_diretorio(diretorio):
+  '''
+  Garante que a criação ou substituição de arquivos em um diretório chegou ao
+  disco. Sincronizar os próprios arquivos não basta para isso.
+  '''
+  descritor = os.open(diretorio, os.O_RDONLY)
+
+  try:
+    os.fsync(descritor)
+  finally:
+    os.close(descritor)
+
+###################
+# FORMATO COLUNAR #
+###################
+
+def codificar_coluna(serie):
+  '''
+  Codifica uma coluna como um dicionário com os valores distintos, no texto
+  que o CSV teria, e o código de cada linha nesse dicionário. Valores nulos
+  viram o texto vazio. Retorna o par (codigos, valores).
+
+  Parâmetros:
+  serie -> A coluna de um DataFrame de votos
+  '''
+  if pd.api.types.is_datetime64_any_dtype(serie):
+    serie = serie.dt.strftime(FORMATO_DATA)
+
+  # Apenas os valores distintos são convertidos para texto
+  codigos, valores = pd.factorize(serie)
+  valores = [ str(valor) for valor in valores ] + [ "" ]
+
+  codigos[codigos < 0] = len(valores) - 1
+
+  return codigos.astype(np.min_scalar_type(len(valores))), np.array(valores, dtype = str)
+
+def decodificar_coluna(codigos, valores, vazio = np.nan):
+  '''
+  Reconstrói uma coluna codificada por codificar_coluna. Como em
+  pd.read_csv(dtype = str), os valores vazios viram NaN.
+
+  Parâmetros:
+  codigos -> O código de cada linha
+  valores -> Os valores distintos da coluna
+  vazio -> O valor que substitui o texto vazio
+  '''
+  valores = valores.astype(object)
+  valores[valores == ""] = vazio
+
+  return valores[codigos]
+
+def chave_particao(df):
+  '''
+  Retorna o governo e o ano de cada voto – as chaves das partições do banco
+  colunar –, como texto. Votos sem governo ou sem data ficam com o texto vazio.
+
+  Parâmetros:
+  df -> DataFrame de votos
+  '''
+  governos = df['governo'].astype(object).fillna("").astype(str)
+
+  if pd.api.types.is_datetime64_any_dtype(df['data']):
+    anos = df['data'].dt.strftime("%Y").fillna("")
+  else:
+    anos = df['data'].astype(object).fillna("").astype(str).str[:4]
+
+  return governos, anos
+
+def filtrar_linhas(df, governos = None, anos = None, deputados = None):
+  '''
+  Mantém apenas os votos dos governos, anos e deputados pedidos, como em
+  BancoVotos.ler. Os filtros que forem None não são aplicados.
+
+  Parâmetros:
+  df -> DataFrame de votos com as colunas usadas nos filtros
+  governos, anos, deputados -> Como em BancoVotos.ler
+  '''
+  if governos is None and anos is None and deputados is None:
+    return df
+
+  governos_df, anos_df = chave_particao(df.reindex(columns = [ 'governo', 'data' ]))
+  mascara = np.ones(df.shape[0], dtype = bool)
+
+  if governos is not None:
+    mascara &= governos_df.isin(governos).values
+
+  if anos is not None:
+    mascara &= anos_df.isin([ str(ano) for ano in anos ]).values
+
+  if deputados is not None:
+    mascara &= df['ideCadastro'].isin([ str(deputado) for deputado in deputados ]).values
+
+  return df[mascara].reset_index(drop = True)
+
+def colunas_filtros(colunas, governos = None, anos = None, deputados = None):
+  '''
+  Acrescenta às colunas pedidas as que são usadas pelos filtros de filtrar_linhas
+  '''
+  if colunas is None:
+    return None
+
+  filtros = [ ('governo', governos), ('data', anos), ('ideCadastro', deputados) ]
+  return list(colunas) + [ coluna for coluna, filtro in filtros if filtro is not None and coluna not in colunas ]
+
+###########
+# CLASSES #
+###########
+
+class GravadorVotos(object):
+  '''
+  Escreve votos no arquivo CSV do banco de dados em lotes. Os votos são
+  gravados primeiro em um arquivo temporário, que só substitui o banco de
+  dados em concluir(); se a coleta falhar no meio, o arquivo anterior fica
+  intacto. Ao anexar, os votos novos vão direto para o final do banco de
+  dados, sem copiar os antigos, e descartar() corta o arquivo de volta ao
+  tamanho que ele tinha. Assim, uma atualização só escreve os votos novos.
+
+  Os filtros de filtrar_votos são aplicados a cada lote entregue ao gravador.
+  Votos duplicados só podem existir dentro de uma mesma votação de uma mesma
+  proposição – as colunas que as identificam fazem parte do voto –, então as
+  duplicatas são removidas entre os votos de cada chamada e, além disso, uma
+  votação que já foi gravada por uma chamada anterior (por exemplo, porque a
+  mesma proposição foi listada duas vezes) é descartada por inteiro. Para isso,
+  o gravador guarda apenas os identificadores das votações, e não os votos.
+  Quem for anexar votos a um banco de dados existente pode preencher
+  self.votacoes com as votações que já estão nele (ver indice.IndiceVotacoes).
+  O gravador também guarda a data da votação mais recente que escreveu e os
+  governos dos votos gravados (ver matriz.MatrizVotos.atualizar). Cada lote
+  escrito, já tipado, é entregue às funções de self.observadores, na ordem
+  em que chega ao banco de dados (ver agregados.AgregadosVotos.registrar).
+
+  Esta classe escreve no formato CSV; GravadorColunar troca apenas a forma
+  de gravar em disco (abrir, gravar, concluir e descartar).
+
+  Parâmetros:
+  caminho -> O caminho do arquivo CSV do banco de dados
+  keep_all -> Booleano que, se verdadeiro, mantém ausências e invocações do artigo 17
+  anexar -> Booleano. Se verdadeiro e o arquivo já existir, os novos votos são
+  acrescentados ao final dos que já estão nele, na mesma ordem de colunas.
+  O cabeçalho do arquivo é conferido antes (ver conferir_csv).
+  tamanho_lote -> Número de votos acumulados antes de cada escrita
+  '''
+
+  def __init__(self, caminho, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    self.caminho             = caminho
+    self.keep_all            = keep_all
+    self.tamanho_lote        = tamanho_lote
+    self.colunas             = core.COLUNAS_VOTO
+    self.gravados            = 0
+    self.votacoes            = set()
+    self.ultima_data         = None
+    self.governos            = set()
+    self.observadores        = [ ]
+    self._lote               = [ ]
+
+    self._indices = { coluna : index for index, coluna in enumerate(core.COLUNAS_VOTO) }
+
+    self.abrir(anexar)
+
+  def abrir(self, anexar):
+    '''
+    Prepara o arquivo temporário ou, ao anexar, abre o próprio banco de dados
+    para acrescentar votos ao final, depois de conferir o cabeçalho e guardar
+    o tamanho atual do arquivo.
+    '''
+    self.caminho_temporario  = f"{self.caminho}.tmp"
+    self.caminho_gravacao    = self.caminho_temporario
+    self._inicio             = None
+    self._cabecalho_escrito  = False
+
+    os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok = True)
+
+    if anexar and os.path.exists(self.caminho):
+
+      # Mantém a ordem das colunas do arquivo existente
+      self.colunas = conferir_csv(self.caminho)
+
+      self.caminho_gravacao   = self.caminho
+      self._inicio            = os.path.getsize(self.caminho)
+      self._cabecalho_escrito = True
+
+    self._file = open(self.caminho_gravacao, "a" if self._cabecalho_escrito else "w", encoding = "utf-8", newline = "")
+
+  def adicionar(self, votos):
+    '''
+    Filtra e acumula um core.LoteVotos – em geral, os votos de uma
+    proposição. O lote é escrito em disco quando atinge tamanho_lote.
+
+    Parâmetros:
+    votos -> Um core.LoteVotos ou uma lista de objetos core.Voto
+    '''
+    voto_index     = self._indices['voto']
+    cadastro_index = self._indices['ideCadastro']
+    votacao_index  = [ self._indices[coluna] for coluna in COLUNAS_VOTACAO ]
+
+    # dict.fromkeys remove as duplicatas mantendo a ordem original
+    linhas = dict.fromkeys( core.LoteVotos.de_votos(votos).linhas() )
+
+    novas_votacoes = set()
+
+    for linha in linhas:
+
+      votacao = tuple( linha[index] for index in votacao_index )
+      if votacao in self.votacoes:
+        continue
+
+      novas_votacoes.add(votacao)
+
+      # Remove votos de parlamentares sem id – geralmente, senadores
+      if linha[cadastro_index] == "":
+        continue
+
+      # Remove ausências e art. 17
+      if self.keep_all is False and linha[voto_index] in ("-", "Art. 17"):
+        continue
+
+      self._lote.append(linha)
+
+    self.votacoes.update(novas_votacoes)
+
+    if len(self._lote) >= self.tamanho_lote:
+      self.descarregar()
+
+  def adicionar_dataframe(self, df, filtrar = True):
+    '''
+    Escreve um DataFrame de votos, com a coluna de data já convertida,
+    depois dos votos acumulados até aqui.
+
+    Parâmetros:
+    df -> DataFrame de votos
+    filtrar -> Booleano. Se verdadeiro, aplica filtrar_votos e descarta as
+    votações já gravadas, como em adicionar(). Deve ser falso para votos
+    que já foram tratados, como os das votações adicionadas manualmente.
+    '''
+    self.descarregar()
+
+    if filtrar:
+      df = filtrar_votos(df, self.keep_all)
+
+      votacoes = list( zip( *[ df[coluna] for coluna in COLUNAS_VOTACAO ] ) )
+      df = df[ [ votacao not in self.votacoes for votacao in votacoes ] ]
+
+    self.votacoes.update( zip( *[ df[coluna] for coluna in COLUNAS_VOTACAO ] ) )
+
+    self.escrever(df)
+
+  def descarregar(self):
+    '''
+    Escreve em disco os votos acumulados
+    '''
+    if len(self._lote) == 0:
+      return
+
+    df = pd.DataFrame(self._lote, columns = core.COLUNAS_VOTO)
+    self._lote = [ ]
+
+    # Converte a coluna de data para um objeto ISO
+    df['data'] = pd.to_datetime(df.data, format = "%d/%m/%Y")
+
+    self.escrever(df)
+
+  def escrever(self, df):
+    '''
+    Acrescenta um DataFrame aos votos gravados, na ordem de colunas do banco,
+    depois de convertê-lo para os tipos de esquema.ESQUEMA
+    '''
+    df = esquema.aplicar(df.reindex(columns = self.colunas))
+
+    self.gravar(df)
+    self.gravados += df.shape[0]
+
+    for observador in self.observadores:
+      observador(df)
+
+    if df.shape[0] > 0:
+      self.governos.update( df['governo'].dropna().unique() )
+
+      data = pd.to_datetime(df['data']).max()
+      if self.ultima_data is None or data > self.ultima_data:
+        self.ultima_data = data
+
+  def gravar(self, df):
+    '''
+    Escreve um DataFrame, já com as colunas do banco, no arquivo de gravação
+    '''
+    df.to_csv(self._file, header = not self._cabecalho_escrito, index = False, date_format = FORMATO_DATA)
+    self._file.flush()
+
+    self._cabecalho_escrito = True
+
+  def ler_gravados(self, colunas):
+    '''
+    Lê, em partes, algumas colunas dos votos gravados até aqui – incluindo,
+    ao anexar, os que já estavam no banco de dados. Os campos vazios viram
+    NaN, como em BancoVotos.ler.
+
+    Parâmetros:
+    colunas -> As colunas lidas
+    '''
+    self.descarregar()
+
+    if not self._cabecalho_escrito:
+      return
+
+    yield from pd.read_csv(self.caminho_gravacao, dtype = str, usecols = colunas, chunksize = self.tamanho_lote)
+
+  def concluir(self):
+    '''
+    Escreve o que restou na memória e garante que os votos chegaram ao disco.
+    Ao anexar, o banco de dados já está completo; caso contrário, ele é
+    substituído pelo arquivo temporário. Se nenhum voto foi gravado, o arquivo
+    fica apenas com o cabeçalho.
+    '''
+    self.descarregar()
+
+    if not self._cabecalho_escrito:
+      self.escrever(pd.DataFrame(columns = self.colunas))
+
+    self._file.flush()
+    os.fsync(self._file.fileno())
+    self._file.close()
+
+    if self._inicio is None:
+      os.replace(self.caminho_temporario, self.caminho)
+      sincronizar_diretorio(os.path.dirname(os.path.abspath(self.caminho)))
+
+  def descartar(self):
+    '''
+    Abandona a gravação, mantendo o banco de dados anterior. Ao anexar, o
+    arquivo volta ao tamanho que tinha antes dos novos votos.
+    '''
+    self._file.close()
+
+    if self._inicio is not None:
+      truncar_csv(self.caminho, self._inicio)
+
+    elif os.path.exists(self.caminho_temporario):
+      os.remove(self.caminho_temporario)
+
+class GravadorColunar(GravadorVotos):
+  '''
+  Um GravadorVotos que escreve no formato colunar de um BancoColunar. Cada
+  lote é dividido entre as partições de governo e ano e vira um fragmento
+  novo em cada uma delas; os fragmentos só passam a fazer parte do banco de
+  dados quando o manifesto é substituído, em concluir(). Ao anexar, os
+  fragmentos que já estavam no banco de dados não são reescritos – apenas as
+  partições que passarem de MAX_FRAGMENTOS fragmentos são reunidas em um só.
+
+  Cada voto guarda sua posição no banco de dados, de forma que a leitura e a
+  exportação para CSV devolvem os votos na ordem em que foram gravados.
+
+  Parâmetros:
+  banco -> O BancoColunar de destino
+  keep_all, anexar, tamanho_lote -> Como em GravadorVotos
+  '''
+
+  def __init__(self, banco, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    self.banco = banco
+    super().__init__(banco.caminho, keep_all = keep_all, anexar = anexar, tamanho_lote = tamanho_lote)
+
+  def abrir(self, anexar):
+    manifesto = self.banco.manifesto()
+
+    if anexar and manifesto is not None:
+      self.colunas     = manifesto["colunas"]
+      self._anteriores = manifesto["fragmentos"]
+      self._ordem      = manifesto["proxima_ordem"]
+
+    else:
+      self._anteriores = [ ]
+      self._ordem      = 0
+
+    self._novos = [ ]
+
+    os.makedirs(self.caminho, exist_ok = True)
+
+  def gravar(self, df):
+    if df.shape[0] == 0:
+      return
+
+    ordem = np.arange(self._ordem, self._ordem + df.shape[0], dtype = np.int64)
+    self._ordem += df.shape[0]
+
+    governos, anos = chave_particao(df)
+
+    for (governo, ano), posicoes in df.groupby([ governos.values, anos.values ], sort = False).indices.items():
+      self._novos.append( self.banco.escrever_fragmento(df.take(posicoes), ordem[posicoes], governo, ano) )
+
+  def ler_gravados(self, colunas):
+    self.descarregar()
+
+    for fragmento in self._anteriores + self._novos:
+      yield self.banco.ler_fragmento(fragmento, colunas)
+
+  def compactar(self, fragmentos):
+    '''
+    Reúne em um único fragmento as partições com mais de MAX_FRAGMENTOS
+    fragmentos. Retorna a nova lista de fragmentos.
+    '''
+    particoes = { }
+    for fragmento in fragmentos:
+      particoes.setdefault( (fragmento["governo"], fragmento["ano"]), [ ] ).append(fragmento)
+
+    resultado = [ ]
+
+    for (governo, ano), grupo in particoes.items():
+
+      if len(grupo) <= MAX_FRAGMENTOS:
+        resultado.extend(grupo)
+        continue
+
+      df = self.banco.ler_fragmentos(grupo, self.colunas, com_ordem = True)
+      ordem = df.pop(BancoColunar.ORDEM).values
+
+      # Os valores vazios são gravados de novo como texto vazio
+      resultado.append( self.banco.escrever_fragmento(df, ordem, governo, ano) )
+
+    return resultado
+
+  def concluir(self):
+    self.descarregar()
+
+    fragmentos = self.compactar(self._anteriores + self._novos)
+
+    # Os fragmentos novos precisam estar no disco antes do manifesto que os lista
+    for particao in set( os.path.dirname(fragmento["arquivo"]) for fragmento in fragmentos ):
+      sincronizar_diretorio(os.path.join(self.caminho, particao))
+
+    self.banco.salvar_manifesto({
+      "versao"        : BancoColunar.VERSAO,
+      "colunas"       : list(self.colunas),
+      "linhas"        : sum( fragmento["linhas"] for fragmento in fragmentos ),
+      "proxima_ordem" : int(self._ordem),
+      "fragmentos"    : fragmentos,
+    })
+
+    # Apaga os fragmentos substituídos ou de gravações anteriores
+    self.banco.limpar()
+
+  def descartar(self):
+    for fragmento in self._novos:
+      caminho = os.path.join(self.caminho, fragmento["arquivo"])
+      if os.path.exists(caminho):
+        os.remove(caminho)
+
+class BancoVotos(object):
+  '''
+  Interface comum aos formatos do banco de dados de votos. Por padrão, os
+  votos lidos vêm como texto, com NaN nos campos vazios, como em
+  pd.read_csv(dtype = str).
+
+  Parâmetros:
+  caminho -> O caminho do banco de dados
+  '''
+
+  def __init__(self, caminho):
+    self.caminho = caminho
+
+  def existe(self):
+    raise NotImplementedError
+
+  def assinatura(self):
+    '''
+    Retorna o tamanho e a data de modificação do arquivo que identifica a versão
+    atual do banco de dados. Ver indice.IndiceVotacoes.
+    '''
+    raise NotImplementedError
+
+  def ler(self, colunas = None, governos = None, anos = None, deputados = None, tipado = False):
+    '''
+    Lê os votos do banco de dados como um DataFrame.
+
+    Parâmetros:
+    colunas -> As colunas lidas. O padrão é ler todas.
+    governos -> Se informado, apenas os votos desses governos são lidos
+    anos -> Se informado, apenas os votos desses anos são lidos
+    deputados -> Se informado, apenas os votos desses deputados (ideCadastro) são lidos
+    tipado -> Booleano. Se verdadeiro, as colunas vêm com os tipos de
+    esquema.ESQUEMA em vez de texto.
+    '''
+    raise NotImplementedError
+
+  def ler_em_partes(self, colunas = None):
+    '''
+    Lê os votos do banco de dados em partes, sem garantia de ordem entre elas
+
+    Parâmetros:
+    colunas -> As colunas lidas. O padrão é ler todas.
+    '''
+    raise NotImplementedError
+
+  def gravador(self, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    '''
+    Retorna um GravadorVotos que escreve neste banco de dados
+    '''
+    raise NotImplementedError
+
+  def exportar_csv(self, destino):
+    '''
+    Escreve o banco de dados inteiro em um arquivo CSV
+    '''
+    raise NotImplementedError
+
+  def marcar(self):
+    '''
+    Retorna um dicionário que descreve o tamanho atual do banco de dados.
+    Com ele, restaurar() desfaz os votos acrescentados depois, sem que seja
+    preciso copiar o banco de dados antes de uma atualização.
+    '''
+    raise NotImplementedError
+
+  def restaurar(self, marca):
+    '''
+    Descarta os votos gravados depois de marcar()
+
+    Parâmetros:
+    marca -> O dicionário devolvido por marcar()
+    '''
+    raise NotImplementedError
+
+  def copiar(self, destino):
+    '''
+    Copia o banco de dados para outro caminho, substituindo o que estiver lá
+    '''
+    raise NotImplementedError
+
+  def importar(self, origem):
+    '''
+    Substitui o conteúdo do banco de dados pelos votos de outro BancoVotos,
+    na mesma ordem e sem aplicar nenhum filtro
+    '''
+    gravador = self.gravador()
+
+    try:
+      for parte in origem.ler_em_partes():
+        gravador.adicionar_dataframe(parte, filtrar = False)
+
+    except BaseException:
+      gravador.descartar()
+      raise
+
+    gravador.concluir()
+
+class BancoCSV(BancoVotos):
+  '''
+  Banco de dados em um único arquivo CSV. A leitura de alguns governos, anos
+  ou deputados percorre o arquivo inteiro.
+  '''
+
+  def existe(self):
+    return os.path.isfile(self.caminho)
+
+  def assinatura(self):
+    estado = os.stat(self.caminho)
+    return [ estado.st_size, estado.st_mtime_ns ]
+
+  def ler(self, colunas = None, governos = None, anos = None, deputados = None, tipado = False):
+    df = pd.read_csv(self.caminho, dtype = str, usecols = colunas_filtros(colunas, governos, anos, deputados))
+    df = filtrar_linhas(df, governos, anos, deputados)
+
+    if colunas is not None:
+      df = df[ list(colunas) ]
+
+    return esquema.aplicar(df) if tipado else df
+
+  def ler_em_partes(self, colunas = None):
+    yield from pd.read_csv(self.caminho, dtype = str, usecols = colunas, chunksize = TAMANHO_LOTE)
+
+  def gravador(self, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    return GravadorVotos(self.caminho, keep_all = keep_all, anexar = anexar, tamanho_lote = tamanho_lote)
+
+  def exportar_csv(self, destino):
+    if os.path.abspath(destino) != os.path.abspath(self.caminho):
+      shutil.copyfile(self.caminho, destino)
+
+  def copiar(self, destino):
+    shutil.copyfile(self.caminho, destino)
+
+  def marcar(self):
+    conferir_csv(self.caminho)
+    return { "bytes" : os.path.getsize(self.caminho) }
+
+  def restaurar(self, marca):
+    truncar_csv(self.caminho, marca["bytes"])
+
+class BancoColunar(BancoVotos):
+  '''
+  Banco de dados em um diretório, particionado por governo e ano. Cada
+  partição é um subdiretório com um ou mais fragmentos, e cada fragmento é um
+  arquivo .npz comprimido que guarda, para cada coluna, os valores distintos
+  e o código de cada voto (ver codificar_coluna), além da posição dos votos
+  no banco de dados. O manifesto lista os fragmentos e as colunas; ele é
+  sempre substituído de uma vez, então uma gravação interrompida não altera o
+  banco de dados.
+
+  A leitura usa o manifesto para abrir apenas os fragmentos dos governos e
+  anos pedidos e, dentro deles, apenas as colunas pedidas.
+  '''
+
+  VERSAO = 1
+
+  # Nome da coluna com a posição de cada voto
+  ORDEM = "ordem"
+
+  def __init__(self, caminho):
+    super().__init__(caminho)
+    self.caminho_manifesto = os.path.join(caminho, MANIFESTO)
+
+  def existe(self):
+    return os.path.isfile(self.caminho_manifesto)
+
+  def assinatura(self):
+    estado = os.stat(self.caminho_manifesto)
+    return [ estado.st_size, estado.st_mtime_ns ]
+
+  def manifesto(self):
+    '''
+    Retorna o manifesto do banco de dados, ou None se ele não existir
+    '''
+    if not self.existe():
+      return None
+
+    with open(self.caminho_manifesto, encoding = "utf-8") as file:
+      manifesto = json.load(file)
+
+    if manifesto.get("versao") != self.VERSAO:
+      raise ValueError(f"O banco de dados em {self.caminho} tem uma versão não suportada: {manifesto.get('versao')}")
+
+    return manifesto
+
+  def salvar_manifesto(self, manifesto):
+    temporario = f"{self.caminho_manifesto}.tmp"
+
+    with open(temporario, "w", encoding = "utf-8") as file:
+      json.dump(manifesto, file, ensure_ascii = False, indent = 1)
+      file.flush()
+      os.fsync(file.fileno())
+
+    os.replace(temporario, self.caminho_manifesto)
+    sincronizar_diretorio(self.caminho)
+
+  def escrever_fragmento(self, df, ordem, governo, ano):
+    '''
+    Escreve os votos de uma partição em um fragmento novo e retorna a entrada dele no manifesto
+
+    Parâmetros:
+    df -> DataFrame de votos, todos da mesma partição
+    ordem -> A posição de cada voto no banco de dados
+    governo, ano -> As chaves da partição
+    '''
+    particao = os.path.join(f"governo={quote(governo, safe = ' ')}", f"ano={ano}")
+    arquivo  = os.path.join(particao, f"{uuid.uuid4().hex}.npz")
+
+    arrays = { self.ORDEM : np.asarray(ordem, dtype = np.int64) }
+
+    for coluna in df.columns:
+      arrays[f"{coluna}.codigos"], arrays[f"{coluna}.valores"] = codificar_coluna(df[coluna])
+
+    os.makedirs(os.path.join(self.caminho, particao), exist_ok = True)
+
+    with open(os.path.join(self.caminho, arquivo), "wb") as file:
+      np.savez_compressed(file, **arrays)
+      file.flush()
+      os.fsync(file.fileno())
+
+    return { "arquivo" : arquivo, "governo" : governo, "ano" : ano, "linhas" : int(df.shape[0]),
+             "primeira" : int(arrays[self.ORDEM].min()), "ultima" : int(arrays[self.ORDEM].max()) }
+
+  def ler_colunas(self, fragmento, colunas, decodificar = True):
+    '''
+    Lê algumas colunas de um fragmento. Retorna um dicionário com um array
+    para cada coluna, além da coluna ORDEM.
+
+    Parâmetros:
+    fragmento -> A entrada do fragmento no manifesto
+    colunas -> As colunas lidas
+    decodificar -> Booleano. Se falso, cada coluna vem como o par (codigos,
+    valores) de codificar_coluna, em vez do array com os valores.
+    '''
+    with np.load(os.path.join(self.caminho, fragmento["arquivo"]), allow_pickle = False) as arquivo:
+
+      dados = { self.ORDEM : arquivo[self.ORDEM] }
+
+      for coluna in colunas:
+        codificada    = ( arquivo[f"{coluna}.codigos"], arquivo[f"{coluna}.valores"] )
+        dados[coluna] = decodificar_coluna(*codificada) if decodificar else codificada
+
+    return dados
+
+  def ler_fragmento(self, fragmento, colunas):
+    '''
+    Lê algumas colunas de um fragmento como um DataFrame
+    '''
+    dados = self.ler_colunas(fragmento, colunas)
+    return pd.DataFrame(dados, columns = list(colunas))
+
+  def ler_fragmentos(self, fragmentos, colunas, com_ordem = False, tipado = False):
+    '''
+    Lê e junta vários fragmentos, com os votos na ordem em que foram gravados.
+    Com tipado, as colunas são convertidas para os tipos de esquema.ESQUEMA
+    sem passar por uma coluna de texto: os dicionários dos fragmentos são
+    reunidos em um só e apenas os valores distintos são convertidos.
+    '''
+    if len(fragmentos) == 0:
+      df = pd.DataFrame(columns = ([ self.ORDEM ] if com_ordem else [ ]) + list(colunas))
+      return esquema.aplicar(df) if tipado else df
+
+    partes   = [ self.ler_colunas(fragmento, colunas, decodificar = not tipado) for fragmento in fragmentos ]
+    ordem    = np.concatenate([ parte[self.ORDEM] for parte in partes ])
+    posicoes = np.argsort(ordem, kind = "stable")
+
+    dados = { }
+
+    if com_ordem:
+      dados[self.ORDEM] = ordem[posicoes]
+
+    if not tipado:
+      for coluna in colunas:
+        dados[coluna] = np.concatenate([ parte[coluna] for parte in partes ])[posicoes]
+
+      return pd.DataFrame(dados, columns = list(dados.keys()))
+
+    # Um dicionário para cada coluna, comum a todos os fragmentos, e o código de cada voto nele
+    dicionarios = { }
+
+    for coluna in colunas:
+      valores = np.unique(np.concatenate([ parte[coluna][1] for parte in partes ]))
+      codigos = np.concatenate([ np.searchsorted(valores, parte[coluna][1])[parte[coluna][0]] for parte in partes ])
+
+      dicionarios[coluna] = ( codigos[posicoes], valores )
+
+    for coluna, (codigos, valores) in dicionarios.items():
+
+      # O texto vazio, que representa os nulos, é o primeiro valor do dicionário ordenado
+      if len(valores) > 0 and valores[0] == "":
+        codigos, valores = codigos.astype(np.int64) - 1, valores[1:]
+
+      categorias = None
+      if esquema.ESQUEMA[coluna] == "categoria":
+        categorias = esquema.categorias([ dicionarios[outra][1] for outra in esquema.dominio(coluna) if outra in dicionarios ])
+        categorias = [ categoria for categoria in categorias if categoria != "" ]
+
+      dados[coluna] = esquema.tipar_dicionario(coluna, codigos, valores, categorias)
+
+    # Ver esquema.aplicar
+    return pd.DataFrame(dados)
+
+  def selecionar(self, manifesto, governos = None, anos = None):
+    '''
+    Retorna os fragmentos do manifesto que pertencem aos governos e anos pedidos
+    '''
+    fragmentos = manifesto["fragmentos"]
+
+    if governos is not None:
+      governos   = set(governos)
+      fragmentos = [ fragmento for fragmento in fragmentos if fragmento["governo"] in governos ]
+
+    if anos is not None:
+      anos       = set( str(ano) for ano in anos )
+      fragmentos = [ fragmento for fragmento in fragmentos if fragmento["ano"] in anos ]
+
+    return fragmentos
+
+  def ler(self, colunas = None, governos = None, anos = None, deputados = None, tipado = False):
+    manifesto = self.manifesto()
+
+    if manifesto is None:
+      raise FileNotFoundError(f"Não há um banco de dados em {self.caminho}")
+
+    if colunas is None:
+      colunas = manifesto["colunas"]
+
+    fragmentos = self.selecionar(manifesto, governos, anos)
+
+    # Os deputados não são chave de partição: os votos dos outros são descartados depois da leitura
+    if deputados is None:
+      return self.ler_fragmentos(fragmentos, colunas, tipado = tipado)
+
+    df = self.ler_fragmentos(fragmentos, colunas_filtros(colunas, deputados = deputados))
+    df = filtrar_linhas(df, deputados = deputados)[ list(colunas) ]
+
+    return esquema.aplicar(df) if tipado else df
+
+  def ler_em_partes(self, colunas = None):
+    manifesto = self.manifesto()
+
+    if manifesto is None:
+      raise FileNotFoundError(f"Não há um banco de dados em {self.caminho}")
+
+    if colunas is None:
+      colunas = manifesto["colunas"]
+
+    for fragmento in manifesto["fragmentos"]:
+      yield self.ler_fragmento(fragmento, colunas)
+
+  def gravador(self, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    return GravadorColunar(self, keep_all = keep_all, anexar = anexar, tamanho_lote = tamanho_lote)
+
+  def exportar_csv(self, destino):
+    # O arquivo é escrito primeiro em um temporário, para nunca ficar pela metade
+    temporario = f"{destino}.tmp"
+
+    self.ler().to_csv(temporario, index = False)
+    os.replace(temporario, destino)
+
+  def copiar(self, destino):
+    if os.path.exists(destino):
+      shutil.rmtree(destino)
+
+    shutil.copytree(self.caminho, destino)
+
+  def marcar(self):
+    manifesto = self.manifesto()
+    return { "linhas" : manifesto["proxima_ordem"] if manifesto is not None else 0 }
+
+  def intervalo(self, fragmento):
+    '''
+    Retorna a primeira e a última posição dos votos de um fragmento. Manifestos
+    antigos não as registram; nesse caso, elas são lidas do fragmento.
+    '''
+    if "primeira" in fragmento:
+      return fragmento["primeira"], fragmento["ultima"]
+
+    ordem = self.ler_colunas(fragmento, [ ])[self.ORDEM]
+    return int(ordem.min()), int(ordem.max())
+
+  def restaurar(self, marca):
+    '''
+    Descarta os votos cuja posição é igual ou posterior à marca. Os
+    fragmentos que só têm votos novos saem do manifesto; os que misturam
+    votos antigos e novos – reunidos por compactação – são reescritos.
+    '''
+    manifesto = self.manifesto()
+    limite    = marca["linhas"]
+
+    if manifesto is None or manifesto["proxima_ordem"] <= limite:
+      return
+
+    fragmentos = [ ]
+
+    for fragmento in manifesto["fragmentos"]:
+      primeira, ultima = self.intervalo(fragmento)
+
+      if ultima < limite:
+        fragmentos.append(fragmento)
+
+      elif primeira < limite:
+        df    = self.ler_fragmentos([ fragmento ], manifesto["colunas"], com_ordem = True)
+        df    = df[ df[self.ORDEM] < limite ]
+        ordem = df.pop(self.ORDEM).values
+
+        fragmentos.append( self.escrever_fragmento(df, ordem, fragmento["governo"], fragmento["ano"]) )
+
+    manifesto["fragmentos"]    = fragmentos
+    manifesto["linhas"]        = sum( fragmento["linhas"] for fragmento in fragmentos )
+    manifesto["proxima_ordem"] = limite
+
+    self.salvar_manifesto(manifesto)
+    self.limpar()
+
+  def limpar(self):
+    '''
+    Apaga os arquivos de fragmentos que não estão no manifesto
+    '''
+    manifesto = self.manifesto()
+    arquivos  = set( os.path.normpath(fragmento["arquivo"]) for fragmento in manifesto["fragmentos"] )
+
+    for raiz, diretorios, nomes in os.walk(self.caminho, topdown = False):
+
+      for nome in nomes:
+        caminho = os.path.join(raiz, nome)
+        if nome.endswith(".npz") and os.path.relpath(caminho, self.caminho) not in arquivos:
+          os.remove(caminho)
+
+      if raiz != self.caminho and len(os.listdir(raiz)) == 0:
+        os.rmdir(raiz)
+
+class GravadorSQLite(GravadorVotos):
+  '''
+  Um GravadorVotos que escreve em um BancoSQLite. Todos os votos de uma
+  gravação entram em uma única transação, em inserções de um lote por vez.
+  Numa gravação nova, o banco de dados é montado em um arquivo temporário,
+  sem diário de transações, e os índices só são criados no final, o que é
+  mais rápido do que atualizá-los a cada lote; o arquivo substitui o banco
+  de dados em concluir(). Ao anexar, a transação é feita no próprio banco de
+  dados, e descartar() a desfaz.
+
+  Parâmetros:
+  banco -> O BancoSQLite de destino
+  keep_all, anexar, tamanho_lote -> Como em GravadorVotos
+  '''
+
+  def __init__(self, banco, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    self.banco = banco
+    super().__init__(banco.caminho, keep_all = keep_all, anexar = anexar, tamanho_lote = tamanho_lote)
+
+  def abrir(self, anexar):
+    self.caminho_temporario = f"{self.caminho}.tmp"
+    self._anexando          = anexar and self.banco.existe()
+
+    os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok = True)
+
+    if self._anexando:
+      self._conexao = self.banco.conectar()
+      self.colunas  = self.banco.conferir(self._conexao)
+
+    else:
+      if os.path.exists(self.caminho_temporario):
+        os.remove(self.caminho_temporario)
+
+      self._conexao = self.banco.conectar(self.caminho_temporario)
+      self._conexao.execute("PRAGMA journal_mode = OFF")
+      self._conexao.execute("PRAGMA synchronous = OFF")
+      self.banco.criar_tabela(self._conexao)
+
+    self._conexao.execute("BEGIN")
+
+  def gravar(self, df):
+    if df.shape[0] == 0:
+      return
+
+    colunas = [ decodificar_coluna(*codificar_coluna(df[coluna]), vazio = None) for coluna in df.columns ]
+    marcadores = ", ".join( "?" for _ in df.columns )
+
+    self._conexao.executemany(f"INSERT INTO {BancoSQLite.TABELA} VALUES ({marcadores})", zip(*colunas))
+
+  def ler_gravados(self, colunas):
+    self.descarregar()
+
+    # A conexão enxerga os votos da transação ainda não confirmada
+    yield from self.banco.consultar(f"SELECT {BancoSQLite.selecionar(colunas)} FROM {BancoSQLite.TABELA}",
+                                    conexao = self._conexao, chunksize = self.tamanho_lote)
+
+  def concluir(self):
+    self.descarregar()
+
+    if not self._anexando:
+      self.banco.criar_indices(self._conexao)
+
+    self._conexao.execute("COMMIT")
+    self._conexao.close()
+
+    if not self._anexando:
+      os.replace(self.caminho_temporario, self.caminho)
+      sincronizar_diretorio(os.path.dirname(os.path.abspath(self.caminho)))
+
+  def descartar(self):
+    self._conexao.execute("ROLLBACK")
+    self._conexao.close()
+
+    if not self._anexando and os.path.exists(self.caminho_temporario):
+      os.remove(self.caminho_temporario)
+
+class BancoSQLite(BancoVotos):
+  '''
+  Banco de dados em um arquivo SQLite, com uma linha da tabela TABELA para
+  cada voto, na ordem em que foram gravados, e índices nas colunas de
+  COLUNAS_INDEXADAS. Os valores são guardados como texto, com NULL nos campos
+  vazios. A leitura de alguns governos, anos ou deputados é feita por uma
+  consulta que usa os índices, e consultar() aceita qualquer consulta SQL.
+  '''
+
+  TABELA = "votos"
+
+  def conectar(self, caminho = None):
+    '''
+    Abre uma conexão com o banco de dados, com as transações controladas
+    explicitamente por quem a usa. Outro caminho pode ser informado para
+    criar um banco de dados novo.
+    '''
+    # O sqlite3 criaria um banco de dados vazio no lugar de um que não existe
+    if caminho is None and not self.existe():
+      raise FileNotFoundError(f"Não há um banco de dados em {self.caminho}")
+
+    return sqlite3.connect(caminho or self.caminho, isolation_level = None)
+
+  @staticmethod
+  def selecionar(colunas):
+    return ", ".join( f'"{coluna}"' for coluna in colunas )
+
+  def criar_tabela(self, conexao):
+    definicoes = ", ".join( f'"{coluna}" TEXT' for coluna in core.COLUNAS_VOTO )
+    conexao.execute(f"CREATE TABLE {self.TABELA} ({definicoes})")
+
+  def criar_indices(self, conexao):
+    for coluna in COLUNAS_INDEXADAS:
+      conexao.execute(f'CREATE INDEX IF NOT EXISTS "{self.TABELA}_{coluna}" ON {self.TABELA} ("{coluna}")')
+
+  def conferir(self, conexao):
+    '''
+    Retorna as colunas da tabela, na ordem do banco de dados, depois de
+    conferir se são as de core.COLUNAS_VOTO. Levanta ValueError se não forem.
+    '''
+    colunas = [ linha[1] for linha in conexao.execute(f"PRAGMA table_info({self.TABELA})") ]
+
+    if sorted(colunas) != sorted(core.COLUNAS_VOTO):
+      raise ValueError(f"A tabela {self.TABELA} de {self.caminho} não corresponde às colunas do banco de dados: {colunas}")
+
+    return colunas
+
+  def consultar(self, sql, parametros = (), conexao = None, chunksize = None):
+    '''
+    Executa uma consulta SQL e retorna o resultado como DataFrame, com NaN
+    nos campos vazios. Com chunksize, retorna um gerador de DataFrames.
+
+    Parâmetros:
+    sql -> A consulta, que pode usar ? para os parâmetros
+    parametros -> Os valores dos parâmetros
+    conexao -> Uma conexão já aberta. O padrão é abrir uma só para a consulta.
+    chunksize -> Número de linhas de cada parte do resultado
+    '''
+    def nulos_para_nan(df):
+      # Apenas as colunas que têm algum NULL são trocadas
+      for coluna in df.columns:
+        nulos = pd.isnull(df[coluna].values)
+
+        if nulos.any():
+          valores = df[coluna].values.astype(object)
+          valores[nulos] = np.nan
+          df[coluna] = valores
+
+      return df
+
+    def partes(conexao_consulta):
+      try:
+        for parte in pd.read_sql_query(sql, conexao_consulta, params = parametros, chunksize = chunksize):
+          yield nulos_para_nan(parte)
+
+      finally:
+        if conexao is None:
+          conexao_consulta.close()
+
+    conexao_consulta = conexao if conexao is not None else self.conectar()
+
+    if chunksize is not None:
+      return partes(conexao_consulta)
+
+    try:
+      return nulos_para_nan(pd.read_sql_query(sql, conexao_consulta, params = parametros))
+
+    finally:
+      if conexao is None:
+        conexao_consulta.close()
+
+  def colunas(self):
+    conexao = self.conectar()
+
+    try:
+      return self.conferir(conexao)
+    finally:
+      conexao.close()
+
+  def existe(self):
+    return os.path.isfile(self.caminho)
+
+  def assinatura(self):
+    estado = os.stat(self.caminho)
+    return [ estado.st_size, estado.st_mtime_ns ]
+
+  def ler(self, colunas = None, governos = None, anos = None, deputados = None, tipado = False):
+    if colunas is None:
+      colunas = self.colunas()
+
+    condicoes  = [ ]
+    parametros = [ ]
+
+    def pertence(coluna, valores):
+      valores = [ str(valor) for valor in valores ]
+      condicoes.append( f'"{coluna}" IN ({", ".join( "?" for _ in valores )})' )
+      parametros.extend(valores)
+
+    if governos is not None:
+      pertence("governo", governos)
+
+    if deputados is not None:
+      pertence("ideCadastro", deputados)
+
+    # Um intervalo de datas, em vez de uma função sobre a coluna, permite usar o índice
+    if anos is not None:
+      intervalos = [ ]
+      for ano in anos:
+        intervalos.append('("data" >= ? AND "data" < ?)')
+        parametros.extend([ str(ano), str(int(ano) + 1) ])
+
+      condicoes.append( "(" + " OR ".join(intervalos or [ "0" ]) + ")" )
+
+    sql = f"SELECT {self.selecionar(colunas)} FROM {self.TABELA}"
+    if len(condicoes) > 0:
+      sql += " WHERE " + " AND ".join(condicoes)
+
+    df = self.consultar(sql + " ORDER BY rowid", parametros)
+    return esquema.aplicar(df) if tipado else df
+
+  def ler_em_partes(self, colunas = None):
+    if colunas is None:
+      colunas = self.colunas()
+
+    yield from self.consultar(f"SELECT {self.selecionar(colunas)} FROM {self.TABELA} ORDER BY rowid", chunksize = TAMANHO_LOTE)
+
+  def gravador(self, keep_all = False, anexar = False, tamanho_lote = TAMANHO_LOTE):
+    return GravadorSQLite(self, keep_all = keep_all, anexar = anexar, tamanho_lote = tamanho_lote)
+
+  def exportar_csv(self, destino):
+    temporario = f"{destino}.tmp"
+
+    self.ler().to_csv(temporario, index = False)
+    os.replace(temporario, destino)
+
+  def copiar(self, destino):
+    # A cópia pela API de backup do SQLite é consistente mesmo com o banco de dados em uso
+    origem  = self.conectar()
+    conexao = sqlite3.connect(destino)
+
+    try:
+      origem.backup(conexao)
+    finally:
+      conexao.close()
+      origem.close()
+
+  def marcar(self):
+    conexao = self.conectar()
+
+    try:
+      ultima, = conexao.execute(f"SELECT coalesce(max(rowid), 0) FROM {self.TABELA}").fetchone()
+    finally:
+      conexao.close()
+
+    return { "linhas" : ultima }
+
+  def restaurar(self, marca):
+    conexao = self.conectar()
+
+    try:
+      conexao.execute(f"DELETE FROM {self.TABELA} WHERE rowid > ?", (marca["linhas"], ))
+    finally:
+      conexao.close()
+
+def abrir_banco(caminho):
+  '''
+  Retorna o BancoVotos de um caminho: um BancoCSV se ele terminar em .csv, um
+  BancoSQLite se terminar em uma das EXTENSOES_SQLITE e, caso contrário, um
+  BancoColunar. Um BancoVotos é devolvido sem alterações.
+
+  Parâmetros:
+  caminho -> O caminho do banco de dados
+  '''
+  if isinstance(caminho, BancoVotos):
+    return caminho
+
+  if str(caminho).endswith(".csv"):
+    return BancoCSV(caminho)
+
+  if str(caminho).endswith(EXTENSOES_SQLITE):
+    return BancoSQLite(caminho)
+
+  return BancoColunar(caminho)
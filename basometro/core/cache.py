@@ -0,0 +1,200 @@
+'''
+Cache em disco das respostas da API da Câmara dos Deputados. Cada resposta
+é salva, comprimida, em um arquivo próprio cujo nome é derivado do método
+e dos parâmetros da requisição. A validade de cada entrada é decidida no
+momento da leitura, a partir dos critérios informados pelo chamador, e o
+tamanho total do cache é limitado: quando ele passa do limite, as entradas
+usadas há mais tempo são apagadas.
+'''
+
+import gzip, hashlib, json, os, threading, time
+
+class CacheRespostas(object):
+  '''
+  Armazena as respostas da API em arquivos json comprimidos com gzip.
+
+  Parâmetros:
+  diretorio -> O diretório onde os arquivos do cache são salvos. Ele só é
+  criado quando a primeira resposta for gravada.
+  tamanho_maximo -> O tamanho máximo, em bytes, que o cache pode ocupar
+  em disco. O padrão é 1 GB.
+  '''
+
+  def __init__(self, diretorio, tamanho_maximo = 1024 ** 3):
+    self.diretorio      = diretorio
+    self.tamanho_maximo = tamanho_maximo
+    self.acertos        = 0
+    self.falhas         = 0
+    self._tamanho       = None
+    self._lock          = threading.Lock()
+
+  def caminho(self, metodo, params):
+    '''
+    Retorna o caminho do arquivo que guarda a resposta para o par
+    método e parâmetros. A ordem dos parâmetros não importa.
+    '''
+    chave = json.dumps([ metodo, { str(k) : str(v) for k, v in params.items() } ], sort_keys = True)
+    chave = hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+    return os.path.join(self.diretorio, metodo, chave[:2], f"{chave}.json.gz")
+
+  def ler(self, metodo, params, ttl = None, gravado_apos = None):
+    '''
+    Retorna a entrada salva para a requisição, ou None caso ela não exista
+    ou esteja vencida. Uma entrada é válida se foi gravada há menos de ttl
+    segundos ou depois do instante gravado_apos. Se os dois critérios forem
+    nulos, a entrada nunca vence. A entrada é um dicionário com a chave
+    "payload" ou, caso a requisição tenha levantado uma exceção conhecida, "erro".
+
+    Parâmetros:
+    metodo -> O nome do método do camaraPy
+    params -> Os parâmetros passados para o método
+    ttl -> A idade máxima aceitável da entrada, em segundos
+    gravado_apos -> Timestamp a partir do qual a entrada é sempre válida
+    '''
+    caminho = self.caminho(metodo, params)
+
+    try:
+      with gzip.open(caminho, "rt", encoding = "utf-8") as file:
+        entrada = json.load(file)
+
+    except (OSError, ValueError):
+      with self._lock:
+        self.falhas += 1
+      return None
+
+    if not self.valida(entrada, ttl, gravado_apos):
+      with self._lock:
+        self.falhas += 1
+      return None
+
+    # Atualiza a data de modificação para que a entrada
+    # seja considerada recém-usada na hora de liberar espaço
+    try:
+      os.utime(caminho, None)
+    except OSError:
+      pass
+
+    with self._lock:
+      self.acertos += 1
+
+    return entrada
+
+  @staticmethod
+  def valida(entrada, ttl, gravado_apos):
+    '''
+    Aplica os critérios de validade descritos em ler()
+    '''
+    if ttl is None and gravado_apos is None:
+      return True
+
+    if ttl is not None and time.time() - entrada["gravado_em"] <= ttl:
+      return True
+
+    return gravado_apos is not None and entrada["gravado_em"] >= gravado_apos
+
+  def escrever(self, metodo, params, payload = None, erro = None):
+    '''
+    Grava no cache a resposta (ou o nome da exceção) de uma requisição.
+
+    Parâmetros:
+    metodo -> O nome do método do camaraPy
+    params -> Os parâmetros passados para o método
+    payload -> O objeto retornado pelo camaraPy
+    erro -> O nome da exceção levantada pelo camaraPy, se houver
+    '''
+    caminho = self.caminho(metodo, params)
+    os.makedirs(os.path.dirname(caminho), exist_ok = True)
+
+    entrada = {
+      "metodo"     : metodo,
+      "params"     : params,
+      "gravado_em" : time.time(),
+      "payload"    : payload,
+      "erro"       : erro,
+    }
+
+    # Escreve em um arquivo temporário e depois o renomeia, para que
+    # uma leitura simultânea nunca encontre um arquivo pela metade
+    temp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(temp, "wt", encoding = "utf-8") as file:
+      json.dump(entrada, file)
+
+    tamanho_anterior = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+    os.replace(temp, caminho)
+
+    with self._lock:
+      if self._tamanho is None:
+        self._tamanho = self.calcular_tamanho()
+      else:
+        self._tamanho += os.path.getsize(caminho) - tamanho_anterior
+
+      if self._tamanho > self.tamanho_maximo:
+        self.liberar_espaco()
+
+  def calcular_tamanho(self):
+    '''
+    Soma o tamanho de todos os arquivos do cache
+    '''
+    return sum( tamanho for _, _, tamanho in self.listar_entradas() )
+
+  def listar_entradas(self):
+    '''
+    Retorna uma lista de triplas (caminho, data de último uso, tamanho) das
+    entradas do cache. Os processos da instalação dividida por ano usam o
+    mesmo diretório, então uma entrada pode ser apagada por outro processo
+    enquanto o diretório é percorrido; ela simplesmente fica de fora.
+    '''
+    entradas = [ ]
+
+    for raiz, _, arquivos in os.walk(self.diretorio):
+      for arquivo in arquivos:
+        if arquivo.endswith(".json.gz"):
+          caminho = os.path.join(raiz, arquivo)
+
+          try:
+            estado = os.stat(caminho)
+          except FileNotFoundError:
+            continue
+
+          entradas.append( (caminho, estado.st_mtime, estado.st_size) )
+
+    return entradas
+
+  def liberar_espaco(self):
+    '''
+    Apaga as entradas usadas há mais tempo até que o cache
+    ocupe no máximo 90% do tamanho permitido.
+    '''
+    entradas = sorted(self.listar_entradas(), key = lambda item: item[1])
+
+    tamanho = sum( tamanho_arquivo for _, _, tamanho_arquivo in entradas )
+    limite  = self.tamanho_maximo * 0.9
+
+    for caminho, _, tamanho_arquivo in entradas:
+
+      if tamanho <= limite:
+        break
+
+      # Outro processo pode ter apagado a entrada ao liberar espaço ao mesmo tempo
+      try:
+        os.remove(caminho)
+      except FileNotFoundError:
+        pass
+
+      tamanho -= tamanho_arquivo
+
+    self._tamanho = tamanho
+
+  def zerar_estatisticas(self):
+    with self._lock:
+      self.acertos = 0
+      self.falhas  = 0
+
+  def somar_estatisticas(self, acertos, falhas):
+    '''
+    Soma aos contadores os de outro processo que usou o mesmo cache
+    '''
+    with self._lock:
+      self.acertos += acertos
+      self.falhas  += falhas
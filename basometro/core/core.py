@@ -1,6 +1,7 @@
 from camaraPy.api_original.core import core, custom_exceptions
 from camaraPy.api_original import proposicoes, deputados
-import datetime
+import array, bisect, datetime, itertools, sys, threading, warnings
+import numpy as np
 import pandas as pd
 
 ######################
@@ -19,11 +20,111 @@ GOVERNOS_SUPORTADOS = {
   "Bolsonaro 1" : (  "1/1/2019",  "31/12/2021" ),
 }
 
+# Intervalos de tempo suportados para agrupar os votos
+FREQUENCIAS = [ 'MS', '2MS', '3MS', '4MS',
+                '5MS', '6MS', '7MS', '8MS',
+                '9MS', '10MS', '11MS', '12MS' ]
+
+# Atributos de cada objeto Voto, na ordem em que viram colunas do banco de dados
+COLUNAS_VOTO = [ 'parlamentar', 'ideCadastro', 'UF', 'voto', 'partido', 'descricaoPartido',
+                 'orientacaoGoverno', 'data', 'hora', 'governo', 'idVotacao',
+                 'tipoProposicao', 'numeroProposicao', 'anoProposicao' ]
+
+# Colunas que variam de deputado para deputado e colunas que são iguais
+# para todos os votos de uma mesma votação, nas posições de COLUNAS_VOTO
+COLUNAS_DEPUTADO      = COLUNAS_VOTO[:6]
+COLUNAS_DADOS_VOTACAO = COLUNAS_VOTO[6:]
+
+# Colunas com o partido do deputado, que os lotes de votos guardam como um
+# código do REGISTRO_PARTIDOS, e as demais colunas de cada deputado
+COLUNAS_PARTIDO       = [ 'partido', 'descricaoPartido' ]
+COLUNAS_PARLAMENTAR   = COLUNAS_DEPUTADO[:4]
+
+# Correções do nome dos partidos, aplicadas por padronizar_partido
+CORRESPONDENCIA_PARTIDOS = {
+  "PPB"        : "Progressistas",
+  "PP"         : "Progressistas",
+  "PPS"        : "Cidadania",
+  "CIDADANIA"  : "Cidadania",
+  "PFL"        : "DEM",
+  "PMDB"       : "MDB",
+  "S.Part."    : "Sem Partido",
+  "PMR"        : "PRB",
+  "PTdoB"      : "Avante",
+  "PEN"        : "Patriota",
+  "SD"         : "Solidariedade",
+  "SDD"        : "Solidariedade",
+  "Solidaried" : "Solidariedade",
+  "PSDC"       : "DC",
+  "PTN"        : "Podemos",
+  "PODE"       : "Podemos",
+  "PODEMOS"    : "Podemos",
+  "NOVO"       : "NOVO",
+  "PR"         : "PL",
+}
+
+# Descrição de cada partido já padronizado, usada por pegar_descricao_partido
+DESCRICOES_PARTIDOS = {
+  'MDB'          : "Movimento Democrático Brasileiro",
+  'Cidadania'    : "Antigo Partido Popular Socialista (PPS)",
+  'PDT'          : "Partido Democrático Trabalhista",
+  'PT'           : "Partido dos Trabalhadores",
+  'PSB'          : "Partido Socialista Brasileiro",
+  'DEM'          : "Democratas",
+  'PTB'          : "Partido Trabalhista Brasileiro",
+  'PL'           : "Partido Liberal – antigo Partido da República (PR)",
+  'Progressistas': "Antigo Partido Progresista (PP)",
+  'PSDB'         : "Partido da Social Democracia Brasileira",
+  'PCdoB'        : "Partido Comunista do Brasil (PCdoB)",
+  'Sem Partido'  : " ",
+  'PRONA'        : "Partido de Reedificação da Ordem Nacional",
+  'PV'           : "Partido Verde",
+  'PSC'          : "Partido Social Cristão",
+  'PMN'          : "Partido da Mobilização Nacional",
+  'PST'          : "Partido Social Trabalhista",
+  'PSL'          : "Partido Social Liberal",
+  'PRP'          : "Partido Republicano Progressista",
+  'PSOL'         : "Partido Socialismo e Liberdade",
+  'PRB'          : "Partido Republicano Brasileiro",
+  'PTC'          : "Partido Trabalhista Cristão",
+  'PR'           : "Partido da República",
+  'PAN'          : "Partido dos Aposentados da Nação",
+  'Avante'       : "Antigo Partido Trabalhista do Brasil (PTdoB)",
+  'PHS'          : "Partido Humanista da Solidariedade",
+  'PRTB'         : "Partido Renovador Trabalhista Brasileiro",
+  'PSD'          : "Partido Social Democrático",
+  'Patriota'     : "Antigo Partido Ecológico Nacional (PEN)",
+  'Solidariedade': " ",
+  'PROS'         : "Partido Republicano da Ordem Social (PROS)",
+  'DC'           : "Democracia Cristã",
+  'Podemos'      : "Antigo Partido Trabalhista Nacional (PTN)",
+  'REDE'         : "Rede Sustentabilidade",
+  'PMB'          : "Partido da Mulher Brasileira",
+  'PPL'          : "Partido Pátria Livre",
+  'NOVO'         : "Partido Novo"
+}
+
 ###########
 # CLASSES #
 ###########
 
+class GovernoDesconhecido(ValueError):
+  '''
+  Exceção levantada quando uma data não pertence a nenhum
+  dos governos de GOVERNOS_SUPORTADOS
+  '''
+  pass
+
 class Voto(object):
+  '''
+  Um voto individual. Os coletores não criam mais um objeto destes para cada
+  deputado – os votos de uma votação vão direto para as colunas de um
+  LoteVotos –, mas a classe continua servindo como visão de um voto isolado,
+  por exemplo ao iterar um lote.
+  '''
+
+  __slots__ = COLUNAS_VOTO
+
   def __init__(self, dictionary):
     self.parlamentar       = dictionary['@Nome'].strip()
     self.ideCadastro       = dictionary['@ideCadastro'].strip()
@@ -43,7 +144,30 @@ class Voto(object):
     self.numeroProposicao  = 'NOT_INITIATED'
     self.anoProposicao     = 'NOT_INITIATED'
 
+  def para_lista(self):
+    '''
+    Retorna os valores do voto na ordem de COLUNAS_VOTO
+    '''
+    return [ getattr(self, coluna) for coluna in COLUNAS_VOTO ]
+
+  @classmethod
+  def de_lista(cls, valores):
+    '''
+    Recria um voto a partir dos valores gerados por para_lista,
+    sem passar de novo pela padronização feita no construtor.
+    '''
+    voto = cls.__new__(cls)
+    for coluna, valor in zip(COLUNAS_VOTO, valores):
+      setattr(voto, coluna, valor)
+
+    return voto
+
 class Votacao(object):
+  '''
+  Uma votação de uma proposição. Os votos ficam em self.votos, um LoteVotos
+  em que os dados da votação são guardados uma única vez.
+  '''
+
   def __init__(self, dictionary):
     self.tipoProposicao    = dictionary["dadosProposicao"]["tipoProposicao"]
     self.anoProposicao     = dictionary["dadosProposicao"]["anoProposicao"]
@@ -53,7 +177,7 @@ class Votacao(object):
     self.hora              = dictionary['@Hora'].strip()
     self.objVotacao        = dictionary['@ObjVotacao'].strip()
     self.codSessao         = dictionary['@codSessao'].strip()
-    self.governo           = descobrir_governo(self.data)
+    self.governo           = governo_da_votacao(self.data)
     self.idVotacao         = f"{self.data.strip()}.{self.hora.strip()}.{self.codSessao.strip()}".replace("/","-").replace(":",".")
 
     if 'orientacaoBancada' in dictionary.keys():
@@ -66,16 +190,269 @@ class Votacao(object):
       self.orientacaoGoverno = 'Liberado'
 
     # Inicializa os votos contados
-    self.votos             = [ Voto(item) for item in dictionary['votos']['Deputado'] ]
-    for voto in self.votos:
-      voto.orientacaoGoverno = self.orientacaoGoverno
-      voto.idVotacao         = self.idVotacao
-      voto.data              = self.data
-      voto.hora              = self.hora
-      voto.governo           = self.governo
-      voto.tipoProposicao    = self.tipoProposicao
-      voto.numeroProposicao  = self.numeroProposicao
-      voto.anoProposicao     = self.anoProposicao
+    self.votos             = LoteVotos()
+    self.votos.adicionar_votacao([ getattr(self, coluna) for coluna in COLUNAS_DADOS_VOTACAO ],
+                                 dictionary['votos']['Deputado'])
+
+class RegistroPartidos(object):
+  '''
+  Tabela dos partidos de um processo. Cada partido padronizado recebe um
+  código inteiro, que nunca muda, e a sigla padronizada e a descrição dele
+  são calculadas e guardadas uma única vez. Os lotes de votos guardam apenas
+  esses códigos e só os convertem em texto – ou em colunas categóricas –
+  na hora de gerar linhas ou um DataFrame.
+
+  Os códigos só valem no processo em que foram criados. A instância usada
+  pelo Basômetro é REGISTRO_PARTIDOS.
+  '''
+
+  def __init__(self):
+    self.partidos   = [ ]
+    self.descricoes = [ ]
+    self._codigos   = { }
+    self._siglas    = { }
+    self._lock      = threading.Lock()
+
+  def codigo(self, partido):
+    '''
+    Retorna o código de um partido já padronizado, registrando-o se for novo
+    '''
+    codigo = self._codigos.get(partido)
+
+    if codigo is None:
+      with self._lock:
+        codigo = self._codigos.get(partido)
+        if codigo is None:
+          codigo = len(self.partidos)
+          self.partidos.append(partido)
+          self.descricoes.append( pegar_descricao_partido(f"{partido}") )
+          self._codigos[partido] = codigo
+
+    return codigo
+
+  def codigo_sigla(self, sigla):
+    '''
+    Retorna o código do partido de uma sigla como vem da API, que
+    passa por padronizar_partido apenas na primeira vez em que aparece
+    '''
+    codigo = self._siglas.get(sigla)
+
+    if codigo is None:
+      codigo = self._siglas[sigla] = self.codigo( padronizar_partido(sigla) )
+
+    return codigo
+
+  def colunas(self, codigos):
+    '''
+    Converte um array de códigos nas colunas partido e descricaoPartido,
+    retornadas como um par de pd.Categorical
+    '''
+    return categorizar(codigos, self.partidos), categorizar(codigos, self.descricoes)
+
+class ColunasDeputados(object):
+  '''
+  Votos dos deputados em uma única votação, já separados em colunas, como
+  os monta o leitor_xml ao ler a resposta da API sem passar por um dicionário
+  para cada deputado. Pode ocupar o lugar da lista de dicionários em
+  votacao['votos']['Deputado']; LoteVotos.adicionar_votacao apenas copia as colunas.
+  '''
+
+  def __init__(self):
+    self.deputados = { coluna : [ ] for coluna in COLUNAS_PARLAMENTAR }
+    self.partidos  = array.array('i')
+
+  def __len__(self):
+    return len(self.partidos)
+
+  def adicionar(self, atributos):
+    '''
+    Acrescenta o voto de um deputado a partir dos atributos do elemento
+    Deputado no XML da API (Nome, ideCadastro, UF, Voto e Partido)
+    '''
+    self.deputados['parlamentar'].append( sys.intern(atributos['Nome'].strip()) )
+    self.deputados['ideCadastro'].append( sys.intern(atributos['ideCadastro'].strip()) )
+    self.deputados['UF'].append( sys.intern(atributos['UF'].strip()) )
+    self.deputados['voto'].append( sys.intern(atributos['Voto'].strip()) )
+    self.partidos.append( REGISTRO_PARTIDOS.codigo_sigla(atributos['Partido'].strip()) )
+
+  def __getstate__(self):
+    return { 'deputados' : self.deputados, 'partidos' : [ REGISTRO_PARTIDOS.partidos[codigo] for codigo in self.partidos ] }
+
+  def __setstate__(self, estado):
+    self.deputados = estado['deputados']
+    self.partidos  = array.array('i', map(REGISTRO_PARTIDOS.codigo, estado['partidos']))
+
+class LoteVotos(object):
+  '''
+  Conjunto de votos guardado em colunas. Os dados de cada deputado ficam em
+  uma lista por coluna de COLUNAS_PARLAMENTAR, com as strings repetidas
+  (nomes, UFs) compartilhadas entre os votos, e o partido fica em um array
+  com o código dele no REGISTRO_PARTIDOS. Os dados de cada votação
+  (COLUNAS_DADOS_VOTACAO) são guardados uma única vez, junto com o número de
+  votos dela. Na hora de gerar linhas ou um DataFrame, os dados das votações
+  são repetidos para cada voto.
+
+  O lote pode ser iterado como uma lista de objetos Voto, na ordem em que
+  os votos foram adicionados.
+  '''
+
+  def __init__(self):
+    self.deputados = { coluna : [ ] for coluna in COLUNAS_PARLAMENTAR }
+    self.partidos  = array.array('i')
+    self.votacoes  = [ ]
+    self.tamanhos  = [ ]
+    self._total    = 0
+
+  def __len__(self):
+    return self._total
+
+  def __iter__(self):
+    return ( Voto.de_lista(linha) for linha in self.linhas() )
+
+  def __getstate__(self):
+    # Os códigos dos partidos só valem neste processo; as siglas, não
+    estado = dict(self.__dict__)
+    estado['partidos'] = [ REGISTRO_PARTIDOS.partidos[codigo] for codigo in self.partidos ]
+    return estado
+
+  def __setstate__(self, estado):
+    estado['partidos'] = array.array('i', map(REGISTRO_PARTIDOS.codigo, estado['partidos']))
+    self.__dict__.update(estado)
+
+  def adicionar_votacao(self, dados_votacao, membros):
+    '''
+    Acrescenta os votos de uma votação.
+
+    Parâmetros:
+    dados_votacao -> Os valores das colunas de COLUNAS_DADOS_VOTACAO, nessa ordem
+    membros -> A lista de dicionários com os votos dos deputados, como vem da
+    API, ou um ColunasDeputados, como o montado pelo leitor_xml
+    '''
+
+    # Com um único deputado, a API devolve um dicionário solto
+    if isinstance(membros, dict):
+      membros = [ membros ]
+
+    # Votos já separados em colunas só precisam ser copiados
+    if isinstance(membros, ColunasDeputados):
+      for coluna in COLUNAS_PARLAMENTAR:
+        self.deputados[coluna].extend(membros.deputados[coluna])
+      self.partidos.extend(membros.partidos)
+
+    else:
+      parlamentares    = self.deputados['parlamentar']
+      ids_cadastro     = self.deputados['ideCadastro']
+      ufs              = self.deputados['UF']
+      votos            = self.deputados['voto']
+      partidos         = self.partidos
+      codigo_sigla     = REGISTRO_PARTIDOS.codigo_sigla
+
+      for item in membros:
+        parlamentares.append( sys.intern(item['@Nome'].strip()) )
+        ids_cadastro.append( sys.intern(item['@ideCadastro'].strip()) )
+        ufs.append( sys.intern(item['@UF'].strip()) )
+        votos.append( sys.intern(item['@Voto'].strip()) )
+        partidos.append( codigo_sigla(item['@Partido'].strip()) )
+
+    self.votacoes.append( tuple(dados_votacao) )
+    self.tamanhos.append( len(membros) )
+    self._total += len(membros)
+
+  def estender(self, outro):
+    '''
+    Acrescenta ao final deste lote os votos de outro LoteVotos
+    ou de uma lista de objetos Voto
+    '''
+    outro = LoteVotos.de_votos(outro)
+
+    for coluna in COLUNAS_PARLAMENTAR:
+      self.deputados[coluna].extend(outro.deputados[coluna])
+
+    self.partidos.extend(outro.partidos)
+    self.votacoes.extend(outro.votacoes)
+    self.tamanhos.extend(outro.tamanhos)
+    self._total += len(outro)
+
+  def linhas(self):
+    '''
+    Gera os votos como tuplas com os valores na ordem de COLUNAS_VOTO
+    '''
+    votacoes = itertools.chain.from_iterable(
+      itertools.repeat(votacao, tamanho) for votacao, tamanho in zip(self.votacoes, self.tamanhos)
+    )
+
+    partidos   = map(REGISTRO_PARTIDOS.partidos.__getitem__, self.partidos)
+    descricoes = map(REGISTRO_PARTIDOS.descricoes.__getitem__, self.partidos)
+
+    for linha in zip(*[ self.deputados[coluna] for coluna in COLUNAS_PARLAMENTAR ], partidos, descricoes, votacoes):
+      yield linha[:-1] + linha[-1]
+
+  def para_dataframe(self):
+    '''
+    Retorna os votos como um DataFrame com as colunas de COLUNAS_VOTO.
+    As colunas de COLUNAS_PARTIDO são categóricas.
+    '''
+    # As colunas de texto vão para um único bloco, que o pandas não precisa consolidar
+    colunas = COLUNAS_PARLAMENTAR + COLUNAS_DADOS_VOTACAO
+    valores = np.empty( (len(colunas), self._total), dtype = object )
+
+    for posicao, coluna in enumerate(COLUNAS_PARLAMENTAR):
+      valores[posicao] = self.deputados[coluna]
+
+    tamanhos = np.array(self.tamanhos, dtype = np.int64)
+    for posicao, coluna in enumerate(COLUNAS_DADOS_VOTACAO, start = len(COLUNAS_PARLAMENTAR)):
+      dados_votacao = np.empty(len(self.votacoes), dtype = object)
+      dados_votacao[:] = [ votacao[posicao - len(COLUNAS_PARLAMENTAR)] for votacao in self.votacoes ]
+      valores[posicao] = np.repeat(dados_votacao, tamanhos)
+
+    df = pd.DataFrame(valores.T, columns = colunas, copy = False)
+
+    partidos, descricoes = REGISTRO_PARTIDOS.colunas( np.asarray(self.partidos, dtype = np.int64) )
+    df.insert(COLUNAS_VOTO.index('partido'), 'partido', partidos)
+    df.insert(COLUNAS_VOTO.index('descricaoPartido'), 'descricaoPartido', descricoes)
+
+    return df
+
+  @classmethod
+  def de_votos(cls, votos):
+    '''
+    Retorna o próprio lote, se votos já for um LoteVotos, ou
+    um novo lote com os votos de uma lista de objetos Voto
+    '''
+    if isinstance(votos, LoteVotos):
+      return votos
+
+    return cls.de_linhas( voto.para_lista() for voto in votos )
+
+  @classmethod
+  def de_linhas(cls, linhas):
+    '''
+    Monta um lote a partir de linhas com os valores na ordem de COLUNAS_VOTO,
+    como as geradas por linhas() ou por Voto.para_lista. Linhas seguidas com
+    os mesmos dados de votação são agrupadas. A descrição do partido é
+    refeita a partir do partido, que já deve estar padronizado.
+    '''
+    lote    = cls()
+    colunas = [ lote.deputados[coluna] for coluna in COLUNAS_PARLAMENTAR ]
+    n       = len(COLUNAS_PARLAMENTAR)
+    codigo  = REGISTRO_PARTIDOS.codigo
+
+    for linha in linhas:
+      for coluna, valor in zip(colunas, linha[:n]):
+        coluna.append(valor)
+
+      lote.partidos.append( codigo(linha[n]) )
+
+      votacao = tuple(linha[len(COLUNAS_DEPUTADO):])
+      if len(lote.votacoes) > 0 and lote.votacoes[-1] == votacao:
+        lote.tamanhos[-1] += 1
+      else:
+        lote.votacoes.append(votacao)
+        lote.tamanhos.append(1)
+
+      lote._total += 1
+
+    return lote
 
 class Parlamentar(object):
   '''
@@ -101,108 +478,243 @@ def padronizar_partido(string):
   A API retorna o nome do partido como existia na época da votação.
   Assim, votos de uma mesma agremiação podem estar registrados de forma
   diferente. Essa função faz o ajuste histórico, além de corrigir inconsistências
-  meio inexplicáveis no retorno da API.
+  meio inexplicáveis no retorno da API, usando CORRESPONDENCIA_PARTIDOS.
   '''
 
-  # Dicionário com as correções necessárias
-  corresp = {
+  return CORRESPONDENCIA_PARTIDOS.get(string, string)
 
-  "PPB"        : "Progressistas",
-  "PP"         : "Progressistas",
-  "PPS"        : "Cidadania",
-  "CIDADANIA"  : "Cidadania",
-  "PFL"        : "DEM",
-  "PMDB"       : "MDB",
-  "S.Part."    : "Sem Partido",
-  "PMR"        : "PRB",
-  "PTdoB"      : "Avante",
-  "PEN"        : "Patriota",
-  "SD"         : "Solidariedade",
-  "SDD"        : "Solidariedade",
-  "Solidaried" : "Solidariedade",
-  "PSDC"       : "DC",
-  "PTN"        : "Podemos",
-  "PODE"       : "Podemos",
-  "PODEMOS"    : "Podemos",
-  "NOVO"       : "NOVO",
-  "PR"         : "PL",
+def pegar_descricao_partido(string):
+  '''
+  Pega o nome completo da sigla do partido e, usando
+  DESCRICOES_PARTIDOS, traz uma descrição detalhada do significado
+  da sigla ou outra informação adicional relevante.
+  '''
+
+  return DESCRICOES_PARTIDOS.get(string, " ")
 
-  }
+def padronizar_partidos(siglas):
+  '''
+  Versão vetorizada de padronizar_partido e pegar_descricao_partido, para
+  uma coluna inteira de siglas – por exemplo, as das votações adicionadas
+  manualmente. Cada sigla distinta passa pelo REGISTRO_PARTIDOS uma única vez.
+  Retorna um DataFrame, com o mesmo índice, com as colunas categóricas
+  partido e descricaoPartido.
 
-  if string in corresp.keys():
-    return corresp[string]
+  Parâmetros:
+  siglas -> Series com as siglas dos partidos, como vêm da API
+  '''
 
-  else:
-    return string
+  siglas   = siglas.astype("category")
+  codigos  = np.array([ REGISTRO_PARTIDOS.codigo_sigla(sigla) for sigla in siglas.cat.categories ] + [ -1 ], dtype = np.int64)
+  partidos, descricoes = REGISTRO_PARTIDOS.colunas( codigos[ siglas.cat.codes.values ] )
 
-def pegar_descricao_partido(string):
+  return pd.DataFrame({ "partido" : partidos, "descricaoPartido" : descricoes }, index = siglas.index)
+
+def categorizar(codigos, valores):
   '''
-  Pega o nome completo da sigla do partido e, usando
-  um dicionário, traz uma descrição detalhada do significado
-  da sigla ou outra informação adicional relevante.
+  Monta um pd.Categorical a partir de códigos que apontam para posições de uma
+  lista de valores, que pode ter repetições. Como em pd.Categorical, as
+  categorias são apenas os valores presentes, em ordem alfabética. O código -1
+  vira um valor nulo.
+
+  Parâmetros:
+  codigos -> Array de inteiros com as posições em valores
+  valores -> A lista de valores
   '''
 
-  corresp = {
-   'MDB'          : "Movimento Democrático Brasileiro",
-   'Cidadania'    : "Antigo Partido Popular Socialista (PPS)",
-   'PDT'          : "Partido Democrático Trabalhista",
-   'PT'           : "Partido dos Trabalhadores",
-   'PSB'          : "Partido Socialista Brasileiro",
-   'DEM'          : "Democratas",
-   'PTB'          : "Partido Trabalhista Brasileiro",
-   'PL'           : "Partido Liberal – antigo Partido da República (PR)",
-   'Progressistas': "Antigo Partido Progresista (PP)",
-   'PSDB'         : "Partido da Social Democracia Brasileira",
-   'PCdoB'        : "Partido Comunista do Brasil (PCdoB)",
-   'Sem Partido'  : " ",
-   'PRONA'        : "Partido de Reedificação da Ordem Nacional",
-   'PV'           : "Partido Verde",
-   'PSC'          : "Partido Social Cristão",
-   'PMN'          : "Partido da Mobilização Nacional",
-   'PST'          : "Partido Social Trabalhista",
-   'PSL'          : "Partido Social Liberal",
-   'PRP'          : "Partido Republicano Progressista",
-   'PSOL'         : "Partido Socialismo e Liberdade",
-   'PRB'          : "Partido Republicano Brasileiro",
-   'PTC'          : "Partido Trabalhista Cristão",
-   'PR'           : "Partido da República",
-   'PAN'          : "Partido dos Aposentados da Nação",
-   'Avante'       : "Antigo Partido Trabalhista do Brasil (PTdoB)",
-   'PHS'          : "Partido Humanista da Solidariedade",
-   'PRTB'         : "Partido Renovador Trabalhista Brasileiro",
-   'PSD'          : "Partido Social Democrático",
-   'Patriota'     : "Antigo Partido Ecológico Nacional (PEN)",
-   'Solidariedade': " ",
-   'PROS'         : "Partido Republicano da Ordem Social (PROS)",
-   'DC'           : "Democracia Cristã",
-   'Podemos'      : "Antigo Partido Trabalhista Nacional (PTN)",
-   'REDE'         : "Rede Sustentabilidade",
-   'PMB'          : "Partido da Mulher Brasileira",
-   'PPL'          : "Partido Pátria Livre",
-   'NOVO'         : "Partido Novo"
-  }
-
-  if string in corresp.keys():
-    return corresp[string]
-
-  else:
-    return " "
+  codigos    = np.asarray(codigos, dtype = np.int64)
+  usados     = np.flatnonzero( np.bincount(codigos[ codigos >= 0 ], minlength = len(valores)) )
+  presentes  = [ valores[codigo] for codigo in usados ]
+  categorias = sorted(set(presentes))
+  posicoes   = { valor : posicao for posicao, valor in enumerate(categorias) }
+
+  # A última posição da tabela recebe o código -1
+  tabela         = np.full(len(valores) + 1, -1, dtype = np.int64)
+  tabela[usados] = [ posicoes[valor] for valor in presentes ]
+
+  return pd.Categorical.from_codes(tabela[codigos], categories = categorias)
+
+def categorizar_partidos(df):
+  '''
+  Guarda as colunas de COLUNAS_PARTIDO de um DataFrame de votos como
+  categorias, mantendo apenas as presentes e em ordem alfabética. Assim,
+  DataFrames com os mesmos votos têm as mesmas categorias, venham eles
+  de um LoteVotos ou de um arquivo CSV.
+
+  Parâmetros:
+  df -> DataFrame de votos
+  '''
+
+  colunas = { }
+  for coluna in COLUNAS_PARTIDO:
+    if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+      colunas[coluna] = df[coluna].cat.remove_unused_categories()
+    else:
+      colunas[coluna] = df[coluna].astype("category")
+
+  return df.assign(**colunas)
 
 def converter_datetime(string):
   return datetime.datetime.strptime(string, "%d/%m/%Y")
 
+def indexar_governos():
+
+  '''
+  Monta o índice usado por descobrir_governo e descobrir_governos: os
+  governos de GOVERNOS_SUPORTADOS ordenados pela data de início, com os
+  limites já convertidos. O último dia de cada governo é incluído, então
+  cada intervalo vai do início até a meia-noite do dia seguinte ao fim.
+  Deve ser chamada de novo se GOVERNOS_SUPORTADOS for alterado.
+  '''
+
+  global NOMES_GOVERNOS, INICIOS_GOVERNOS, FINS_GOVERNOS, INICIOS_GOVERNOS_NS, FINS_GOVERNOS_NS
+
+  intervalos = sorted(
+    ( converter_datetime(inicio), converter_datetime(fim) + datetime.timedelta(days = 1), governo )
+    for governo, (inicio, fim) in GOVERNOS_SUPORTADOS.items()
+  )
+
+  NOMES_GOVERNOS      = [ governo for _, _, governo in intervalos ]
+  INICIOS_GOVERNOS    = [ inicio.toordinal() for inicio, _, _ in intervalos ]
+  FINS_GOVERNOS       = [ fim.toordinal() for _, fim, _ in intervalos ]
+  INICIOS_GOVERNOS_NS = pd.to_datetime([ inicio for inicio, _, _ in intervalos ]).values
+  FINS_GOVERNOS_NS    = pd.to_datetime([ fim for _, fim, _ in intervalos ]).values
+
+def calcular_intervalos(governo, freq):
+  '''
+  Divide o período de um governo em bins de tempo igualitárias e retorna
+  uma lista de pares (início, fim), sem sobreposição, que cobrem do primeiro
+  ao último dia do governo.
+
+  Parâmetros:
+  governo -> O governo ("Lula 1", por exemplo)
+  freq -> O intervalo de tempo de cada bin: MS ou um múltiplo (2MS, 3MS etc.)
+  '''
+
+  # Constante que representa um segundo.
+  # Vai ser usada para evitar que as bins temporais se sobreponham.
+  one_second = datetime.timedelta(seconds = 1)
+
+  # Seleciona as datas de início e fim do governo
+  date_extent = GOVERNOS_SUPORTADOS[governo]
+  assert len(date_extent) == 2
+
+  # A partir delas, cria um intervalo de datas
+  date_range = [ pd.to_datetime(item, format = "%d/%m/%Y") for item in date_extent ]
+  date_range = list( pd.date_range( start = date_range[0], end = date_range[1], freq = freq ) )   # Referência: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.date_range.html
+
+  # É preciso adicionar o último dia de governo de cada um dos presidentes.
+  # Ele acaba cortado pela função pd.date_range, que só pega os inícios de mês
+  end_of_term = pd.to_datetime(date_extent[1], format = "%d/%m/%Y").replace(hour = 23, minute = 59, second = 59)
+  date_range.append(end_of_term)
+
+  # Cria pares com datas iniciais e finais para selecionar os dados
+  date_pairs = [ ]
+  for start, end in zip( date_range[:-1], date_range[1:] ):
+    if end != end_of_term:
+      end = end - one_second
+
+    date_pair = (start, end)
+    date_pairs.append(date_pair)
+
+  # O governo Temer é o único que não se inicia em um começo de mês.
+  # Assim, precisamos adicionar um par de datas inicial manualmente.
+  if governo == "Temer 1":
+
+    date_pair = ( pd.to_datetime("2016-05-13"), date_pairs[0][0] - one_second )
+    date_pairs.insert(0, date_pair)
+
+  # Checa se o primeiro e último dia dos intervalos correspondem às datas do governo
+  assert date_pairs[0][0].date()   == pd.to_datetime(GOVERNOS_SUPORTADOS[governo][0], format = "%d/%m/%Y").date()
+  assert date_pairs[-1][-1].date() == pd.to_datetime(GOVERNOS_SUPORTADOS[governo][1], format = "%d/%m/%Y").date()
+
+  return date_pairs
+
+def calcular_bins(datas, date_pairs):
+  '''
+  Retorna a posição, em date_pairs, da bin de cada data, ou -1 para as datas
+  que caem fora de todas elas. Equivale a selecionar, para cada bin, as datas
+  entre o início e o fim, inclusive, como em basometro_deputados.calcular_governismo.
+
+  Parâmetros:
+  datas -> Um array de datas (datetime64)
+  date_pairs -> As bins, como retornadas por calcular_intervalos
+  '''
+  inicios = pd.DatetimeIndex([ start for start, _ in date_pairs ]).values
+  fins    = pd.DatetimeIndex([ end for _, end in date_pairs ]).values
+
+  bins = np.searchsorted(inicios, datas, side = "right") - 1
+  return np.where( (bins >= 0) & (datas <= fins[ np.maximum(bins, 0) ]), bins, -1 )
+
 def descobrir_governo(data):
 
   '''
   Função que recebe uma data em formato d/m/yyyy
   e retorna o presidente que estava governando o
-  país na época.
+  país na época. Levanta GovernoDesconhecido se a
+  data estiver fora de todos os governos suportados.
+  '''
+
+  # Converte a data em um número de dias, sem passar pelo strptime
+  dia, mes, ano = data.split("/")
+  dias = datetime.date(int(ano), int(mes), int(dia)).toordinal()
+
+  # Busca binária pelo último governo iniciado até a data
+  posicao = bisect.bisect_right(INICIOS_GOVERNOS, dias) - 1
+
+  if posicao < 0 or dias >= FINS_GOVERNOS[posicao]:
+    raise GovernoDesconhecido(f"A data {data} não pertence a nenhum dos governos suportados. "
+                              f"Pode ser preciso atualizar GOVERNOS_SUPORTADOS.")
+
+  return NOMES_GOVERNOS[posicao]
+
+def descobrir_governos(datas, estrito = True):
+
   '''
+  Versão vetorizada de descobrir_governo, para uma coluna inteira de
+  datas de uma vez – por exemplo, ao reprocessar o banco de dados.
+  Retorna uma Series com o governo de cada data, com o mesmo índice.
+
+  Parâmetros:
+  datas -> Series de datas (datetime64) ou de strings no formato d/m/yyyy
+  estrito -> Booleano. Se verdadeiro, levanta GovernoDesconhecido caso alguma
+  data esteja fora dos governos suportados; se falso, o governo delas é None.
+  '''
+
+  if not pd.api.types.is_datetime64_any_dtype(datas):
+    datas = pd.to_datetime(datas, format = "%d/%m/%Y")
+
+  valores  = datas.values
+  posicoes = np.searchsorted(INICIOS_GOVERNOS_NS, valores, side = "right") - 1
+
+  # Datas anteriores ao primeiro governo, posteriores ao fim do governo encontrado ou nulas
+  validas = (posicoes >= 0) & (valores < FINS_GOVERNOS_NS[ np.maximum(posicoes, 0) ]) & ~pd.isnull(valores)
+
+  if estrito and not validas.all():
+    fora = pd.Series(datas[~validas].unique()).dt.strftime("%d/%m/%Y").tolist()
+    raise GovernoDesconhecido(f"{len(fora)} datas não pertencem a nenhum dos governos suportados, como {fora[:5]}. "
+                              f"Pode ser preciso atualizar GOVERNOS_SUPORTADOS.")
+
+  governos = np.array(NOMES_GOVERNOS + [ None ], dtype = object)[ np.where(validas, posicoes, len(NOMES_GOVERNOS)) ]
+
+  return pd.Series(governos, index = datas.index, name = "governo")
+
+def governo_da_votacao(data):
+
+  '''
+  Retorna o governo de uma votação, como descobrir_governo. Votações fora
+  dos governos suportados continuam sendo coletadas, com o governo vazio,
+  mas geram um aviso – um por ano – para que GOVERNOS_SUPORTADOS seja atualizado.
+  '''
+
+  try:
+    return descobrir_governo(data)
+
+  except GovernoDesconhecido:
+    warnings.warn(f"Há votações de {data.split('/')[-1]} fora dos governos suportados. "
+                  f"Elas ficam sem governo até que GOVERNOS_SUPORTADOS seja atualizado.", stacklevel = 2)
+    return None
 
-  # Transforma a string passada pelo usuário em um bojeto de data
-  datetime_obj = converter_datetime(data)
+indexar_governos()
 
-  # Itera pelos itens do dicionário até encontrar o governo correto.
-  for gov, dates in GOVERNOS_SUPORTADOS.items():
-    if converter_datetime(dates[0]) <= datetime_obj <= converter_datetime(dates[1]):
-      return gov
+REGISTRO_PARTIDOS = RegistroPartidos()
@@ -0,0 +1,145 @@
+'''
+Diário (checkpoint) das coletas do Basômetro. Cada proposição concluída é
+registrada em uma linha de um arquivo que só recebe acréscimos, junto com
+os votos que ela gerou. Se a coleta for interrompida, uma nova execução com
+os mesmos parâmetros lê o diário e recomeça de onde a anterior parou.
+'''
+
+from basometro.core import core
+import json, os, threading
+
+class DiarioColeta(object):
+  '''
+  Registra as proposições já coletadas, identificadas pelo par
+  (ano, codProposicao), e os votos que cada uma delas gerou.
+
+  A primeira linha do arquivo guarda os parâmetros da coleta. Se o diário
+  encontrado em disco tiver sido criado com parâmetros diferentes, ele é
+  descartado e a coleta começa do zero.
+
+  Parâmetros:
+  caminho -> O caminho do arquivo do diário
+  parametros -> Dicionário (serializável em json) que identifica a coleta,
+  como o intervalo de anos de uma instalação.
+  '''
+
+  def __init__(self, caminho, parametros):
+    self.caminho    = caminho
+    self.parametros = parametros
+    self.concluidas = { }
+    self._lock      = threading.Lock()
+
+    if not self.carregar():
+      self.iniciar()
+
+    self._file = open(self.caminho, "a", encoding = "utf-8")
+
+  def carregar(self):
+    '''
+    Lê o diário salvo em disco. Retorna falso se ele não
+    existir ou se pertencer a uma coleta com outros parâmetros.
+    '''
+    if not os.path.exists(self.caminho):
+      return False
+
+    with open(self.caminho, encoding = "utf-8") as file:
+
+      try:
+        cabecalho = json.loads(file.readline())
+      except ValueError:
+        return False
+
+      if cabecalho.get("parametros") != self.parametros or cabecalho.get("colunas") != core.COLUNAS_VOTO:
+        return False
+
+      incompleta = False
+
+      for linha in file:
+
+        # Se o processo morreu no meio de uma escrita, a
+        # última linha fica incompleta e é simplesmente ignorada
+        try:
+          registro = json.loads(linha)
+        except ValueError:
+          incompleta = True
+          break
+
+        self.concluidas[ (registro["ano"], registro["id"]) ] = registro["votos"]
+
+    if len(self.concluidas) > 0:
+      print(f"Retomando a coleta a partir do diário: {len(self.concluidas)} proposições já concluídas.")
+
+    # Descarta a linha incompleta antes de voltar a escrever
+    if incompleta:
+      self.reescrever()
+
+    return True
+
+  def iniciar(self):
+    '''
+    Cria um diário vazio, apenas com o cabeçalho
+    '''
+    os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok = True)
+
+    with open(self.caminho, "w", encoding = "utf-8") as file:
+      file.write(json.dumps({ "parametros" : self.parametros, "colunas" : core.COLUNAS_VOTO }) + "\n")
+
+    self.concluidas = { }
+
+  def reescrever(self):
+    '''
+    Regrava o diário a partir do que foi carregado em memória
+    '''
+    temp = f"{self.caminho}.tmp"
+
+    with open(temp, "w", encoding = "utf-8") as file:
+      file.write(json.dumps({ "parametros" : self.parametros, "colunas" : core.COLUNAS_VOTO }) + "\n")
+      for (year, id_proposicao), votos in self.concluidas.items():
+        file.write(json.dumps({ "ano" : year, "id" : id_proposicao, "votos" : votos }) + "\n")
+
+    os.replace(temp, self.caminho)
+
+  def concluida(self, year, id_proposicao):
+    '''
+    Informa se a proposição já foi coletada para o ano
+    '''
+    return (year, id_proposicao) in self.concluidas
+
+  def votos(self, year, id_proposicao):
+    '''
+    Retorna os votos registrados para a proposição como um core.LoteVotos
+    '''
+    return core.LoteVotos.de_linhas(self.concluidas[ (year, id_proposicao) ])
+
+  def registrar(self, year, id_proposicao, votos):
+    '''
+    Acrescenta ao diário uma proposição concluída e seus votos. A linha é
+    enviada ao sistema operacional imediatamente, então sobrevive ao fim
+    abrupto do processo, mas não há fsync: o custo por proposição é o de
+    uma única escrita sequencial.
+
+    Parâmetros:
+    year -> O ano da coleta
+    id_proposicao -> O codProposicao da proposição
+    votos -> O core.LoteVotos (ou a lista de objetos core.Voto) gerado pela proposição
+    '''
+    valores = list( core.LoteVotos.de_votos(votos).linhas() )
+    linha   = json.dumps({ "ano" : year, "id" : id_proposicao, "votos" : valores }) + "\n"
+
+    with self._lock:
+      self._file.write(linha)
+      self._file.flush()
+      # Os votos só precisam ficar na memória quando vêm de uma execução anterior
+      self.concluidas[ (year, id_proposicao) ] = None
+
+  def fechar(self):
+    self._file.close()
+
+  def apagar(self):
+    '''
+    Fecha e remove o diário. Deve ser chamado quando a coleta
+    terminar com sucesso e seus resultados já estiverem salvos.
+    '''
+    self.fechar()
+    if os.path.exists(self.caminho):
+      os.remove(self.caminho)
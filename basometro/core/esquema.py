@@ -0,0 +1,172 @@
+'''
+Esquema dos votos do Basômetro. Em disco, todos os campos são texto; na
+memória, cada coluna tem o tipo declarado em ESQUEMA: os ids são números
+inteiros, a data é um datetime64 convertido uma única vez e as colunas com
+poucos valores distintos – partido, governo, UF, voto etc. – são categóricas,
+com cada valor guardado uma única vez e um código pequeno para cada voto.
+
+O esquema é aplicado na leitura (ver armazenamento.BancoVotos.ler, com
+tipado = True) e na gravação, antes de cada lote ir para o disco: um voto que
+não possa ser convertido interrompe a gravação em vez de chegar ao banco de
+dados, e as datas são sempre escritas no mesmo formato.
+'''
+
+import numpy as np
+import pandas as pd
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Tipo de cada coluna de core.COLUNAS_VOTO: "inteiro" (com o tipo do numpy),
+# "data" ou "categoria". O número da proposição é texto, e não inteiro,
+# porque a API o devolve com zeros à esquerda ("0017"), que fazem parte da
+# identidade da votação (ver armazenamento.COLUNAS_VOTACAO).
+ESQUEMA = {
+  'parlamentar'       : "categoria",
+  'ideCadastro'       : ("inteiro", "int32"),
+  'UF'                : "categoria",
+  'voto'              : "categoria",
+  'partido'           : "categoria",
+  'descricaoPartido'  : "categoria",
+  'orientacaoGoverno' : "categoria",
+  'data'              : "data",
+  'hora'              : "categoria",
+  'governo'           : "categoria",
+  'idVotacao'         : "categoria",
+  'tipoProposicao'    : "categoria",
+  'numeroProposicao'  : "categoria",
+  'anoProposicao'     : ("inteiro", "int16"),
+}
+
+# Colunas categóricas que são comparadas entre si e, por isso, precisam ter as mesmas categorias
+DOMINIOS = [ [ 'voto', 'orientacaoGoverno' ] ]
+
+###########
+# FUNÇÕES #
+###########
+
+def dominio(coluna):
+  '''
+  Retorna as colunas que compartilham as categorias com a coluna indicada, incluindo ela mesma
+  '''
+  for colunas in DOMINIOS:
+    if coluna in colunas:
+      return colunas
+
+  return [ coluna ]
+
+def categorias(distintos):
+  '''
+  Retorna, em ordem alfabética, a união dos valores distintos de uma ou mais colunas
+
+  Parâmetros:
+  distintos -> Uma lista com os valores distintos de cada coluna
+  '''
+  return sorted( set().union( *[ np.asarray(valores).tolist() for valores in distintos ] ) )
+
+def tipar_dicionario(coluna, codigos, distintos, categorias_coluna = None, index = None):
+  '''
+  Converte para o tipo declarado em ESQUEMA uma coluna codificada como um
+  dicionário: os valores distintos, como texto, e o código de cada voto
+  nesse dicionário, com -1 nos campos vazios. Apenas os valores distintos são
+  convertidos. Levanta ValueError se algum deles não puder ser convertido.
+
+  Parâmetros:
+  coluna -> O nome da coluna
+  codigos -> O código de cada voto
+  distintos -> Os valores distintos, sem repetições e sem nulos
+  categorias_coluna -> As categorias, no caso de uma coluna categórica. O
+  padrão é usar os valores distintos, em ordem alfabética.
+  index -> O índice da Series devolvida
+  '''
+  tipo = ESQUEMA[coluna]
+  nulo = codigos < 0
+
+  if tipo == "categoria":
+    if categorias_coluna is None:
+      categorias_coluna = categorias([ distintos ])
+
+    dtype    = pd.CategoricalDtype(categorias_coluna)
+    posicoes = np.append(dtype.categories.get_indexer(distintos), -1)
+
+    return pd.Series(pd.Categorical.from_codes(posicoes[codigos], dtype = dtype), index = index)
+
+  if tipo == "data":
+    datas = np.append(pd.to_datetime(distintos).values, np.datetime64("NaT"))
+    return pd.Series(datas[codigos], index = index)
+
+  # Inteiros: uma coluna com campos vazios fica com o tipo anulável do pandas (Int32 em vez de int32)
+  numeros = pd.to_numeric(distintos).astype(tipo[1])
+
+  if nulo.any():
+    return pd.Series(pd.array(numeros, dtype = tipo[1].capitalize()).take(codigos, allow_fill = True), index = index)
+
+  return pd.Series(numeros[codigos], index = index)
+
+def aplicar(df):
+  '''
+  Retorna um DataFrame de votos com as colunas convertidas para os tipos de
+  ESQUEMA. Colunas de fora do esquema ficam como estão. As colunas de um
+  mesmo domínio (ver DOMINIOS) recebem as mesmas categorias.
+
+  Parâmetros:
+  df -> DataFrame de votos, como texto, com NaN nos campos vazios, ou já tipado
+  '''
+  dicionarios = { }
+
+  for coluna in df.columns:
+    if coluna in ESQUEMA:
+      codigos, distintos  = pd.factorize(df[coluna])
+      dicionarios[coluna] = ( codigos, np.asarray(distintos) )
+
+  convertidas = { }
+
+  for coluna in df.columns:
+
+    if coluna not in dicionarios:
+      convertidas[coluna] = df[coluna]
+      continue
+
+    categorias_coluna = None
+    if ESQUEMA[coluna] == "categoria":
+      categorias_coluna = categorias([ dicionarios[outra][1] for outra in dominio(coluna) if outra in dicionarios ])
+
+    convertidas[coluna] = tipar_dicionario(coluna, *dicionarios[coluna], categorias_coluna, index = df.index)
+
+  # Sem columns: com ele, o pandas converteria as datas, uma a uma, em objetos do Python
+  return pd.DataFrame(convertidas, index = df.index)
+
+def como_coluna(serie, valor):
+  '''
+  Converte um valor – por exemplo, um ideCadastro recebido como texto – para
+  ser comparado aos de uma coluna, que pode estar tipada ou não
+
+  Parâmetros:
+  serie -> A coluna
+  valor -> O valor
+  '''
+  if pd.api.types.is_integer_dtype(serie):
+    try:
+      return int(valor)
+    except ValueError:
+      return valor
+
+  return str(valor)
+
+def memoria(df):
+  '''
+  Retorna um DataFrame com o tipo e o espaço ocupado na memória, em bytes,
+  por cada coluna de um DataFrame de votos, e o total na última linha
+
+  Parâmetros:
+  df -> DataFrame de votos
+  '''
+  bytes_colunas = df.memory_usage(index = False, deep = True)
+
+  relatorio = pd.DataFrame({ "tipo" : df.dtypes.astype(str), "bytes" : bytes_colunas })
+  relatorio.loc["total"] = [ "", bytes_colunas.sum() ]
+
+  return relatorio
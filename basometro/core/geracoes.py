@@ -0,0 +1,273 @@
+'''
+Gerações versionadas de um diretório – o banco de dados colunar ou os
+arquivos da visualização. Cada atualização monta uma geração nova ao lado da
+atual e, quando ela está completa, troca de uma só vez o link simbólico que
+aponta para a geração em uso. Quem lê pelo caminho do link (o servidor web,
+por exemplo) vê a geração anterior inteira ou a nova inteira, nunca um
+diretório pela metade.
+
+Os arquivos que não mudaram não são copiados: a geração nova é feita de hard
+links para os da atual. Por isso, fazer o backup e desfazer uma atualização
+custam apenas o número de arquivos alterados, e voltar para a geração
+anterior é só apontar o link para ela.
+
+Os hard links compartilham o conteúdo entre as gerações, então um arquivo
+herdado nunca pode ser alterado no lugar – apenas substituído (um arquivo
+novo seguido de os.replace) ou apagado. O formato colunar (ver
+armazenamento.BancoColunar) só grava dessa forma. Os formatos CSV e SQLite
+alteram o arquivo no lugar e não usam gerações.
+
+Estrutura em disco, para o caminho output:
+
+  output -> output.geracoes/000003
+  output.geracoes/000002/
+  output.geracoes/000003/
+'''
+
+from basometro.core import armazenamento
+import filecmp, os, shutil
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Número de gerações guardadas, contando a atual
+GERACOES_MANTIDAS = 3
+
+# Número de dígitos do nome de cada geração
+DIGITOS = 6
+
+class Geracoes(object):
+  '''
+  As gerações de um diretório e o link simbólico que aponta para a atual.
+
+  Parâmetros:
+  caminho -> O caminho do link simbólico. As gerações ficam em um diretório
+  ao lado dele, com a extensão .geracoes acrescentada ao nome.
+  sufixos -> Sufixos de arquivos ou diretórios que acompanham o diretório e
+  também são versionados, como o .indice e a .matriz do banco de dados (ver
+  indice.IndiceVotacoes e matriz.MatrizVotos): caminho + sufixo passa a ser
+  geração + sufixo.
+  '''
+
+  def __init__(self, caminho, sufixos = ()):
+    self.caminho   = os.path.normpath(caminho)
+    self.diretorio = f"{self.caminho}.geracoes"
+    self.sufixos   = sufixos
+
+  def caminho_geracao(self, numero):
+    return os.path.join(self.diretorio, f"{numero:0{DIGITOS}d}")
+
+  def listar(self):
+    '''
+    Retorna os números das gerações em disco, em ordem crescente
+    '''
+    if not os.path.isdir(self.diretorio):
+      return [ ]
+
+    return sorted( int(nome) for nome in os.listdir(self.diretorio) if nome.isdigit() and len(nome) == DIGITOS )
+
+  def atual(self):
+    '''
+    Retorna o número da geração para a qual o link aponta, ou None se
+    o caminho não existir ou ainda não for um link para uma geração
+    '''
+    if not os.path.islink(self.caminho):
+      return None
+
+    nome = os.path.basename(os.readlink(self.caminho))
+    return int(nome) if nome.isdigit() else None
+
+  def preparar(self):
+    '''
+    Transforma um diretório comum, criado antes das gerações, na primeira
+    geração e põe o link em seu lugar. Não faz nada se o caminho já for um
+    link ou ainda não existir.
+    '''
+    if os.path.islink(self.caminho) or not os.path.exists(self.caminho):
+      return
+
+    numero  = max(self.listar(), default = 0) + 1
+    geracao = self.caminho_geracao(numero)
+
+    print(f"Movendo {self.caminho} para {geracao}")
+    os.makedirs(self.diretorio, exist_ok = True)
+    os.rename(self.caminho, geracao)
+
+    for sufixo in self.sufixos:
+      if os.path.exists(self.caminho + sufixo):
+        os.rename(self.caminho + sufixo, geracao + sufixo)
+
+    self.publicar(numero)
+
+  def criar(self, copiar_atual = True):
+    '''
+    Cria uma geração nova, que ainda não é publicada, e retorna o seu número.
+
+    Parâmetros:
+    copiar_atual -> Se verdadeiro, a geração nova começa com hard links para
+    todos os arquivos da atual; quem a alterar deve apenas substituir ou apagar
+    esses arquivos. Se falso, ela começa vazia. O padrão é True.
+    '''
+    # O número é sempre maior que o de qualquer geração em disco, mesmo das
+    # abandonadas por uma atualização interrompida
+    numero = max(self.listar(), default = 0) + 1
+    nova   = self.caminho_geracao(numero)
+    atual  = self.atual()
+
+    os.makedirs(self.diretorio, exist_ok = True)
+
+    if not copiar_atual or atual is None:
+      os.makedirs(nova)
+      return numero
+
+    origem = self.caminho_geracao(atual)
+    shutil.copytree(origem, nova, copy_function = os.link)
+
+    for sufixo in self.sufixos:
+      if os.path.isdir(origem + sufixo):
+        shutil.copytree(origem + sufixo, nova + sufixo, copy_function = os.link)
+
+      elif os.path.exists(origem + sufixo):
+        os.link(origem + sufixo, nova + sufixo)
+
+    return numero
+
+  def deduplicar(self, numero):
+    '''
+    Troca os arquivos de uma geração que são idênticos aos da geração atual por
+    hard links para eles, para que só os arquivos alterados ocupem espaço.
+    Retorna o número de arquivos trocados.
+    '''
+    atual = self.atual()
+    if atual is None or atual == numero:
+      return 0
+
+    origem  = self.caminho_geracao(atual)
+    destino = self.caminho_geracao(numero)
+    ligados = 0
+
+    for raiz, diretorios, nomes in os.walk(destino):
+      for nome in nomes:
+        novo   = os.path.join(raiz, nome)
+        antigo = os.path.join(origem, os.path.relpath(novo, destino))
+
+        if not os.path.isfile(antigo) or os.path.samefile(antigo, novo):
+          continue
+
+        if filecmp.cmp(antigo, novo, shallow = False):
+          # O link é criado com outro nome e substitui o arquivo de uma vez
+          temporario = f"{novo}.link"
+          os.link(antigo, temporario)
+          os.replace(temporario, novo)
+          ligados += 1
+
+    return ligados
+
+  def publicar(self, numero):
+    '''
+    Aponta o link para uma geração. O link novo é criado com outro nome e
+    substitui o anterior com os.replace, que é atômico.
+    '''
+    alvo       = os.path.join(os.path.basename(self.diretorio), os.path.basename(self.caminho_geracao(numero)))
+    temporario = f"{self.caminho}.tmp"
+
+    if os.path.lexists(temporario):
+      os.remove(temporario)
+
+    os.symlink(alvo, temporario)
+    os.replace(temporario, self.caminho)
+    armazenamento.sincronizar_diretorio(os.path.dirname(self.caminho) or ".")
+
+  def descartar(self, numero):
+    '''
+    Apaga uma geração. Os arquivos compartilhados com outras gerações continuam nelas.
+    '''
+    geracao = self.caminho_geracao(numero)
+
+    if os.path.isdir(geracao):
+      shutil.rmtree(geracao)
+
+    for sufixo in self.sufixos:
+      if os.path.isdir(geracao + sufixo):
+        shutil.rmtree(geracao + sufixo)
+
+      elif os.path.exists(geracao + sufixo):
+        os.remove(geracao + sufixo)
+
+  def limpar(self, manter = GERACOES_MANTIDAS):
+    '''
+    Apaga as gerações antigas, mantendo a atual e as mais recentes anteriores
+    a ela, e as posteriores à atual, abandonadas por atualizações que falharam
+    ou desfeitas por reverter.
+
+    Parâmetros:
+    manter -> O número de gerações mantidas, contando a atual. O padrão é GERACOES_MANTIDAS.
+    '''
+    atual = self.atual()
+    if atual is None:
+      return
+
+    anteriores  = [ numero for numero in self.listar() if numero <= atual ]
+    posteriores = [ numero for numero in self.listar() if numero > atual ]
+
+    for numero in anteriores[ : -max(manter, 1) ] + posteriores:
+      self.descartar(numero)
+
+  def reverter(self):
+    '''
+    Aponta o link para a geração anterior à atual e retorna o número
+    dela, ou None se não houver uma geração anterior guardada
+    '''
+    atual      = self.atual()
+    anteriores = [ numero for numero in self.listar() if atual is not None and numero < atual ]
+
+    if not anteriores:
+      return None
+
+    self.publicar(anteriores[-1])
+    return anteriores[-1]
+
+  def atualizar(self, gerar, copiar_atual = True, deduplicar = False, manter = GERACOES_MANTIDAS):
+    '''
+    Monta uma geração nova e, se ela for concluída, publica e apaga as
+    gerações antigas. Se gerar levantar uma exceção, a geração nova é
+    descartada e o link continua apontando para a atual. Retorna o caminho
+    da geração publicada.
+
+    Parâmetros:
+    gerar -> Função que recebe o caminho da geração nova e a preenche
+    copiar_atual -> Ver criar. O padrão é True.
+    deduplicar -> Se verdadeiro, os arquivos iguais aos da geração atual são
+    trocados por hard links antes da publicação (ver deduplicar). O padrão é False.
+    manter -> Ver limpar. O padrão é GERACOES_MANTIDAS.
+    '''
+    self.preparar()
+    numero = self.criar(copiar_atual = copiar_atual)
+
+    try:
+      gerar(self.caminho_geracao(numero))
+
+    except BaseException:
+      self.descartar(numero)
+      raise
+
+    if deduplicar:
+      print(f"{self.deduplicar(numero)} arquivos iguais aos da geração anterior em {self.caminho}")
+
+    self.publicar(numero)
+    self.limpar(manter)
+
+    return self.caminho_geracao(numero)
+
+def desvincular(caminho):
+  '''
+  Apaga um arquivo, se ele existir, antes que ele seja escrito de novo em uma
+  geração criada com copiar_atual. O arquivo herdado é um hard link para o da
+  geração atual, que seria alterado junto se fosse escrito no lugar; depois
+  de apagado, o arquivo escrito é um novo, só da geração nova.
+  '''
+  if os.path.lexists(caminho):
+    os.remove(caminho)
@@ -0,0 +1,123 @@
+'''
+Índice persistente das votações que já estão no banco de dados do Basômetro.
+Ele fica ao lado do banco de dados e guarda a identidade de cada votação (as
+colunas de armazenamento.COLUNAS_VOTACAO) e a data da votação mais recente.
+Com ele, o atualizador sabe a partir de quando buscar votos novos e quais
+votações descartar sem precisar ler as linhas antigas do banco de dados.
+
+O índice registra o tamanho e a data de modificação do banco de dados que
+descreve (ver armazenamento.BancoVotos.assinatura). Se ele for alterado por
+fora – por exemplo, restaurado de um backup –, o índice deixa de valer e é
+reconstruído a partir dos votos.
+'''
+
+from basometro.core import armazenamento
+import gzip, json, os
+import pandas as pd
+
+class IndiceVotacoes(object):
+  '''
+  Conjunto das votações gravadas em um banco de dados, com a data da mais recente.
+
+  Parâmetros:
+  caminho_banco -> O caminho do banco de dados, em qualquer dos formatos de
+  armazenamento.abrir_banco. O índice é salvo ao lado dele, com a extensão
+  .indice acrescentada ao nome. Se o caminho for um link simbólico – como o
+  das gerações do banco de dados (ver geracoes.Geracoes) –, o índice fica ao
+  lado do destino do link e acompanha cada geração.
+  '''
+
+  VERSAO = 1
+
+  def __init__(self, caminho_banco):
+    self.banco         = armazenamento.abrir_banco(caminho_banco)
+    self.caminho_banco = self.banco.caminho
+    self.caminho       = f"{os.path.realpath(self.caminho_banco)}.indice"
+    self.votacoes      = set()
+    self.ultima_data   = None
+
+  @classmethod
+  def abrir(cls, caminho_banco):
+    '''
+    Carrega o índice do banco de dados ou, se ele não existir ou
+    estiver desatualizado, reconstrói e salva um novo.
+    '''
+    indice = cls(caminho_banco)
+
+    if not indice.carregar():
+      print("Reconstruindo o índice de votações do banco de dados.")
+      indice.reconstruir()
+      indice.salvar()
+
+    return indice
+
+  def assinatura(self):
+    '''
+    Retorna o tamanho e a data de modificação do banco de dados, que identificam a versão indexada
+    '''
+    return self.banco.assinatura()
+
+  def carregar(self):
+    '''
+    Lê o índice salvo. Retorna False se ele não existir, for de outra
+    versão ou não corresponder mais ao banco de dados.
+    '''
+    try:
+      with gzip.open(self.caminho, "rt", encoding = "utf-8") as file:
+        dados = json.load(file)
+
+    except (OSError, ValueError):
+      return False
+
+    if dados.get("versao") != self.VERSAO or dados.get("assinatura") != self.assinatura():
+      return False
+
+    self.votacoes    = set( tuple(votacao) for votacao in dados["votacoes"] )
+    self.ultima_data = pd.Timestamp(dados["ultima_data"]) if dados["ultima_data"] is not None else None
+
+    return True
+
+  def reconstruir(self):
+    '''
+    Monta o índice lendo do banco de dados, em partes, apenas as
+    colunas que identificam as votações e a data
+    '''
+    self.votacoes    = set()
+    self.ultima_data = None
+
+    colunas = armazenamento.COLUNAS_VOTACAO + [ 'data' ]
+
+    for parte in self.banco.ler_em_partes(colunas):
+      parte = parte.fillna("")
+      self.votacoes.update( zip( *[ parte[coluna] for coluna in armazenamento.COLUNAS_VOTACAO ] ) )
+      self.registrar_data( pd.to_datetime(parte.data, format = armazenamento.FORMATO_DATA).max() )
+
+  def registrar_data(self, data):
+    if pd.notnull(data) and (self.ultima_data is None or data > self.ultima_data):
+      self.ultima_data = data
+
+  def registrar(self, gravador):
+    '''
+    Acrescenta ao índice as votações e a data mais recente de um
+    armazenamento.GravadorVotos já concluído
+    '''
+    self.votacoes.update( tuple( str(valor) for valor in votacao ) for votacao in gravador.votacoes )
+    self.registrar_data(gravador.ultima_data)
+
+  def salvar(self):
+    '''
+    Salva o índice, associado à versão atual do banco de dados. O arquivo
+    é escrito primeiro em um temporário, para nunca ficar pela metade.
+    '''
+    dados = {
+      "versao"      : self.VERSAO,
+      "assinatura"  : self.assinatura(),
+      "ultima_data" : self.ultima_data.strftime(armazenamento.FORMATO_DATA) if self.ultima_data is not None else None,
+      "votacoes"    : sorted(self.votacoes),
+    }
+
+    temporario = f"{self.caminho}.tmp"
+    with gzip.open(temporario, "wt", encoding = "utf-8") as file:
+      json.dump(dados, file, ensure_ascii = False)
+
+    os.replace(temporario, self.caminho)
@@ -0,0 +1,193 @@
+'''
+Leitura direta do XML de ObterVotacaoProposicao. O camaraPy converte a
+resposta inteira em dicionários aninhados – um para cada deputado de cada
+votação – que depois são percorridos de novo por core.Votacao. Aqui, o XML é
+lido aos poucos, com um parser incremental, e os votos dos deputados vão
+direto para as colunas de um core.ColunasDeputados, sem a árvore intermediária.
+
+O resultado tem o mesmo formato do dicionário devolvido pelo camaraPy até o
+nível das votações, então os coletores e a memória de proposições não
+precisam saber qual dos dois caminhos foi usado. Apenas votacao['votos']['Deputado']
+muda: em vez da lista de dicionários, é um core.ColunasDeputados.
+
+A leitura é opcional (ver requisicoes.configurar_leitura_xml). Se o XML não
+tiver o formato esperado, levanta XMLInesperado e o chamador volta a usar o camaraPy.
+'''
+
+from basometro.core import core
+from camaraPy.api_original.core import core as campy_core, custom_exceptions
+import xml.etree.ElementTree as ET
+import requests
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Quantos caracteres do XML são entregues ao parser de cada vez
+TAMANHO_BLOCO = 64 * 1024
+
+# Campos da proposição, filhos diretos do elemento raiz
+CAMPOS_PROPOSICAO = [ "Sigla", "Numero", "Ano" ]
+
+class XMLInesperado(ValueError):
+  '''
+  Exceção levantada quando a resposta não é um XML válido
+  ou não tem o formato esperado de ObterVotacaoProposicao
+  '''
+  pass
+
+###########
+# FUNÇÕES #
+###########
+
+def baixar_votacao_proposicao(params):
+  '''
+  Faz a requisição de ObterVotacaoProposicao e retorna o XML da resposta como
+  texto, sem interpretá-lo. Os erros são tratados como no camaraPy: as
+  respostas de erro que indicam proposição acessória ou falta de dados
+  levantam as exceções correspondentes; as demais, requests.HTTPError.
+
+  Parâmetros:
+  params -> Dicionário com tipo, número e ano da proposição
+  '''
+
+  # O camaraPy preenche os parâmetros ausentes no dicionário recebido
+  url = campy_core.build_url("ObterVotacaoProposicao", dict(params), "proposicoes")
+
+  resposta = requests.get(url)
+  resposta.encoding = "utf-8"
+
+  if resposta.status_code in range(400, 501):
+
+    if "proposição é acessória" in resposta.text.lower():
+      raise custom_exceptions.ProposicaoAcessoria(custom_exceptions.ProposicaoAcessoria.err_message)
+
+    elif "dados não encontrados" in resposta.text.lower():
+      raise custom_exceptions.SemDados(custom_exceptions.SemDados.err_message)
+
+    else:
+      raise requests.HTTPError(f"Houve um erro na sua requisição. O servidor respondeu com: '{resposta.text}'")
+
+  return resposta.text
+
+def atributos(elemento):
+  '''
+  Retorna os atributos de um elemento com as chaves prefixadas por @, como no xmltodict
+  '''
+  return { f"@{chave}" : valor for chave, valor in elemento.attrib.items() }
+
+def texto(elemento):
+  '''
+  Retorna o texto de um elemento como o xmltodict: sem espaços nas pontas e None se estiver vazio
+  '''
+  if elemento.text is None:
+    return None
+
+  return elemento.text.strip() or None
+
+def ler_votacao_proposicao(xml):
+  '''
+  Lê o XML de ObterVotacaoProposicao e retorna um dicionário com o formato
+  do devolvido pelo camaraPy, com os votos de cada votação em um
+  core.ColunasDeputados. Levanta XMLInesperado se o XML for inválido ou
+  tiver outro formato, e Exception se a API tiver respondido com um erro,
+  como o camaraPy.
+
+  Parâmetros:
+  xml -> O texto da resposta da API
+  '''
+
+  parser = ET.XMLPullParser(events = ("start", "end"))
+
+  caminho    = [ ]
+  proposicao = { }
+  votacoes   = [ ]
+  estado     = { "votacao" : None, "bancadas" : None, "deputados" : None, "erro" : None }
+
+  def processar(eventos):
+
+    for evento, elemento in eventos:
+      tag = elemento.tag
+
+      if evento == "start":
+        caminho.append(tag)
+
+        if len(caminho) == 1 and tag not in ("proposicao", "erro"):
+          raise XMLInesperado(f"Elemento raiz inesperado: {tag}")
+
+        if tag == "Votacao":
+          estado["votacao"] = atributos(elemento)
+          votacoes.append(estado["votacao"])
+
+        elif tag == "orientacaoBancada":
+          estado["bancadas"] = [ ]
+
+        elif tag == "votos":
+          estado["deputados"] = core.ColunasDeputados()
+
+        continue
+
+      caminho.pop()
+
+      if tag == "Deputado":
+        estado["deputados"].adicionar(elemento.attrib)
+        elemento.clear()
+
+      elif tag == "bancada":
+        estado["bancadas"].append( atributos(elemento) )
+
+      # Como no xmltodict, um elemento sem filhos vira None
+      elif tag == "orientacaoBancada":
+        estado["votacao"]["orientacaoBancada"] = { "bancada" : estado["bancadas"] } if len(estado["bancadas"]) > 0 else None
+
+      elif tag == "votos":
+        estado["votacao"]["votos"] = { "Deputado" : estado["deputados"] } if len(estado["deputados"]) > 0 else None
+        elemento.clear()
+
+      elif tag == "Votacao":
+        elemento.clear()
+
+      elif len(caminho) == 1 and caminho[0] == "proposicao" and tag in CAMPOS_PROPOSICAO:
+        proposicao[tag] = texto(elemento)
+
+      elif len(caminho) == 1 and caminho[0] == "erro" and tag == "descricao":
+        estado["erro"] = texto(elemento)
+
+  try:
+    for inicio in range(0, len(xml), TAMANHO_BLOCO):
+      parser.feed(xml[inicio:inicio + TAMANHO_BLOCO])
+      processar(parser.read_events())
+
+    parser.close()
+    processar(parser.read_events())
+
+  except (ET.ParseError, KeyError, TypeError, AttributeError) as e:
+    raise XMLInesperado(f"Não foi possível ler o XML de ObterVotacaoProposicao: {e!r}") from e
+
+  # O camaraPy também levanta uma exceção genérica quando a API devolve um XML de erro
+  if estado["erro"] is not None:
+    raise Exception(f"Houve um erro na sua requisição. O servidor respondeu com: \"{estado['erro']}\"")
+
+  # Com uma única votação, os dados ficam soltos, como no xmltodict
+  if len(votacoes) == 0:
+    proposicao["Votacoes"] = None
+  else:
+    proposicao["Votacoes"] = { "Votacao" : votacoes[0] if len(votacoes) == 1 else votacoes }
+
+  return { "proposicao" : proposicao }
+
+def interpretar_votacao_proposicao(payload):
+  '''
+  Retorna a resposta de ObterVotacaoProposicao como dicionário. Ela pode ter
+  sido guardada pelo caminho do camaraPy, já como dicionário, ou pela leitura
+  direta, como o texto do XML.
+
+  Parâmetros:
+  payload -> A resposta, nova ou lida do cache
+  '''
+  if isinstance(payload, str):
+    return ler_votacao_proposicao(payload)
+
+  return payload
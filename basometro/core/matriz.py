@@ -0,0 +1,442 @@
+'''
+Matriz de votos do Basômetro. Para cada governo, uma matriz densa de
+deputados × votações, com um int8 por célula, diz como cada deputado votou em
+cada votação em relação à orientação do governo (ver SEM_VOTO,
+VOTO_GOVERNISTA, VOTO_CONTRARIO e VOTO_LIBERADO). Matrizes do mesmo formato
+guardam o código do partido, da UF e do nome do deputado em cada voto, e
+vetores guardam a data e a sessão (idVotacao) de cada votação. Com elas, os
+votos de um deputado são uma linha e os de um partido são uma máscara, sem
+filtrar o DataFrame de votos inteiro, que tem uma linha de texto por voto.
+
+Cada governo é uma partição, salva em arquivos .npy e aberta com
+np.load(mmap_mode = "r"): os arrays são lidos do disco sob demanda e, como
+são mapeados e não copiados, vários processos que abram a mesma matriz
+compartilham a mesma memória.
+
+A matriz fica ao lado do banco de dados, com a extensão .matriz acrescentada
+ao nome, e registra a assinatura do banco de dados que descreve, como o
+índice (ver indice.IndiceVotacoes). O atualizador refaz apenas as partições
+dos governos que receberam votos novos (ver atualizar). Os arquivos nunca são
+alterados no lugar: cada partição refeita vai para um diretório novo, e o
+manifesto que aponta para elas é substituído de uma vez.
+'''
+
+from basometro.core import armazenamento
+import json, os, shutil, uuid
+import numpy as np
+import pandas as pd
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Valores das células da matriz de votos
+SEM_VOTO        = 0
+VOTO_GOVERNISTA = 1
+VOTO_CONTRARIO  = -1
+VOTO_LIBERADO   = 2  # Voto em uma votação na qual o governo liberou a bancada
+
+# Colunas lidas do banco de dados para montar a matriz
+COLUNAS = [ 'parlamentar', 'ideCadastro', 'UF', 'voto', 'partido', 'orientacaoGoverno', 'data', 'governo' ] + armazenamento.COLUNAS_VOTACAO
+
+# Atributos de cada voto guardados em matrizes de códigos: nome da matriz -> (coluna, tipo)
+ATRIBUTOS = {
+  "partidos" : ( 'partido',     np.int8  ),
+  "ufs"      : ( 'UF',          np.int8  ),
+  "nomes"    : ( 'parlamentar', np.int16 ),
+}
+
+# Arquivo, dentro do diretório da matriz, que lista as partições
+MANIFESTO = "matriz.json"
+
+class ParticaoGoverno(object):
+  '''
+  As matrizes e os vetores dos votos de um governo. As linhas são os
+  deputados, em ordem crescente de ideCadastro, e as colunas são as votações,
+  na ordem em que aparecem no banco de dados.
+
+  Atributos:
+  deputados -> O ideCadastro de cada linha
+  votos -> Matriz int8 com o voto de cada deputado em cada votação
+  partidos, ufs, nomes -> Matrizes com o código do partido, da UF e do nome do
+  deputado em cada voto, ou -1 onde não há voto. Os valores estão em dicionarios.
+  posicoes -> Matriz com a posição de cada voto entre os da sua votação, na ordem do banco de dados
+  datas -> A data de cada votação
+  sessoes -> O código do idVotacao de cada votação
+  duplicados -> A linha e a coluna de cada voto de um deputado em uma votação
+  na qual ele já tinha votado, que não entra na matriz (ver construir)
+  dicionarios -> Os valores de cada código: um dicionário com as listas
+  "partidos", "ufs", "nomes" e "sessoes"
+  '''
+
+  ARRAYS = [ "deputados", "votos", "partidos", "ufs", "nomes", "posicoes", "datas", "sessoes", "duplicados" ]
+
+  def __init__(self, arrays, dicionarios):
+    for nome in self.ARRAYS:
+      setattr(self, nome, arrays[nome])
+
+    self.dicionarios = dicionarios
+
+  @classmethod
+  def construir(cls, df):
+    '''
+    Monta a partição a partir dos votos de um governo. Um deputado não pode
+    votar duas vezes na mesma votação, mas há dados problemáticos da Câmara em
+    que isso ocorre: a célula fica com o primeiro voto, na ordem do banco de
+    dados, e os demais são guardados em duplicados, para que sejam avisados
+    (ver votos_duplicados e basometro_governos.validar_sessoes).
+
+    Parâmetros:
+    df -> DataFrame com as COLUNAS, tipado (ver esquema.aplicar) e na ordem do banco de dados
+    '''
+
+    def fatorar(colunas):
+      # Código de cada combinação de valores das colunas, na ordem em que aparecem
+      chave = np.zeros(df.shape[0], dtype = np.int64)
+
+      for coluna in colunas:
+        codigos, distintos = pd.factorize(df[coluna])
+        chave = chave * (len(distintos) + 1) + (codigos + 1)
+
+      return pd.factorize(chave)[0]
+
+    def por_votacao(valores):
+      # O valor do primeiro voto de cada votação
+      vetor = np.empty(n_votacoes, dtype = valores.dtype)
+      vetor[colunas[::-1]] = valores[::-1]
+      return vetor
+
+    ###############################
+    ### EXECUÇÃO DE construir() ###
+    ###############################
+
+    # Votos sem ideCadastro não pertencem a nenhuma linha
+    df = df[ df.ideCadastro.notna() ]
+
+    deputados, linhas = np.unique(df.ideCadastro.values.astype(np.int64), return_inverse = True)
+    colunas           = fatorar(armazenamento.COLUNAS_VOTACAO)
+
+    n_deputados = deputados.shape[0]
+    n_votacoes  = int(colunas.max()) + 1 if colunas.shape[0] > 0 else 0
+
+    repetidos = pd.Series(linhas * n_votacoes + colunas).duplicated().values
+
+    arrays = {
+      "deputados"  : deputados.astype(np.int32),
+      "duplicados" : np.stack([ linhas[repetidos], colunas[repetidos] ], axis = 1).astype(np.int32),
+    }
+
+    df, linhas, colunas = df[~repetidos], linhas[~repetidos], colunas[~repetidos]
+
+    liberado   = (df.orientacaoGoverno == "Liberado").values
+    governista = (df.voto == df.orientacaoGoverno).values
+
+    arrays["votos"] = np.full( (n_deputados, n_votacoes), SEM_VOTO, dtype = np.int8 )
+    arrays["votos"][linhas, colunas] = np.where(liberado, VOTO_LIBERADO, np.where(governista, VOTO_GOVERNISTA, VOTO_CONTRARIO))
+
+    dicionarios = { }
+
+    for nome, (coluna, tipo) in ATRIBUTOS.items():
+      codigos, distintos = pd.factorize(df[coluna])
+
+      if len(distintos) > np.iinfo(tipo).max:
+        raise ValueError(f"A coluna {coluna} tem valores demais para a matriz de votos: {len(distintos)}")
+
+      arrays[nome] = np.full( (n_deputados, n_votacoes), -1, dtype = tipo )
+      arrays[nome][linhas, colunas] = codigos
+      dicionarios[nome] = [ str(valor) for valor in distintos ]
+
+    arrays["posicoes"] = np.zeros( (n_deputados, n_votacoes), dtype = np.int16 )
+    arrays["posicoes"][linhas, colunas] = pd.Series(colunas).groupby(colunas).cumcount().values
+
+    sessoes, distintas = pd.factorize(df.idVotacao)
+    dicionarios["sessoes"] = [ str(valor) for valor in distintas ]
+
+    arrays["datas"]   = por_votacao(df.data.values.astype("datetime64[ns]"))
+    arrays["sessoes"] = por_votacao(sessoes.astype(np.int32))
+
+    return cls(arrays, dicionarios)
+
+  @classmethod
+  def abrir(cls, diretorio):
+    '''
+    Abre uma partição salva, mapeando os arrays na memória sem lê-los
+    '''
+    arrays = { nome : np.load(os.path.join(diretorio, f"{nome}.npy"), mmap_mode = "r") for nome in cls.ARRAYS }
+
+    with open(os.path.join(diretorio, "dicionarios.json"), encoding = "utf-8") as file:
+      dicionarios = json.load(file)
+
+    return cls(arrays, dicionarios)
+
+  def salvar(self, diretorio):
+    os.makedirs(diretorio)
+
+    for nome in self.ARRAYS:
+      np.save(os.path.join(diretorio, f"{nome}.npy"), getattr(self, nome))
+
+    with open(os.path.join(diretorio, "dicionarios.json"), "w", encoding = "utf-8") as file:
+      json.dump(self.dicionarios, file, ensure_ascii = False)
+
+    armazenamento.sincronizar_diretorio(diretorio)
+
+  def linha(self, ideCadastro):
+    '''
+    Retorna a linha de um deputado, ou None se ele não votou no governo
+    '''
+    try:
+      ideCadastro = int(ideCadastro)
+    except ValueError:
+      return None
+
+    linha = int(np.searchsorted(self.deputados, ideCadastro))
+
+    if linha < self.deputados.shape[0] and self.deputados[linha] == ideCadastro:
+      return linha
+
+    return None
+
+  def codigo(self, atributo, valor):
+    '''
+    Retorna o código de um valor (um partido, por exemplo) no dicionário de um
+    atributo, ou None se ele não aparecer nos votos do governo
+    '''
+    try:
+      return self.dicionarios[atributo].index(valor)
+    except ValueError:
+      return None
+
+  def votos_duplicados(self):
+    '''
+    Retorna um DataFrame com o ideCadastro, o idVotacao e o total de votos de
+    cada deputado que votou mais de uma vez na mesma votação
+    '''
+    linhas, colunas = self.duplicados[:, 0], self.duplicados[:, 1]
+
+    repetidos = pd.DataFrame({
+      "ideCadastro" : self.deputados[linhas],
+      "idVotacao"   : np.array(self.dicionarios["sessoes"], dtype = object)[ self.sessoes[colunas] ],
+    })
+
+    # Cada linha é um voto além do primeiro
+    return repetidos.groupby([ 'ideCadastro', 'idVotacao' ], sort = False).size().add(1).rename("votos").reset_index()
+
+  def mascara(self, ideCadastro = None, partido = None):
+    '''
+    Retorna as linhas selecionadas e uma máscara booleana dos votos delas,
+    fora das votações liberadas, de um deputado, de um partido (pelo partido
+    em cada voto) ou, se nenhum dos dois for informado, de todos os deputados
+    '''
+    if ideCadastro is not None:
+      linha  = self.linha(ideCadastro)
+      linhas = slice(0, 0) if linha is None else slice(linha, linha + 1)
+    else:
+      linhas = slice(None)
+
+    votos   = self.votos[linhas]
+    mascara = (votos == VOTO_GOVERNISTA) | (votos == VOTO_CONTRARIO)
+
+    if partido is not None:
+      codigo   = self.codigo("partidos", partido)
+      mascara &= (self.partidos[linhas] == codigo) if codigo is not None else False
+
+    return linhas, mascara
+
+  def dataframe(self, ideCadastro = None, partido = None):
+    '''
+    Retorna como DataFrame os votos de mascara(), na ordem das votações, com as
+    colunas de um voto (ideCadastro, parlamentar, partido, UF, data e idVotacao)
+    e a coluna booleana governista, verdadeira para os votos que seguiram a
+    orientação do governo
+    '''
+    linhas, mascara = self.mascara(ideCadastro, partido)
+    primeira        = linhas.start or 0
+
+    # Com a máscara transposta, os votos saem ordenados pela votação
+    colunas, linhas = np.nonzero(mascara.T)
+    linhas          = linhas + primeira
+
+    def decodificar(nome, codigos):
+      return pd.Categorical.from_codes(codigos, categories = pd.Index(self.dicionarios[nome], dtype = object))
+
+    return pd.DataFrame({
+      "ideCadastro" : self.deputados[linhas],
+      "parlamentar" : decodificar("nomes", self.nomes[linhas, colunas]),
+      "partido"     : decodificar("partidos", self.partidos[linhas, colunas]),
+      "UF"          : decodificar("ufs", self.ufs[linhas, colunas]),
+      "data"        : self.datas[colunas],
+      "idVotacao"   : decodificar("sessoes", self.sessoes[colunas]),
+      "governista"  : self.votos[linhas, colunas] == VOTO_GOVERNISTA,
+    })
+
+class MatrizVotos(object):
+  '''
+  As partições da matriz de votos de um banco de dados, uma por governo.
+
+  Parâmetros:
+  caminho_banco -> O caminho do banco de dados, em qualquer dos formatos de
+  armazenamento.abrir_banco. A matriz é salva ao lado dele, com a extensão
+  .matriz acrescentada ao nome; se o caminho for um link simbólico, ao lado
+  do destino do link, como o índice.
+  '''
+
+  VERSAO = 2
+
+  def __init__(self, caminho_banco):
+    self.banco             = armazenamento.abrir_banco(caminho_banco)
+    self.caminho           = f"{os.path.realpath(self.banco.caminho)}.matriz"
+    self.caminho_manifesto = os.path.join(self.caminho, MANIFESTO)
+    self.particoes         = { }
+    self._diretorios       = { }
+
+  @classmethod
+  def abrir(cls, caminho_banco):
+    '''
+    Carrega a matriz do banco de dados ou, se ela não existir ou
+    estiver desatualizada, constrói e salva uma nova.
+    '''
+    matriz = cls(caminho_banco)
+
+    if not matriz.carregar():
+      print("Construindo a matriz de votos do banco de dados.")
+      matriz.reconstruir()
+
+    return matriz
+
+  def carregar(self):
+    '''
+    Abre as partições salvas. Retorna False se a matriz não existir, for de
+    outra versão ou não corresponder mais ao banco de dados.
+    '''
+    try:
+      with open(self.caminho_manifesto, encoding = "utf-8") as file:
+        dados = json.load(file)
+
+    except (OSError, ValueError):
+      return False
+
+    if dados.get("versao") != self.VERSAO or dados.get("assinatura") != self.banco.assinatura():
+      return False
+
+    self._diretorios = dados["particoes"]
+    self.particoes   = { governo : ParticaoGoverno.abrir(os.path.join(self.caminho, diretorio)) for governo, diretorio in self._diretorios.items() }
+
+    return True
+
+  def reconstruir(self):
+    '''
+    Monta todas as partições a partir do banco de dados inteiro
+    '''
+    self.particoes   = { }
+    self._diretorios = { }
+
+    self.gravar( self.banco.ler(colunas = COLUNAS, tipado = True) )
+
+  def atualizar(self, governos):
+    '''
+    Refaz as partições de alguns governos – em geral, os que receberam votos
+    novos –, lendo do banco de dados apenas os votos deles. No banco colunar,
+    apenas as partições desses governos são lidas.
+
+    Parâmetros:
+    governos -> Os governos cujas partições são refeitas
+    '''
+    governos = [ governo for governo in governos if pd.notnull(governo) ]
+
+    if len(governos) > 0:
+      self.gravar( self.banco.ler(colunas = COLUNAS, governos = governos, tipado = True) )
+
+    else:
+      self.salvar_manifesto()
+
+  def gravar(self, df):
+    '''
+    Monta e salva as partições dos governos de um DataFrame de votos, que
+    substituem as que já existirem, e depois o manifesto
+    '''
+    for governo, grupo in df.groupby('governo', sort = False, observed = True):
+      diretorio = f"particao-{uuid.uuid4().hex}"
+      caminho   = os.path.join(self.caminho, diretorio)
+
+      ParticaoGoverno.construir(grupo).salvar(caminho)
+
+      self._diretorios[governo] = diretorio
+      self.particoes[governo]   = ParticaoGoverno.abrir(caminho)
+
+    self.salvar_manifesto()
+    self.limpar()
+
+  def salvar_manifesto(self):
+    '''
+    Salva o manifesto, associado à versão atual do banco de dados. O arquivo
+    é escrito primeiro em um temporário, para nunca ficar pela metade.
+    '''
+    os.makedirs(self.caminho, exist_ok = True)
+
+    dados = {
+      "versao"     : self.VERSAO,
+      "assinatura" : self.banco.assinatura(),
+      "particoes"  : self._diretorios,
+    }
+
+    temporario = f"{self.caminho_manifesto}.tmp"
+    with open(temporario, "w", encoding = "utf-8") as file:
+      json.dump(dados, file, ensure_ascii = False, indent = 1)
+
+    os.replace(temporario, self.caminho_manifesto)
+    armazenamento.sincronizar_diretorio(self.caminho)
+
+  def limpar(self):
+    '''
+    Apaga os diretórios de partições que não estão no manifesto
+    '''
+    atuais = set(self._diretorios.values())
+
+    for nome in os.listdir(self.caminho):
+      if nome.startswith("particao-") and nome not in atuais:
+        shutil.rmtree(os.path.join(self.caminho, nome))
+
+  def dataframe(self, governo, ideCadastro = None, partido = None):
+    '''
+    Retorna os votos de um governo como em ParticaoGoverno.dataframe, ou um
+    DataFrame vazio se não houver votos do governo na matriz
+    '''
+    if governo not in self.particoes:
+      return pd.DataFrame(columns = [ "ideCadastro", "parlamentar", "partido", "UF", "data", "idVotacao", "governista" ])
+
+    return self.particoes[governo].dataframe(ideCadastro = ideCadastro, partido = partido)
+
+  def governos(self, ideCadastro = None, partido = None):
+    '''
+    Retorna, em ordem cronológica, os governos em que um deputado ou um
+    partido têm votos – incluindo os das votações liberadas – ou, se nenhum
+    dos dois for informado, todos os governos da matriz
+    '''
+    governos = sorted( self.particoes, key = lambda governo: self.particoes[governo].datas.min() )
+
+    if ideCadastro is not None:
+      governos = [ governo for governo in governos if self.particoes[governo].linha(ideCadastro) is not None ]
+
+    if partido is not None:
+      governos = [ governo for governo in governos if self.particoes[governo].codigo("partidos", partido) is not None ]
+
+    return governos
+
+  def deputados(self):
+    '''
+    Retorna o ideCadastro de todos os deputados da matriz, em ordem crescente
+    '''
+    return np.unique( np.concatenate( [ particao.deputados for particao in self.particoes.values() ] + [ np.zeros(0, dtype = np.int32) ] ) )
+
+  def partidos(self):
+    '''
+    Retorna todos os partidos da matriz, na ordem em que aparecem nos governos
+    '''
+    partidos = { }
+
+    for governo in self.governos():
+      partidos.update( dict.fromkeys(self.particoes[governo].dicionarios["partidos"]) )
+
+    return list(partidos)
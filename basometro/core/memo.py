@@ -0,0 +1,170 @@
+'''
+Memória, válida durante uma única coleta, dos detalhes e das votações das
+proposições. ObterVotacaoProposicao devolve as votações de todos os anos em
+que a proposição foi ao plenário, mas cada ano da coleta só usa as suas. Em
+vez de buscar a proposição de novo a cada ano em que ela aparece, a primeira
+busca separa as votações por ano e guarda as dos outros anos da coleta até
+que eles sejam processados.
+
+As votações guardadas só são entregues para outro ano se a resposta original
+também valer para ele pelos critérios do cache em disco (ver
+requisicoes.validade_para_ano). Uma resposta antiga, lida do cache para um ano
+já encerrado, pode não conter as votações mais recentes; nesse caso, a
+proposição é buscada de novo.
+'''
+
+from basometro.core import requisicoes
+from concurrent.futures import Future
+import threading
+
+class MemoProposicoes(object):
+  '''
+  Guarda os parâmetros de todas as proposições consultadas e as votações
+  ainda não usadas, separadas por ano. As votações de um ano são entregues
+  uma única vez e, em seguida, descartadas, então a memória ocupada se limita
+  às votações de proposições que voltam ao plenário em anos posteriores.
+
+  Se duas threads pedirem a mesma proposição ao mesmo tempo, apenas uma faz a
+  requisição e a outra espera pelo resultado.
+
+  Parâmetros:
+  years -> Os anos da coleta. Votações de outros anos são entregues junto com as
+  do ano que fez a primeira busca pela proposição.
+  '''
+
+  def __init__(self, years):
+    self.years                  = set( int(year) for year in years )
+    self.economia_detalhes      = 0
+    self.economia_votacoes      = 0
+    self._parametros            = { }
+    self._votacoes              = { }
+    self._lock                  = threading.Lock()
+
+  def buscar(self, memoria, chave, funcao):
+    '''
+    Retorna o Future guardado em memoria[chave] ou, se ele não existir, executa
+    funcao() e guarda seu resultado em um novo Future. Devolve o par (futuro,
+    economizado). Exceções conhecidas da API também são guardadas, como em
+    requisicoes.chamar: o resultado do Future é o par (valor, classe da exceção).
+    Outros erros não são guardados, para que a próxima consulta tente de novo.
+    '''
+    with self._lock:
+      futuro = memoria.get(chave)
+      dono   = futuro is None
+      if dono:
+        futuro = memoria[chave] = Future()
+
+    if dono:
+      try:
+        futuro.set_result( (funcao(), None) )
+
+      except tuple(requisicoes.EXCECOES_CONHECIDAS.values()) as e:
+        futuro.set_result( (None, type(e)) )
+
+      except BaseException as e:
+        with self._lock:
+          del memoria[chave]
+        futuro.set_exception(e)
+        raise
+
+    return futuro, not dono
+
+  def resultado(self, futuro):
+    '''
+    Espera pelo resultado de um Future criado por buscar e levanta
+    novamente a exceção conhecida, se for o caso
+    '''
+    valor, excecao = futuro.result()
+
+    if excecao is not None:
+      raise excecao(excecao.err_message)
+
+    return valor
+
+  def parametros(self, id_proposicao, obter_parametros):
+    '''
+    Retorna os parâmetros (tipo, número e ano) de uma proposição.
+
+    Parâmetros:
+    id_proposicao -> O codProposicao da proposição
+    obter_parametros -> Função que recebe o id e busca os parâmetros na API
+    '''
+    futuro, economizado = self.buscar(self._parametros, id_proposicao, lambda: obter_parametros(id_proposicao))
+
+    if economizado:
+      with self._lock:
+        self.economia_detalhes += 1
+
+    return self.resultado(futuro)
+
+  def votacoes(self, id_proposicao, params, year):
+    '''
+    Retorna um par com os dados da proposição (tipo, número e ano) e a lista
+    de suas votações que aconteceram no ano informado. Levanta as mesmas
+    exceções conhecidas que requisicoes.obter_votacao_proposicao.
+
+    Parâmetros:
+    id_proposicao -> O codProposicao da proposição
+    params -> Dicionário com tipo, número e ano da proposição
+    year -> O ano cujas votações devem ser devolvidas
+    '''
+
+    def separar_por_ano():
+      votacoes, gravado_em = requisicoes.obter_votacao_proposicao(params, year, com_data = True)
+
+      dados_proposicao = {
+        "tipoProposicao"   : votacoes['proposicao']['Sigla'].strip(),
+        "numeroProposicao" : votacoes['proposicao']['Numero'].strip(),
+        "anoProposicao"    : votacoes['proposicao']['Ano'].strip()
+      }
+
+      votacoes = votacoes['proposicao']['Votacoes']['Votacao']
+
+      # Se houve apenas uma votação, os dados vêm como um dicionário solto
+      if isinstance(votacoes, dict):
+        votacoes = [ votacoes ]
+
+      # Votações de anos fora da coleta ficam com o ano desta busca, como
+      # aconteceria sem a memória; o filtro do chamador decide se as mantém
+      por_ano = { }
+      for votacao in votacoes:
+        year_votacao = int(votacao["@Data"].strip()[-4:])
+        if year_votacao not in self.years:
+          year_votacao = int(year)
+        por_ano.setdefault(year_votacao, [ ]).append(votacao)
+
+      return dados_proposicao, por_ano, gravado_em
+
+    futuro, economizado = self.buscar(self._votacoes, id_proposicao, separar_por_ano)
+
+    dados_proposicao, por_ano, gravado_em = self.resultado(futuro)
+
+    if economizado:
+
+      # A resposta guardada é antiga demais para este ano: descarta e busca de novo
+      if not requisicoes.resposta_valida(gravado_em, year):
+        with self._lock:
+          if self._votacoes.get(id_proposicao) is futuro:
+            del self._votacoes[id_proposicao]
+
+        return self.votacoes(id_proposicao, params, year)
+
+      with self._lock:
+        self.economia_votacoes += 1
+
+    with self._lock:
+      votacoes = por_ano.pop(int(year), [ ])
+
+      # Sem mais votações para entregar, a entrada pode ser descartada
+      if len(por_ano) == 0 and self._votacoes.get(id_proposicao) is futuro:
+        del self._votacoes[id_proposicao]
+
+    return dados_proposicao, votacoes
+
+  def relatorio(self):
+    '''
+    Imprime no console quantas requisições a memória evitou
+    '''
+    total = self.economia_detalhes + self.economia_votacoes
+    print(f"Memória de proposições: {total} requisições economizadas "
+          f"({self.economia_detalhes} de detalhes e {self.economia_votacoes} de votações).")
@@ -0,0 +1,385 @@
+'''
+Ponto único de acesso às funções do camaraPy usadas pelos coletores
+do Basômetro. Todas as requisições passam pelo cache em disco definido
+em core.cache: anos já encerrados nunca mudam e, por isso, suas respostas
+são guardadas para sempre; as do ano corrente valem por pouco tempo. As
+que precisam ir até a API são executadas pelo agendador de core.agendador,
+que controla o ritmo e a concorrência e repete as que falham. As votações
+podem, opcionalmente, ser lidas direto do XML da API por core.leitor_xml.
+'''
+
+from basometro.core import agendador, cache, leitor_xml
+from camaraPy.api_original.core import custom_exceptions
+from camaraPy.api_original import proposicoes
+import datetime, time
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Onde as respostas da API são armazenadas
+DIRETORIO_CACHE = "./database/cache"
+
+# Por quanto tempo, em segundos, as respostas referentes ao ano corrente são válidas
+TTL_ANO_CORRENTE = 60 * 60
+
+# Exceções do camaraPy que fazem parte do funcionamento normal da API
+# e, por isso, também são guardadas no cache
+EXCECOES_CONHECIDAS = {
+  "ProposicaoAcessoria" : custom_exceptions.ProposicaoAcessoria,
+  "SemDados"            : custom_exceptions.SemDados,
+}
+
+# O cache usado por todas as requisições. Pode ser trocado ou
+# desativado (com None) pela função configurar_cache.
+CACHE = cache.CacheRespostas(DIRETORIO_CACHE)
+
+# Se verdadeiro, nenhuma requisição é feita à API: tudo vem do cache
+OFFLINE = False
+
+# Se verdadeiro, o XML de ObterVotacaoProposicao é lido diretamente pelo
+# leitor_xml, sem passar pelos dicionários do camaraPy
+LEITURA_XML = False
+
+# Número máximo de requisições por segundo feitas à API da Câmara
+TAXA_MAXIMA = 20
+
+# Número máximo de requisições simultâneas que o agendador pode permitir
+CONCORRENCIA_MAXIMA = 32
+
+# Número máximo de tentativas de cada requisição que falhar por erro transitório
+TENTATIVAS = 5
+
+class ForaDoCache(LookupError):
+  '''
+  Exceção levantada quando, no modo offline, uma
+  requisição não tem resposta salva no cache.
+  '''
+  pass
+
+class ErroServidor(Exception):
+  '''
+  Exceção levantada quando a API responde com um XML de erro, o que acontece
+  de vez em quando, sem motivo aparente. O camaraPy e o leitor_xml levantam
+  uma Exception genérica nesse caso; ela é trocada por esta, que o agendador
+  trata como um erro transitório.
+  '''
+  pass
+
+################
+# CONFIGURAÇÃO #
+################
+
+def criar_agendador(taxa = TAXA_MAXIMA, **kwargs):
+  '''
+  Cria um agendador.AgendadorRequisicoes com os parâmetros globais deste
+  módulo. As exceções conhecidas do camaraPy nunca são repetidas; os erros de
+  rede, HTTP e de tempo esgotado (OSError, que inclui os do requests) e os XMLs
+  de erro da API (ErroServidor) são repetidos.
+
+  Parâmetros:
+  taxa -> Número máximo de requisições por segundo. None desativa o limite.
+  kwargs -> Demais parâmetros de agendador.AgendadorRequisicoes
+  '''
+  kwargs.setdefault("concorrencia_maxima", CONCORRENCIA_MAXIMA)
+  kwargs.setdefault("tentativas", TENTATIVAS)
+
+  return agendador.AgendadorRequisicoes(taxa = taxa, permanentes = tuple(EXCECOES_CONHECIDAS.values()),
+                                        transitorias = (OSError, ErroServidor), **kwargs)
+
+# O agendador usado por todas as requisições que vão até a API. Pode ser
+# trocado ou desativado (com None) pela função configurar_agendador.
+AGENDADOR = criar_agendador()
+
+def configurar_agendador(novo_agendador):
+  '''
+  Troca o agendador usado pelas requisições e retorna o anterior.
+
+  Parâmetros:
+  novo_agendador -> Um objeto agendador.AgendadorRequisicoes, como os criados por
+  criar_agendador, ou None, para chamar o camaraPy diretamente, sem limites nem novas tentativas
+  '''
+  global AGENDADOR
+
+  anterior  = AGENDADOR
+  AGENDADOR = novo_agendador
+
+  return anterior
+
+def configurar_cache(novo_cache, offline = False):
+  '''
+  Troca o cache usado pelas requisições e retorna o anterior.
+
+  Parâmetros:
+  novo_cache -> Um objeto cache.CacheRespostas ou None, para desativar o cache
+  offline -> Booleano. Se verdadeiro, as respostas vêm exclusivamente do cache
+  e qualquer requisição que não esteja salva levanta ForaDoCache. Serve para
+  reconstruir o banco de dados sem acessar a API, com qualquer idade de entrada.
+  '''
+  global CACHE, OFFLINE
+
+  anterior = CACHE
+  CACHE    = novo_cache
+  OFFLINE  = offline
+
+  return anterior
+
+def configurar_leitura_xml(ativa):
+  '''
+  Liga ou desliga a leitura direta do XML de ObterVotacaoProposicao (ver
+  core.leitor_xml) e retorna a configuração anterior. As respostas lidas
+  assim são guardadas no cache como XML; as duas formas de leitura entendem
+  as respostas guardadas pela outra.
+
+  Parâmetros:
+  ativa -> Booleano. Se falso, as votações são obtidas pelo camaraPy.
+  '''
+  global LEITURA_XML
+
+  anterior    = LEITURA_XML
+  LEITURA_XML = ativa
+
+  return anterior
+
+def validade_para_ano(year):
+  '''
+  Retorna os critérios de validade (ver cache.CacheRespostas.ler) das respostas
+  referentes a um ano. Qualquer resposta vale por TTL_ANO_CORRENTE segundos;
+  as gravadas depois que o ano terminou valem para sempre.
+
+  Parâmetros:
+  year -> O ano a que a requisição se refere. Pode ser None, caso em que
+  a resposta é tratada como se fosse do ano corrente.
+  '''
+  validade = { "ttl" : TTL_ANO_CORRENTE, "gravado_apos" : None }
+
+  if year is not None:
+    fim_do_ano = datetime.datetime(int(year) + 1, 1, 1)
+    if fim_do_ano <= datetime.datetime.now():
+      validade["gravado_apos"] = fim_do_ano.timestamp()
+
+  return validade
+
+def relatorio_cache():
+  '''
+  Imprime no console quantas requisições foram respondidas pelo cache
+  '''
+  if CACHE is None:
+    print("Cache de respostas desativado.")
+    return
+
+  total = CACHE.acertos + CACHE.falhas
+  print(f"Cache de respostas: {CACHE.acertos} acertos e {CACHE.falhas} falhas em {total} requisições.")
+
+def relatorio_agendador():
+  '''
+  Imprime no console quantas requisições chegaram à API e quantas precisaram ser repetidas
+  '''
+  if AGENDADOR is None:
+    print("Agendador de requisições desativado.")
+    return
+
+  print(f"Requisições à API: {AGENDADOR.requisicoes} respondidas, {AGENDADOR.erros} erros transitórios "
+        f"e {AGENDADOR.retentativas} novas tentativas. Concorrência final: {AGENDADOR.limite} requisições simultâneas.")
+
+def estatisticas():
+  '''
+  Retorna os contadores do cache e do agendador deste processo. Os processos
+  da coleta dividida por ano (ver basometro_coleta.coletar_particoes) os
+  devolvem ao processo principal, que os soma aos seus com somar_estatisticas,
+  para que relatorio_cache e relatorio_agendador cubram a coleta inteira.
+  '''
+  contadores = { "cache" : None, "agendador" : None }
+
+  if CACHE is not None:
+    contadores["cache"] = { "acertos" : CACHE.acertos, "falhas" : CACHE.falhas }
+
+  if AGENDADOR is not None:
+    contadores["agendador"] = {
+      "requisicoes"  : AGENDADOR.requisicoes,
+      "erros"        : AGENDADOR.erros,
+      "retentativas" : AGENDADOR.retentativas,
+      "votos"        : AGENDADOR.votos,
+    }
+
+  return contadores
+
+def zerar_estatisticas():
+  '''
+  Zera os contadores do cache e do agendador deste processo
+  '''
+  if CACHE is not None:
+    CACHE.zerar_estatisticas()
+
+  if AGENDADOR is not None:
+    AGENDADOR.zerar_estatisticas()
+
+def somar_estatisticas(contadores):
+  '''
+  Soma aos contadores deste processo os de outro, retornados por estatisticas
+
+  Parâmetros:
+  contadores -> O dicionário retornado por estatisticas no outro processo
+  '''
+  if CACHE is not None and contadores["cache"] is not None:
+    CACHE.somar_estatisticas(**contadores["cache"])
+
+  if AGENDADOR is not None and contadores["agendador"] is not None:
+    AGENDADOR.somar_estatisticas(**contadores["agendador"])
+
+def contar_votos(n):
+  '''
+  Informa ao agendador quantos votos foram processados, para o cálculo da vazão
+  '''
+  if AGENDADOR is not None:
+    AGENDADOR.contar_votos(n)
+
+def resumo_vazao():
+  '''
+  Retorna a vazão atual da coleta, para os avisos de progresso
+  '''
+  if AGENDADOR is None:
+    return ""
+
+  return AGENDADOR.resumo()
+
+###############
+# REQUISIÇÕES #
+###############
+
+def chamar(metodo, params, validade = { }, com_data = False, funcao = None, interpretar = None):
+  '''
+  Executa um método do camaraPy, consultando antes o cache. Exceções
+  conhecidas (como ProposicaoAcessoria) também são guardadas e levantadas
+  novamente quando a resposta vem do cache.
+
+  Parâmetros:
+  metodo -> O nome do método do módulo proposicoes do camaraPy
+  params -> Dicionário com os parâmetros da requisição
+  validade -> Dicionário com os critérios de validade das respostas salvas,
+  como o gerado por validade_para_ano. Sem critérios, qualquer resposta salva vale.
+  com_data -> Booleano. Se verdadeiro, retorna o par (resposta, timestamp em que
+  ela foi obtida da API), que pode ser passado para resposta_valida.
+  funcao -> Função que faz a requisição no lugar do método do camaraPy
+  interpretar -> Função aplicada à resposta, nova ou salva, antes de ela ser
+  devolvida. No cache, fica guardada a resposta original.
+  '''
+  if interpretar is None:
+    interpretar = lambda payload: payload
+
+  if funcao is None:
+    funcao = getattr(proposicoes, metodo)
+
+  funcao = identificar_erro_servidor(funcao)
+
+  if CACHE is not None:
+
+    entrada = CACHE.ler(metodo, params, **({ } if OFFLINE else validade))
+
+    if entrada is not None:
+      if entrada["erro"] is not None:
+        excecao = EXCECOES_CONHECIDAS[entrada["erro"]]
+        raise excecao(excecao.err_message)
+
+      if com_data:
+        return interpretar(entrada["payload"]), entrada["gravado_em"]
+
+      return interpretar(entrada["payload"])
+
+  if OFFLINE:
+    raise ForaDoCache(f"Não há resposta salva para {metodo} com os parâmetros {params}")
+
+  # O camaraPy adiciona os parâmetros ausentes ao dicionário recebido,
+  # então passamos uma cópia para não alterar a chave do cache
+  try:
+    if AGENDADOR is not None:
+      payload = AGENDADOR.executar(metodo, funcao, dict(params))
+    else:
+      payload = funcao(dict(params))
+
+  except tuple(EXCECOES_CONHECIDAS.values()) as e:
+    if CACHE is not None:
+      CACHE.escrever(metodo, params, erro = type(e).__name__)
+    raise
+
+  # Uma resposta que não pode ser interpretada não vai para o cache
+  resultado = interpretar(payload)
+
+  if CACHE is not None:
+    CACHE.escrever(metodo, params, payload = payload)
+
+  if com_data:
+    return resultado, time.time()
+
+  return resultado
+
+def identificar_erro_servidor(funcao):
+  '''
+  Retorna uma versão da função que faz a requisição em que a Exception
+  genérica levantada para um XML de erro da API vira ErroServidor. Outras
+  exceções genéricas, como as de parâmetros inválidos, passam inalteradas.
+
+  Parâmetros:
+  funcao -> A função que faz a requisição
+  '''
+  def chamar_funcao(params):
+    try:
+      return funcao(params)
+
+    except Exception as e:
+      if type(e) is Exception and str(e).startswith("Houve um erro na sua requisição. O servidor respondeu com"):
+        raise ErroServidor(*e.args) from e
+      raise
+
+  return chamar_funcao
+
+def resposta_valida(gravado_em, year):
+  '''
+  Informa se uma resposta obtida da API no instante gravado_em ainda vale
+  para as requisições referentes a um ano, pelos critérios de validade_para_ano.
+  No modo offline, qualquer resposta vale.
+  '''
+  if OFFLINE:
+    return True
+
+  return cache.CacheRespostas.valida({ "gravado_em" : gravado_em }, **validade_para_ano(year))
+
+def listar_proposicoes_votadas(year):
+  '''
+  Lista as proposições votadas em plenário em um ano
+  '''
+  return chamar("ListarProposicoesVotadasEmPlenario", { "Ano" : year }, validade_para_ano(year))
+
+def obter_proposicao(id_proposicao):
+  '''
+  Obtém os detalhes de uma proposição. Eles não mudam com o tempo.
+  '''
+  return chamar("ObterProposicaoPorID", { "IdProp" : id_proposicao })
+
+def obter_votacao_proposicao(params, year = None, com_data = False):
+  '''
+  Obtém todas as votações de uma proposição.
+
+  Parâmetros:
+  params -> Dicionário com tipo, número e ano da proposição
+  year -> O ano cujas votações interessam ao chamador. Uma proposição pode
+  voltar ao plenário a qualquer momento, então a resposta só é considerada
+  definitiva quando esse ano já terminou.
+  com_data -> Herdado de chamar
+  '''
+  validade = validade_para_ano(year)
+
+  if LEITURA_XML:
+    try:
+      return chamar("ObterVotacaoProposicao", params, validade, com_data,
+                    funcao = leitor_xml.baixar_votacao_proposicao,
+                    interpretar = leitor_xml.interpretar_votacao_proposicao)
+
+    # XML em formato inesperado: volta para o camaraPy
+    except leitor_xml.XMLInesperado as e:
+      print(f"Leitura direta do XML falhou para {params}; usando o camaraPy. {e}")
+
+  return chamar("ObterVotacaoProposicao", params, validade, com_data,
+                interpretar = leitor_xml.interpretar_votacao_proposicao)
@@ -1,35 +1,81 @@
 '''
 Esse script deve ser executado para capturar os dados
 e montar a estrutura de dados do Basômetro pela primeira vez.
-Ao final da execução, são gerados um banco de dados de votos completo
-e os arquivos .csv necessários para a geração das visualizações de dados.
+Ao final da execução, são gerados um banco de dados de votos completo,
+a sua exportação em CSV e os arquivos .csv necessários para a geração
+das visualizações de dados.
 '''
 
 from camaraPy.api_original import proposicoes as campy_proposicoes
 from basometro import basometro_coleta, basometro_aplicativo
-from basometro.core import core as basometro_core
+from basometro.core import armazenamento, core as basometro_core, diario, geracoes, indice, requisicoes
 import datetime, glob, os, shutil
 import pandas as pd
 
-def instalar_basometro():
-
-  def coletar_dados_api(start_year, end_year, keep_all = False):
+def instalar_basometro(start_year = 2003, end_year = None, max_workers = basometro_coleta.MAX_REQUISICOES_SIMULTANEAS, pipeline = False, offline = False, processos = None, exportar_csv = True, df_path = "./database/basometro"):
+  '''
+  Monta o banco de dados e os arquivos de visualização do Basômetro.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta. O padrão é 2003.
+  end_year -> O ano de término da coleta. O padrão é o ano atual.
+  max_workers -> Número máximo de proposições coletadas em paralelo.
+  pipeline -> Booleano. Caso verdadeiro, a coleta é feita pelo pipeline assíncrono.
+  offline -> Booleano. Caso verdadeiro, todas as respostas da API vêm do cache em disco,
+  sem nenhuma requisição à Câmara. Útil para reconstruir o banco de dados depois de uma
+  mudança no processamento dos votos.
+  processos -> Número de processos entre os quais os anos são divididos. Se for None, a coleta
+  acontece em um único processo. Caso algum ano falhe, basta executar a instalação de novo: os anos
+  que já foram coletados ficam salvos em database/particoes e não são refeitos.
+  Os arquivos da visualização também são gerados por esse número de processos
+  (ver basometro_aplicativo.gerar_arquivos_viz).
+  exportar_csv -> Booleano. Caso verdadeiro, o banco de dados também é exportado para
+  database/basometro.csv.
+  df_path -> O caminho do banco de dados. O formato depende dele (ver armazenamento.abrir_banco):
+  o padrão é o formato colunar; um caminho terminado em .sqlite cria um banco SQLite, com índices.
+  '''
+
+  def coletar_dados_api(start_year, end_year, gravador, max_workers = basometro_coleta.MAX_REQUISICOES_SIMULTANEAS, pipeline = False, processos = None):
     '''
     A função o módulo de coleta do Basômetro para acessar a API da Câmara e armazenar todas as votações
-    que ocorreram etre os anos especificados. O parâmetro `keep_all`, nesse caso, significa que vamos
-    descartar da base de dados as faltas e situações em que o presidente da Câmara optou por invocar o
-    Artigo 17 do regimento interno – dispositivo que permite que ele não participe da votação.
+    que ocorreram etre os anos especificados. Os votos são entregues, aos poucos, ao gravador, que já
+    descarta as faltas e situações em que o presidente da Câmara optou por invocar o Artigo 17 do
+    regimento interno – dispositivo que permite que ele não participe da votação.
 
     Parâmetros:
     start_year -> O ano de início da coleta. Pode ser int ou str.
     end_year -> O ano de término da coleta. Pode ser Sint ou str.
-    keep_all -> Indica se deve o coletor deve descartar faltas e invocações do Artigo 17. Booleano.
+    gravador -> O objeto armazenamento.GravadorVotos do banco de dados.
+    max_workers -> Número máximo de proposições coletadas em paralelo.
+    pipeline -> Booleano. Caso verdadeiro, usa o pipeline assíncrono de basometro_coleta.
+    processos -> Caso seja informado, divide os anos entre esse número de processos usando
+    basometro_coleta.coletar_particoes. As partições ficam em particoes_path até o fim da instalação
+    e funcionam como checkpoint, ano a ano.
+
+    Nos demais modos, cada proposição coletada é registrada no diário em diario_path. Se a instalação
+    for interrompida, a próxima execução com o mesmo intervalo de anos recomeça de onde ela parou.
     '''
-    database = basometro_coleta.coletar_votos(start_year, end_year, keep_all)
+    if processos:
+      years = basometro_coleta.coletar_particoes(start_year, end_year,
+                                                 diretorio = particoes_path,
+                                                 max_workers = max_workers,
+                                                 processos = processos)
+
+      basometro_coleta.gravar_particoes(years, particoes_path, gravador)
+      return
+
+    diario_coleta = diario.DiarioColeta(diario_path, { "tipo"       : "instalacao",
+                                                       "start_year" : int(start_year),
+                                                       "end_year"   : int(end_year) })
 
-    return database
+    basometro_coleta.gravar_votos(start_year, end_year, gravador,
+                                  max_workers = max_workers,
+                                  pipeline = pipeline,
+                                  diario = diario_coleta)
 
-  def obter_votacoes_faltantes(database):
+    diario_coleta.fechar()
+
+  def obter_votacoes_faltantes(gravador):
     '''
     Essa função adiciona manualmente algumas votações que não constam no banco de dados da Câmara dos Deputados.
     Em conversas com a equipe técnica da instituição, fomos informados de que as votações feitas via painel são
@@ -40,9 +86,28 @@ def instalar_basometro():
     da base.
 
     Parâmetros:
-    database -> O banco de dados completo do basômetro, gerado em coletar_dados_api. Formato dataframe.
+    gravador -> O objeto armazenamento.GravadorVotos que recebeu os votos em coletar_dados_api.
     '''
 
+    def listar_deputados(gravador):
+      '''
+      Lê, em partes, os nomes e identificadores dos deputados de cada governo
+      já gravados no banco de dados. O resultado substitui o banco de dados
+      completo na hora de preencher o ideCadastro dos votos faltantes.
+
+      Parâmetros:
+      gravador -> O objeto armazenamento.GravadorVotos do banco de dados.
+      '''
+      colunas = [ 'parlamentar', 'ideCadastro', 'governo' ]
+      partes  = [ parte.drop_duplicates() for parte in gravador.ler_gravados(colunas) ]
+
+      if len(partes) == 0:
+        return pd.DataFrame(columns = colunas)
+
+      deputados = pd.concat(partes, ignore_index = True)
+
+      return deputados.drop_duplicates()
+
     def obter_votos_faltantes(database, missing_session_fpath, names, keep_all):
 
       def ler_arquivo(missing_session_fpath, names, keep_all):
@@ -114,7 +179,7 @@ def instalar_basometro():
         os identifadores, que foram levantados manualmente, adicionados no braço.
 
         Parâmetros:
-        database -> A base de dados completa do basômetro
+        database -> Os deputados do basômetro, gerados por listar_deputados
         missing_session -> Datafame com os votos faltantes de uma votação específica
         missing_sessions_fpath -> O caminho até o csv do dataframe. É usada para escolher os dados corretos.
         '''
@@ -170,39 +235,27 @@ def instalar_basometro():
         '''
         Atualiza o nome do partido para o registro mais recente.
         Assim, entradas como "PMDB" viram "MDB" – a sigla atual.
+        A coluna inteira é convertida de uma vez, com cada sigla
+        distinta padronizada uma única vez.
 
         Parâmetros:
         missing_session -> O dataframe com votos faltantes.
         '''
 
-        def padronizar_partido(row):
-          '''
-          Função para ser rodada via o método apply do pandas.
-          Ela invoca a função padronizar_partido do módulo core do basômetro.
-          '''
-
-          partido = basometro_core.padronizar_partido(row.partido)
-
-          return pd.Series({
-              "partido" : partido,
-          })
-
-        missing_session['partido'] = missing_session.apply(padronizar_partido, axis = 1)
+        missing_session['partido'] = basometro_core.padronizar_partidos(missing_session.partido).partido
 
         return missing_session
 
-      def adicionar_votos_faltantes(database, missing_session):
+      def adicionar_votos_faltantes(missing_session):
         '''
         Ao final do processo, resta apenas adicionar os votos recém padronizados
         ao banco de dados completo.
 
         Parâmetros:
-        database -> O banco de dados completo do basômetro, em formato dataframe.
         missing_session -> O banco de dados, já padronizado, de uma sessão da Câmara que não consta na API.
         '''
 
-        database = database.append(missing_session, ignore_index = True)
-        return database
+        gravador.adicionar_dataframe(missing_session, filtrar = False)
 
       ##############################################
       ### EXECUÇÃO DE obter_votos_faltantes() ###
@@ -220,10 +273,7 @@ def instalar_basometro():
 
       missing_session = padronizar_partidos(missing_session)
 
-      database = adicionar_votos_faltantes(database = database,
-                                          missing_session = missing_session)
-
-      return database
+      adicionar_votos_faltantes(missing_session = missing_session)
 
     ##############################################
     ### EXECUÇÃO DE obter_votacoes_faltantes() ###
@@ -231,13 +281,16 @@ def instalar_basometro():
     names = ['parlamentar', 'voto', 'partido', 'UF']
     missing_session_fpaths = glob.glob("database/votacoes-ausentes/*.csv")
 
-    for missing_session_fpath in missing_session_fpaths:
-      database = obter_votos_faltantes(database = database,
-                                       missing_session_fpath = missing_session_fpath,
-                                       names = names,
-                                       keep_all = False)
+    if len(missing_session_fpaths) == 0:
+      return
+
+    database = listar_deputados(gravador)
 
-    return database
+    for missing_session_fpath in missing_session_fpaths:
+      obter_votos_faltantes(database = database,
+                            missing_session_fpath = missing_session_fpath,
+                            names = names,
+                            keep_all = False)
 
   ########################################
   ### EXECUÇÃO DE instalar_basometro() ###
@@ -245,30 +298,81 @@ def instalar_basometro():
 
   print("Esse script monta a estrutura de dados necessária para rodar o Basômetro pela primeira vez.\n")
 
-  # Coleta dados da API
-  current_year = datetime.datetime.now().year
-  database = coletar_dados_api(start_year = 2003,
-                               end_year   = current_year,
-                               keep_all   = False)
+  particoes_path = "./database/particoes"
+  diario_path    = "./database/instalacao.diario"
+
+  if end_year is None:
+    end_year = datetime.datetime.now().year
+
+  # Os votos são gravados em lotes, à medida que são coletados, em fragmentos
+  # que só passam a fazer parte do banco de dados quando a instalação termina
+  csv_path = "./database/basometro.csv"
+  banco    = armazenamento.abrir_banco(df_path)
+  gravador = banco.gravador(keep_all = False)
+
+  # Coleta dados da API. O modo offline vale apenas para esta coleta: depois
+  # dela, o modo anterior é restaurado, mesmo que a coleta falhe
+  offline_anterior = requisicoes.OFFLINE
+
+  if offline:
+    requisicoes.configurar_cache(requisicoes.CACHE, offline = True)
+
+  try:
+    coletar_dados_api(start_year  = start_year,
+                      end_year    = end_year,
+                      gravador    = gravador,
+                      max_workers = max_workers,
+                      pipeline    = pipeline,
+                      processos   = processos)
 
-  # Preenche banco de dados com votações faltantes
-  print("Agora vamos obter as votações por chamada.")
-  database = obter_votacoes_faltantes(database = database)
+    requisicoes.relatorio_cache()
+    requisicoes.relatorio_agendador()
 
-  # Salva banco de dados em formato csv
-  df_path = "./database/basometro.csv"
-  database.to_csv(df_path, index = False, encoding = 'utf-8')
+    # Preenche banco de dados com votações faltantes
+    print("Agora vamos obter as votações por chamada.")
+    obter_votacoes_faltantes(gravador = gravador)
+
+  except BaseException:
+    gravador.descartar()
+    raise
+
+  finally:
+    requisicoes.configurar_cache(requisicoes.CACHE, offline = offline_anterior)
+
+  # Salva banco de dados
+  gravador.concluir()
+  print(f"{gravador.gravados} votos salvos em {df_path}")
+
+  if exportar_csv:
+    banco.exportar_csv(csv_path)
+    print(f"Banco de dados exportado para {csv_path}")
+
+  # Salva o índice usado pelo atualizador para não precisar ler o banco de dados
+  indice_votacoes = indice.IndiceVotacoes(df_path)
+  indice_votacoes.registrar(gravador)
+  indice_votacoes.salvar()
+
+  # As partições e o diário da coleta não são mais necessários
+  if os.path.exists(particoes_path):
+    shutil.rmtree(particoes_path)
+
+  if os.path.exists(diario_path):
+    os.remove(diario_path)
 
   print("E agora vamos gerar os arquivos para a visualização de dados.")
 
-  output_path = "./output/"
-  if os.path.exists(output_path):
-    shutil.rmtree(output_path)
+  output_path = "./output"
+  freqs       = [ "MS" ] # Frequências para criar bins temporais
+
+  def gerar(caminho):
+    basometro_aplicativo.gerar_arquivos_viz(freqs = freqs,
+                                            df_path = df_path,
+                                            output_path = caminho,
+                                            processos = processos)
 
-  freqs = [ "MS" ] # Frequências para criar bins temporais
-  basometro_aplicativo.gerar_arquivos_viz(freqs = freqs,
-                                          df_path = df_path,
-                                          output_path = output_path)
+  # Os arquivos são publicados como uma geração nova do output, que substitui
+  # a anterior de uma só vez (ver geracoes.Geracoes)
+  geracoes.Geracoes(output_path).atualizar(gerar, copiar_atual = False)
   print("Pronto!")
   return
 
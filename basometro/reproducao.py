@@ -0,0 +1,516 @@
+'''
+Gravação e reprodução das respostas da API da Câmara dos Deputados, para
+medir e testar os coletores sem acesso à rede. Em modo de gravação, as
+respostas que o camaraPy devolve para ListarProposicoesVotadasEmPlenario,
+ObterProposicaoPorID e ObterVotacaoProposicao são guardadas em um arquivo.
+Depois, elas podem ser reproduzidas de duas formas: por um transporte que
+substitui as funções do camaraPy no próprio processo ou por um servidor HTTP
+local que imita o webservice da Câmara, de modo que o camaraPy faça as
+requisições e interprete o XML como faria com a API real. Nos dois casos, é
+possível simular latência, variação da latência, falhas e sobrecarga.
+
+Para gravar a coleta de um intervalo de anos na API real:
+
+python -m basometro.reproducao gravar 2015 2016 database/gravacao.jsonl.gz
+
+Para servir uma gravação em http://127.0.0.1:8000:
+
+python -m basometro.reproducao servir database/gravacao.jsonl.gz 8000
+
+O processo que vai usar o servidor deve chamar apontar_camarapy com o
+endereço impresso no console.
+'''
+
+from basometro.core import requisicoes
+from camaraPy.api_original import proposicoes as campy_proposicoes
+from camaraPy.api_original.core import core as campy_core
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import gzip, json, random, requests, sys, threading, time
+import xmltodict
+
+######################
+#                    #
+# PARÂMETROS GLOBAIS #
+#                    #
+######################
+
+# Métodos do camaraPy usados pelos coletores
+METODOS = [ "ListarProposicoesVotadasEmPlenario", "ObterProposicaoPorID", "ObterVotacaoProposicao" ]
+
+# Caminho do webservice de proposições na API da Câmara
+CAMINHO_PROPOSICOES = "/SitCamaraWS/Proposicoes.asmx"
+
+# Mensagens com que a API responde às exceções conhecidas. O camaraPy
+# reconhece cada exceção procurando um trecho dessas mensagens.
+MENSAGENS_ERRO = {
+  "ProposicaoAcessoria" : "Essa proposição é acessória, atrelada a outra principal.",
+  "SemDados"            : "Dados não encontrados.",
+}
+
+class ForaDaGravacao(LookupError):
+  '''
+  Exceção levantada quando uma requisição não está na gravação
+  '''
+  pass
+
+###########
+# CLASSES #
+###########
+
+class RedeSimulada(object):
+  '''
+  Imita o tempo de resposta de um servidor e, eventualmente, falhas de
+  conexão. Se houver mais requisições simultâneas do que a capacidade do
+  servidor, todas elas ficam mais lentas – mais do que proporcionalmente,
+  como acontece com um servidor sobrecarregado.
+
+  Parâmetros:
+  latencia -> Tempo, em segundos, que cada requisição leva para ser respondida
+  variacao -> Variação aleatória da latência, como fração dela. Com 0.5, cada
+  requisição leva entre 50% e 150% da latência.
+  falhas -> Probabilidade de uma requisição falhar
+  capacidade -> Número de requisições simultâneas que o servidor atende sem
+  ficar mais lento. None significa capacidade ilimitada.
+  semente -> Semente usada para sortear as latências e as falhas
+  '''
+
+  def __init__(self, latencia = 0, variacao = 0, falhas = 0, capacidade = None, semente = 0):
+    self.latencia          = latencia
+    self.variacao          = variacao
+    self.falhas            = falhas
+    self.capacidade        = capacidade
+    self.requisicoes       = 0
+    self.falhas_simuladas  = 0
+    self._ativas           = 0
+    self._lock             = threading.Lock()
+    self._random           = random.Random(f"{semente}-rede")
+
+  def esperar(self):
+    '''
+    Espera o tempo de uma requisição e retorna True se ela deve falhar
+    '''
+    with self._lock:
+      self.requisicoes += 1
+      self._ativas     += 1
+      ativas = self._ativas
+      fator  = self._random.uniform(1 - self.variacao, 1 + self.variacao)
+      falhou = self._random.random() < self.falhas
+      if falhou:
+        self.falhas_simuladas += 1
+
+    # Acima da capacidade, a vazão do servidor cai
+    if self.capacidade is not None and ativas > self.capacidade:
+      fator *= (ativas / self.capacidade) ** 2
+
+    try:
+      if self.latencia:
+        time.sleep(self.latencia * fator)
+
+    finally:
+      with self._lock:
+        self._ativas -= 1
+
+    return falhou
+
+class ApiSubstituta(object):
+  '''
+  Base das classes que tomam o lugar da API da Câmara. Enquanto uma delas
+  está instalada, o cache de respostas fica desativado – para que respostas
+  falsas nunca se misturem às verdadeiras e para que todas as requisições
+  cheguem ao substituto – e as requisições passam pelo agendador self.agendador.
+  As subclasses implementam substituir() e restaurar().
+
+  A leitura direta do XML (ver requisicoes.configurar_leitura_xml) faz as
+  próprias requisições, sem passar pelas funções do camaraPy. Por isso, fica
+  desligada enquanto um substituto que troca essas funções está instalado.
+
+  Parâmetros:
+  agendador -> O agendador.AgendadorRequisicoes usado enquanto o substituto está
+  instalado. O padrão é o criado por criar_agendador().
+  '''
+
+  # Se verdadeiro, o substituto responde a requisições HTTP e
+  # pode ser usado com a leitura direta do XML
+  RESPONDE_HTTP = False
+
+  def __init__(self, agendador = None):
+    self.agendador            = agendador
+    self.cache_original       = None
+    self.agendador_original   = None
+    self.leitura_xml_original = None
+
+  def criar_agendador(self):
+    '''
+    Cria o agendador padrão: sem limite de ritmo, já que não há API real a poupar
+    '''
+    return requisicoes.criar_agendador(taxa = None)
+
+  def instalar(self):
+    self.substituir()
+
+    self.cache_original = requisicoes.configurar_cache(None)
+
+    if self.agendador is None:
+      self.agendador = self.criar_agendador()
+    self.agendador_original = requisicoes.configurar_agendador(self.agendador)
+
+    if not self.RESPONDE_HTTP:
+      self.leitura_xml_original = requisicoes.configurar_leitura_xml(False)
+
+    return self
+
+  def desinstalar(self):
+    self.restaurar()
+
+    requisicoes.configurar_cache(self.cache_original)
+    requisicoes.configurar_agendador(self.agendador_original)
+
+    if not self.RESPONDE_HTTP:
+      requisicoes.configurar_leitura_xml(self.leitura_xml_original)
+
+  def substituir(self):
+    raise NotImplementedError
+
+  def restaurar(self):
+    raise NotImplementedError
+
+  def __enter__(self):
+    return self.instalar()
+
+  def __exit__(self, *args):
+    self.desinstalar()
+
+class Gravacao(object):
+  '''
+  Conjunto de respostas da API, indexadas pelo método e pelos parâmetros da
+  requisição. Parâmetros vazios são ignorados, já que o camaraPy preenche com
+  strings vazias todos os que não foram informados. Exceções conhecidas (como
+  ProposicaoAcessoria) também são gravadas e levantadas de novo na reprodução.
+
+  As respostas ficam guardadas como texto json e são decodificadas a cada
+  reprodução, para que quem as recebe possa alterá-las à vontade.
+  '''
+
+  def __init__(self):
+    self.respostas = { }
+    self._lock     = threading.Lock()
+
+  def __len__(self):
+    return len(self.respostas)
+
+  @staticmethod
+  def chave(metodo, params):
+    '''
+    Retorna a chave da requisição. A ordem dos parâmetros não importa.
+    '''
+    params = { str(k) : str(v) for k, v in params.items() if v is not None and str(v) != "" }
+    return json.dumps([ metodo, params ], sort_keys = True)
+
+  def registrar(self, metodo, params, payload = None, erro = None):
+    '''
+    Grava a resposta de uma requisição.
+
+    Parâmetros:
+    metodo -> O nome do método do camaraPy
+    params -> Os parâmetros passados para o método
+    payload -> A resposta devolvida pelo camaraPy
+    erro -> O nome da exceção conhecida levantada pelo camaraPy, se for o caso
+    '''
+    resposta = { "erro" : erro } if erro is not None else { "payload" : json.dumps(payload, ensure_ascii = False) }
+
+    with self._lock:
+      self.respostas[self.chave(metodo, params)] = resposta
+
+  def responder(self, metodo, params):
+    '''
+    Retorna a resposta gravada para a requisição ou levanta a exceção
+    gravada. Se a requisição não foi gravada, levanta ForaDaGravacao.
+    '''
+    resposta = self.respostas.get(self.chave(metodo, params))
+
+    if resposta is None:
+      raise ForaDaGravacao(f"Não há resposta gravada para {metodo} com os parâmetros {params}")
+
+    if "erro" in resposta:
+      excecao = requisicoes.EXCECOES_CONHECIDAS[resposta["erro"]]
+      raise excecao(excecao.err_message)
+
+    return json.loads(resposta["payload"])
+
+  def salvar(self, caminho):
+    '''
+    Salva a gravação em um arquivo json comprimido com gzip, com uma resposta por linha
+    '''
+    with gzip.open(caminho, "wt", encoding = "utf-8") as file:
+      for chave in sorted(self.respostas):
+        metodo, params = json.loads(chave)
+        resposta = dict(self.respostas[chave], metodo = metodo, params = params)
+        file.write(json.dumps(resposta, ensure_ascii = False) + "\n")
+
+  @classmethod
+  def carregar(cls, caminho):
+    '''
+    Lê uma gravação salva por salvar()
+    '''
+    gravacao = cls()
+
+    with gzip.open(caminho, "rt", encoding = "utf-8") as file:
+      for linha in file:
+        resposta = json.loads(linha)
+        chave = cls.chave(resposta.pop("metodo"), resposta.pop("params"))
+        gravacao.respostas[chave] = resposta
+
+    return gravacao
+
+class GravadorApi(ApiSubstituta):
+  '''
+  Modo de gravação: as funções do camaraPy continuam sendo chamadas, mas cada
+  resposta é guardada em self.gravacao. O agendador em uso é mantido, para que
+  a API real continue protegida pelo limite de ritmo.
+
+  Parâmetros:
+  gravacao -> A Gravacao onde as respostas são guardadas. O padrão é uma nova.
+  '''
+
+  def __init__(self, gravacao = None, agendador = None):
+    super().__init__(agendador)
+    self.gravacao  = gravacao if gravacao is not None else Gravacao()
+    self.originais = { }
+
+  def criar_agendador(self):
+    return requisicoes.AGENDADOR
+
+  def substituir(self):
+
+    def gravar(metodo, original):
+
+      def chamar(parameters = { }):
+        # O camaraPy altera o dicionário de parâmetros, então a chave é lida antes
+        params = dict(parameters)
+
+        try:
+          payload = original(parameters)
+
+        except tuple(requisicoes.EXCECOES_CONHECIDAS.values()) as e:
+          self.gravacao.registrar(metodo, params, erro = type(e).__name__)
+          raise
+
+        self.gravacao.registrar(metodo, params, payload = payload)
+
+        return payload
+
+      return chamar
+
+    for metodo in METODOS:
+      self.originais[metodo] = getattr(campy_proposicoes, metodo)
+      setattr(campy_proposicoes, metodo, gravar(metodo, self.originais[metodo]))
+
+  def restaurar(self):
+    for metodo, funcao in self.originais.items():
+      setattr(campy_proposicoes, metodo, funcao)
+    self.originais = { }
+
+class ApiReproduzida(ApiSubstituta):
+  '''
+  Transporte que reproduz uma gravação no próprio processo, no lugar das
+  funções do camaraPy. As falhas simuladas levantam requests.ConnectionError.
+
+  Parâmetros:
+  gravacao -> A Gravacao reproduzida
+  rede -> A RedeSimulada que imita a latência e as falhas. O padrão é uma rede sem latência.
+  agendador -> Herdado de ApiSubstituta
+  '''
+
+  def __init__(self, gravacao, rede = None, agendador = None):
+    super().__init__(agendador)
+    self.gravacao  = gravacao
+    self.rede      = rede if rede is not None else RedeSimulada()
+    self.originais = { }
+
+  def substituir(self):
+
+    def reproduzir(metodo):
+
+      def chamar(parameters = { }):
+        if self.rede.esperar():
+          raise requests.ConnectionError("Falha de conexão simulada")
+        return self.gravacao.responder(metodo, parameters)
+
+      return chamar
+
+    for metodo in METODOS:
+      self.originais[metodo] = getattr(campy_proposicoes, metodo)
+      setattr(campy_proposicoes, metodo, reproduzir(metodo))
+
+  def restaurar(self):
+    for metodo, funcao in self.originais.items():
+      setattr(campy_proposicoes, metodo, funcao)
+    self.originais = { }
+
+class ServidorLocal(ApiSubstituta):
+  '''
+  Servidor HTTP que imita o webservice de proposições da Câmara a partir de
+  uma gravação. As respostas são convertidas de volta para XML, e as exceções
+  conhecidas e as falhas simuladas viram respostas de erro, como as da API
+  real. Instalado, o servidor é iniciado e o camaraPy passa a apontar para ele;
+  também pode ser usado sozinho, com iniciar() e parar().
+
+  Parâmetros:
+  gravacao -> A Gravacao reproduzida
+  rede -> A RedeSimulada que imita a latência e as falhas. O padrão é uma rede sem latência.
+  agendador -> Herdado de ApiSubstituta
+  endereco -> O endereço em que o servidor escuta
+  porta -> A porta em que o servidor escuta. Com 0, uma porta livre é escolhida.
+  '''
+
+  RESPONDE_HTTP = True
+
+  def __init__(self, gravacao, rede = None, agendador = None, endereco = "127.0.0.1", porta = 0):
+    super().__init__(agendador)
+    self.gravacao     = gravacao
+    self.rede         = rede if rede is not None else RedeSimulada()
+    self.endereco     = endereco
+    self.porta        = porta
+    self.url          = None
+    self.url_original = None
+    self._servidor    = None
+    self._thread      = None
+
+  def responder_http(self, caminho):
+    '''
+    Retorna o par (código HTTP, corpo) da resposta a uma URL do webservice
+    '''
+    url    = urlsplit(caminho)
+    metodo = url.path.rstrip("/").rsplit("/", 1)[-1]
+    params = dict(parse_qsl(url.query, keep_blank_values = True))
+
+    if self.rede.esperar():
+      return 500, "Falha simulada do servidor"
+
+    try:
+      payload = self.gravacao.responder(metodo, params)
+
+    except tuple(requisicoes.EXCECOES_CONHECIDAS.values()) as e:
+      return 500, MENSAGENS_ERRO[type(e).__name__]
+
+    except ForaDaGravacao as e:
+      return 404, str(e)
+
+    return 200, xmltodict.unparse(payload)
+
+  def iniciar(self):
+    '''
+    Inicia o servidor em uma thread e retorna o endereço do webservice
+    '''
+    servidor_local = self
+
+    class Requisicao(BaseHTTPRequestHandler):
+
+      def do_GET(self):
+        codigo, corpo = servidor_local.responder_http(self.path)
+        corpo = corpo.encode("utf-8")
+
+        self.send_response(codigo)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+      def log_message(self, *args):
+        pass
+
+    class Servidor(ThreadingHTTPServer):
+      daemon_threads     = True
+      request_queue_size = 128
+
+    self._servidor = Servidor((self.endereco, self.porta), Requisicao)
+    self._thread   = threading.Thread(target = self._servidor.serve_forever, daemon = True)
+    self._thread.start()
+
+    endereco, porta = self._servidor.server_address[:2]
+    self.url = f"http://{endereco}:{porta}{CAMINHO_PROPOSICOES}"
+
+    return self.url
+
+  def parar(self):
+    self._servidor.shutdown()
+    self._servidor.server_close()
+    self._thread.join()
+
+  def substituir(self):
+    self.url_original = apontar_camarapy(self.iniciar())
+
+  def restaurar(self):
+    apontar_camarapy(self.url_original)
+    self.parar()
+
+###########
+# FUNÇÕES #
+###########
+
+def apontar_camarapy(url):
+  '''
+  Faz o camaraPy usar outro endereço para o webservice de proposições
+  e retorna o anterior.
+
+  Parâmetros:
+  url -> O endereço do webservice, como o retornado por ServidorLocal.iniciar()
+  '''
+  anterior = campy_core.BASE_URLS["proposicoes"]
+  campy_core.BASE_URLS["proposicoes"] = url
+
+  return anterior
+
+def gravar_coleta(start_year, end_year, caminho, max_workers = 1):
+  '''
+  Coleta os votos do intervalo na API real, gravando todas as respostas
+  em um arquivo que pode ser reproduzido depois. Retorna o DataFrame coletado.
+
+  Parâmetros:
+  start_year -> O ano de início da coleta
+  end_year -> O ano de término da coleta
+  caminho -> O arquivo onde a gravação é salva
+  max_workers -> Número de requisições simultâneas
+  '''
+
+  from basometro import basometro_coleta
+
+  with GravadorApi() as gravador:
+    df = basometro_coleta.coletar_votos(start_year, end_year, max_workers = max_workers)
+
+  gravador.gravacao.salvar(caminho)
+  print(f"{len(gravador.gravacao)} respostas gravadas em {caminho}")
+
+  return df
+
+##############
+### main() ###
+##############
+
+def main(argumentos):
+  comando = argumentos[0]
+
+  if comando == "gravar":
+    start_year, end_year, caminho = argumentos[1:4]
+    gravar_coleta(int(start_year), int(end_year), caminho, max_workers = 8)
+
+  elif comando == "servir":
+    caminho = argumentos[1]
+    porta   = int(argumentos[2]) if len(argumentos) > 2 else 8000
+
+    servidor = ServidorLocal(Gravacao.carregar(caminho), porta = porta)
+    print(f"Servindo {len(servidor.gravacao)} respostas em {servidor.iniciar()}")
+
+    try:
+      while True:
+        time.sleep(1)
+
+    except KeyboardInterrupt:
+      servidor.parar()
+
+  else:
+    raise ValueError(f"Comando desconhecido: {comando}. Os comandos válidos são gravar e servir.")
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
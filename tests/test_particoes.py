@@ -0,0 +1,21 @@
+'''
+A coleta dividida por ano deve funcionar mesmo quando nenhum dos anos teve votos.
+'''
+
+from basometro import basometro_coleta
+from basometro.core import core
+
+def test_juntar_particoes_sem_votos(tmp_path):
+  diretorio = str(tmp_path)
+
+  # Uma partição só com o cabeçalho e outra vazia, gravada por versões anteriores
+  with open(basometro_coleta.caminho_particao(diretorio, 2019), "w", encoding = "utf-8") as file:
+    file.write(",".join(core.COLUNAS_VOTO) + "\n")
+
+  open(basometro_coleta.caminho_particao(diretorio, 2020), "w").close()
+
+  df = basometro_coleta.juntar_particoes([ 2019, 2020 ], diretorio)
+
+  assert df.shape[0] == 0
+  assert list(df.columns) == core.COLUNAS_VOTO
+  assert str(df.data.dtype) == "datetime64[ns]"
@@ -0,0 +1,66 @@
+'''
+Um deputado com dois votos na mesma votação não deve interromper a geração
+dos arquivos da visualização: os votos repetidos são avisados por
+basometro_governos.validar_sessoes, e os arquivos são escritos.
+'''
+
+from basometro import basometro_aplicativo
+from basometro.core import agregados
+import os
+import pandas as pd
+import pytest
+
+def escrever_banco(caminho):
+  '''
+  Escreve um banco de dados CSV com três votações do governo Dilma 2, nas
+  quais o deputado 10001 votou duas vezes na segunda, com votos diferentes
+  '''
+  votos = [ ]
+
+  for dia, id_votacao in [ ("2015-04-21", "21-4-2015.15.28.1"), ("2015-05-12", "12-5-2015.16.02.2"), ("2015-06-03", "3-6-2015.18.40.3") ]:
+    for ideCadastro, partido, voto in [ (10000, "PT", "Sim"), (10001, "PSDB", "Não"), (10002, "PV", "Sim") ]:
+      votos.append({
+        "parlamentar"       : f"Deputado {ideCadastro}",
+        "ideCadastro"       : ideCadastro,
+        "UF"                : "SP",
+        "voto"              : voto,
+        "partido"           : partido,
+        "descricaoPartido"  : partido,
+        "orientacaoGoverno" : "Sim",
+        "data"              : f"{dia} 00:00:00",
+        "hora"              : "15:28",
+        "governo"           : "Dilma 2",
+        "idVotacao"         : id_votacao,
+        "tipoProposicao"    : "PL",
+        "numeroProposicao"  : "0017",
+        "anoProposicao"     : "2014",
+      })
+
+  votos.append(dict(votos[4], voto = "Sim"))
+
+  pd.DataFrame(votos).to_csv(caminho, index = False, encoding = "utf-8")
+
+def test_voto_duplicado_avisa_e_gera_arquivos(tmp_path):
+  df_path     = str(tmp_path / "basometro.csv")
+  output_path = str(tmp_path / "output")
+
+  escrever_banco(df_path)
+
+  with pytest.warns(UserWarning, match = r"10001 \(2 votos na votação 12-5-2015\.16\.02\.2\)"):
+    basometro_aplicativo.gerar_arquivos_viz(freqs = [ "MS" ], df_path = df_path, output_path = output_path)
+
+  # A matriz guarda o primeiro dos votos repetidos, contrário ao governo
+  todos = pd.read_csv(os.path.join(output_path, "governos", "Dilma 2-todos.csv")).set_index('ideCadastro')
+  assert todos.loc[10001, [ 'totalVotos', 'proGovCtg', 'totalVotacoes' ]].tolist() == [ 3, 0, 3 ]
+
+  assert os.path.exists(os.path.join(output_path, "deputados", "10001-MS.csv"))
+  assert os.path.exists(os.path.join(output_path, "last-update.json"))
+
+def test_agregados_contam_como_a_matriz(tmp_path):
+  df_path = str(tmp_path / "basometro.csv")
+  escrever_banco(df_path)
+
+  tabela = agregados.AgregadosVotos.abrir(df_path).tabelas["governos"]
+  linha  = tabela[ (tabela.partido == "todos") & (tabela.ideCadastro == 10001) ]
+
+  assert linha[[ 'votos', 'governistas', 'sessoes' ]].values.tolist() == [ [ 3, 0, 3 ] ]